@@ -7,7 +7,8 @@ from agno.models.azure import AzureOpenAI
 
 from agents.agent_types import AgentType
 from agents.llm_models import LLMModel
-from knowledge_base.hex_gig_knowledge_base import get_hex_gig_knowledge, get_member_profiles_data
+from knowledge_base.hex_gig_knowledge_base import get_hex_gig_knowledge
+from knowledge_base.hex_gig_member_directory import MEMBER_DIRECTORY_TOOLS, get_member_directory
 
 logger = getLogger(__name__)
 
@@ -22,7 +23,7 @@ def get_hex_gig_agent() -> Agent:
     follow-up questions (e.g. "yes" after a clarification prompt) retain their
     meaning. Session state is wiped on container restart.
     """
-    member_count = len(get_member_profiles_data())
+    member_count = len(get_member_directory())
     print(f"📊 HeX member count from CSV: {member_count}")
     member_count_str = str(member_count)
 
@@ -40,6 +41,9 @@ def get_hex_gig_agent() -> Agent:
         knowledge=get_hex_gig_knowledge(),
         search_knowledge=True,
         enable_agentic_knowledge_filters=True,
+        # Exact member counts and lists from the in-memory member directory,
+        # without an embedding or vector search per question.
+        tools=MEMBER_DIRECTORY_TOOLS,
         # Context & Memory — RAM-backed, so history injection is safe
         add_history_to_context=True,
         num_history_runs=3,
@@ -106,8 +110,9 @@ def get_hex_gig_agent() -> Agent:
             </grounding_rules>
 
             <search_strategy>
-            CRITICAL: You MUST call search_knowledge_base before answering ANY question,
-            even if the answer seems obvious from your instructions. Never respond with
+            CRITICAL: You MUST call search_knowledge_base (or, for membership counts and
+            lists, a member directory tool) before answering ANY question, even if the
+            answer seems obvious from your instructions. Never respond with
             member names, research topics, or network details without first searching.
             - Use the `source_type` metadata filter to target your search:
               - "research_paper" for questions about expertise, publications, or collaborations
@@ -118,10 +123,11 @@ def get_hex_gig_agent() -> Agent:
                 membership and expertise
             - For questions about a specific faculty or discipline, also use
               `faculty_affiliation` or `discipline` metadata filters to narrow results.
-            - For "list all members" questions: state the total count, then perform
-              multiple searches using faculty_affiliation filters to retrieve members
-              in batches (your search returns at most 10 results per query). Organise
-              results by faculty.
+            - For membership counts and lists ("how many members...", "list the members
+              of...", "which faculties..."), use the member directory tools instead of
+              searching: count_network_members, list_network_members and
+              count_network_members_by return exact, complete results (search returns at
+              most 10 results per query). Organise listed members by faculty.
             - If initial results seem sparse, try broadening your search with related
               terms before concluding that no information is available.
             - For queries about "latest", "most recent", "newest", or "current" news:
@@ -11,6 +11,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from agents.registry import register_agents
 from api.routes.agents import agents_router
 from api.settings import api_settings
+from services.response_cache import response_cache
+from services.usage_writer import usage_writer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -41,16 +43,23 @@ agent_os_db = get_project_db(api_settings.project_config.project_name)
 async def app_lifecycle(app):
     """
     Lifespan context manager to handle startup and shutdown events.
-    Loads knowledge into agents when the application starts.
+    Loads knowledge into agents when the application starts, runs the
+    background usage/metrics writer, and flushes its queue on shutdown.
     """
+    usage_writer.start()
+
     print(f"📚 Loading knowledge for {api_settings.project_config.project_name} project...")
 
     await api_settings.project_config.load_knowledge(agents)
+    # Answers cached before this (re)load may cite knowledge that changed.
+    response_cache.invalidate()
 
     yield
 
     print("👋 Shutting down...")
 
+    await usage_writer.stop()
+
 
 # Create custom FastAPI app with budget-enforced agent routes
 app = FastAPI(title="Health Research Agent API")
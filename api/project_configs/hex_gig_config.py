@@ -1,18 +1,67 @@
-from typing import List
+import asyncio
+from typing import List, Optional
 
 from agno.agent import Agent
 from agno.knowledge.reader.pdf_reader import PDFReader
 
 from agents.hex_gig_agent import get_hex_gig_agent
-from api.project_configs.project_config import ProjectConfig, ProjectName
+from api.project_configs.project_config import ProjectConfig, ProjectName, print_ingestion_progress
 from knowledge_base.hex_gig_knowledge_base import get_member_profiles_data, get_research_articles_from_ucloud
-from knowledge_base.hex_gig_rss_knowledge import aload_rss_into_knowledge
+from knowledge_base.hex_gig_rss_knowledge import RSS_SOURCE_TYPE, aload_rss_into_knowledge
+from services.citations_service import CitationResolvers, CitationSource
+from services.ingestion_executor import ingest_into_knowledge
 from services.nextcloud_client import NextcloudClient
 from services.nextcloud_pdf_provider import NextcloudPDFProvider
 
 UCLOUD_WEBDAV_URL = "https://ucloud.univie.ac.at/public.php/webdav/"
 
 
+def _cite_research_paper(name: Optional[str], meta: dict) -> Optional[CitationSource]:
+    """Research papers link to their DOI, or to the author's u:find profile when no DOI was found."""
+    url = meta.get("doi") or meta.get("uni_wien_url")
+    if not url:
+        return None
+    return CitationSource(
+        source_url=url,
+        title=name or meta.get("network_member_name") or url,
+        source_type="research_paper",
+        language=meta.get("language") or "en",
+    )
+
+
+def _cite_news_article(name: Optional[str], meta: dict) -> Optional[CitationSource]:
+    url = meta.get("link")
+    if not url:
+        return None
+    return CitationSource(
+        source_url=url,
+        title=meta.get("title") or name or url,
+        source_type=RSS_SOURCE_TYPE,
+        language=meta.get("language") or "en",
+    )
+
+
+def _cite_member_profile(name: Optional[str], meta: dict) -> Optional[CitationSource]:
+    url = meta.get("uni_wien_url")
+    if not url:
+        return None
+    return CitationSource(
+        source_url=url,
+        title=name or meta.get("network_member_name") or url,
+        source_type="member_profile",
+        language=meta.get("language") or "en",
+    )
+
+
+HEX_GIG_CITATION_RESOLVERS = CitationResolvers(
+    {
+        "research_paper": _cite_research_paper,
+        RSS_SOURCE_TYPE: _cite_news_article,
+        "member_profile": _cite_member_profile,
+    }
+)
+
+
 class HexGigConfig(ProjectConfig):
     """Configuration for the HeX-GiG (Health Network Explorer) project."""
 
@@ -27,6 +76,10 @@ class HexGigConfig(ProjectConfig):
             "https://hex-gig-agent-ui.bravemeadow-0cb4208f.swedencentral.azurecontainerapps.io",  # remove after ZID CNAME is live
         ]
 
+    @property
+    def citation_resolvers(self) -> CitationResolvers:
+        return HEX_GIG_CITATION_RESOLVERS
+
     def get_agents(self) -> List[Agent]:
         """Initialize hex_gig agent."""
         return [get_hex_gig_agent()]
@@ -54,6 +107,10 @@ class HexGigConfig(ProjectConfig):
 
         from agno.knowledge.chunking.semantic import SemanticChunking
 
+        from services.embedding_cache import embedding_cache
+        from services.knowledge_indexes import ensure_knowledge_indexes
+        from services.knowledge_reconcile import aknowledge_load_lock, forget_documents, reconcile_knowledge
+
         pdf_reader = PDFReader(
             chunking_strategy=SemanticChunking(
                 embedder="minishlab/potion-base-32M",
@@ -78,20 +135,30 @@ class HexGigConfig(ProjectConfig):
                 share_token=share_token,
                 share_password=share_password,
             )
-            provider = NextcloudPDFProvider(client)
-            discovered = await provider.discover_and_download()
-
-            kb_data = get_research_articles_from_ucloud(discovered)
-            for i, item in enumerate(kb_data, 1):
-                print(f"  [{i}/{len(kb_data)}] Embedding: {item['name']}")
-                await hex_gig_agent.knowledge.ainsert(
-                    name=item["name"],
-                    path=str(item["path"]),
-                    reader=pdf_reader,
-                    metadata=item["metadata"],
-                    skip_if_exists=True,
+            async with NextcloudPDFProvider(client) as provider:
+                discovered = await provider.discover_and_download()
+
+            # DOI extraction parses PDFs (worker processes); keep it off the event loop.
+            kb_data = await asyncio.to_thread(get_research_articles_from_ucloud, discovered)
+            # Only new and changed papers are ingested; removed ones lose their vectors.
+            # Held until ingestion ends, so a concurrent load (the RSS refresh job) cannot
+            # insert between the reconcile snapshot and its orphan sweep.
+            async with aknowledge_load_lock(hex_gig_agent.knowledge):
+                papers, reconcile_report = await asyncio.to_thread(
+                    reconcile_knowledge,
+                    hex_gig_agent.knowledge,
+                    [{**item, "path": str(item["path"]), "reader": pdf_reader} for item in kb_data],
+                    "research papers",
+                    {"source_type": "research_paper"},
+                )
+                print(f"✅ Reconciled {reconcile_report.summary()}")
+                report = await ingest_into_knowledge(
+                    hex_gig_agent.knowledge, papers, label="research papers", on_progress=print_ingestion_progress
                 )
-            print(f"✅ Knowledge loaded from u:Cloud ({len(kb_data)} documents)")
+                print(f"✅ Knowledge loaded from u:Cloud ({len(kb_data)} documents)")
+                if report.rate_limited:
+                    print(f"⚠️  {len(report.rate_limited)} papers still rate limited: {', '.join(report.rate_limited)}")
+                    await asyncio.to_thread(forget_documents, hex_gig_agent.knowledge, report.rate_limited)
 
             # Load RSS news
             seen, _ = await aload_rss_into_knowledge(hex_gig_agent.knowledge)
@@ -99,14 +166,37 @@ class HexGigConfig(ProjectConfig):
 
             # Load member profiles from CSV
             member_profiles = get_member_profiles_data()
-            for item in member_profiles:
-                await hex_gig_agent.knowledge.ainsert(
-                    name=item["name"],
-                    text_content=item["text_content"],
-                    metadata=item["metadata"],
-                    skip_if_exists=True,
+            # Edited profiles are replaced; departed members are removed.
+            async with aknowledge_load_lock(hex_gig_agent.knowledge):
+                profiles, reconcile_report = await asyncio.to_thread(
+                    reconcile_knowledge,
+                    hex_gig_agent.knowledge,
+                    member_profiles,
+                    "member profiles",
+                    {"source_type": "member_profile"},
+                )
+                print(f"✅ Reconciled {reconcile_report.summary()}")
+                report = await ingest_into_knowledge(
+                    hex_gig_agent.knowledge, profiles, label="member profiles", on_progress=print_ingestion_progress
                 )
-            print(f"✅ Member profiles loaded ({len(member_profiles)} members)")
+                print(f"✅ Member profiles loaded ({len(member_profiles)} members)")
+                if report.rate_limited:
+                    print(
+                        f"⚠️  {len(report.rate_limited)} profiles still rate limited: {', '.join(report.rate_limited)}"
+                    )
+                    await asyncio.to_thread(forget_documents, hex_gig_agent.knowledge, report.rate_limited)
+            print(f"✅ Embedding cache: {embedding_cache.summary()}")
+
+            # Create or rebuild the HNSW, text search and metadata filter indexes search
+            # depends on (non-fatal: without them searches fall back to slower plans).
+            if os.environ.get("MANAGE_VECTOR_INDEX_ON_STARTUP", "true").lower() == "true":
+                try:
+                    index_reports = await asyncio.to_thread(ensure_knowledge_indexes, hex_gig_agent.knowledge.vector_db)
+                    for index_report in index_reports:
+                        icon = "⚠️ " if index_report.action == "failed" else "✅"
+                        print(f"{icon} Index {index_report.summary()}")
+                except Exception as e:
+                    print(f"⚠️  Index check failed: {e}")
         except Exception as e:
             print(f"❌ Error loading HeX-GiG knowledge: {e}")
             raise
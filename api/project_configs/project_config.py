@@ -4,6 +4,8 @@ from typing import List
 
 from agno.agent import Agent
 
+from services.citations_service import SOURCE_URL_RESOLVERS, CitationResolvers
+
 
 class ProjectName(str, Enum):
     """Supported project names for multi-project API."""
@@ -41,3 +43,17 @@ class ProjectConfig(ABC):
     async def load_knowledge(self, agents: List[Agent]) -> None:
         """Load knowledge bases into the provided agents."""
         pass
+
+    @property
+    def citation_resolvers(self) -> CitationResolvers:
+        """Resolvers mapping retrieved chunks to citation sources for the Citations frame.
+
+        Defaults to chunks carrying `meta_data.source_url`; projects whose
+        metadata differs override this with a module-level registry.
+        """
+        return SOURCE_URL_RESOLVERS
+
+
+def print_ingestion_progress(done: int, total: int, item: dict) -> None:
+    """Startup console progress for `ingest_into_knowledge` (the `on_progress` callback)."""
+    print(f"  [{done}/{total}] Embedded: {item['name']}")
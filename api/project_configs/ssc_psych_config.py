@@ -1,3 +1,4 @@
+import asyncio
 from pathlib import Path
 from typing import IO, Any, List, Optional, Union
 
@@ -7,7 +8,8 @@ from agno.knowledge.reader.docx_reader import DocxReader
 from agno.knowledge.reader.pdf_reader import PDFReader
 
 from agents.ssc_psych_agent import get_ssc_psych_agent
-from api.project_configs.project_config import ProjectConfig, ProjectName
+from api.project_configs.project_config import ProjectConfig, ProjectName, print_ingestion_progress
+from services.ingestion_executor import ingest_into_knowledge
 
 
 def _drop_blank_documents(documents: List[Document]) -> List[Document]:
@@ -65,14 +67,34 @@ class SscPsychConfig(ProjectConfig):
         """Load SSC Psychologie knowledge from website scraping into the agent."""
         import os
 
+        from services.excerpt_index import excerpt_index_store, index_knowledge_chunks
+
         load_knowledge = os.environ.get("LOAD_SSC_PSYCH_KNOWLEDGE", "true").lower() == "true"
         if not load_knowledge:
             print("⏭️  Skipping SSC Psych knowledge loading (LOAD_SSC_PSYCH_KNOWLEDGE=false)")
+            try:
+                await asyncio.to_thread(excerpt_index_store.preload)
+            except Exception as e:
+                print(f"⚠️  Citation token indexes not loaded (excerpts scan chunk text): {e}")
             return
 
         from agno.knowledge.chunking.semantic import SemanticChunking
 
-        from services.ssc_web_scraper import scrape_ssc_downloads, scrape_ssc_web_pages
+        from services.crawl_state import CrawlState, CrawlStateStore
+        from services.embedding_cache import embedding_cache
+        from services.knowledge_indexes import ensure_knowledge_indexes
+        from services.knowledge_reconcile import (
+            aknowledge_load_lock,
+            forget_documents,
+            incomplete_documents,
+            reconcile_knowledge,
+        )
+        from services.ssc_web_scraper import (
+            CRAWL_STATE_SOURCE,
+            ascrape_ssc_downloads,
+            ascrape_ssc_web_pages,
+            open_ssc_crawler,
+        )
 
         pdf_reader = NonEmptyPDFReader(
             chunking_strategy=SemanticChunking(
@@ -88,44 +110,100 @@ class SscPsychConfig(ProjectConfig):
         try:
             ssc_agent = agents[0]
 
-            # Load web pages from SSC website
-            web_pages = scrape_ssc_web_pages()
-            for i, item in enumerate(web_pages, 1):
-                print(f"  [{i}/{len(web_pages)}] Embedding web page: {item['name']}")
-                await ssc_agent.knowledge.ainsert(
-                    name=item["name"],
-                    text_content=item["text_content"],
-                    metadata=item["metadata"],
-                    skip_if_exists=True,
+            # Crawl the SSC web pages and downloads concurrently, within one politeness budget.
+            # Requests are conditional on the last crawl: only new or changed items come back.
+            crawl_store = CrawlStateStore(CRAWL_STATE_SOURCE)
+            crawl_state = CrawlState(await asyncio.to_thread(crawl_store.load))
+            async with open_ssc_crawler() as crawler:
+                web_pages, docs = await asyncio.gather(
+                    ascrape_ssc_web_pages(crawler, crawl_state), ascrape_ssc_downloads(crawler, crawl_state)
                 )
-            print(f"✅ Web pages loaded ({len(web_pages)} pages)")
+            removed = crawl_state.removed()
+            print(
+                f"✅ SSC crawl: {len(web_pages) + len(docs)} new or changed, "
+                f"{crawl_state.unchanged} unchanged, {len(removed)} removed"
+            )
 
-            # Load PDF and Word documents from SSC downloads section
-            docs = scrape_ssc_downloads()
-            for i, item in enumerate(docs, 1):
+            # Load PDF and Word documents from SSC downloads section. Password-locked
+            # PDFs come back as download stubs (text_content) so the agent can still
+            # cite the form's URL.
+            doc_items = []
+            for item in docs:
                 if "text_content" in item:
-                    # Password-locked PDF: embed the download stub so the agent
-                    # can still cite the form's URL.
-                    print(f"  [{i}/{len(docs)}] Embedding download stub: {item['name']}")
-                    await ssc_agent.knowledge.ainsert(
-                        name=item["name"],
-                        text_content=item["text_content"],
-                        metadata=item["metadata"],
-                        skip_if_exists=True,
-                    )
+                    doc_items.append(item)
                     continue
                 is_pdf = str(item["path"]).lower().endswith(".pdf")
-                reader = pdf_reader if is_pdf else docx_reader
-                file_type = "PDF" if is_pdf else "Word doc"
-                print(f"  [{i}/{len(docs)}] Embedding {file_type}: {item['name']}")
-                await ssc_agent.knowledge.ainsert(
-                    name=item["name"],
-                    path=str(item["path"]),
-                    reader=reader,
-                    metadata=item["metadata"],
-                    skip_if_exists=True,
+                doc_items.append({**item, "path": str(item["path"]), "reader": pdf_reader if is_pdf else docx_reader})
+
+            # Changed pages and documents replace their rows and vectors; removed ones are
+            # deleted. Unchanged URLs were not fetched again, so their rows are retained.
+            # Without a crawl state, or after a failed fetch of a URL it had no record of,
+            # a missing page may just not have been reached: then nothing is deleted.
+            unchanged_urls = crawl_state.unchanged_urls()
+            purge_removed = crawl_store.enabled and crawl_state.removals_known()
+            if not purge_removed:
+                print("⚠️  SSC crawl incomplete or without crawl state: removed pages are kept this time")
+            # Held until ingestion ends: a concurrent load must not insert between the
+            # reconcile snapshot and its orphan sweep.
+            async with aknowledge_load_lock(ssc_agent.knowledge):
+                to_ingest, reconcile_report = await asyncio.to_thread(
+                    reconcile_knowledge,
+                    ssc_agent.knowledge,
+                    web_pages + doc_items,
+                    "SSC pages and documents",
+                    retain=lambda metadata: not purge_removed or metadata.get("source_url") in unchanged_urls,
+                )
+                print(f"✅ Reconciled {reconcile_report.summary()}")
+
+                # Load web pages from SSC website
+                page_items = [item for item in to_ingest if item["metadata"]["source_type"] == "web_page"]
+                report = await ingest_into_knowledge(
+                    ssc_agent.knowledge, page_items, label="web pages", on_progress=print_ingestion_progress
+                )
+                print(f"✅ Web pages loaded ({len(web_pages)} pages)")
+
+                doc_report = await ingest_into_knowledge(
+                    ssc_agent.knowledge,
+                    [item for item in to_ingest if item["metadata"]["source_type"] != "web_page"],
+                    label="documents",
+                    on_progress=print_ingestion_progress,
                 )
-            print(f"✅ Documents loaded ({len(docs)} total)")
+                print(f"✅ Documents loaded ({len(docs)} total)")
+
+                rate_limited = report.rate_limited + doc_report.rate_limited
+                if rate_limited:
+                    print(f"⚠️  {len(rate_limited)} items still rate limited: {', '.join(rate_limited)}")
+                    await asyncio.to_thread(forget_documents, ssc_agent.knowledge, rate_limited)
+                failed = await asyncio.to_thread(incomplete_documents, ssc_agent.knowledge, to_ingest)
+            if failed:
+                print(f"⚠️  {len(failed)} items failed to load: {', '.join(failed)}")
+            # Rate-limited and failed items are fetched and ingested again by the next crawl
+            # (otherwise it gets 304 Not Modified and retains the broken row).
+            unfinished = set(rate_limited) | set(failed)
+            for item in web_pages + docs:
+                if item["name"] in unfinished:
+                    crawl_state.invalidate(item["metadata"]["source_url"])
+            await asyncio.to_thread(crawl_store.save, crawl_state.records.values())
+            print(f"✅ Embedding cache: {embedding_cache.summary()}")
+
+            # Create or rebuild the HNSW, text search and metadata filter indexes search
+            # depends on (non-fatal: without them searches fall back to slower plans).
+            if os.environ.get("MANAGE_VECTOR_INDEX_ON_STARTUP", "true").lower() == "true":
+                try:
+                    index_reports = await asyncio.to_thread(ensure_knowledge_indexes, ssc_agent.knowledge.vector_db)
+                    for index_report in index_reports:
+                        icon = "⚠️ " if index_report.action == "failed" else "✅"
+                        print(f"{icon} Index {index_report.summary()}")
+                except Exception as e:
+                    print(f"⚠️  Index check failed: {e}")
+
+            # Tokenize new chunks once for citation excerpts (non-fatal: excerpts
+            # fall back to scanning the chunk text).
+            try:
+                indexed = await asyncio.to_thread(index_knowledge_chunks, ssc_agent.knowledge.vector_db)
+                print(f"✅ Citation token indexes updated ({indexed} new chunks)")
+            except Exception as e:
+                print(f"⚠️  Citation token indexing failed (excerpts scan chunk text): {e}")
 
         except Exception as e:
             print(f"❌ Error loading SSC Psych knowledge: {e}")
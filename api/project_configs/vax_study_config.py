@@ -1,5 +1,5 @@
 import asyncio
-from typing import List
+from typing import List, Optional
 
 from agno.agent import Agent
 
@@ -7,9 +7,28 @@ from agents.marhinovirus_agents.control_agent import get_control_marhinovirus_ag
 from agents.marhinovirus_agents.simple_language_agent import get_simple_language_marhinovirus_agent
 from api.project_configs.project_config import ProjectConfig, ProjectName
 from knowledge_base.marhinovirus_knowledge_base import (
+    get_normal_catalog_url,
     initialize_agent_configs,
     load_normal_catalog,
 )
+from services.citations_service import CitationResolvers, CitationSource
+
+
+def _cite_catalog_page(name: Optional[str], meta: dict) -> Optional[CitationSource]:
+    """Catalog chunks carry no URL of their own; cite the catalog PDF, anchored on the chunk's page."""
+    url = meta.get("url") or get_normal_catalog_url()
+    page = meta.get("page")
+    if page:
+        url = f"{url}#page={page}"
+    return CitationSource(
+        source_url=url,
+        title=name or "Marhinovirus Normal Catalog",
+        source_type="pdf_document",
+        language=meta.get("language") or "en",
+    )
+
+
+VAX_STUDY_CITATION_RESOLVERS = CitationResolvers(default=_cite_catalog_page)
 
 
 class VaxStudyConfig(ProjectConfig):
@@ -24,6 +43,10 @@ class VaxStudyConfig(ProjectConfig):
         # TODO: remove CORS-coupling between FE and BE projects
         return ["https://marhinovirus-infobot.wittywave-d78264d4.swedencentral.azurecontainerapps.io"]
 
+    @property
+    def citation_resolvers(self) -> CitationResolvers:
+        return VAX_STUDY_CITATION_RESOLVERS
+
     def get_agents(self) -> List[Agent]:
         """Initialize vax-study agents (c, sl)."""
         try:
@@ -41,9 +64,12 @@ class VaxStudyConfig(ProjectConfig):
 
     async def load_knowledge(self, agents: List[Agent]) -> None:
         """Load Marhinovirus research catalog into both agents."""
+        from services.embedding_cache import embedding_cache
+
         try:
             await asyncio.gather(*(load_normal_catalog(agent.knowledge, skip_if_exists=False) for agent in agents))
             print(f"✅ Knowledge loaded successfully for {len(agents)} vax-study agents")
+            print(f"✅ Embedding cache: {embedding_cache.summary()}")
         except Exception as e:
             print(f"❌ Error loading Marhinovirus knowledge: {e}")
             raise
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import time
 from logging import getLogger
@@ -5,18 +6,32 @@ from typing import AsyncGenerator, Optional
 from uuid import uuid4
 
 from agno.agent import Agent
+from agno.models.message import Message
 from agno.os.utils import format_sse_event
+from agno.run.agent import RunCompletedEvent, RunContentEvent, RunInput, RunOutput, RunStartedEvent
+from agno.run.base import RunStatus
+from agno.session.agent import AgentSession
 from fastapi import APIRouter, Body, Form, HTTPException, status
 from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, field_validator
+from starlette.background import BackgroundTask
 
 from agents.agent_types import AgentType
 from agents.registry import get_agent
 from api.settings import api_settings
 from knowledge_base.marhinovirus_knowledge_base import get_normal_catalog_knowledge
-from services.budget_service import check_budget_available, record_usage
-from services.citations_service import build_citations, format_citations_sse
+from services.budget_service import (
+    BudgetReservation,
+    check_budget_available,
+    estimate_run_cost_eur,
+    record_usage,
+    release_reservation,
+    reserve_budget,
+)
+from services.citations_service import CitationBuilder, build_citations, format_citations_sse
 from services.metrics_service import record_agent_metrics
+from services.response_cache import CachedResponse, ResponseCacheTicket, response_cache
+from services.sse_coalescer import coalesce_content_events
 
 logger = getLogger(__name__)
 
@@ -27,6 +42,114 @@ logger = getLogger(__name__)
 agents_router = APIRouter(prefix="/agents", tags=["Agents"])
 
 
+def _max_completion_tokens(agent: Agent) -> Optional[int]:
+    """Output token cap configured on the agent's model, if any (bounds the budget reservation)."""
+    model = getattr(agent, "model", None)
+    for attr in ("max_completion_tokens", "max_tokens"):
+        value = getattr(model, attr, None)
+        if isinstance(value, int) and value > 0:
+            return value
+    return None
+
+
+def _budget_exceeded_response(reset_time, session_id: Optional[str], user_id: Optional[str]) -> JSONResponse:
+    record_agent_metrics(
+        session_id=session_id,
+        user_id=user_id,
+        response_status="budget_exceeded",
+    )
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={
+            "error": "daily_budget_exceeded",
+            "reset_time_utc": reset_time.isoformat(),
+            "daily_budget_eur": api_settings.daily_budget_eur,
+        },
+    )
+
+
+async def _lookup_cached_response(
+    agent: Agent, agent_id: str, message: str, session_id: Optional[str]
+) -> tuple[Optional[CachedResponse], Optional[ResponseCacheTicket]]:
+    """Semantic response cache lookup for an opening message (never raises; follow-ups are not cached)."""
+    if not api_settings.response_cache_enabled:
+        return None, None
+    embedder = getattr(getattr(getattr(agent, "knowledge", None), "vector_db", None), "embedder", None)
+    if embedder is None:
+        return None, None
+    try:
+        session = await agent.aget_session(session_id=session_id)
+        if session is not None and session.runs:
+            return None, None
+        embedding = await asyncio.to_thread(embedder.get_embedding, message)
+        if not embedding:
+            return None, None
+        return response_cache.lookup(agent_id, embedding)
+    except Exception as e:
+        logger.warning(f"Response cache lookup failed, running the agent: {e}")
+        return None, None
+
+
+async def _record_cached_turn(agent: Agent, session_id: Optional[str], run_id: str, message: str, content: str) -> None:
+    """Add a replayed answer to the agent session, so follow-up questions keep it in their history."""
+    if session_id is None:
+        return
+    try:
+        now = int(time.time())
+        session = await agent.aget_session(session_id=session_id)
+        if session is None:
+            session = AgentSession(session_id=session_id, agent_id=agent.id, created_at=now)
+        session.upsert_run(
+            RunOutput(
+                run_id=run_id,
+                agent_id=agent.id,
+                agent_name=agent.name,
+                session_id=session_id,
+                input=RunInput(input_content=message),
+                content=content,
+                messages=[Message(role="user", content=message), Message(role="assistant", content=content)],
+                status=RunStatus.completed,
+                created_at=now,
+            )
+        )
+        await agent.asave_session(session)
+    except Exception as e:
+        logger.warning(f"Could not add cached answer to session {session_id}: {e}")
+
+
+async def cached_response_streamer(
+    agent: Agent,
+    message: str,
+    cached: CachedResponse,
+    has_budget: bool = False,
+    session_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> AsyncGenerator:
+    """
+    Replay a cached answer as the SSE frames of a completed run, without calling the model.
+
+    Yields RunStarted, one RunContent with the whole answer, RunCompleted and the
+    Citations frame — the same event sequence the UI gets from a live run.
+    """
+    start_time = time.monotonic()
+    run_id = str(uuid4())
+    await _record_cached_turn(agent, session_id, run_id, message, cached.content)
+
+    ids = {"run_id": run_id, "agent_id": agent.id, "agent_name": agent.name, "session_id": session_id}
+    yield format_sse_event(RunStartedEvent(**ids))
+    yield format_sse_event(RunContentEvent(content=cached.content, **ids))
+    yield format_sse_event(RunCompletedEvent(content=cached.content, **ids))
+    yield format_citations_sse(cached.citations)
+
+    if has_budget:
+        record_agent_metrics(
+            session_id=session_id,
+            user_id=user_id,
+            duration_seconds=time.monotonic() - start_time,
+            response_status="cache_hit",
+        )
+
+
 async def chat_response_streamer(
     agent: Agent,
     message: str,
@@ -34,6 +157,8 @@ async def chat_response_streamer(
     session_id: Optional[str] = None,
     user_id: Optional[str] = None,
     agent_id: Optional[str] = None,
+    reservation: Optional[BudgetReservation] = None,
+    cache_ticket: Optional[ResponseCacheTicket] = None,
 ) -> AsyncGenerator:
     """
     Stream agent responses chunk by chunk.
@@ -44,57 +169,108 @@ async def chat_response_streamer(
         has_budget: Whether this deployment enforces budget (for usage recording)
         session_id: Anonymous session identifier for metrics tracking
         user_id: Longer-lived anonymous user identifier for per-user metrics
-        agent_id: The id of the agent being run (gates the final citations frame)
+        agent_id: The id of the agent being run
+        reservation: Budget reserved for this run; settled by its usage record, or
+            released if the run fails or the client disconnects
+        cache_ticket: Response cache miss of this run; the completed answer is stored under it
 
     Yields:
         Text chunks from the agent response
     """
-    run_response = agent.arun(message, stream=True, stream_events=True, session_id=session_id)
-
-    input_tokens = 0
-    output_tokens = 0
-    total_tokens = 0
-    duration_seconds: Optional[float] = None
-    time_to_first_token: Optional[float] = None
-    latest_references = None
-    final_answer_text: Optional[str] = None
-    start_time = time.monotonic()
-
     try:
-        async for chunk in run_response:
+        run_response = agent.arun(message, stream=True, stream_events=True, session_id=session_id)
+        if api_settings.sse_coalesce_enabled:
+            run_response = coalesce_content_events(
+                run_response,
+                window_seconds=api_settings.sse_coalesce_window_ms / 1000,
+                max_bytes=api_settings.sse_coalesce_max_bytes,
+                queue_size=api_settings.sse_coalesce_queue_size,
+            )
+
+        input_tokens = 0
+        output_tokens = 0
+        total_tokens = 0
+        duration_seconds: Optional[float] = None
+        time_to_first_token: Optional[float] = None
+        # Issue #37 — citations are built while the answer streams, using the
+        # project's resolvers to map retrieved chunks to source URLs.
+        citation_builder = CitationBuilder(message, resolvers=api_settings.project_config.citation_resolvers)
+        final_answer_text: Optional[str] = None
+        start_time = time.monotonic()
+
+        try:
+            async for chunk in run_response:
+                try:
+                    yield format_sse_event(chunk)
+                except Exception:
+                    chunk_content = getattr(chunk, "content", str(chunk))
+                    yield f"event: message\ndata: {json.dumps({'content': chunk_content})}\n\n"
+
+                # Capture metrics from the final chunk if available
+                chunk_metrics = getattr(chunk, "metrics", None)
+                if chunk_metrics is not None:
+                    if hasattr(chunk_metrics, "input_tokens") and chunk_metrics.input_tokens:
+                        input_tokens = chunk_metrics.input_tokens
+                    if hasattr(chunk_metrics, "output_tokens") and chunk_metrics.output_tokens:
+                        output_tokens = chunk_metrics.output_tokens
+                    if hasattr(chunk_metrics, "total_tokens") and chunk_metrics.total_tokens:
+                        total_tokens = chunk_metrics.total_tokens
+                    if hasattr(chunk_metrics, "duration") and chunk_metrics.duration:
+                        duration_seconds = chunk_metrics.duration
+                    if hasattr(chunk_metrics, "time_to_first_token") and chunk_metrics.time_to_first_token:
+                        time_to_first_token = chunk_metrics.time_to_first_token
+
+                chunk_refs = getattr(chunk, "references", None)
+                if chunk_refs:
+                    citation_builder.set_references(chunk_refs)
+                if getattr(chunk, "event", None) == "RunContent":
+                    chunk_content = getattr(chunk, "content", None)
+                    if isinstance(chunk_content, str):
+                        citation_builder.add_answer_delta(chunk_content)
+
+                # RunCompleted carries the full answer text — the claim anchor
+                # for citation excerpts.
+                if getattr(chunk, "event", None) == "RunCompleted":
+                    chunk_content = getattr(chunk, "content", None)
+                    if isinstance(chunk_content, str):
+                        final_answer_text = chunk_content
+        except Exception:
+            # Issue #27 — failed runs must still leave a metrics row, otherwise
+            # the reported error rate can never rise above zero.
+            if has_budget:
+                record_agent_metrics(
+                    session_id=session_id,
+                    user_id=user_id,
+                    input_tokens=input_tokens,
+                    output_tokens=output_tokens,
+                    total_tokens=total_tokens,
+                    duration_seconds=time.monotonic() - start_time,
+                    time_to_first_token=time_to_first_token,
+                    response_status="error",
+                )
+            raise
+
+        # Issue #37 — emit inline-excerpt citations after content streams.
+        # Wire name follows Agno's PascalCase SSE convention (e.g. RunStarted, RunCompleted)
+        # so the FE RunEvent enum can stay internally consistent.
+        citations = citation_builder.build(answer_text=final_answer_text)
+        yield format_citations_sse(citations)
+
+        if cache_ticket is not None and final_answer_text:
+            response_cache.store(cache_ticket, final_answer_text, citations)
+
+        # Fallback: use wall-clock duration if agno didn't report it
+        if duration_seconds is None:
+            duration_seconds = time.monotonic() - start_time
+
+        # Record budget usage after stream completes
+        if has_budget and (input_tokens > 0 or output_tokens > 0):
             try:
-                yield format_sse_event(chunk)
-            except Exception:
-                chunk_content = getattr(chunk, "content", str(chunk))
-                yield f"event: message\ndata: {json.dumps({'content': chunk_content})}\n\n"
-
-            # Capture metrics from the final chunk if available
-            chunk_metrics = getattr(chunk, "metrics", None)
-            if chunk_metrics is not None:
-                if hasattr(chunk_metrics, "input_tokens") and chunk_metrics.input_tokens:
-                    input_tokens = chunk_metrics.input_tokens
-                if hasattr(chunk_metrics, "output_tokens") and chunk_metrics.output_tokens:
-                    output_tokens = chunk_metrics.output_tokens
-                if hasattr(chunk_metrics, "total_tokens") and chunk_metrics.total_tokens:
-                    total_tokens = chunk_metrics.total_tokens
-                if hasattr(chunk_metrics, "duration") and chunk_metrics.duration:
-                    duration_seconds = chunk_metrics.duration
-                if hasattr(chunk_metrics, "time_to_first_token") and chunk_metrics.time_to_first_token:
-                    time_to_first_token = chunk_metrics.time_to_first_token
-
-            chunk_refs = getattr(chunk, "references", None)
-            if chunk_refs:
-                latest_references = chunk_refs
-
-            # RunCompleted carries the full answer text — the claim anchor
-            # for citation excerpts.
-            if getattr(chunk, "event", None) == "RunCompleted":
-                chunk_content = getattr(chunk, "content", None)
-                if isinstance(chunk_content, str):
-                    final_answer_text = chunk_content
-    except Exception:
-        # Issue #27 — failed runs must still leave a metrics row, otherwise
-        # the reported error rate can never rise above zero.
+                record_usage(input_tokens=input_tokens, output_tokens=output_tokens, reservation=reservation)
+            except Exception as e:
+                logger.error(f"Failed to record streaming usage metrics: {e}")
+
+        # Record anonymous usage metrics
         if has_budget:
             record_agent_metrics(
                 session_id=session_id,
@@ -102,41 +278,13 @@ async def chat_response_streamer(
                 input_tokens=input_tokens,
                 output_tokens=output_tokens,
                 total_tokens=total_tokens,
-                duration_seconds=time.monotonic() - start_time,
+                duration_seconds=duration_seconds,
                 time_to_first_token=time_to_first_token,
-                response_status="error",
             )
-        raise
-
-    # Issue #37 — emit inline-excerpt citations for SSC-Psych after content streams.
-    # Wire name follows Agno's PascalCase SSE convention (e.g. RunStarted, RunCompleted)
-    # so the FE RunEvent enum can stay internally consistent.
-    if agent_id == AgentType.SSC_PSYCH_AGENT.id:
-        citations = build_citations(latest_references, query=message, answer_text=final_answer_text)
-        yield format_citations_sse(citations)
-
-    # Fallback: use wall-clock duration if agno didn't report it
-    if duration_seconds is None:
-        duration_seconds = time.monotonic() - start_time
-
-    # Record budget usage after stream completes
-    if has_budget and (input_tokens > 0 or output_tokens > 0):
-        try:
-            record_usage(input_tokens=input_tokens, output_tokens=output_tokens)
-        except Exception as e:
-            logger.error(f"Failed to record streaming usage metrics: {e}")
-
-    # Record anonymous usage metrics
-    if has_budget:
-        record_agent_metrics(
-            session_id=session_id,
-            user_id=user_id,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
-            total_tokens=total_tokens,
-            duration_seconds=duration_seconds,
-            time_to_first_token=time_to_first_token,
-        )
+    finally:
+        # No-op once record_usage settled it; otherwise the run failed, recorded
+        # no tokens, or the client went away mid-stream.
+        release_reservation(reservation)
 
 
 class RunRequest(BaseModel):
@@ -203,25 +351,55 @@ async def create_agent_run(
         available, _, reset_time = check_budget_available()
 
         if not available:
-            record_agent_metrics(
-                session_id=run_request.session_id,
-                user_id=run_request.user_id,
-                response_status="budget_exceeded",
-            )
-            return JSONResponse(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                content={
-                    "error": "daily_budget_exceeded",
-                    "reset_time_utc": reset_time.isoformat(),
-                    "daily_budget_eur": api_settings.daily_budget_eur,
-                },
-            )
+            return _budget_exceeded_response(reset_time, run_request.session_id, run_request.user_id)
 
     try:
         agent: Agent = get_agent(agent_id)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
+    # Opt-in semantic response cache: a near-identical opening question is
+    # answered from a recent run without calling the model or reserving budget.
+    cached, cache_ticket = await _lookup_cached_response(agent, agent_id, run_request.message, run_request.session_id)
+    if cached is not None:
+        logger.info(f"Response cache hit for {agent_id} (similarity {cached.similarity:.3f})")
+        headers = {}
+        if has_budget:
+            _, remaining_eur, _ = check_budget_available()
+            headers["X-Budget-Remaining-EUR"] = f"{remaining_eur:.4f}"
+        replay = cached_response_streamer(
+            agent,
+            run_request.message,
+            cached,
+            has_budget=has_budget,
+            session_id=run_request.session_id,
+            user_id=run_request.user_id,
+        )
+        if run_request.stream:
+            return StreamingResponse(replay, media_type="text/event-stream", headers=headers)
+        async for _ in replay:
+            pass
+        return JSONResponse(
+            content={
+                "content": cached.content,
+                "citations": cached.citations,
+                "agent_id": agent_id,
+                "session_id": run_request.session_id,
+                "status": RunStatus.completed.value,
+                "cached": True,
+            },
+            headers=headers,
+        )
+
+    # Pre-authorize the run's worst-case cost under a row lock, so concurrent
+    # requests cannot all pass the pre-check above and overshoot the budget.
+    reservation: Optional[BudgetReservation] = None
+    if has_budget:
+        estimate = estimate_run_cost_eur(agent_id, _max_completion_tokens(agent))
+        reservation = await asyncio.to_thread(reserve_budget, estimate)
+        if reservation is None:
+            return _budget_exceeded_response(reset_time, run_request.session_id, run_request.user_id)
+
     if run_request.stream:
         # For streaming, include remaining budget in headers
         headers = {}
@@ -238,15 +416,21 @@ async def create_agent_run(
                 session_id=run_request.session_id,
                 user_id=run_request.user_id,
                 agent_id=agent_id,
+                reservation=reservation,
+                cache_ticket=cache_ticket,
             ),
             media_type="text/event-stream",
             headers=headers,
+            # The streamer settles or releases the reservation; if the client disconnects
+            # before the body starts, the streamer never runs and this release does it.
+            background=BackgroundTask(release_reservation, reservation) if reservation is not None else None,
         )
     else:
         start_time = time.monotonic()
         try:
             response = await agent.arun(run_request.message, stream=False, session_id=run_request.session_id)
         except Exception:
+            release_reservation(reservation)
             # Issue #27 — failed runs must still leave a metrics row, otherwise
             # the reported error rate can never rise above zero.
             if has_budget:
@@ -265,14 +449,16 @@ async def create_agent_run(
                 "content": getattr(response, "content", ""),
             }
 
-        # Issue #37 — inline-excerpt citations for SSC-Psych.
-        if agent_id == AgentType.SSC_PSYCH_AGENT.id:
-            response_content = getattr(response, "content", None)
-            response_payload["citations"] = build_citations(
-                getattr(response, "references", None),
-                query=run_request.message,
-                answer_text=response_content if isinstance(response_content, str) else None,
-            )
+        # Issue #37 — inline-excerpt citations.
+        response_content = getattr(response, "content", None)
+        response_payload["citations"] = build_citations(
+            getattr(response, "references", None),
+            query=run_request.message,
+            answer_text=response_content if isinstance(response_content, str) else None,
+            resolvers=api_settings.project_config.citation_resolvers,
+        )
+        if cache_ticket is not None and isinstance(response_content, str) and response_content:
+            response_cache.store(cache_ticket, response_content, response_payload["citations"])
 
         # Record usage for budgeted agents
         if has_budget:
@@ -299,9 +485,10 @@ async def create_agent_run(
 
             if input_tokens > 0 or output_tokens > 0:
                 try:
-                    record_usage(input_tokens=input_tokens, output_tokens=output_tokens)
+                    record_usage(input_tokens=input_tokens, output_tokens=output_tokens, reservation=reservation)
                 except Exception as e:
                     logger.error(f"Failed to record usage metrics: {e}")
+            release_reservation(reservation)
 
             record_agent_metrics(
                 session_id=run_request.session_id,
@@ -349,6 +536,7 @@ async def load_agent_knowledge(agent_id: AgentType):
 
     try:
         await agent_knowledge.aload(upsert=True)
+        response_cache.invalidate()
     except Exception as e:
         logger.error(f"Error loading knowledge base for {agent_id}: {e}")
         raise HTTPException(
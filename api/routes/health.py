@@ -1,5 +1,8 @@
 from fastapi import APIRouter
 
+from services.query_embedding_cache import query_embedding_cache
+from services.usage_writer import usage_writer
+
 ######################################################
 ## Routes for the API Health
 ######################################################
@@ -13,4 +16,6 @@ def get_health():
 
     return {
         "status": "success",
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "usage_writer": usage_writer.stats(),
     }
@@ -30,6 +30,40 @@ class ApiSettings(BaseSettings):
     daily_budget_eur: Optional[float] = None
     model_pricing_input_eur: Optional[float] = None
     model_pricing_output_eur: Optional[float] = None
+    # How often the in-process budget ledger re-reads today's spend from Postgres
+    # (picks up spend recorded by other workers/replicas).
+    budget_ledger_resync_seconds: float = 60.0
+    # Pre-authorization: each run reserves its worst-case cost before the model is
+    # called. Input tokens are estimated (per agent_id, JSON map, with a default);
+    # output tokens use the model's max completion tokens, or this fallback.
+    budget_input_token_estimate: int = 8000
+    budget_input_token_estimates: dict[str, int] = {}
+    budget_output_token_estimate: int = 1500
+
+    # Background usage/metrics writer (services/usage_writer.py): a batch is written
+    # when it reaches batch_size rows or flush_seconds after its first row; failed
+    # transactions are retried max_retries times, backing off from retry_base_seconds.
+    usage_writer_batch_size: int = 100
+    usage_writer_flush_seconds: float = 1.0
+    usage_writer_max_queue_size: int = 10_000
+    usage_writer_max_retries: int = 3
+    usage_writer_retry_base_seconds: float = 0.5
+
+    # Opt-in SSE frame coalescing (services/sse_coalescer.py): consecutive content
+    # deltas are merged for up to window_ms or max_bytes; queue_size bounds how far
+    # the run may read ahead of a slow client.
+    sse_coalesce_enabled: bool = False
+    sse_coalesce_window_ms: int = 30
+    sse_coalesce_max_bytes: int = 4096
+    sse_coalesce_queue_size: int = 64
+
+    # Opt-in semantic response cache (services/response_cache.py): an opening
+    # message at least this cosine-similar to a recent one for the same agent
+    # replays the cached answer and citations instead of running the model.
+    response_cache_enabled: bool = False
+    response_cache_similarity_threshold: float = 0.95
+    response_cache_ttl_seconds: float = 86_400.0
+    response_cache_max_entries: int = 256
 
     # u:Cloud (Nextcloud) configuration for hex_gig project research papers
     ucloud_share_token: Optional[str] = None
@@ -71,9 +105,7 @@ class ApiSettings(BaseSettings):
 
             if missing_vars:
                 missing = ", ".join(missing_vars)
-                raise ValueError(
-                    f"Missing required budget environment variables for PROJECT_NAME={project}: {missing}"
-                )
+                raise ValueError(f"Missing required budget environment variables for PROJECT_NAME={project}: {missing}")
 
         # HeX-specific: u:Cloud token required for research paper downloads
         if project == ProjectName.HEX_GIG.value and not self.ucloud_share_token:
@@ -1,12 +1,13 @@
 """
-Database model for tracking daily agent usage.
+Database models for tracking daily agent usage.
 
-This model stores daily token usage and costs for budget enforcement.
+These models store daily token usage and costs for budget enforcement:
+per-run audit rows plus a pre-aggregated daily total per project.
 """
 
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, Date, DateTime, Float, Index, Integer
+from sqlalchemy import Column, Date, DateTime, Float, Index, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -49,3 +50,43 @@ class DailyAgentUsage(Base):
             f"cost_eur={self.cost_eur}"
             f")>"
         )
+
+
+class DailySpendRollup(Base):
+    """
+    Pre-aggregated spend for one project on one date.
+
+    Every usage event adds its cost to this row with an atomic
+    ``INSERT ... ON CONFLICT DO UPDATE SET cost_eur = cost_eur + excluded.cost_eur``,
+    so budget reads fetch a single row instead of re-summing the growing
+    ``daily_agent_usage`` table. The per-run rows are still written for auditing.
+
+    ``reserved_eur`` holds the estimated cost of runs that are still in flight.
+    Reservations are taken under a row lock (``SELECT ... FOR UPDATE``), so
+    concurrent runs across workers cannot all pass the budget check at once.
+
+    Attributes:
+        date: The date of usage (Vienna timezone)
+        project: Project name (PROJECT_NAME) the spend belongs to
+        cost_eur: Total recorded cost in EUR for this date and project
+        reserved_eur: Estimated cost of in-flight runs not yet settled
+        updated_at: Timestamp of the last update
+    """
+
+    __tablename__ = "daily_spend_rollup"
+
+    date = Column(Date, primary_key=True)
+    project = Column(String(32), primary_key=True)
+    cost_eur = Column(Float, nullable=False, default=0.0)
+    reserved_eur = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return (
+            f"<DailySpendRollup("
+            f"date={self.date}, "
+            f"project={self.project}, "
+            f"cost_eur={self.cost_eur}, "
+            f"reserved_eur={self.reserved_eur}"
+            f")>"
+        )
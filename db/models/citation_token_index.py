@@ -0,0 +1,37 @@
+"""
+Database model for precomputed excerpt token indexes.
+
+Citation excerpts search each retrieved chunk for the query/claim keywords.
+The chunk text only changes when the knowledge base is reloaded, so the
+tokenization is done once at ingestion and stored here, keyed by a hash of the
+chunk content (the vector table itself stays untouched, and the index never
+reaches the LLM context the way chunk ``meta_data`` does).
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+
+class CitationTokenIndex(Base):
+    """
+    Positional token index of one embedded chunk.
+
+    Attributes:
+        content_hash: SHA-256 hex digest of the chunk content
+        token_index: {token: [offsets]} over the stripped, lowercased content
+        created_at: Timestamp when the index was computed (UTC)
+    """
+
+    __tablename__ = "citation_token_index"
+
+    content_hash = Column(String(64), primary_key=True)
+    token_index = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<CitationTokenIndex(content_hash={self.content_hash}, tokens={len(self.token_index or {})})>"
@@ -0,0 +1,47 @@
+"""
+Database model for the state of the last website crawl.
+
+The SSC scraper re-fetched and re-embedded every page and document at each
+startup. It now remembers, per URL, the validators the server sent (ETag,
+Last-Modified), a hash of the content, and the links the page contained, so
+the next crawl can send conditional requests, follow the links of pages that
+answered 304 Not Modified, and tell changed and removed pages apart.
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+
+class CrawlStateEntry(Base):
+    """
+    Crawl state of one URL.
+
+    Attributes:
+        source: Crawled site (e.g. ssc-psych); each source's rows are replaced after each crawl
+        url: Normalized URL (the pages' and documents' `source_url` metadata)
+        kind: web_page, listing (link pages, nothing embedded) or document
+        etag: ETag response header ("" when the server sent none)
+        last_modified: Last-Modified response header ("" when the server sent none)
+        content_hash: SHA-256 of the extracted page text or the document bytes ("" when nothing was embedded)
+        links: Absolute links found on the page, followed again when it answers 304
+        last_seen: Timestamp of the last successful fetch (UTC)
+    """
+
+    __tablename__ = "crawl_state"
+
+    source = Column(String(50), primary_key=True)
+    url = Column(Text, primary_key=True)
+    kind = Column(String(20), nullable=False)
+    etag = Column(Text, nullable=False, default="")
+    last_modified = Column(Text, nullable=False, default="")
+    content_hash = Column(String(64), nullable=False, default="")
+    links = Column(JSONB, nullable=False, default=list)
+    last_seen = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<CrawlStateEntry(source={self.source}, url={self.url}, kind={self.kind})>"
@@ -0,0 +1,48 @@
+"""
+Database model for the content-addressed embedding cache.
+
+Knowledge ingestion re-embeds every chunk of a document whose name/path hash
+changed, even when most chunk texts are unchanged. Embeddings are cached here,
+keyed by the embedding model, its dimensions and the SHA-256 of the chunk
+text, so unchanged chunks are never sent to the embedder again — across
+restarts and across the HeX, SSC and Marhinovirus knowledge bases.
+"""
+
+from datetime import datetime, timezone
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, Index, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+
+class EmbeddingCacheEntry(Base):
+    """
+    One cached embedding.
+
+    Attributes:
+        embedder_id: Embedding model id (e.g. text-embedding-3-large)
+        dimensions: Requested vector dimensions
+        content_hash: SHA-256 hex digest of the embedded text
+        embedding: The vector
+        created_at: Timestamp when the embedding was computed (UTC)
+        last_used_at: Timestamp of the last cache hit (UTC); least recently used rows are evicted first
+    """
+
+    __tablename__ = "embedding_cache"
+
+    embedder_id = Column(String(100), primary_key=True)
+    dimensions = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), primary_key=True)
+    embedding = Column(Vector(), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    last_used_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (Index("ix_embedding_cache_last_used_at", "last_used_at"),)
+
+    def __repr__(self):
+        return (
+            f"<EmbeddingCacheEntry(embedder_id={self.embedder_id}, dimensions={self.dimensions}, "
+            f"content_hash={self.content_hash})>"
+        )
@@ -1,6 +1,218 @@
+import asyncio
 import os
+import time
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Tuple
 
 from agno.knowledge.embedder.azure_openai import AzureOpenAIEmbedder
+from agno.vectordb.pgvector import PgVector
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, create_engine
+
+from db.session import get_db_url_cached
+from services.embedding_batcher import EmbeddingBatcher
+from services.embedding_cache import embedding_cache
+from services.excerpt_index import content_hash
+from services.hybrid_search import (
+    build_hybrid_search_query,
+    get_hybrid_search_candidates,
+    get_hybrid_search_rrf_k,
+    text_search_column_exists,
+)
+from services.ingestion_executor import get_ingest_concurrency, is_rate_limit_error, note_rate_limit
+from services.knowledge_indexes import MetadataFilterIndexes
+from services.query_embedding_cache import query_embedding_cache
+
+logger = getLogger(__name__)
+
+_knowledge_engine: Optional[Engine] = None
+
+
+class RateLimitReportingEmbedder(AzureOpenAIEmbedder):
+    """AzureOpenAIEmbedder that reports 429s to the ingestion executor.
+
+    PgVector swallows embedding errors, so without this a rate-limited chunk is
+    stored without a vector and the insert looks successful.
+    """
+
+    async def _aresponse(self, text: str):
+        try:
+            return await super()._aresponse(text)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                note_rate_limit(e)
+            raise
+
+
+class BatchingEmbedder(RateLimitReportingEmbedder):
+    """Embeds document chunks in batched requests, through the persistent embedding cache.
+
+    See services/embedding_batcher.py and services/embedding_cache.py.
+
+    Only the async per-chunk methods PgVector uses during ingestion are
+    batched; query embeddings (sync `get_embedding`) go out immediately,
+    through the query embedding cache (services/query_embedding_cache.py).
+    """
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.batcher = EmbeddingBatcher(self._aembed_many)
+
+    async def _aembed_many(self, texts: List[str]) -> Tuple[List[List[float]], Optional[Dict]]:
+        """Embed one batch, sending only the texts missing from the embedding cache to Azure."""
+        hashes = [content_hash(text) for text in texts]
+        vectors = await asyncio.to_thread(embedding_cache.lookup, self.id, self.dimensions, texts)
+        missing = list({digest: text for digest, text in zip(hashes, texts) if digest not in vectors}.items())
+        if not missing:
+            return [vectors[digest] for digest in hashes], None
+
+        embeddings, usage = await self._arequest_embeddings([text for _, text in missing])
+        if len(embeddings) != len(missing):
+            raise ValueError(f"Embedder returned {len(embeddings)} vectors for {len(missing)} inputs")
+        await asyncio.to_thread(
+            embedding_cache.store, self.id, self.dimensions, [text for _, text in missing], embeddings
+        )
+        vectors.update((digest, embedding) for (digest, _), embedding in zip(missing, embeddings))
+        return [vectors[digest] for digest in hashes], usage
+
+    async def _arequest_embeddings(self, texts: List[str]) -> Tuple[List[List[float]], Optional[Dict]]:
+        request: Dict[str, Any] = {"input": texts, "model": self.id, "encoding_format": self.encoding_format}
+        if self.user is not None:
+            request["user"] = self.user
+        if self.dimensions is not None:
+            request["dimensions"] = self.dimensions
+        if self.request_params:
+            request.update(self.request_params)
+        response = await self.aclient.embeddings.create(**request)
+        embeddings = [data.embedding for data in sorted(response.data, key=lambda data: data.index)]
+        return embeddings, response.usage.model_dump() if response.usage else None
+
+    def get_embedding(self, text: str) -> List[float]:
+        """Query embeddings (PgVector search) go through the LRU + TTL query cache."""
+        return query_embedding_cache.get_or_embed(self.id, self.dimensions, text, super().get_embedding)
+
+    async def async_get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        try:
+            return await self.batcher.embed(text)
+        except Exception as e:
+            # Noted here, in the inserting item's context, not in the batch request's task.
+            if is_rate_limit_error(e):
+                note_rate_limit(e)
+            raise
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        embedding, _ = await self.async_get_embedding_and_usage(text)
+        return embedding
+
+    async def async_get_embeddings_batch_and_usage(
+        self, texts: List[str]
+    ) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        results = await asyncio.gather(*(self.async_get_embedding_and_usage(text) for text in texts))
+        return [embedding for embedding, _ in results], [usage for _, usage in results]
+
+
+class IndexedHybridPgVector(PgVector):
+    """PgVector whose hybrid search stays on the HNSW and GIN indexes.
+
+    See services/hybrid_search.py. Semantic and lexical candidates are fused by
+    reciprocal rank in one statement; `meta_data["similarity_score"]` is the
+    chunk's cosine similarity and `meta_data["rrf_score"]` its fused score.
+    `similarity_threshold` is not applied (RRF scores are not similarities).
+
+    Until the ``content_tsv`` column exists (created with the HNSW index at
+    startup), searches fall back to vector search. Whether it exists is
+    checked once per instance; a missing column is checked again at most every
+    TEXT_SEARCH_RECHECK_SECONDS, so a fallback search costs no failed statement.
+
+    `filter_indexes` declares the metadata keys the agent filters on
+    (services/knowledge_indexes.py). Dict filters become one ``@>`` per key,
+    the predicate form of the partial HNSW indexes.
+    """
+
+    TEXT_SEARCH_RECHECK_SECONDS = 300.0
+
+    _has_text_search: Optional[bool] = None
+    _text_search_checked_at = 0.0
+
+    def __init__(self, *args, filter_indexes: Optional[MetadataFilterIndexes] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.filter_indexes = filter_indexes
+
+    def _text_search_ready(self) -> bool:
+        """Whether ``content_tsv`` exists; cached once found, re-checked periodically while missing."""
+        if self._has_text_search:
+            return True
+        now = time.monotonic()
+        if self._has_text_search is False and now - self._text_search_checked_at < self.TEXT_SEARCH_RECHECK_SECONDS:
+            return False
+        try:
+            with self.Session() as sess:
+                ready = text_search_column_exists(sess, self.schema, self.table_name)
+        except Exception as e:
+            logger.warning(f"Text search column check on {self.table_name} failed: {e}")
+            ready = False
+        if not ready and self._has_text_search is None:
+            logger.warning(f"{self.table_name} has no content_tsv column yet, using vector search")
+        self._has_text_search = ready
+        self._text_search_checked_at = now
+        return ready
+
+    def hybrid_search(self, query: str, limit: int = 5, filters: Optional[Any] = None) -> List[Any]:
+        from agno.knowledge.document import Document
+
+        if not self._text_search_ready():
+            return self.vector_search(query=query, limit=limit, filters=filters)
+
+        query_embedding = self.embedder.get_embedding(query)
+        if not query_embedding:
+            logger.error(f"Error getting embedding for query: {query}")
+            return []
+
+        conditions = []
+        if isinstance(filters, dict):
+            conditions.extend(self.table.c.meta_data.contains({key: value}) for key, value in filters.items())
+        elif filters:
+            conditions.extend(
+                self._dsl_to_sqlalchemy(f.to_dict() if hasattr(f, "to_dict") else f, self.table) for f in filters
+            )
+        candidates = get_hybrid_search_candidates()
+        stmt = build_hybrid_search_query(
+            self.table,
+            query_embedding,
+            query,
+            limit=limit,
+            candidates=candidates,
+            rrf_k=get_hybrid_search_rrf_k(),
+            conditions=conditions,
+        )
+        try:
+            with self.Session() as sess, sess.begin():
+                ef_search = max(getattr(self.vector_index, "ef_search", 0), candidates)
+                sess.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+                results = sess.execute(stmt).fetchall()
+        except Exception as e:
+            logger.warning(f"Hybrid search on {self.table_name} failed, using vector search: {e}")
+            return self.vector_search(query=query, limit=limit, filters=filters)
+
+        documents = []
+        for result in results:
+            meta_data = dict(result.meta_data) if result.meta_data else {}
+            meta_data["similarity_score"] = float(result.similarity)
+            meta_data["rrf_score"] = float(result.rrf_score)
+            documents.append(
+                Document(
+                    id=result.id,
+                    name=result.name,
+                    meta_data=meta_data,
+                    content=result.content,
+                    embedder=self.embedder,
+                    embedding=result.embedding,
+                    usage=result.usage,
+                )
+            )
+        if self.reranker:
+            documents = self.reranker.rerank(query=query, documents=documents)
+        return documents
 
 
 def get_azure_embedder() -> AzureOpenAIEmbedder:
@@ -11,7 +223,7 @@ def get_azure_embedder() -> AzureOpenAIEmbedder:
     Returns:
         AzureOpenAIEmbedder configured with environment variables
     """
-    return AzureOpenAIEmbedder(
+    return BatchingEmbedder(
         id="text-embedding-3-large",
         # dimensions=3072, # Pgvector does not support 3072 dimension vectors, hence defaulting to 1536
         api_key=os.getenv("AZURE_EMBEDDER_OPENAI_API_KEY"),
@@ -19,3 +231,43 @@ def get_azure_embedder() -> AzureOpenAIEmbedder:
         azure_endpoint=os.getenv("AZURE_EMBEDDER_OPENAI_ENDPOINT"),
         azure_deployment=os.getenv("AZURE_EMBEDDER_DEPLOYMENT"),
     )
+
+
+def get_knowledge_db_engine() -> Engine:
+    """
+    Shared engine for the knowledge vector tables and contents tables.
+
+    During ingestion every concurrent insert can hold a vector-table and a
+    contents-table connection at once, so the pool is sized from
+    INGEST_CONCURRENCY instead of SQLAlchemy's default of 5.
+    """
+    global _knowledge_engine
+
+    if _knowledge_engine is None:
+        _knowledge_engine = create_engine(
+            get_db_url_cached(),
+            pool_pre_ping=True,
+            pool_size=max(5, 2 * get_ingest_concurrency()),
+            max_overflow=10,
+        )
+
+    return _knowledge_engine
+
+
+def _hex_gig_vector_db():
+    from knowledge_base.hex_gig_knowledge_base import get_hex_gig_knowledge
+
+    return get_hex_gig_knowledge().vector_db
+
+
+def _ssc_psych_vector_db():
+    from knowledge_base.ssc_psych_knowledge_base import get_ssc_psych_knowledge
+
+    return get_ssc_psych_knowledge().vector_db
+
+
+# Vector DB factory per project with a knowledge vector table (used by the index scripts).
+VECTOR_DBS = {
+    "hex-gig": _hex_gig_vector_db,
+    "ssc-psych": _ssc_psych_vector_db,
+}
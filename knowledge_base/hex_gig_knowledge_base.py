@@ -1,23 +1,19 @@
 import csv
 import logging
-import re
 import unicodedata
 from pathlib import Path
 
-from pypdf import PdfReader as _PdfReader
-
 from agno.db.postgres import PostgresDb
 from agno.knowledge import Knowledge
-from agno.vectordb.pgvector import PgVector, SearchType
+from agno.vectordb.pgvector import SearchType
 
-from db.session import get_db_url_cached
-from knowledge_base import get_azure_embedder
+from knowledge_base import IndexedHybridPgVector, get_azure_embedder, get_knowledge_db_engine
+from services.doi_extraction import DOI_CACHE_FILENAME, extract_dois
+from services.knowledge_indexes import MetadataFilterIndexes
+from services.vector_index import hnsw_index
 
 logger = logging.getLogger(__name__)
 
-# Standard DOI pattern — matches "10.NNNN/suffix" anywhere in text
-_DOI_RE = re.compile(r"\b(10\.\d{4,9}/[^\s\],;:\'\"<>()]+)", re.IGNORECASE)
-
 HEX_GIG_KNOWLEDGE_DIR = Path(__file__).resolve().parent / "hex_gig_knowledge"
 HEX_GIG_MEMBERS_CSV = HEX_GIG_KNOWLEDGE_DIR / "hex_gig_members_list.csv"
 
@@ -38,59 +34,28 @@ MEMBER_REQUIRED_COLUMNS = {
 MEMBER_EXCLUDED_METADATA_FIELDS = {"gender"}
 
 
-def _extract_doi_from_pdf(path: Path) -> str | None:
-    """Extract the first DOI found in a PDF's title/abstract and reference pages.
-
-    Reads the first 3 pages and last 2 pages — sufficient to capture the DOI
-    from the title page header/footer, abstract, or reference list without
-    loading the full document into memory.
-
-    Returns a full https://doi.org/... URL, or None if no DOI is found or extraction fails.
-    """
-    try:
-        reader = _PdfReader(str(path))
-        pages = reader.pages
-        n = len(pages)
-        # Indices: first 3 + last 2, deduplicated, clamped to actual page count
-        indices = list(dict.fromkeys([0, 1, 2, max(0, n - 2), max(0, n - 1)]))
-        text_parts = []
-        for i in indices:
-            if i < n:
-                text_parts.append(pages[i].extract_text() or "")
-        text = "\n".join(text_parts)
-        match = _DOI_RE.search(text)
-        if match:
-            doi = match.group(1).rstrip(".")
-            # Strip trailing "doi"/"DOI" label — PDF text extraction artifact (e.g. "...609825doi")
-            doi = re.sub(r"(?i)doi$", "", doi).rstrip(".")
-            # Strip supplemental URL path suffix (e.g. /-/DCSupplemental)
-            doi = re.sub(r"/-/.*$", "", doi)
-            # Discard DOIs with very short suffixes — likely truncated by a line break in the PDF
-            # (e.g. "10.1371/j" or "10.5061/dry"). A broken link is worse than no link.
-            suffix = doi.split("/", 1)[1] if "/" in doi else doi
-            if len(suffix) < 5:
-                logger.warning("Discarding likely truncated DOI from %s: %s", path.name, doi)
-                return None
-            return f"https://doi.org/{doi}"
-    except Exception:
-        logger.warning("Could not extract DOI from PDF: %s", path)
-    return None
+# Metadata keys the agent filters on (agentic knowledge filters). Member
+# profiles are a small slice of the table, so they get their own partial HNSW.
+HEX_GIG_FILTER_INDEXES = MetadataFilterIndexes(
+    keys=("source_type", "faculty_affiliation", "discipline"),
+    selective_filters=(("source_type", "member_profile"),),
+)
 
 
 def get_hex_gig_knowledge() -> Knowledge:
-    db_url = get_db_url_cached()
-
     hex_gig_knowledge = Knowledge(
         name="Health in Society Research Network Knowledge",
-        vector_db=PgVector(
-            db_url=db_url,
-            # SearchType.vector, not hybrid: agno's hybrid_search computes
-            # ts_rank_cd(to_tsvector(content), ...) over every row with no WHERE
-            # clause, so it full-scans the table on each query (~30s on the
-            # B1ms prod DB at 15k+ chunks). Vector search stays index-friendly.
-            search_type=SearchType.vector,
+        vector_db=IndexedHybridPgVector(
+            db_engine=get_knowledge_db_engine(),
+            # Not agno's hybrid_search: it computes ts_rank_cd(to_tsvector(content), ...)
+            # over every row with no WHERE clause (~30s on the B1ms prod DB at 15k+
+            # chunks). IndexedHybridPgVector fuses HNSW and GIN-indexed candidates
+            # instead, so names and DOIs match lexically without a full scan.
+            search_type=SearchType.hybrid,
+            vector_index=hnsw_index(),
             table_name="hex_gig_embeddings",
             embedder=get_azure_embedder(),
+            filter_indexes=HEX_GIG_FILTER_INDEXES,
         ),
         contents_db=get_hex_gig_contents_db(),
     )
@@ -99,10 +64,8 @@ def get_hex_gig_knowledge() -> Knowledge:
 
 
 def get_hex_gig_contents_db():
-    db_url = get_db_url_cached()
-
     hex_gig_contents = PostgresDb(
-        db_url,
+        db_engine=get_knowledge_db_engine(),
         id="hex_gig_contents",
         knowledge_table="hex_gig_contents",
     )
@@ -257,6 +220,11 @@ def get_research_articles_from_ucloud(discovered_pdfs: list) -> list[dict]:
         List of dicts with "path" (Path) and "metadata" (dict) keys.
     """
     members_by_name = _build_member_name_index()
+    # PDFs sit in <download dir>/<member folder>/, the DOI cache in the download dir.
+    dois = extract_dois(
+        [pdf.local_path for pdf in discovered_pdfs],
+        cache_path=discovered_pdfs[0].local_path.parent.parent / DOI_CACHE_FILENAME if discovered_pdfs else None,
+    )
 
     kb_data: list[dict] = []
     for pdf in discovered_pdfs:
@@ -282,7 +250,7 @@ def get_research_articles_from_ucloud(discovered_pdfs: list) -> list[dict]:
         ).strip()
         member_metadata["network_member_name"] = member_name or "Unknown"
 
-        doi_url = _extract_doi_from_pdf(pdf.local_path)
+        doi_url = dois.get(pdf.local_path)
         metadata = {
             **member_metadata,
             "source_type": "research_paper",
@@ -0,0 +1,181 @@
+"""In-memory directory of the HeX network members, exposed to the HeX agent as tools.
+
+Membership questions ("how many members are in the Faculty of Psychology?",
+"list the sociologists") used to go through vector search over the
+``member_profile`` chunks, which costs an embedding and an ANN query per
+search and cannot guarantee a complete list: the model sees at most the
+top-k chunks. The members CSV is small (tens of rows), so the directory
+is built once from `_build_member_name_index()` and kept in memory,
+indexed by faculty, department, discipline and position. Counts and
+lists come back exact in microseconds.
+"""
+
+import json
+import logging
+from functools import lru_cache
+from typing import Optional
+
+from knowledge_base.hex_gig_knowledge_base import _build_member_name_index
+
+logger = logging.getLogger(__name__)
+
+# Tool argument -> CSV column
+MEMBER_FACETS = {
+    "faculty": "faculty_affiliation",
+    "department": "department_affiliation",
+    "discipline": "discipline",
+    "position": "academic_position",
+}
+
+# Fields returned per member (everything the member profile chunks contain)
+MEMBER_FIELDS = (
+    "academic_position",
+    "faculty_affiliation",
+    "department_affiliation",
+    "discipline",
+    "email_address",
+    "uni_wien_url",
+)
+
+
+def _fold(value: str) -> str:
+    return " ".join(value.split()).casefold()
+
+
+class MemberDirectory:
+    """Members by name, with a value -> member names index per facet."""
+
+    def __init__(self, members_by_name: dict[str, dict[str, str]]):
+        self.members = dict(sorted(members_by_name.items(), key=lambda item: item[0].casefold()))
+        self.index: dict[str, dict[str, list[str]]] = {column: {} for column in MEMBER_FACETS.values()}
+        for name, member in self.members.items():
+            for column, values in self.index.items():
+                value = " ".join(member.get(column, "").split())
+                if value:
+                    values.setdefault(value, []).append(name)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def matching_values(self, column: str, query: str) -> list[str]:
+        """Facet values equal to `query` (case-insensitive), else the values containing it."""
+        folded = _fold(query)
+        values = self.index[column]
+        exact = [value for value in values if _fold(value) == folded]
+        return exact or [value for value in values if folded in _fold(value)]
+
+    def find(self, **criteria: Optional[str]) -> tuple[list[str], dict[str, list[str]]]:
+        """
+        Names of the members matching every given facet (faculty, department, discipline, position).
+
+        Returns:
+            (member names, {facet: facet values that matched})
+        """
+        names = set(self.members)
+        matched = {}
+        for facet, query in criteria.items():
+            if not query:
+                continue
+            column = MEMBER_FACETS[facet]
+            values = self.matching_values(column, query)
+            matched[facet] = values
+            names &= {name for value in values for name in self.index[column][value]}
+        return [name for name in self.members if name in names], matched
+
+    def group_counts(self, facet: str) -> dict[str, int]:
+        """Member count per value of a facet, largest first; members without a value under ""."""
+        column = MEMBER_FACETS[facet]
+        counts = {value: len(names) for value, names in self.index[column].items()}
+        unassigned = len(self.members) - sum(counts.values())
+        if unassigned:
+            counts[""] = unassigned
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def profile(self, name: str) -> dict[str, str]:
+        member = self.members[name]
+        return {"name": name, **{field: member.get(field, "") for field in MEMBER_FIELDS}}
+
+
+@lru_cache(maxsize=1)
+def get_member_directory() -> MemberDirectory:
+    """The member directory, built from the members CSV on first use."""
+    directory = MemberDirectory(_build_member_name_index())
+    logger.info("HeX member directory built (%d members)", len(directory))
+    return directory
+
+
+def count_network_members(
+    faculty: Optional[str] = None,
+    department: Optional[str] = None,
+    discipline: Optional[str] = None,
+    position: Optional[str] = None,
+) -> str:
+    """Exact number of HeX network members, optionally filtered by faculty, department, discipline or academic position.
+
+    Use this for every "how many members" question instead of searching the knowledge base.
+    Filters match case-insensitively, as the full value or a part of it (e.g. "Psychology"
+    matches "Faculty of Psychology"); the values that matched are returned as `matched`.
+
+    Args:
+        faculty: Faculty affiliation, e.g. "Faculty of Psychology"
+        department: Department affiliation
+        discipline: Discipline, e.g. "Sociology"
+        position: Academic position, e.g. "Full Professor"
+
+    Returns:
+        JSON with `count`, `total_members` and `matched`
+    """
+    directory = get_member_directory()
+    names, matched = directory.find(faculty=faculty, department=department, discipline=discipline, position=position)
+    return json.dumps({"count": len(names), "total_members": len(directory), "matched": matched}, ensure_ascii=False)
+
+
+def list_network_members(
+    faculty: Optional[str] = None,
+    department: Optional[str] = None,
+    discipline: Optional[str] = None,
+    position: Optional[str] = None,
+) -> str:
+    """Complete list of the HeX network members matching the given filters (all members without filters).
+
+    Use this for "list / who are the members of ..." questions: it returns every match,
+    not the top search results. Filters work as in count_network_members. Each member
+    comes with position, faculty, department, discipline, email and University of
+    Vienna profile URL (uni_wien_url).
+
+    Args:
+        faculty: Faculty affiliation, e.g. "Faculty of Psychology"
+        department: Department affiliation
+        discipline: Discipline, e.g. "Sociology"
+        position: Academic position, e.g. "Full Professor"
+
+    Returns:
+        JSON with `count`, `matched` and `members`
+    """
+    directory = get_member_directory()
+    names, matched = directory.find(faculty=faculty, department=department, discipline=discipline, position=position)
+    return json.dumps(
+        {"count": len(names), "matched": matched, "members": [directory.profile(name) for name in names]},
+        ensure_ascii=False,
+    )
+
+
+def count_network_members_by(group_by: str) -> str:
+    """Number of HeX network members per faculty, department, discipline or position.
+
+    Use this for overviews such as "which faculties are represented in the network?".
+    Members with no value for the facet are counted under "".
+
+    Args:
+        group_by: One of "faculty", "department", "discipline", "position"
+
+    Returns:
+        JSON with `total_members` and `counts` ({value: count}, largest first)
+    """
+    if group_by not in MEMBER_FACETS:
+        return json.dumps({"error": f"group_by must be one of {', '.join(MEMBER_FACETS)}"})
+    directory = get_member_directory()
+    return json.dumps({"total_members": len(directory), "counts": directory.group_counts(group_by)}, ensure_ascii=False)
+
+
+MEMBER_DIRECTORY_TOOLS = [count_network_members, list_network_members, count_network_members_by]
@@ -1,3 +1,4 @@
+import asyncio
 import hashlib
 import logging
 import xml.etree.ElementTree as ET
@@ -6,6 +7,9 @@ from urllib.request import urlopen
 
 from agno.knowledge import Knowledge
 
+from services.ingestion_executor import ingest_into_knowledge
+from services.knowledge_reconcile import aknowledge_load_lock, forget_documents, reconcile_knowledge
+
 logger = logging.getLogger(__name__)
 
 RSS_FEED_URL = "https://gig.univie.ac.at/en/about-us/news/feed.xml"
@@ -140,17 +144,20 @@ def get_rss_news_data() -> list[dict]:  # type: ignore[type-arg]
 
 
 async def aload_rss_into_knowledge(knowledge: Knowledge) -> tuple[int, int]:
-    """Fetch the RSS feed and insert items into *knowledge*, skipping duplicates.
+    """Fetch the RSS feed and bring the news articles in *knowledge* up to date.
 
-    Uses ``skip_if_exists=True`` so previously-loaded articles (keyed by ``name``)
-    are not re-inserted. Returns ``(items_seen, items_attempted_insert)`` for logging.
+    ``reconcile_knowledge`` replaces edited articles and removes those no longer
+    in the feed; only new and changed articles are inserted, concurrently via
+    ``ingest_into_knowledge``, under ``aknowledge_load_lock`` so the refresh job and
+    the API's startup load never interleave. Returns ``(items_seen, items_attempted_insert)``
+    for logging.
     """
     items = get_rss_news_data()
-    for item in items:
-        await knowledge.ainsert(
-            name=item["name"],
-            text_content=item["text_content"],
-            metadata=item["metadata"],
-            skip_if_exists=True,
+    async with aknowledge_load_lock(knowledge):
+        to_ingest, _ = await asyncio.to_thread(
+            reconcile_knowledge, knowledge, items, "RSS articles", {"source_type": RSS_SOURCE_TYPE}
         )
-    return len(items), len(items)
+        report = await ingest_into_knowledge(knowledge, to_ingest, label="RSS articles")
+        if report.rate_limited:
+            await asyncio.to_thread(forget_documents, knowledge, report.rate_limited)
+    return len(items), len(to_ingest)
@@ -2,37 +2,41 @@ import logging
 
 from agno.db.postgres import PostgresDb
 from agno.knowledge import Knowledge
-from agno.vectordb.pgvector import PgVector, SearchType
+from agno.vectordb.pgvector import SearchType
 
-from db.session import get_db_url_cached
-from knowledge_base import get_azure_embedder
+from knowledge_base import IndexedHybridPgVector, get_azure_embedder, get_knowledge_db_engine
+from services.knowledge_indexes import MetadataFilterIndexes
+from services.vector_index import hnsw_index
 
 logger = logging.getLogger(__name__)
 
 
-def get_ssc_psych_knowledge() -> Knowledge:
-    """Create the Knowledge object for SSC Psychologie with PgVector semantic search."""
-    db_url = get_db_url_cached()
+# Metadata keys set by the SSC scraper that the agent filters on.
+SSC_PSYCH_FILTER_INDEXES = MetadataFilterIndexes(keys=("source_type", "language"))
+
 
+def get_ssc_psych_knowledge() -> Knowledge:
+    """Create the Knowledge object for SSC Psychologie with index-backed hybrid search."""
     return Knowledge(
         name="SSC Psychologie Knowledge",
-        vector_db=PgVector(
-            db_url=db_url,
-            # SearchType.vector, not hybrid: agno's hybrid_search full-scans the
-            # table on every query (no WHERE clause, ts_rank_cd computed for all
-            # rows) — see the same switch in hex_gig_knowledge_base.py (#42).
-            search_type=SearchType.vector,
+        vector_db=IndexedHybridPgVector(
+            db_engine=get_knowledge_db_engine(),
+            # Index-backed hybrid search (services/hybrid_search.py): course codes
+            # and form names match lexically, without agno's full-scan hybrid_search
+            # — see hex_gig_knowledge_base.py (#42).
+            search_type=SearchType.hybrid,
+            vector_index=hnsw_index(),
             table_name="ssc_psych_embeddings",
             embedder=get_azure_embedder(),
+            filter_indexes=SSC_PSYCH_FILTER_INDEXES,
         ),
         contents_db=_get_ssc_psych_contents_db(),
     )
 
 
 def _get_ssc_psych_contents_db():
-    db_url = get_db_url_cached()
     return PostgresDb(
-        db_url=db_url,
+        db_engine=get_knowledge_db_engine(),
         id="ssc_psych_contents",
         knowledge_table="ssc_psych_contents",
     )
@@ -0,0 +1,101 @@
+"""Micro-benchmark: linear-time extract_excerpt vs. the original O(k²) window search.
+
+Times both implementations on chunks of the SSC semantic chunk size (2000
+chars) and larger, in which the query words occur often, and on prose-like
+chunks with a large vocabulary. Also times extract_excerpt with the chunk's
+precomputed token lookup (services/excerpt_index.py) against its text scan.
+Checks that all outputs are identical and prints per-call timings.
+
+Usage:
+    python scripts/benchmark_extract_excerpt.py [--repeat 200]
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.citations_service import extract_excerpt
+from services.excerpt_index import TokenLookup, build_token_index
+from tests.services.excerpt_reference import legacy_extract_excerpt
+
+_QUERY = "Wie bewerbe ich mich für den Bachelor Psychologie und wann ist die Frist für den Antrag?"
+_CLAIM = "Der Antrag für das Bachelorstudium Psychologie muss innerhalb der Zulassungsfrist gestellt werden."
+
+
+_KEYWORDS = [
+    "Psychologie",
+    "Bachelor",
+    "Bachelorstudium",
+    "Antrag",
+    "Frist",
+    "Zulassung",
+    "Studium",
+    "Semester",
+    "der",
+    "und",
+    "Informationen",
+    "Lehrveranstaltungen",
+]
+
+
+def _chunk(rng: random.Random, chars: int = 2000) -> str:
+    """Keyword-dense chunk: every word is one of the query or claim words."""
+    out: list[str] = []
+    while sum(len(w) + 1 for w in out) < chars:
+        out.append(rng.choice(_KEYWORDS))
+    return " ".join(out)[:chars]
+
+
+def _prose(rng: random.Random, chars: int = 2000) -> str:
+    """Prose-like chunk: mostly distinct words, one in ten a query or claim word."""
+    out: list[str] = []
+    while sum(len(w) + 1 for w in out) < chars:
+        if rng.random() < 0.1:
+            out.append(rng.choice(_KEYWORDS))
+        else:
+            out.append("".join(rng.choice("abcdefghijklmnoprstuvwzäöü") for _ in range(rng.randint(2, 12))))
+    return " ".join(out)[:chars]
+
+
+def _per_call(seconds: float, repeat: int) -> str:
+    return f"{seconds / repeat * 1e6:10.1f} µs/call"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="calls per implementation")
+    args = parser.parse_args()
+
+    kwargs: dict[str, Any] = {"max_chars": 200, "claim_text": _CLAIM, "exclude_tokens": ["informationen"]}
+    chunks = [
+        ("2000-char keyword-dense", _chunk(random.Random(37), 2000)),
+        ("8000-char keyword-dense", _chunk(random.Random(37), 8000)),
+        ("2000-char prose", _prose(random.Random(37), 2000)),
+    ]
+    for label, chunk in chunks:
+        lookup = TokenLookup(build_token_index(chunk))
+        expected = legacy_extract_excerpt(chunk, _QUERY, **kwargs)
+        if extract_excerpt(chunk, _QUERY, **kwargs) != expected:
+            sys.exit(f"Output differs from the legacy implementation ({label} chunk)")
+        if extract_excerpt(chunk, _QUERY, token_index=lookup, **kwargs) != expected:
+            sys.exit(f"Indexed output differs from the text scan ({label} chunk)")
+
+        legacy = timeit.timeit(partial(legacy_extract_excerpt, chunk, _QUERY, **kwargs), number=args.repeat)
+        linear = timeit.timeit(partial(extract_excerpt, chunk, _QUERY, **kwargs), number=args.repeat)
+        indexed = timeit.timeit(
+            partial(extract_excerpt, chunk, _QUERY, token_index=lookup, **kwargs), number=args.repeat
+        )
+        print(f"{label} chunk, {args.repeat} calls each, identical output")
+        print(f"  legacy O(k²): {_per_call(legacy, args.repeat)}")
+        print(f"  linear scan:  {_per_call(linear, args.repeat)} ({legacy / linear:.1f}x)")
+        print(f"  token lookup: {_per_call(indexed, args.repeat)} ({linear / indexed:.1f}x vs. scan)")
+
+
+if __name__ == "__main__":
+    main()
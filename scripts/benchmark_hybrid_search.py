@@ -0,0 +1,87 @@
+"""Latency check for the index-backed hybrid search (target: < 100 ms at 50k chunks).
+
+Runs the hybrid search statement against a project's vector table with random
+query vectors (ANN latency does not depend on what the vector means, and no
+embedding calls are made), prints p50/p95 timings, and the EXPLAIN ANALYZE
+plan of one run so the HNSW and GIN index scans can be checked.
+
+Usage:
+    python scripts/benchmark_hybrid_search.py --project ssc-psych [--repeat 50]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+
+from knowledge_base import VECTOR_DBS  # noqa: E402
+from services.hybrid_search import (  # noqa: E402
+    build_hybrid_search_query,
+    get_hybrid_search_candidates,
+    get_hybrid_search_rrf_k,
+)
+
+_QUERIES = [
+    "Aufnahmetest Psychologie Termin",
+    "Anerkennung von Prüfungen Masterstudium",
+    "who researches mental health in adolescents",
+    "10.1371/journal.pone",
+    "Zulassungsfrist Bachelor",
+]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--project", choices=sorted(VECTOR_DBS), default="ssc-psych")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    vector_db = VECTOR_DBS[args.project]()
+    dimensions = vector_db.embedder.dimensions or 1536
+    candidates = get_hybrid_search_candidates()
+    rng = random.Random(0)
+
+    def statement(query: str):
+        embedding = [rng.uniform(-1, 1) for _ in range(dimensions)]
+        return build_hybrid_search_query(
+            vector_db.table, embedding, query, args.limit, candidates, get_hybrid_search_rrf_k()
+        )
+
+    timings = []
+    with vector_db.db_engine.connect() as conn:
+        rows = conn.execute(text(f'SELECT count(*) FROM "{vector_db.schema}"."{vector_db.table_name}"')).scalar_one()
+        for i in range(args.repeat):
+            with conn.begin():
+                conn.execute(text(f"SET LOCAL hnsw.ef_search = {max(vector_db.vector_index.ef_search, candidates)}"))
+                started = time.perf_counter()
+                conn.execute(statement(_QUERIES[i % len(_QUERIES)])).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+
+        compiled = statement(_QUERIES[0]).compile(dialect=postgresql.dialect())
+        # Vectors in pgvector's text format; the other parameters pass through as-is.
+        params = {
+            key: "[" + ",".join(map(str, value)) + "]" if isinstance(value, list) else value
+            for key, value in compiled.params.items()
+        }
+        with conn.begin():
+            conn.execute(text(f"SET LOCAL hnsw.ef_search = {max(vector_db.vector_index.ef_search, candidates)}"))
+            plan = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}", params).scalars().all()
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{vector_db.table_name}: {rows} chunks, {candidates} candidates per set, limit {args.limit}")
+    print(f"  p50 {statistics.median(timings):7.1f} ms   p95 {p95:7.1f} ms   max {timings[-1]:7.1f} ms")
+    print("\n".join(plan))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
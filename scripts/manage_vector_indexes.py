@@ -0,0 +1,59 @@
+"""Check, create or rebuild the HNSW, text search and metadata filter indexes of the knowledge vector tables.
+
+Same check as app startup (services/knowledge_indexes.py),
+without booting the FastAPI server or loading knowledge. Index builds run
+CONCURRENTLY, so the API keeps serving searches meanwhile.
+
+Usage:
+    python scripts/manage_vector_indexes.py                     # every project table
+    python scripts/manage_vector_indexes.py --project hex-gig
+    python scripts/manage_vector_indexes.py --dry-run           # report only
+    python scripts/manage_vector_indexes.py --rebuild           # force a rebuild
+"""
+
+import argparse
+import logging
+import sys
+
+from knowledge_base import VECTOR_DBS
+from services.knowledge_indexes import ensure_knowledge_indexes
+from services.vector_index import get_hnsw_settings
+
+logger = logging.getLogger("manage_vector_indexes")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--project", choices=sorted(VECTOR_DBS), help="Only this project's table (default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be built without building")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even when the index looks fine")
+    args = parser.parse_args(argv)
+
+    settings = get_hnsw_settings()
+    logger.info(
+        "HNSW settings: m=%d, ef_construction=%d, ef_search=%d, rebuild at %.1fx growth",
+        settings.m,
+        settings.ef_construction,
+        settings.ef_search,
+        settings.rebuild_growth,
+    )
+
+    failed = False
+    for project in [args.project] if args.project else sorted(VECTOR_DBS):
+        try:
+            vector_db = VECTOR_DBS[project]()
+            reports = ensure_knowledge_indexes(
+                vector_db, settings=settings, force_rebuild=args.rebuild, dry_run=args.dry_run
+            )
+            for report in reports:
+                logger.info("%s: %s", project, report.summary())
+            failed = failed or any(report.action == "failed" for report in reports)
+        except Exception:
+            logger.exception("%s: index check failed", project)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    sys.exit(main())
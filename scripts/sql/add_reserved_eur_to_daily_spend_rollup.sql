@@ -0,0 +1,25 @@
+-- =============================================================================
+-- Migration: Add reserved_eur column to daily_spend_rollup
+-- =============================================================================
+--
+-- Description:
+--   Adds the running total of budget reservations (estimated cost of runs
+--   still in flight). A run reserves its estimate under a row lock before it
+--   starts and releases it when its real cost is recorded or it fails, so
+--   concurrent runs across workers cannot overshoot DAILY_BUDGET_EUR.
+--   Reservations left by a crashed worker expire with the day's row.
+--   Idempotent — safe to re-run. Requires create_daily_spend_rollup.sql.
+--
+-- Usage:
+--   psql -d <database_name> -f add_reserved_eur_to_daily_spend_rollup.sql
+--
+-- =============================================================================
+
+ALTER TABLE daily_spend_rollup
+    ADD COLUMN IF NOT EXISTS reserved_eur FLOAT NOT NULL DEFAULT 0.0;
+
+-- Verify
+SELECT column_name, data_type, is_nullable, column_default
+FROM information_schema.columns
+WHERE table_name = 'daily_spend_rollup'
+  AND column_name = 'reserved_eur';
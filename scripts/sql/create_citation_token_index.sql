@@ -0,0 +1,29 @@
+-- =============================================================================
+-- Migration: Create citation_token_index table
+-- =============================================================================
+--
+-- Description:
+--   Creates the side table holding a positional token index per embedded
+--   chunk, keyed by the SHA-256 of the chunk content. It is filled when the
+--   SSC-Psych knowledge base is loaded and read into memory at startup, so
+--   citation excerpts do not re-tokenize retrieved chunks on every request.
+--   Rows for chunks that no longer exist are harmless (never looked up).
+--   Idempotent — safe to re-run.
+--
+-- Usage:
+--   psql -d <database_name> -f create_citation_token_index.sql
+--
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS citation_token_index (
+    content_hash VARCHAR(64) PRIMARY KEY,
+    token_index JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE citation_token_index IS
+'Precomputed {token: [offsets]} per embedded chunk (keyed by content SHA-256) for citation excerpts';
+
+-- Verify
+SELECT COUNT(*) AS indexed_chunks, MAX(created_at) AS last_indexed
+FROM citation_token_index;
@@ -0,0 +1,39 @@
+-- =============================================================================
+-- Migration: Create crawl_state table
+-- =============================================================================
+--
+-- Description:
+--   Creates the per-URL state of the last SSC website crawl: the ETag and
+--   Last-Modified validators, a hash of the extracted content and the
+--   page's links. The next crawl sends If-None-Match / If-Modified-Since,
+--   skips unchanged pages, replaces the vectors of changed pages and
+--   deletes those of pages that disappeared.
+--   Without this table every crawl fetches everything, as before.
+--   After emptying ssc_psych_embeddings, also delete the 'ssc-psych' rows
+--   here, otherwise unchanged pages are not embedded again.
+--   Idempotent — safe to re-run.
+--
+-- Usage:
+--   psql -d <database_name> -f create_crawl_state.sql
+--
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS crawl_state (
+    source VARCHAR(50) NOT NULL,
+    url TEXT NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    etag TEXT NOT NULL DEFAULT '',
+    last_modified TEXT NOT NULL DEFAULT '',
+    content_hash VARCHAR(64) NOT NULL DEFAULT '',
+    links JSONB NOT NULL DEFAULT '[]'::jsonb,
+    last_seen TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (source, url)
+);
+
+COMMENT ON TABLE crawl_state IS
+'Per-URL validators, content hash and links of the last crawl, for conditional re-crawls';
+
+-- Verify
+SELECT source, kind, COUNT(*) AS urls, MAX(last_seen) AS last_seen
+FROM crawl_state
+GROUP BY source, kind;
@@ -0,0 +1,46 @@
+-- =============================================================================
+-- Migration: Create daily_spend_rollup table
+-- =============================================================================
+--
+-- Description:
+--   Creates the pre-aggregated daily spend table read by budget checks, and
+--   backfills it from the per-run rows in daily_agent_usage. Each usage event
+--   adds its cost with an atomic INSERT ... ON CONFLICT DO UPDATE, so a budget
+--   check reads one row instead of summing the day's usage rows.
+--   Idempotent — safe to re-run (the backfill overwrites totals with the
+--   current sums from daily_agent_usage).
+--
+-- Usage:
+--   psql -d <database_name> -v project=hex-gig -f create_daily_spend_rollup.sql
+--
+-- Parameters:
+--   :project - PROJECT_NAME of the deployment using this database
+--              (vax-study, hex-gig or ssc-psych)
+--
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS daily_spend_rollup (
+    date DATE NOT NULL,
+    project VARCHAR(32) NOT NULL,
+    cost_eur FLOAT NOT NULL DEFAULT 0.0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (date, project)
+);
+
+COMMENT ON TABLE daily_spend_rollup IS
+'Pre-aggregated daily spend per project for budget enforcement (detail rows stay in daily_agent_usage)';
+
+-- Backfill from existing per-run rows
+INSERT INTO daily_spend_rollup (date, project, cost_eur, updated_at)
+SELECT date, :'project', COALESCE(SUM(cost_eur), 0.0), NOW()
+FROM daily_agent_usage
+GROUP BY date
+ON CONFLICT (date, project) DO UPDATE
+    SET cost_eur = EXCLUDED.cost_eur,
+        updated_at = EXCLUDED.updated_at;
+
+-- Verify
+SELECT date, project, ROUND(cost_eur::numeric, 4) AS cost_eur, updated_at
+FROM daily_spend_rollup
+ORDER BY date DESC
+LIMIT 7;
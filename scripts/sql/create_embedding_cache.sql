@@ -0,0 +1,39 @@
+-- =============================================================================
+-- Migration: Create embedding_cache table
+-- =============================================================================
+--
+-- Description:
+--   Creates the content-addressed embedding cache shared by all knowledge
+--   bases. Rows are keyed by (embedder id, dimensions, SHA-256 of the chunk
+--   text); ingestion looks chunks up here before calling the embedder and
+--   stores what it had to compute. Least recently used rows beyond
+--   EMBEDDING_CACHE_MAX_ROWS are evicted by the application.
+--   Without this table the cache disables itself and ingestion embeds every
+--   chunk, as before. Idempotent — safe to re-run.
+--
+-- Usage:
+--   psql -d <database_name> -f create_embedding_cache.sql
+--
+-- =============================================================================
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    embedder_id VARCHAR(100) NOT NULL,
+    dimensions INTEGER NOT NULL,
+    content_hash VARCHAR(64) NOT NULL,
+    embedding VECTOR NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_used_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (embedder_id, dimensions, content_hash)
+);
+
+CREATE INDEX IF NOT EXISTS ix_embedding_cache_last_used_at ON embedding_cache (last_used_at);
+
+COMMENT ON TABLE embedding_cache IS
+'Content-addressed embedding cache (embedder id, dimensions, text SHA-256) shared by all knowledge bases';
+
+-- Verify
+SELECT embedder_id, dimensions, COUNT(*) AS cached_embeddings, MAX(last_used_at) AS last_hit
+FROM embedding_cache
+GROUP BY embedder_id, dimensions;
@@ -75,6 +75,7 @@ SELECT
     COUNT(*) AS total_requests,
     COUNT(DISTINCT anonymous_session_id) AS unique_sessions,
     COUNT(*) FILTER (WHERE response_status = 'success') AS successful,
+    COUNT(*) FILTER (WHERE response_status = 'cache_hit') AS cache_hits,
     COUNT(*) FILTER (WHERE response_status = 'error') AS errors,
     COUNT(*) FILTER (WHERE response_status = 'budget_exceeded') AS budget_exceeded
 FROM agent_usage_metrics
@@ -121,15 +122,18 @@ ORDER BY date;
 
 
 -- ─────────────────────────────────────────────────────────────────────────────
--- 6. Non-success rate by date, split into genuine errors and budget blocks
+-- 6. Non-success rate by date, split into genuine errors and budget blocks.
+--    Answers served from the response cache count as successes.
 -- ─────────────────────────────────────────────────────────────────────────────
 SELECT
     TO_CHAR(date, 'DD-Mon-YYYY') AS date,
     COUNT(*) AS total_requests,
     COUNT(*) FILTER (WHERE response_status = 'error') AS errors,
     COUNT(*) FILTER (WHERE response_status = 'budget_exceeded') AS budget_exceeded,
+    COUNT(*) FILTER (WHERE response_status = 'cache_hit') AS cache_hits,
     ROUND(
-        (COUNT(*) FILTER (WHERE response_status != 'success'))::numeric / NULLIF(COUNT(*), 0) * 100,
+        (COUNT(*) FILTER (WHERE response_status NOT IN ('success', 'cache_hit')))::numeric
+        / NULLIF(COUNT(*), 0) * 100,
         1
     ) AS non_success_rate_pct
 FROM agent_usage_metrics
@@ -148,7 +152,8 @@ SELECT
     COALESCE(SUM(total_tokens), 0) AS total_tokens,
     ROUND(COALESCE(SUM(cost_eur), 0)::numeric, 2) AS total_cost_eur,
     ROUND(AVG(duration_seconds)::numeric, 2) AS avg_response_duration_s,
-    COUNT(*) FILTER (WHERE response_status != 'success') AS non_success_count
+    COUNT(*) FILTER (WHERE response_status = 'cache_hit') AS cache_hits,
+    COUNT(*) FILTER (WHERE response_status NOT IN ('success', 'cache_hit')) AS non_success_count
 FROM agent_usage_metrics
 WHERE date BETWEEN :from_date AND :to_date
 GROUP BY DATE_TRUNC('week', date)
@@ -0,0 +1,155 @@
+"""
+Polite asyncio crawling on httpx: a deque frontier, per-host token buckets, bounded in-flight requests.
+
+Used by the SSC scraper (services/ssc_web_scraper.py), which used to crawl
+synchronously with `requests` and a fixed sleep before every fetch, blocking
+the event loop for the whole crawl during startup.
+
+- `TokenBucket` spaces requests to `rate_per_second` per host, allowing
+  short bursts of `burst` requests (the politeness budget);
+- `AsyncCrawler.fetch` / `AsyncCrawler.stream` take a token from the URL's
+  host bucket and hold one of `max_in_flight` slots for the request;
+- `AsyncCrawler.crawl` runs a breadth-first crawl: URLs are taken from a
+  deque, deduplicated by a caller-supplied key, and visited concurrently;
+  each visit returns the links to enqueue.
+
+Settings come from `SSC_CRAWL_RATE_PER_SECOND` (0 disables the limit),
+`SSC_CRAWL_BURST` and `SSC_CRAWL_MAX_IN_FLIGHT`.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from logging import getLogger
+from typing import AsyncIterator, Awaitable, Callable, Iterable
+from urllib.parse import urlparse
+
+import httpx
+
+from services.env import env_number
+
+logger = getLogger(__name__)
+
+DEFAULT_CRAWL_RATE_PER_SECOND = 2.0
+DEFAULT_CRAWL_BURST = 2
+DEFAULT_CRAWL_MAX_IN_FLIGHT = 4
+
+
+@dataclass(frozen=True)
+class CrawlSettings:
+    """Politeness budget of a crawl."""
+
+    rate_per_second: float = DEFAULT_CRAWL_RATE_PER_SECOND
+    burst: int = DEFAULT_CRAWL_BURST
+    max_in_flight: int = DEFAULT_CRAWL_MAX_IN_FLIGHT
+
+
+def get_crawl_settings() -> CrawlSettings:
+    return CrawlSettings(
+        rate_per_second=env_number("SSC_CRAWL_RATE_PER_SECOND", DEFAULT_CRAWL_RATE_PER_SECOND, float),
+        burst=max(1, env_number("SSC_CRAWL_BURST", DEFAULT_CRAWL_BURST, int)),
+        max_in_flight=max(1, env_number("SSC_CRAWL_MAX_IN_FLIGHT", DEFAULT_CRAWL_MAX_IN_FLIGHT, int)),
+    )
+
+
+class TokenBucket:
+    """`rate` tokens per second, at most `burst` saved up; `acquire` waits for one."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncCrawler:
+    """Rate-limited, bounded requests over one httpx client, and a concurrent BFS crawl."""
+
+    def __init__(self, client: httpx.AsyncClient, settings: CrawlSettings):
+        self.client = client
+        self.settings = settings
+        self._slots = asyncio.Semaphore(settings.max_in_flight)
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.settings.rate_per_second, self.settings.burst)
+        return self._buckets[host]
+
+    async def fetch(self, url: str, **kwargs) -> httpx.Response:
+        """GET `url` (body read), within the host's rate and the in-flight bound."""
+        async with self._slots:
+            await self._bucket(url).acquire()
+            return await self.client.get(url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Streaming GET of `url`; holds its in-flight slot until the body is consumed."""
+        async with self._slots:
+            await self._bucket(url).acquire()
+            async with self.client.stream("GET", url, **kwargs) as response:
+                yield response
+
+    async def crawl(
+        self,
+        seeds: Iterable[str],
+        key: Callable[[str], str],
+        visit: Callable[[str], Awaitable[Iterable[str]]],
+    ) -> int:
+        """
+        Visit `seeds` and every link the visits return, each `key` once, breadth first.
+
+        A visit failing with an httpx error is logged and yields no links; any other
+        error cancels the visits still in flight and propagates.
+
+        Returns:
+            Number of URLs visited
+        """
+        frontier = deque(seeds)
+        seen: set[str] = set()
+        in_flight: set[asyncio.Task] = set()
+
+        async def run(url: str) -> Iterable[str]:
+            try:
+                return await visit(url)
+            except httpx.HTTPError as e:
+                logger.warning(f"Failed to fetch {url}: {e}")
+                return ()
+
+        try:
+            while frontier or in_flight:
+                # More tasks than slots would only queue on the semaphore.
+                while frontier and len(in_flight) < self.settings.max_in_flight:
+                    url = frontier.popleft()
+                    if key(url) in seen:
+                        continue
+                    seen.add(key(url))
+                    in_flight.add(asyncio.create_task(run(url)))
+                if not in_flight:
+                    break
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    frontier.extend(link for link in task.result() if key(link) not in seen)
+        finally:
+            # A failed visit or a cancelled crawl must not leave visits running unawaited.
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        return len(seen)
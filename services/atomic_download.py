@@ -0,0 +1,96 @@
+"""
+Streaming file downloads that never leave a truncated file in place.
+
+Used by the u:Cloud client and the SSC scraper (httpx, async). The
+response body is written in chunks to a temp file next to the target, so
+memory stays flat for large PDFs. The byte count is checked
+against the expected size (the PROPFIND ``getcontentlength`` when known,
+else the Content-Length header), and the file is fsynced and atomically
+renamed into place. A crash or a short read leaves the previous file (or
+no file) behind, never a partial one that later looks cached.
+
+Async downloads use the writer with ``async with``, which opens, fsyncs
+and renames the file in a worker thread, so concurrent downloads do not
+block the event loop on disk flushes.
+"""
+
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, Mapping, Optional
+
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+
+class IncompleteDownloadError(IOError):
+    """The downloaded byte count does not match the expected size."""
+
+
+def expected_length(headers: Mapping[str, str]) -> Optional[int]:
+    """Content-Length of a response, unless the body is content-encoded (the length is then the compressed size)."""
+    encoding = headers.get("content-encoding", "identity").strip().lower()
+    length = headers.get("content-length", "").strip()
+    if encoding not in ("", "identity") or not length.isdigit():
+        return None
+    return int(length)
+
+
+class AtomicFileWriter:
+    """Context manager writing chunks to a temp file that replaces `local_path` on a clean, complete exit."""
+
+    def __init__(self, local_path: Path, expected_size: Optional[int] = None):
+        self.local_path = local_path
+        self.expected_size = expected_size
+        self.written = 0
+        self._file: Any = None
+
+    def __enter__(self) -> "AtomicFileWriter":
+        self.local_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(
+            dir=self.local_path.parent, prefix=f".{self.local_path.name}.", suffix=".part", delete=False
+        )
+        return self
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self.written += len(chunk)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        tmp_path = Path(self._file.name)
+        try:
+            complete = exc_type is None and self.expected_size in (None, self.written)
+            if complete:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._file.close()
+            if exc_type is None and not complete:
+                raise IncompleteDownloadError(
+                    f"{self.local_path.name}: received {self.written} of {self.expected_size} bytes"
+                )
+            if complete:
+                os.replace(tmp_path, self.local_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    async def __aenter__(self) -> "AtomicFileWriter":
+        return await asyncio.to_thread(self.__enter__)
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await asyncio.to_thread(self.__exit__, exc_type, exc, tb)
+
+
+def write_chunks(chunks: Iterator[bytes], local_path: Path, expected_size: Optional[int] = None) -> int:
+    """Write a (sync) response body atomically; returns the number of bytes written."""
+    with AtomicFileWriter(local_path, expected_size) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    return writer.written
+
+
+async def awrite_chunks(chunks: AsyncIterator[bytes], local_path: Path, expected_size: Optional[int] = None) -> int:
+    """Write an async response body atomically; returns the number of bytes written."""
+    async with AtomicFileWriter(local_path, expected_size) as writer:
+        async for chunk in chunks:
+            writer.write(chunk)
+    return writer.written
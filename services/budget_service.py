@@ -4,18 +4,32 @@ Budget service for tracking and enforcing daily agent usage limits.
 This service tracks token usage and costs, enforcing a configurable daily budget
 in EUR. The budget resets at midnight Vienna time (Europe/Vienna timezone).
 Each deployment has its own database, so no agent_id filtering is needed.
+
+Budget checks are answered from an in-process ledger (``budget_ledger``) that
+loads today's spend from Postgres once, adds new spend in memory as usage is
+recorded, and resyncs every ``BUDGET_LEDGER_RESYNC_SECONDS`` and whenever the
+Vienna date rolls over — so the request path does not hit the database.
+
+Runs additionally pre-authorize their worst-case cost with `reserve_budget`,
+which takes a row lock on today's ``daily_spend_rollup`` row so concurrent
+runs across workers cannot all pass the check and overshoot the budget
+together. The reservation is released when the run's actual usage is recorded
+(or when the run fails or the client disconnects).
 """
 
-from datetime import date, datetime, timedelta
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
 from logging import getLogger
-from typing import Tuple
+from typing import Optional, Tuple
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import func
-
 from api.settings import BUDGET_TIMEZONE, api_settings
 from db.models.budget import DailyAgentUsage
 from db.session import SessionLocal
+from services.spend_rollup import add_daily_spend, get_daily_spend, lock_daily_spend
+from services.usage_writer import usage_writer
 
 logger = getLogger(__name__)
 
@@ -107,29 +121,79 @@ def get_next_reset_time_utc() -> datetime:
     return midnight_vienna.astimezone(utc_tz)
 
 
+def _query_daily_spend_eur(day: date) -> float:
+    """Read the recorded spend for `day` from the pre-aggregated rollup row."""
+    db = SessionLocal()
+    try:
+        return get_daily_spend(db, day)
+    finally:
+        db.close()
+
+
+class BudgetLedger:
+    """
+    In-process running total of today's spend.
+
+    Loads the day's total from Postgres on first use, then adds each recorded
+    cost in memory. The total is re-read from Postgres when it is older than
+    `resync_seconds` (so spend recorded by other workers is picked up) and
+    when the Vienna date changes (midnight budget reset).
+
+    A resync that lands between a usage commit and the matching `add()` counts
+    that cost twice until the next resync. That error only ever overstates
+    spend, which is the safe direction for a budget guard.
+    """
+
+    def __init__(self, resync_seconds: float):
+        self._resync_seconds = resync_seconds
+        self._lock = threading.Lock()
+        self._day: Optional[date] = None
+        self._spend_eur = 0.0
+        self._synced_at = 0.0
+
+    def _needs_resync(self, today: date) -> bool:
+        if self._day != today:
+            return True
+        return time.monotonic() - self._synced_at >= self._resync_seconds
+
+    def spend_eur(self) -> float:
+        """Today's spend in EUR, resyncing from Postgres only when stale."""
+        today = get_today_vienna()
+        with self._lock:
+            if self._needs_resync(today):
+                # Rows still queued in the background writer are not in Postgres yet.
+                self._spend_eur = _query_daily_spend_eur(today) + usage_writer.pending_cost_eur(today)
+                self._day = today
+                self._synced_at = time.monotonic()
+                logger.debug(f"Budget ledger resynced: day={today}, spend={self._spend_eur:.4f} EUR")
+            return self._spend_eur
+
+    def add(self, day: date, cost_eur: float) -> None:
+        """Add committed spend for `day`; spend for any other day is left to the next resync."""
+        with self._lock:
+            if self._day == day:
+                self._spend_eur += cost_eur
+
+    def invalidate(self) -> None:
+        """Force the next read to resync from Postgres."""
+        with self._lock:
+            self._day = None
+
+
+budget_ledger = BudgetLedger(resync_seconds=api_settings.budget_ledger_resync_seconds)
+
+
 def get_daily_spend_eur() -> float:
     """
     Get the total spend in EUR for today (Vienna timezone).
 
-    Sums all cost_eur values from the database for today's date
-    in Vienna timezone.
+    Served from the in-process budget ledger; Postgres is only queried
+    when the ledger is due for a resync.
 
     Returns:
         Total spend in EUR for today
     """
-    today = get_today_vienna()
-
-    db = SessionLocal()
-    try:
-        result = (
-            db.query(func.coalesce(func.sum(DailyAgentUsage.cost_eur), 0.0))
-            .filter(DailyAgentUsage.date == today)
-            .scalar()
-        )
-
-        return float(result)
-    finally:
-        db.close()
+    return budget_ledger.spend_eur()
 
 
 def check_budget_available() -> Tuple[bool, float, datetime]:
@@ -159,30 +223,146 @@ def check_budget_available() -> Tuple[bool, float, datetime]:
     return available, remaining, reset_time
 
 
-def record_usage(input_tokens: int, output_tokens: int) -> None:
+@dataclass
+class BudgetReservation:
+    """Budget held for one in-flight run on `day`, until it is settled or released."""
+
+    day: date
+    amount_eur: float
+    closed: bool = False
+
+
+def estimate_run_cost_eur(agent_id: str, max_completion_tokens: Optional[int]) -> float:
+    """
+    Estimate the worst-case cost of one run, used as its budget reservation.
+
+    Args:
+        agent_id: Agent identifier (selects a per-agent input token estimate, if configured)
+        max_completion_tokens: The model's output token cap, if it has one
+
+    Returns:
+        Estimated cost in EUR
+    """
+    input_tokens = api_settings.budget_input_token_estimates.get(agent_id, api_settings.budget_input_token_estimate)
+    output_tokens = max_completion_tokens or api_settings.budget_output_token_estimate
+    return calculate_cost_eur(input_tokens, output_tokens)
+
+
+def reserve_budget(estimated_cost_eur: float) -> Optional[BudgetReservation]:
+    """
+    Atomically reserve `estimated_cost_eur` of today's budget.
+
+    Locks today's rollup row (SELECT ... FOR UPDATE) so the check and the
+    reservation cannot interleave with another worker's.
+
+    Args:
+        estimated_cost_eur: Amount to hold, usually from `estimate_run_cost_eur`
+
+    Returns:
+        The reservation, or None if recorded spend plus outstanding reservations
+        plus this estimate would exceed the daily budget
+    """
+    daily_budget, _, _ = _get_required_budget_config()
+    today = get_today_vienna()
+
+    db = SessionLocal()
+    try:
+        row = lock_daily_spend(db, today)
+        # Spend still queued in the background writer is not in the row yet.
+        committed = row.cost_eur + row.reserved_eur + usage_writer.pending_cost_eur(today)
+        if committed + estimated_cost_eur > daily_budget:
+            db.rollback()
+            logger.info(
+                f"Budget reservation refused: spend+reserved={committed:.4f} EUR, "
+                f"estimate={estimated_cost_eur:.4f} EUR, budget={daily_budget:.2f} EUR"
+            )
+            return None
+
+        row.reserved_eur += estimated_cost_eur
+        row.updated_at = datetime.now(timezone.utc)
+        db.commit()
+        logger.info(f"Reserved budget: {estimated_cost_eur:.4f} EUR (spend+reserved={committed:.4f} EUR)")
+        return BudgetReservation(day=today, amount_eur=estimated_cost_eur)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def release_reservation(reservation: Optional[BudgetReservation]) -> None:
+    """
+    Return an unused reservation to the budget (failed or disconnected runs).
+
+    Safe to call more than once and never raises: a release that cannot be
+    written only leaves the budget conservatively reserved until midnight.
+
+    Args:
+        reservation: Reservation from `reserve_budget`; None is ignored
+    """
+    if reservation is None or reservation.closed:
+        return
+    reservation.closed = True
+    if usage_writer.submit_release(reservation.day, reservation.amount_eur):
+        return
+
+    db = SessionLocal()
+    try:
+        add_daily_spend(db, reservation.day, 0.0, released_eur=reservation.amount_eur)
+        db.commit()
+        logger.info(f"Released budget reservation: {reservation.amount_eur:.4f} EUR")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to release budget reservation: {e}")
+    finally:
+        db.close()
+
+
+def record_usage(input_tokens: int, output_tokens: int, reservation: Optional[BudgetReservation] = None) -> None:
     """
     Record token usage for the deployed agent.
 
-    Creates a new record in the database with the token counts
-    and calculated cost.
+    Hands the row to the background usage writer while the app is running
+    (never blocks the event loop on a commit); otherwise creates the record
+    and bumps the daily spend rollup in one transaction. Either way the cost
+    is added to the budget ledger.
 
     Args:
         input_tokens: Number of input tokens consumed
         output_tokens: Number of output tokens consumed
+        reservation: The run's budget reservation, settled in the same write
     """
     today = get_today_vienna()
     cost = calculate_cost_eur(input_tokens, output_tokens)
+    release = None
+    if reservation is not None and not reservation.closed:
+        release = (reservation.day, reservation.amount_eur)
+
+    values = {
+        "date": today,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cost_eur": cost,
+        "created_at": datetime.now(timezone.utc),
+    }
+    if usage_writer.submit_usage(values, release=release):
+        if reservation is not None:
+            reservation.closed = True
+        budget_ledger.add(today, cost)
+        logger.info(f"Queued usage: input={input_tokens}, output={output_tokens}, cost={cost:.6f} EUR")
+        return
 
     db = SessionLocal()
     try:
-        usage = DailyAgentUsage(
-            date=today,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
-            cost_eur=cost,
-        )
+        usage = DailyAgentUsage(**values)
         db.add(usage)
+        add_daily_spend(db, today, cost)
+        if release is not None:
+            add_daily_spend(db, release[0], 0.0, released_eur=release[1])
         db.commit()
+        if reservation is not None:
+            reservation.closed = True
+        budget_ledger.add(today, cost)
 
         logger.info(f"Recorded usage: input={input_tokens}, output={output_tokens}, cost={cost:.6f} EUR")
     except Exception as e:
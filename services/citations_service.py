@@ -12,13 +12,28 @@ source (weight 2) plus the user query (weight 1) compete for the densest
 window in the chunk, and the citation's own title words are barred from
 anchoring (titles repeat in header/nav boilerplate — the exact text a chip
 should not quote).
+
+`CitationBuilder` does the same work incrementally while the answer streams:
+retrieved chunks are indexed as soon as their references arrive, and each
+source's excerpt is computed as soon as a completed answer line cites its URL,
+so the terminal Citations frame only serializes finished work.
+
+Which chunks become citations, and under which URL/title, is decided by the
+active project's `CitationResolvers` (``ProjectConfig.citation_resolvers``):
+a dict from the chunk's ``source_type`` to a resolver function, built once
+per project module, so dispatch is one dict lookup per chunk. The default
+(`SOURCE_URL_RESOLVERS`) is the SSC-Psych behaviour — chunks carrying
+``meta_data.source_url``.
 """
 
 from __future__ import annotations
 
 import json
 import re
-from typing import Any, Iterable, Optional
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+from services.excerpt_index import TokenLookup, excerpt_index_store, find_indexed_occurrences
 
 # Minimal bilingual stopword union — kept inline to avoid a new dependency.
 _STOPWORDS: frozenset[str] = frozenset(
@@ -181,6 +196,15 @@ _MD_LINK_RE = re.compile(r"\[[^\]]*\]\([^)]*\)")
 _URL_RE = re.compile(r"https?://\S+")
 
 
+def _claim_from_line(line: str, source_url: str) -> Optional[str]:
+    """`line` (which cites `source_url`) stripped of link markup and URLs; None if no prose is left."""
+    cleaned = _MD_LINK_RE.sub(" ", line)
+    cleaned = cleaned.replace(source_url, " ")
+    cleaned = _URL_RE.sub(" ", cleaned)
+    cleaned = cleaned.strip()
+    return cleaned or None
+
+
 def _claim_text_for_url(answer_text: Optional[str], source_url: str) -> Optional[str]:
     """The answer line that cites `source_url`, stripped of link markup and URLs.
 
@@ -191,13 +215,8 @@ def _claim_text_for_url(answer_text: Optional[str], source_url: str) -> Optional
     if not answer_text:
         return None
     for line in answer_text.splitlines():
-        if source_url not in line:
-            continue
-        cleaned = _MD_LINK_RE.sub(" ", line)
-        cleaned = cleaned.replace(source_url, " ")
-        cleaned = _URL_RE.sub(" ", cleaned)
-        cleaned = cleaned.strip()
-        return cleaned or None
+        if source_url in line:
+            return _claim_from_line(line, source_url)
     return None
 
 
@@ -225,12 +244,67 @@ def _snap_to_whitespace(text: str, start: int, end: int) -> tuple[int, int]:
     return s, e
 
 
+def _find_occurrences(lowered: str, weights: dict[str, int]) -> list[tuple[int, str]]:
+    """Every (position, keyword) where a keyword occurs in `lowered`, overlaps included, sorted.
+
+    One pass of a compiled alternation inside a lookahead visits each position
+    once and reports the longest keyword starting there; every other keyword
+    starting at that position is necessarily a prefix of it.
+    """
+    if not weights:
+        return []
+    ordered = sorted(weights, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(re.escape(kw) for kw in ordered) + "))")
+    prefixes = {kw: [other for other in ordered if kw.startswith(other)] for kw in ordered}
+    return [(match.start(), kw) for match in pattern.finditer(lowered) for kw in prefixes[match.group(1)]]
+
+
+def _densest_window_start(
+    occurrences: list[tuple[int, str]],
+    weights: dict[str, int],
+    lead: int,
+    max_chars: int,
+) -> int:
+    """Start of the best window [anchor - lead, anchor - lead + max_chars) over sorted occurrences.
+
+    A window scores the summed weight of the *distinct* keywords starting
+    inside it; the earliest anchor wins ties. Both window edges only move
+    forward as the anchor advances, so two pointers with per-keyword counts
+    score every anchor in one pass.
+    """
+    counts: dict[str, int] = {}
+    score = 0
+    left = right = 0
+    best_start = 0
+    best_score = -1
+    for anchor, _kw in occurrences:
+        w_start = anchor - lead
+        w_end = w_start + max_chars
+        while right < len(occurrences) and occurrences[right][0] < w_end:
+            kw = occurrences[right][1]
+            counts[kw] = counts.get(kw, 0) + 1
+            if counts[kw] == 1:
+                score += weights[kw]
+            right += 1
+        while left < right and occurrences[left][0] < w_start:
+            kw = occurrences[left][1]
+            counts[kw] -= 1
+            if counts[kw] == 0:
+                score -= weights[kw]
+            left += 1
+        if score > best_score:
+            best_score = score
+            best_start = w_start
+    return best_start
+
+
 def extract_excerpt(
     chunk_content: str,
     query: str,
     max_chars: int = 200,
     claim_text: Optional[str] = None,
     exclude_tokens: Optional[Iterable[str]] = None,
+    token_index: Optional[TokenLookup] = None,
 ) -> str:
     """Verbatim window from chunk_content around the densest keyword cluster.
 
@@ -242,6 +316,9 @@ def extract_excerpt(
     (the citation's title words) cannot anchor a window — titles repeat in page
     headers/nav text, and the chip already sits under the titled link. Falls
     back to the leading max_chars when nothing matches.
+
+    `token_index` (from `services.excerpt_index`, computed at ingestion) locates
+    the keywords without rescanning the chunk; the result is identical.
     """
     if not chunk_content:
         return ""
@@ -259,35 +336,21 @@ def extract_excerpt(
         if kw not in excluded:
             weights[kw] = 2
 
-    lowered = content.lower()
-    occurrences: list[tuple[int, str]] = []
-    for kw in weights:
-        pos = lowered.find(kw)
-        while pos != -1:
-            occurrences.append((pos, kw))
-            pos = lowered.find(kw, pos + 1)
+    if token_index is not None:
+        occurrences = find_indexed_occurrences(token_index, weights)
+    else:
+        occurrences = _find_occurrences(content.lower(), weights)
 
     if not occurrences:
         if excluded:
             # Retry with title tokens allowed: a title-anchored window is
             # weaker, but still better than the blind leading window.
-            return extract_excerpt(content, query, max_chars, claim_text=claim_text)
+            return extract_excerpt(content, query, max_chars, claim_text=claim_text, token_index=token_index)
         window = content[:max_chars]
         return _WHITESPACE_RE.sub(" ", window).strip() + "…"
 
-    occurrences.sort()
     lead = max_chars // 4  # anchor sits a quarter in, so context reads forward
-
-    best_start = 0
-    best_score = -1
-    for anchor, _kw in occurrences:
-        w_start = anchor - lead
-        w_end = w_start + max_chars
-        in_window = {kw for pos, kw in occurrences if w_start <= pos < w_end}
-        score = sum(weights[kw] for kw in in_window)
-        if score > best_score:
-            best_score = score
-            best_start = w_start
+    best_start = _densest_window_start(occurrences, weights, lead, max_chars)
 
     start, end = _snap_to_whitespace(content, best_start, best_start + max_chars)
 
@@ -326,16 +389,211 @@ def _iter_chunks(references: Any) -> Iterable[Any]:
             yield chunk
 
 
+@dataclass(frozen=True)
+class CitationSource:
+    """Where a retrieved chunk came from, as shown on its citation chip."""
+
+    source_url: str
+    title: str
+    source_type: str
+    language: str
+
+
+# (chunk name, chunk meta_data) -> source, or None when the chunk cannot be cited.
+CitationResolver = Callable[[Optional[str], dict], Optional[CitationSource]]
+
+
+class CitationResolvers:
+    """Per-project registry mapping a chunk's `source_type` to its resolver.
+
+    `default` handles chunks whose source_type has no entry (or no source_type
+    at all); without a default such chunks are not cited.
+    """
+
+    def __init__(
+        self,
+        by_source_type: Optional[dict[str, CitationResolver]] = None,
+        default: Optional[CitationResolver] = None,
+    ):
+        self._by_source_type = dict(by_source_type or {})
+        self._default = default
+
+    def resolve(self, name: Optional[str], meta: dict) -> Optional[CitationSource]:
+        resolver = self._by_source_type.get(meta.get("source_type"), self._default)
+        return resolver(name, meta) if resolver is not None else None
+
+
+def resolve_source_url(name: Optional[str], meta: dict) -> Optional[CitationSource]:
+    """Chunks that carry `meta_data.source_url` (SSC web pages and downloads)."""
+    source_url = meta.get("source_url")
+    if not source_url:
+        return None
+    return CitationSource(
+        source_url=source_url,
+        title=meta.get("page_title") or meta.get("document_title") or name or source_url,
+        source_type=meta.get("source_type") or "web_page",
+        language=meta.get("language") or "de",
+    )
+
+
+SOURCE_URL_RESOLVERS = CitationResolvers(default=resolve_source_url)
+
+
+class _Source:
+    """One deduplicated citation source and, once known, its excerpt."""
+
+    __slots__ = (
+        "source_url",
+        "title",
+        "source_type",
+        "language",
+        "content",
+        "exclude_tokens",
+        "token_index",
+        "excerpt",
+    )
+
+    def __init__(self, source_url: str, title: str, source_type: str, language: str, content: str):
+        self.source_url = source_url
+        self.title = title
+        self.source_type = source_type
+        self.language = language
+        self.content = content
+        self.exclude_tokens = _TOKEN_RE.findall(str(title).lower())
+        self.token_index = excerpt_index_store.get(content)
+        self.excerpt: Optional[str] = None
+
+
+class CitationBuilder:
+    """Build the citation list incrementally while an answer streams.
+
+    Feed it the run's references with `set_references` whenever a chunk carries
+    them (latest wins, like the streamer's own bookkeeping) and the answer text
+    with `add_answer_delta`. A source's excerpt is computed as soon as a
+    completed answer line cites its URL — that line is final, so the claim is
+    the same one `build_citations` would pick from the full answer. `build`
+    fills in the sources that were never cited on a completed line and returns
+    exactly what `build_citations(references, query, answer_text=...)` would.
+    """
+
+    def __init__(
+        self,
+        query: str,
+        max_excerpt_chars: int = 200,
+        resolvers: CitationResolvers = SOURCE_URL_RESOLVERS,
+    ):
+        self._query = query
+        self._max_excerpt_chars = max_excerpt_chars
+        self._resolvers = resolvers
+        self._references: Any = None
+        self._sources: list[_Source] = []
+        # Excerpts survive a references refresh: (url, content, title) -> (claim, excerpt).
+        self._done: dict[tuple[str, str, str], tuple[Optional[str], str]] = {}
+        self._answer_parts: list[str] = []
+        self._completed_lines: list[str] = []
+        self._partial_line = ""
+
+    def _excerpt(self, source: _Source, claim: Optional[str]) -> str:
+        key = (source.source_url, source.content, str(source.title))
+        done = self._done.get(key)
+        if done is not None and done[0] == claim:
+            return done[1]
+        excerpt = extract_excerpt(
+            source.content,
+            self._query,
+            max_chars=self._max_excerpt_chars,
+            claim_text=claim,
+            exclude_tokens=source.exclude_tokens,
+            token_index=source.token_index,
+        )
+        self._done[key] = (claim, excerpt)
+        return excerpt
+
+    def _resolve_from_lines(self, source: _Source, lines: Iterable[str]) -> None:
+        for line in lines:
+            if source.source_url in line:
+                source.excerpt = self._excerpt(source, _claim_from_line(line, source.source_url))
+                return
+
+    def set_references(self, references: Any) -> None:
+        """Index the retrieved chunks of `references` (replaces any earlier set)."""
+        if references is self._references:
+            return
+        self._references = references
+        seen: set[str] = set()
+        self._sources = []
+        for chunk in _iter_chunks(references):
+            name, meta, content = _chunk_meta(chunk)
+            resolved = self._resolvers.resolve(name, meta)
+            if resolved is None or resolved.source_url in seen:
+                continue
+            seen.add(resolved.source_url)
+            source = _Source(
+                source_url=resolved.source_url,
+                title=resolved.title,
+                source_type=resolved.source_type,
+                language=resolved.language,
+                content=content,
+            )
+            self._resolve_from_lines(source, self._completed_lines)
+            self._sources.append(source)
+
+    def add_answer_delta(self, text: str) -> None:
+        """Append streamed answer text; resolves sources cited on newly completed lines."""
+        if not text:
+            return
+        self._answer_parts.append(text)
+        lines = (self._partial_line + text).splitlines(keepends=True)
+        self._partial_line = ""
+        # Same line boundaries as str.splitlines(); an unterminated tail is still growing.
+        if lines and lines[-1].splitlines() == [lines[-1]]:
+            self._partial_line = lines.pop()
+        new_lines = [line.splitlines()[0] for line in lines]
+        self._completed_lines.extend(new_lines)
+        for source in self._sources:
+            if source.excerpt is None:
+                self._resolve_from_lines(source, new_lines)
+
+    def build(self, answer_text: Optional[str] = None) -> list[dict]:
+        """Finish the remaining excerpts and return the ranked citation list.
+
+        `answer_text` is the run's final answer (RunCompleted content). When it
+        differs from the streamed text, every claim is re-derived from it.
+        """
+        streamed = "".join(self._answer_parts)
+        final_text = streamed if answer_text is None else answer_text
+        for source in self._sources:
+            if source.excerpt is None or final_text != streamed:
+                source.excerpt = self._excerpt(source, _claim_text_for_url(final_text, source.source_url))
+
+        total = len(self._sources)
+        if total == 0:
+            return []
+        return [
+            {
+                "source_url": source.source_url,
+                "title": source.title,
+                "source_type": source.source_type,
+                "language": source.language,
+                "excerpt": source.excerpt,
+                "score": round(1.0 - (rank / total), 4),
+            }
+            for rank, source in enumerate(self._sources)
+        ]
+
+
 def build_citations(
     references: Any,
     query: str,
     max_excerpt_chars: int = 200,
     answer_text: Optional[str] = None,
+    resolvers: CitationResolvers = SOURCE_URL_RESOLVERS,
 ) -> list[dict]:
     """Flatten Agno references into a deduplicated citation list.
 
-    - Skips chunks whose `meta_data` lacks `source_url` (so VAX / HeX-GiG
-      chunks silently produce no citations).
+    - `resolvers` maps each chunk to its source URL/title; chunks it cannot
+      resolve are skipped (by default: chunks whose `meta_data` lacks
+      `source_url`).
     - Dedup key: `source_url`. First-seen wins, because Agno returns chunks
       in relevance order.
     - `score` is derived from rank (top = 1.0) since Document.to_dict() does
@@ -343,43 +601,9 @@ def build_citations(
     - `answer_text` (the agent's full reply) anchors each excerpt on the
       claim sentence that cites the source; title words never anchor.
     """
-    seen: set[str] = set()
-    ordered: list[dict] = []
-
-    for chunk in _iter_chunks(references):
-        name, meta, content = _chunk_meta(chunk)
-        source_url = meta.get("source_url")
-        if not source_url or source_url in seen:
-            continue
-        seen.add(source_url)
-
-        title = meta.get("page_title") or meta.get("document_title") or name or source_url
-        source_type = meta.get("source_type") or "web_page"
-        language = meta.get("language") or "de"
-        excerpt = extract_excerpt(
-            content,
-            query,
-            max_chars=max_excerpt_chars,
-            claim_text=_claim_text_for_url(answer_text, source_url),
-            exclude_tokens=_TOKEN_RE.findall(str(title).lower()),
-        )
-
-        ordered.append(
-            {
-                "source_url": source_url,
-                "title": title,
-                "source_type": source_type,
-                "language": language,
-                "excerpt": excerpt,
-            }
-        )
-
-    total = len(ordered)
-    if total == 0:
-        return []
-    for rank, citation in enumerate(ordered):
-        citation["score"] = round(1.0 - (rank / total), 4)
-    return ordered
+    builder = CitationBuilder(query, max_excerpt_chars=max_excerpt_chars, resolvers=resolvers)
+    builder.set_references(references)
+    return builder.build(answer_text=answer_text)
 
 
 def format_citations_sse(citations: list[dict]) -> str:
@@ -0,0 +1,181 @@
+"""
+Conditional re-crawls: what the last crawl saw, and what changed since.
+
+`CrawlStateStore` loads and saves one site's rows of the ``crawl_state``
+table (db/models/crawl_state.py). `CrawlState` is handed to the scraper for
+one crawl:
+
+- `conditional_headers` turns the previous ETag / Last-Modified into
+  If-None-Match / If-Modified-Since;
+- `keep` carries a URL's previous record forward when it answered 304, or
+  when fetching it failed (a flaky request must not look like a deletion),
+  and returns it so its stored links can be followed;
+- `update` records a fetched URL and says whether its content changed;
+- `unchanged_urls` lists the URLs whose stored vectors are still current
+  (304, unchanged content or a failed fetch); the loader's reconcile keeps
+  them although the scraper did not return them, and purges the rest;
+- `removals_known` says whether that purge is safe: a URL that failed
+  without a previous record may have hidden pages behind it (its links
+  were never read), so nothing not returned counts as removed.
+
+The store is an optimization only: if the table is missing or a query
+fails, it logs a warning and the crawl fetches and ingests everything, as
+before.
+"""
+
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, insert, select
+
+from db.models.crawl_state import CrawlStateEntry
+from db.session import SessionLocal
+
+logger = getLogger(__name__)
+
+# Kinds of crawled URLs; listings only hold links, nothing of them is embedded.
+WEB_PAGE = "web_page"
+LISTING = "listing"
+DOCUMENT = "document"
+
+
+@dataclass(frozen=True)
+class CrawlRecord:
+    """State of one URL after a crawl (see CrawlStateEntry for the fields)."""
+
+    url: str
+    kind: str
+    etag: str = ""
+    last_modified: str = ""
+    content_hash: str = ""
+    links: tuple[str, ...] = ()
+    last_seen: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class CrawlState:
+    """Previous crawl's records in; this crawl's records, changes and removals out."""
+
+    def __init__(self, previous: Optional[dict[str, CrawlRecord]] = None):
+        self.previous = previous or {}
+        self.records: dict[str, CrawlRecord] = {}
+        self.changed: list[str] = []  # new or changed since the previous crawl
+        self.failed: set[str] = set()  # could not be fetched in this crawl
+        self.unchanged = 0
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        record = self.previous.get(url)
+        if record is None:
+            return {}
+        headers = {}
+        if record.etag:
+            headers["If-None-Match"] = record.etag
+        if record.last_modified:
+            headers["If-Modified-Since"] = record.last_modified
+        return headers
+
+    def keep(self, url: str, seen: bool = True) -> Optional[CrawlRecord]:
+        """Carry the previous record of `url` forward (`seen`: it answered 304, else the fetch failed)."""
+        if not seen:
+            self.failed.add(url)
+        record = self.previous.get(url)
+        if record is None:
+            return None
+        if seen:
+            record = replace(record, last_seen=datetime.now(timezone.utc))
+            self.unchanged += 1
+        self.records[url] = record
+        return record
+
+    def update(self, record: CrawlRecord) -> bool:
+        """Record a fetched URL; True when its content is new or changed since the previous crawl."""
+        self.records[record.url] = record
+        previous = self.previous.get(record.url)
+        if previous is not None and previous.content_hash == record.content_hash:
+            self.unchanged += 1
+            return False
+        self.changed.append(record.url)
+        return True
+
+    def invalidate(self, url: str) -> None:
+        """Forget the validators and hash of `url`, so the next crawl fetches and ingests it again."""
+        if url in self.records:
+            self.records[url] = replace(self.records[url], etag="", last_modified="", content_hash="")
+
+    def removed(self) -> list[CrawlRecord]:
+        """Previous records not found again (unlinked, or 404/410)."""
+        return [record for url, record in self.previous.items() if url not in self.records]
+
+    def unchanged_urls(self) -> set[str]:
+        """URLs of this crawl whose stored vectors are current: not new or changed, nor removed (failed included)."""
+        return (set(self.records) - set(self.changed)) | self.failed
+
+    def removals_known(self) -> bool:
+        """True when every failed URL had a previous record, so URLs not found again were really removed."""
+        return all(url in self.previous for url in self.failed)
+
+
+class CrawlStateStore:
+    """Load/save of one source's crawl state; disables itself when the table is unavailable."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.enabled = True
+
+    def _disable(self, action: str, error: Exception) -> None:
+        self.enabled = False
+        logger.warning(f"Crawl state disabled ({action} failed, crawling everything): {error}")
+
+    def load(self) -> dict[str, CrawlRecord]:
+        if not self.enabled:
+            return {}
+        db = SessionLocal()
+        try:
+            rows = db.execute(select(CrawlStateEntry).where(CrawlStateEntry.source == self.source)).scalars().all()
+        except Exception as e:
+            self._disable("load", e)
+            return {}
+        finally:
+            db.close()
+        return {
+            row.url: CrawlRecord(
+                url=row.url,
+                kind=row.kind,
+                etag=row.etag or "",
+                last_modified=row.last_modified or "",
+                content_hash=row.content_hash or "",
+                links=tuple(row.links or ()),
+                last_seen=row.last_seen,
+            )
+            for row in rows
+        }
+
+    def save(self, records: Iterable[CrawlRecord]) -> None:
+        """Replace the source's rows with `records`."""
+        if not self.enabled:
+            return
+        rows = [
+            {
+                "source": self.source,
+                "url": record.url,
+                "kind": record.kind,
+                "etag": record.etag,
+                "last_modified": record.last_modified,
+                "content_hash": record.content_hash,
+                "links": list(record.links),
+                "last_seen": record.last_seen,
+            }
+            for record in records
+        ]
+        db = SessionLocal()
+        try:
+            db.execute(delete(CrawlStateEntry).where(CrawlStateEntry.source == self.source))
+            if rows:
+                db.execute(insert(CrawlStateEntry), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._disable("save", e)
+        finally:
+            db.close()
@@ -0,0 +1,172 @@
+"""
+DOI extraction from the HeX research PDFs, in worker processes and cached on disk.
+
+Extracting text from five pages per paper with pypdf is CPU-bound and used
+to run serially on the event loop for every PDF at every startup, even for
+papers that had not changed. `extract_dois`:
+
+- looks each PDF up in a JSON cache keyed by path and validated by size and
+  mtime, so a warm restart parses no PDF at all;
+- extracts the misses in a `ProcessPoolExecutor` with
+  `DOI_EXTRACTION_WORKERS` workers (default: up to 4, one per CPU), falling
+  back to the calling thread for a single PDF or when no pool can be started;
+- stores the results, including "no DOI found", back into the cache. A PDF
+  that could not be read (`EXTRACTION_FAILED`) is not cached and is tried
+  again on the next run.
+
+Workers are spawned, not forked (the API process holds threads and DB
+connections), and only import this module and pypdf.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from pypdf import PdfReader
+
+from services.env import env_number
+
+logger = logging.getLogger(__name__)
+
+DOI_CACHE_FILENAME = ".doi_cache.json"
+DEFAULT_DOI_EXTRACTION_WORKERS = min(4, os.cpu_count() or 1)
+
+# Returned by `extract_doi_from_pdf` when the PDF could not be read; unlike None
+# ("no DOI in this file") it is not cached. A string, so it survives the worker pickling.
+EXTRACTION_FAILED = "extraction-failed"
+
+# Standard DOI pattern — matches "10.NNNN/suffix" anywhere in text
+_DOI_RE = re.compile(r"\b(10\.\d{4,9}/[^\s\],;:\'\"<>()]+)", re.IGNORECASE)
+
+
+def extract_doi_from_pdf(path: Path) -> Optional[str]:
+    """Extract the first DOI found in a PDF's title/abstract and reference pages.
+
+    Reads the first 3 pages and last 2 pages — sufficient to capture the DOI
+    from the title page header/footer, abstract, or reference list without
+    loading the full document into memory.
+
+    Returns a full https://doi.org/... URL, None if no DOI is found, or
+    `EXTRACTION_FAILED` if the PDF could not be read.
+    """
+    path = Path(path)
+    try:
+        reader = PdfReader(str(path))
+        pages = reader.pages
+        n = len(pages)
+        # Indices: first 3 + last 2, deduplicated, clamped to actual page count
+        indices = list(dict.fromkeys([0, 1, 2, max(0, n - 2), max(0, n - 1)]))
+        text_parts = []
+        for i in indices:
+            if i < n:
+                text_parts.append(pages[i].extract_text() or "")
+        text = "\n".join(text_parts)
+        match = _DOI_RE.search(text)
+        if match:
+            doi = match.group(1).rstrip(".")
+            # Strip trailing "doi"/"DOI" label — PDF text extraction artifact (e.g. "...609825doi")
+            doi = re.sub(r"(?i)doi$", "", doi).rstrip(".")
+            # Strip supplemental URL path suffix (e.g. /-/DCSupplemental)
+            doi = re.sub(r"/-/.*$", "", doi)
+            # Discard DOIs with very short suffixes — likely truncated by a line break in the PDF
+            # (e.g. "10.1371/j" or "10.5061/dry"). A broken link is worse than no link.
+            suffix = doi.split("/", 1)[1] if "/" in doi else doi
+            if len(suffix) < 5:
+                logger.warning("Discarding likely truncated DOI from %s: %s", path.name, doi)
+                return None
+            return f"https://doi.org/{doi}"
+    except Exception:
+        logger.warning("Could not extract DOI from PDF: %s", path)
+        return EXTRACTION_FAILED
+    return None
+
+
+def get_doi_extraction_workers() -> int:
+    return max(1, env_number("DOI_EXTRACTION_WORKERS", DEFAULT_DOI_EXTRACTION_WORKERS, int))
+
+
+def _file_key(path: Path) -> Optional[dict]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _load_cache(cache_path: Path) -> dict[str, dict]:
+    try:
+        return json.loads(cache_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable DOI cache %s: %s", cache_path, e)
+        return {}
+
+
+def _save_cache(cache_path: Path, cache: dict[str, dict]) -> None:
+    try:
+        tmp_path = cache_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(cache, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("Could not write DOI cache %s: %s", cache_path, e)
+
+
+def _extract_many(paths: list[Path], workers: int) -> list[Optional[str]]:
+    if workers <= 1 or len(paths) <= 1:
+        return [extract_doi_from_pdf(path) for path in paths]
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(paths)), mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            return list(pool.map(extract_doi_from_pdf, paths, chunksize=4))
+    except Exception as e:
+        logger.warning("DOI extraction pool failed, extracting in process: %s", e)
+        return [extract_doi_from_pdf(path) for path in paths]
+
+
+def extract_dois(
+    paths: list[Path], cache_path: Optional[Path] = None, workers: Optional[int] = None
+) -> dict[Path, Optional[str]]:
+    """
+    DOI URL (or None) per PDF, from the on-disk cache or extracted in worker processes.
+
+    Args:
+        paths: PDF files
+        cache_path: JSON cache file (no caching when None)
+        workers: Worker processes (default: `DOI_EXTRACTION_WORKERS`)
+
+    Returns:
+        {path: DOI URL or None (also for PDFs that could not be read)}
+    """
+    cache = _load_cache(cache_path) if cache_path else {}
+    results: dict[Path, Optional[str]] = {}
+    misses: list[Path] = []
+    for path in dict.fromkeys(paths):
+        entry = cache.get(str(path))
+        key = _file_key(path)
+        if entry is not None and key is not None and {k: entry.get(k) for k in key} == key:
+            results[path] = entry.get("doi")
+        else:
+            misses.append(path)
+
+    if misses:
+        logger.info("Extracting DOIs from %d of %d PDFs", len(misses), len(results) + len(misses))
+        for path, doi in zip(misses, _extract_many(misses, workers or get_doi_extraction_workers())):
+            key = _file_key(path)
+            if doi == EXTRACTION_FAILED:
+                doi = key = None  # a transient read error must not become a cached "no DOI"
+            results[path] = doi
+            if key is None:
+                cache.pop(str(path), None)
+            else:
+                cache[str(path)] = {**key, "doi": doi}
+        if cache_path:
+            # Only the PDFs passed in (and still present) stay cached.
+            _save_cache(cache_path, {str(path): cache[str(path)] for path in results if str(path) in cache})
+    return results
@@ -0,0 +1,145 @@
+"""
+Micro-batching of embedding requests during ingestion.
+
+PgVector embeds each chunk of an insert with its own
+`async_get_embedding_and_usage` call, so short documents (member profiles, RSS
+items, SSC pages) cost one HTTP round trip per chunk. `EmbeddingBatcher`
+collects the texts awaited concurrently — the chunks of one insert and of the
+other inserts `ingest_into_knowledge` runs alongside it — and sends them as one
+embeddings request once `EMBED_BATCH_MAX_INPUTS` texts or
+`EMBED_BATCH_MAX_TOKENS` estimated tokens are queued, or
+`EMBED_BATCH_LINGER_MS` after the first text arrived. The vectors are handed
+back to each waiting caller in order; a failed request fails every caller in
+it with the same error.
+
+Token counts are estimated (no tokenizer is installed) at one token per three
+characters, which overestimates German and English text, so a batch stays
+under the per-request token limit.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Awaitable, Callable, Optional
+
+from services.env import env_number
+
+logger = getLogger(__name__)
+
+DEFAULT_EMBED_BATCH_MAX_INPUTS = 64
+DEFAULT_EMBED_BATCH_MAX_TOKENS = 60_000
+DEFAULT_EMBED_BATCH_LINGER_MS = 20
+
+Embedding = list[float]
+Usage = Optional[dict]
+EmbedMany = Callable[[list[str]], Awaitable[tuple[list[Embedding], Usage]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate for batch sizing (~3 characters per token)."""
+    return len(text) // 3 + 1
+
+
+def _usage_share(usage: Usage, tokens: int, batch_tokens: int) -> Usage:
+    """A caller's share of the batch usage, proportional to its estimated tokens."""
+    if not usage:
+        return usage
+    share = tokens / batch_tokens
+    return {key: round(value * share) if isinstance(value, (int, float)) else value for key, value in usage.items()}
+
+
+@dataclass
+class _Pending:
+    text: str
+    tokens: int
+    future: asyncio.Future
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding calls into batched requests."""
+
+    def __init__(
+        self,
+        embed_many: EmbedMany,
+        max_inputs: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        linger_seconds: Optional[float] = None,
+    ):
+        self._embed_many = embed_many
+        self.max_inputs = max(
+            1, max_inputs or env_number("EMBED_BATCH_MAX_INPUTS", DEFAULT_EMBED_BATCH_MAX_INPUTS, int)
+        )
+        self.max_tokens = max(
+            1, max_tokens or env_number("EMBED_BATCH_MAX_TOKENS", DEFAULT_EMBED_BATCH_MAX_TOKENS, int)
+        )
+        if linger_seconds is None:
+            linger_seconds = env_number("EMBED_BATCH_LINGER_MS", DEFAULT_EMBED_BATCH_LINGER_MS, float) / 1000
+        self.linger_seconds = linger_seconds
+
+        self._pending: list[_Pending] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._requests: set[asyncio.Task] = set()
+
+        self.requests_sent = 0
+        self.texts_embedded = 0
+
+    async def embed(self, text: str) -> tuple[Embedding, Usage]:
+        """Embed one text as part of the next batch. Returns (embedding, usage share)."""
+        loop = asyncio.get_running_loop()
+        tokens = estimate_tokens(text)
+        # Adding this text would overflow the open batch: send that batch first.
+        if self._pending and (
+            len(self._pending) + 1 > self.max_inputs or self._pending_tokens + tokens > self.max_tokens
+        ):
+            self._flush()
+
+        future = loop.create_future()
+        self._pending.append(_Pending(text, tokens, future))
+        self._pending_tokens += tokens
+
+        if len(self._pending) >= self.max_inputs or self._pending_tokens >= self.max_tokens:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger_seconds, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._requests.add(task)
+        task.add_done_callback(self._requests.discard)
+
+    async def _send(self, batch: list[_Pending]) -> None:
+        waiting = [item for item in batch if not item.future.done()]
+        if not waiting:
+            return
+        try:
+            embeddings, usage = await self._embed_many([item.text for item in waiting])
+            if len(embeddings) != len(waiting):
+                raise ValueError(f"Embedder returned {len(embeddings)} vectors for {len(waiting)} inputs")
+        except Exception as e:
+            for item in waiting:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        except BaseException:
+            # Cancelled (shutdown): the callers must not wait forever on their futures.
+            for item in waiting:
+                if not item.future.done():
+                    item.future.cancel()
+            raise
+
+        self.requests_sent += 1
+        self.texts_embedded += len(waiting)
+        logger.debug(f"Embedded batch of {len(waiting)} texts")
+        batch_tokens = sum(item.tokens for item in waiting)
+        for item, embedding in zip(waiting, embeddings):
+            if not item.future.done():
+                item.future.set_result((embedding, _usage_share(usage, item.tokens, batch_tokens)))
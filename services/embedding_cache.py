@@ -0,0 +1,181 @@
+"""
+Persistent content-addressed embedding cache.
+
+`skip_if_exists` only skips documents whose name/path hash is already stored,
+so touching a PDF or changing one line of a scraped page re-embeds every chunk
+of it. The ingestion embedder (`knowledge_base.BatchingEmbedder`) looks each
+batch up in the ``embedding_cache`` table — keyed by (embedder id, dimensions,
+SHA-256 of the text) — and only sends the misses to Azure, then stores their
+vectors. The table is shared by every knowledge base and survives restarts.
+
+Hits refresh ``last_used_at`` in the same statement that reads them. Once more
+than `EMBEDDING_CACHE_MAX_ROWS` rows exist, the least recently used are
+evicted (checked on the first store after startup and then every
+`_EVICT_CHECK_EVERY` stored rows).
+
+The cache is an optimization only: if the table is missing or a query fails,
+it logs a warning, disables itself for the process, and every text is
+embedded as before.
+"""
+
+import os
+import threading
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Optional, Sequence
+
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from db.models.embedding_cache import EmbeddingCacheEntry
+from db.session import SessionLocal
+from services.env import env_number
+from services.excerpt_index import content_hash
+
+logger = getLogger(__name__)
+
+DEFAULT_EMBEDDING_CACHE_MAX_ROWS = 100_000
+_EVICT_CHECK_EVERY = 1_000
+
+
+class EmbeddingCache:
+    """Lookup/store of embeddings by text hash, with hit/miss counters and LRU eviction."""
+
+    def __init__(self, enabled: Optional[bool] = None, max_rows: Optional[int] = None):
+        if enabled is None:
+            enabled = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+        self.max_rows = max_rows or env_number("EMBEDDING_CACHE_MAX_ROWS", DEFAULT_EMBEDDING_CACHE_MAX_ROWS, int)
+
+        self._lock = threading.Lock()
+        self._stored_since_eviction = _EVICT_CHECK_EVERY  # check on the first store
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+
+    def _disable(self, action: str, error: Exception) -> None:
+        self.enabled = False
+        logger.warning(f"Embedding cache disabled ({action} failed, embedding without cache): {error}")
+
+    def lookup(self, embedder_id: str, dimensions: Optional[int], texts: Sequence[str]) -> dict[str, list[float]]:
+        """
+        Cached embeddings for `texts`, refreshing their `last_used_at`.
+
+        Returns:
+            {content_hash: embedding} for the texts that are cached
+        """
+        hashes = list(dict.fromkeys(content_hash(text) for text in texts))
+        if not self.enabled or not hashes:
+            return {}
+
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                update(EmbeddingCacheEntry)
+                .where(
+                    EmbeddingCacheEntry.embedder_id == embedder_id,
+                    EmbeddingCacheEntry.dimensions == (dimensions or 0),
+                    EmbeddingCacheEntry.content_hash.in_(hashes),
+                )
+                .values(last_used_at=datetime.now(timezone.utc))
+                .returning(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding)
+            ).all()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._disable("lookup", e)
+            return {}
+        finally:
+            db.close()
+
+        found = {row.content_hash: [float(value) for value in row.embedding] for row in rows}
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def store(
+        self, embedder_id: str, dimensions: Optional[int], texts: Sequence[str], embeddings: Sequence[list[float]]
+    ) -> None:
+        """Cache freshly computed embeddings (empty vectors from failed calls are skipped)."""
+        if not self.enabled:
+            return
+        rows = {
+            content_hash(text): {
+                "embedder_id": embedder_id,
+                "dimensions": dimensions or 0,
+                "content_hash": content_hash(text),
+                "embedding": list(embedding),
+            }
+            for text, embedding in zip(texts, embeddings)
+            if embedding
+        }
+        if not rows:
+            return
+
+        db = SessionLocal()
+        try:
+            stmt = pg_insert(EmbeddingCacheEntry).values(list(rows.values()))
+            db.execute(stmt.on_conflict_do_nothing())
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._disable("store", e)
+            return
+        finally:
+            db.close()
+
+        with self._lock:
+            self.stored += len(rows)
+            self._stored_since_eviction += len(rows)
+            check = self._stored_since_eviction >= _EVICT_CHECK_EVERY
+        if check:
+            self.evict()
+
+    def evict(self) -> int:
+        """Delete the least recently used rows beyond `max_rows`. Returns how many were deleted."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            self._stored_since_eviction = 0
+
+        key = tuple_(EmbeddingCacheEntry.embedder_id, EmbeddingCacheEntry.dimensions, EmbeddingCacheEntry.content_hash)
+        db = SessionLocal()
+        try:
+            total = db.execute(select(func.count()).select_from(EmbeddingCacheEntry)).scalar_one()
+            if total <= self.max_rows:
+                return 0
+            oldest = (
+                select(
+                    EmbeddingCacheEntry.embedder_id, EmbeddingCacheEntry.dimensions, EmbeddingCacheEntry.content_hash
+                )
+                .order_by(EmbeddingCacheEntry.last_used_at.asc())
+                .limit(total - self.max_rows)
+            )
+            deleted = db.execute(delete(EmbeddingCacheEntry).where(key.in_(oldest))).rowcount
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Embedding cache eviction failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+        with self._lock:
+            self.evicted += deleted
+        logger.info(f"Evicted {deleted} least recently used embeddings (cache limit {self.max_rows} rows)")
+        return deleted
+
+    def summary(self) -> str:
+        """Counters since startup, for the knowledge-loading log."""
+        looked_up = self.hits + self.misses
+        rate = f"{self.hits / looked_up:.0%}" if looked_up else "n/a"
+        state = "" if self.enabled else " (disabled)"
+        return (
+            f"{self.hits} hits, {self.misses} misses (hit rate {rate}), "
+            f"{self.stored} stored, {self.evicted} evicted{state}"
+        )
+
+
+embedding_cache = EmbeddingCache()
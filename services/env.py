@@ -0,0 +1,31 @@
+"""
+Environment settings for the services that also run outside the API.
+
+API settings (budget, pricing, CORS, the usage writer, SSE coalescing) live in
+`api.settings.ApiSettings`, a pydantic model validated once at import: it
+requires the budget variables of budgeted projects and loads the project
+config. The knowledge services (ingestion, embedding and query caches, hybrid
+search, vector indexes, crawler, DOI extraction, reconcile) are also used by
+the standalone scripts (scripts/refresh_hex_gig_rss.py,
+scripts/manage_vector_indexes.py, the benchmarks), which must run without the
+API's settings. They read their tuning knobs from the environment directly,
+through `env_number`, with module-level defaults, documented in .env.example.
+"""
+
+import os
+from logging import getLogger
+from typing import Any, Callable
+
+logger = getLogger(__name__)
+
+
+def env_number(name: str, default: Any, cast: Callable[[str], Any]) -> Any:
+    """Read a numeric setting from the environment, falling back to `default` when unset or invalid."""
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    try:
+        return cast(raw)
+    except ValueError:
+        logger.warning(f"Invalid {name}={raw!r}; using {default}")
+        return default
@@ -0,0 +1,193 @@
+"""
+Precomputed token indexes for citation excerpts.
+
+`extract_excerpt` locates query/claim keywords in every retrieved chunk. The
+SSC corpus only changes when the knowledge base is reloaded, so
+`index_knowledge_chunks` tokenizes each embedded chunk once at ingestion and
+stores a positional index ({token: [offsets]}) in the ``citation_token_index``
+side table, keyed by the SHA-256 of the chunk content. The table is held in
+memory (`excerpt_index_store`) as `TokenLookup`s, so the request path does
+one search over the chunk's distinct tokens per keyword instead of scanning
+the text; chunks without an index fall back to the scan. Indexes of chunks no
+longer in the vector table (replaced or purged by a reload) are deleted in the
+same pass, so the table and the store track the corpus.
+
+Every token of three or more characters is indexed — stopwords included.
+Keywords match as substrings (as `extract_excerpt` always has), and a keyword
+can sit inside a stopword ("cause" in "because"), so filtering stopwords here
+would change which windows are found.
+"""
+
+import hashlib
+import re
+import threading
+from bisect import bisect_right
+from logging import getLogger
+from typing import Any, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from db.models.citation_token_index import CitationTokenIndex
+from db.session import SessionLocal
+
+logger = getLogger(__name__)
+
+# Same tokenizer as the citation keywords: a keyword is a \w+ run, so every
+# occurrence of it lies inside one \w+ run of the chunk text.
+_TOKEN_RE = re.compile(r"\w+", flags=re.UNICODE)
+_MIN_TOKEN_LEN = 3
+
+TokenIndex = dict[str, list[int]]
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 hex digest of a chunk's content (the side table key)."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def build_token_index(content: str) -> TokenIndex:
+    """Offsets of every token (>= 3 chars) in `content.strip().lower()` — the text `extract_excerpt` searches."""
+    index: TokenIndex = {}
+    for match in _TOKEN_RE.finditer(content.strip().lower()):
+        token = match.group()
+        if len(token) >= _MIN_TOKEN_LEN:
+            index.setdefault(token, []).append(match.start())
+    return index
+
+
+class TokenLookup:
+    """
+    A chunk's token index, laid out for keyword lookup.
+
+    Keywords match as substrings of tokens. The distinct tokens are joined into
+    one NUL-separated vocabulary string, so `str.find` locates every token
+    containing a keyword in one pass over the vocabulary (shorter than the
+    text, as tokens repeat), and bisect over the token starts maps each hit
+    back to its token and offsets. Keywords are \\w+ runs, so a hit never spans
+    two tokens.
+    """
+
+    __slots__ = ("_vocabulary", "_starts", "_offsets")
+
+    def __init__(self, token_index: TokenIndex):
+        tokens = sorted(token_index)
+        self._vocabulary = "\0".join(tokens)
+        self._starts: list[int] = []
+        position = 0
+        for token in tokens:
+            self._starts.append(position)
+            position += len(token) + 1
+        self._offsets = [token_index[token] for token in tokens]
+
+    def occurrences(self, keywords: Any) -> list[tuple[int, str]]:
+        """Every (position, keyword) occurrence in the chunk, sorted."""
+        occurrences: list[tuple[int, str]] = []
+        vocabulary, starts, offsets = self._vocabulary, self._starts, self._offsets
+        for kw in keywords:
+            at = vocabulary.find(kw)
+            while at != -1:
+                i = bisect_right(starts, at) - 1
+                within = at - starts[i]
+                occurrences.extend((offset + within, kw) for offset in offsets[i])
+                at = vocabulary.find(kw, at + 1)
+        occurrences.sort()
+        return occurrences
+
+
+def find_indexed_occurrences(token_lookup: TokenLookup, keywords: Any) -> list[tuple[int, str]]:
+    """Every (position, keyword) occurrence, sorted, resolved from a token lookup instead of the text."""
+    return token_lookup.occurrences(keywords)
+
+
+class ExcerptIndexStore:
+    """In-memory view of ``citation_token_index``, filled at startup."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: dict[str, TokenLookup] = {}
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def get(self, content: str) -> Optional[TokenLookup]:
+        """The precomputed lookup for `content`, or None (callers scan the text)."""
+        if not self._indexes:
+            return None
+        return self._indexes.get(content_hash(content))
+
+    def update(self, indexes: dict[str, TokenIndex]) -> None:
+        lookups = {key: TokenLookup(index) for key, index in indexes.items()}
+        with self._lock:
+            self._indexes.update(lookups)
+
+    def preload(self) -> int:
+        """Replace the in-memory indexes with every stored one. Returns how many were loaded."""
+        db = SessionLocal()
+        try:
+            rows = db.execute(select(CitationTokenIndex.content_hash, CitationTokenIndex.token_index)).all()
+        finally:
+            db.close()
+        lookups = {row.content_hash: TokenLookup(row.token_index) for row in rows}
+        with self._lock:
+            self._indexes = lookups
+        logger.info(f"Loaded {len(rows)} citation token indexes")
+        return len(rows)
+
+
+excerpt_index_store = ExcerptIndexStore()
+
+
+def index_knowledge_chunks(vector_db: Any, batch_size: int = 500) -> int:
+    """
+    Index every chunk in a PgVector table that has no stored token index yet.
+
+    Reads chunk contents from the vector table, computes the missing indexes,
+    stores them, deletes the indexes of chunks no longer in the table, and
+    loads all indexes into `excerpt_index_store`. The side table serves this
+    one vector table (SSC).
+
+    Args:
+        vector_db: The knowledge base's PgVector (its `table` has a `content` column)
+        batch_size: Rows per INSERT or DELETE
+
+    Returns:
+        Number of newly indexed chunks
+    """
+    db = SessionLocal()
+    try:
+        contents = db.execute(select(vector_db.table.c.content)).scalars().all()
+        known = set(db.execute(select(CitationTokenIndex.content_hash)).scalars().all())
+
+        missing: dict[str, TokenIndex] = {}
+        current: set[str] = set()
+        for content in contents:
+            if not content:
+                continue
+            key = content_hash(content)
+            current.add(key)
+            if key not in known and key not in missing:
+                missing[key] = build_token_index(content)
+
+        rows = [{"content_hash": key, "token_index": index} for key, index in missing.items()]
+        for start in range(0, len(rows), batch_size):
+            stmt = pg_insert(CitationTokenIndex).values(rows[start : start + batch_size])
+            db.execute(stmt.on_conflict_do_nothing(index_elements=[CitationTokenIndex.content_hash]))
+        # Chunks replaced or purged by a reload leave their indexes behind.
+        stale = sorted(known - current)
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start : start + batch_size]
+            db.execute(delete(CitationTokenIndex).where(CitationTokenIndex.content_hash.in_(batch)))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    excerpt_index_store.preload()
+    logger.info(
+        f"Indexed {len(missing)} new chunks for citation excerpts, removed {len(stale)} stale indexes "
+        f"({len(contents)} chunks in table)"
+    )
+    return len(missing)
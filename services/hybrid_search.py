@@ -0,0 +1,208 @@
+"""
+Index-backed hybrid search for the knowledge vector tables.
+
+agno's `PgVector.hybrid_search` scores ``ts_rank_cd(to_tsvector(content), ...)``
+for every row with no WHERE clause, so HeX and SSC run vector-only and miss
+exact matches on names, course codes and DOIs. This module keeps both halves
+of hybrid search on an index:
+
+- a stored ``content_tsv`` column, generated from the chunk content with the
+  ``german`` text search config for ``language = 'de'`` chunks and ``english``
+  otherwise, with a GIN index (`ensure_text_search_index`);
+- lexical candidates: rows whose ``content_tsv`` matches the query (GIN index
+  scan), top `candidates` by ``ts_rank_cd``;
+- semantic candidates: top `candidates` by cosine distance (HNSW index scan);
+- reciprocal rank fusion, ``sum(1 / (rrf_k + rank))`` over both lists.
+
+`build_hybrid_search_query` returns all of it as one statement, so a search is
+a single round trip. The query text is parsed with both configs (the question
+may be in either language) and the two tsqueries are OR-ed.
+
+`knowledge_base.IndexedHybridPgVector` uses it for `SearchType.hybrid`; the
+column and GIN index are created next to the HNSW index at startup and by
+scripts/manage_vector_indexes.py.
+"""
+
+import time
+from logging import getLogger
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import and_, bindparam, func, literal_column, select, text, true, union_all
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.sql import ColumnElement, Select
+
+from services.env import env_number
+from services.vector_index import VectorIndexReport
+
+logger = getLogger(__name__)
+
+DEFAULT_HYBRID_SEARCH_CANDIDATES = 40
+DEFAULT_HYBRID_SEARCH_RRF_K = 60
+
+TEXT_SEARCH_COLUMN = "content_tsv"
+TEXT_SEARCH_CONFIGS = ("german", "english")
+# Chunk language comes from the scraper/loader metadata ("de" or "en").
+TEXT_SEARCH_EXPRESSION = (
+    "to_tsvector(CASE WHEN meta_data->>'language' = 'de' THEN 'german'::regconfig "
+    "ELSE 'english'::regconfig END, coalesce(content, ''))"
+)
+
+
+def get_hybrid_search_candidates() -> int:
+    return env_number("HYBRID_SEARCH_CANDIDATES", DEFAULT_HYBRID_SEARCH_CANDIDATES, int)
+
+
+def get_hybrid_search_rrf_k() -> int:
+    return env_number("HYBRID_SEARCH_RRF_K", DEFAULT_HYBRID_SEARCH_RRF_K, int)
+
+
+def build_hybrid_search_query(
+    table: Any,
+    query_embedding: Sequence[float],
+    query: str,
+    limit: int,
+    candidates: int,
+    rrf_k: int,
+    conditions: Sequence[ColumnElement[bool]] = (),
+) -> Select:
+    """
+    One statement: semantic and lexical candidate sets, fused by reciprocal rank.
+
+    Args:
+        table: The PgVector SQLAlchemy table
+        query_embedding: Embedding of `query`
+        query: Search text (websearch syntax: quotes, OR, -)
+        limit: Rows returned
+        candidates: Rows taken from each candidate set (at least `limit`)
+        rrf_k: RRF constant; larger values flatten the rank differences
+        conditions: Metadata filters, applied to both candidate sets
+
+    Returns:
+        Select of the table's id, name, meta_data, content, embedding and usage
+        plus ``rrf_score`` and ``similarity`` (cosine), best first
+    """
+    candidates = max(candidates, limit)
+    where = and_(true(), *conditions)
+    content_tsv = literal_column(TEXT_SEARCH_COLUMN, TSVECTOR)
+    query_text = bindparam("query", value=query)
+    tsquery = None
+    for config in TEXT_SEARCH_CONFIGS:
+        parsed = func.websearch_to_tsquery(config, query_text)
+        tsquery = parsed if tsquery is None else tsquery.op("||")(parsed)
+
+    distance = table.c.embedding.cosine_distance(query_embedding)
+    nearest = (
+        select(table.c.id, distance.label("distance")).where(where).order_by(distance).limit(candidates).subquery()
+    )
+    semantic = select(nearest.c.id, func.row_number().over(order_by=nearest.c.distance).label("rank"))
+
+    text_rank = func.ts_rank_cd(content_tsv, tsquery)
+    matching = (
+        select(table.c.id, text_rank.label("text_rank"))
+        .where(where, content_tsv.op("@@")(tsquery))
+        .order_by(text_rank.desc())
+        .limit(candidates)
+        .subquery()
+    )
+    lexical = select(matching.c.id, func.row_number().over(order_by=matching.c.text_rank.desc()).label("rank"))
+
+    ranked = union_all(semantic, lexical).subquery("ranked")
+    fused = (
+        select(ranked.c.id, func.sum(1.0 / (rrf_k + ranked.c.rank)).label("rrf_score"))
+        .group_by(ranked.c.id)
+        .subquery("fused")
+    )
+    return (
+        select(
+            table.c.id,
+            table.c.name,
+            table.c.meta_data,
+            table.c.content,
+            table.c.embedding,
+            table.c.usage,
+            fused.c.rrf_score,
+            (1 - distance).label("similarity"),
+        )
+        .join(fused, fused.c.id == table.c.id)
+        .order_by(fused.c.rrf_score.desc(), table.c.id)
+        .limit(limit)
+    )
+
+
+def text_search_column_exists(conn, schema: str, table: str) -> bool:
+    """Whether the ``content_tsv`` column exists on `schema`.`table` (`conn`: a connection or session)."""
+    return (
+        conn.execute(
+            text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_schema = :schema AND table_name = :table AND column_name = :column"
+            ),
+            {"schema": schema, "table": table, "column": TEXT_SEARCH_COLUMN},
+        ).first()
+        is not None
+    )
+
+
+def _index_valid(conn, schema: str, name: str) -> Optional[bool]:
+    """True/False for a valid/invalid index, None when there is none."""
+    return conn.execute(
+        text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = :schema AND c.relname = :name"
+        ),
+        {"schema": schema, "name": name},
+    ).scalar()
+
+
+def ensure_text_search_index(vector_db: Any, dry_run: bool = False) -> VectorIndexReport:
+    """
+    Add the generated ``content_tsv`` column and its GIN index to a PgVector table if missing.
+
+    Adding the column rewrites the table under an exclusive lock (seconds at
+    the current corpus sizes); the index is built CONCURRENTLY.
+
+    Returns:
+        VectorIndexReport for the GIN index
+    """
+    schema, table = vector_db.schema, vector_db.table_name
+    name = f"{table}_{TEXT_SEARCH_COLUMN}_index"
+    qualified = f'"{schema}"."{table}"'
+
+    with vector_db.db_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        rows = conn.execute(text(f"SELECT count(*) FROM {qualified}")).scalar_one()
+        has_column = text_search_column_exists(conn, schema, table)
+        valid = _index_valid(conn, schema, name)
+        if has_column and valid:
+            size = conn.execute(text("SELECT pg_relation_size(to_regclass(:name))"), {"name": f"{schema}.{name}"})
+            return VectorIndexReport(f"{schema}.{table}", name, "ok", "", rows, size.scalar() or 0)
+
+        reason = "missing column" if not has_column else ("invalid" if valid is False else "missing")
+        if dry_run:
+            return VectorIndexReport(f"{schema}.{table}", name, "planned", reason, rows)
+
+        lock_key = f"vector_index:{schema}.{table}"
+        if not conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": lock_key}).scalar_one():
+            return VectorIndexReport(
+                f"{schema}.{table}", name, "skipped", f"{reason}; another process holds the build lock", rows
+            )
+        try:
+            logger.info(f"Building text search index {name} on {schema}.{table} ({reason}, {rows} rows)")
+            started = time.monotonic()
+            if not has_column:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {qualified} ADD COLUMN IF NOT EXISTS {TEXT_SEARCH_COLUMN} tsvector "
+                        f"GENERATED ALWAYS AS ({TEXT_SEARCH_EXPRESSION}) STORED"
+                    )
+                )
+            conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{schema}"."{name}"'))
+            conn.execute(text(f'CREATE INDEX CONCURRENTLY "{name}" ON {qualified} USING gin ({TEXT_SEARCH_COLUMN})'))
+            build_seconds = time.monotonic() - started
+            size = conn.execute(text("SELECT pg_relation_size(to_regclass(:name))"), {"name": f"{schema}.{name}"})
+            size_bytes = size.scalar() or 0
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": lock_key})
+
+    report = VectorIndexReport(f"{schema}.{table}", name, "created", reason, rows, size_bytes, build_seconds)
+    logger.info(report.summary())
+    return report
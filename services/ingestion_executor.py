@@ -0,0 +1,168 @@
+"""
+Bounded-concurrency knowledge ingestion.
+
+Startup ingestion used to await `knowledge.ainsert` one document at a time, so
+a cold load scaled with corpus size times the embedding round-trip.
+`ingest_into_knowledge` runs the inserts concurrently, at most
+`INGEST_CONCURRENCY` at a time (an asyncio.Semaphore), and reports progress as
+items finish.
+
+Rate limits: agno's `Knowledge.ainsert` never raises for a failed embedding —
+PgVector logs the error and stores the chunk without a vector. The ingestion
+embedder (`knowledge_base.get_azure_embedder`) therefore reports every 429 via
+`note_rate_limit`, which records it against the item being inserted (a
+ContextVar, so concurrent items do not see each other's errors). A
+rate-limited item is re-inserted with exponential backoff, replacing whatever
+the failed attempt stored, up to `INGEST_MAX_RETRIES` times.
+
+Settings are read from the environment (`services.env`), so the standalone
+refresh jobs can use this module without the API's budget settings.
+"""
+
+import asyncio
+import random
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Any, Callable, Optional
+
+from services.env import env_number
+
+logger = getLogger(__name__)
+
+DEFAULT_INGEST_CONCURRENCY = 4
+DEFAULT_INGEST_MAX_RETRIES = 4
+DEFAULT_INGEST_RETRY_BASE_SECONDS = 2.0  # doubles each retry: 2s, 4s, 8s, 16s (plus jitter)
+
+# ainsert() keyword arguments an ingestion item may carry.
+_INSERT_KEYS = ("name", "path", "text_content", "reader", "metadata")
+
+_rate_limits: ContextVar[Optional[list[BaseException]]] = ContextVar("ingestion_rate_limits", default=None)
+
+ProgressCallback = Callable[[int, int, dict], None]
+
+
+def get_ingest_concurrency() -> int:
+    """Concurrent inserts per ingestion run (`INGEST_CONCURRENCY`, at least 1)."""
+    return max(1, env_number("INGEST_CONCURRENCY", DEFAULT_INGEST_CONCURRENCY, int))
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for an HTTP 429 from the embedding API (openai.RateLimitError or an httpx status error)."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429
+
+
+def note_rate_limit(error: BaseException) -> None:
+    """Record a 429 against the ingestion item currently being inserted (no-op outside ingestion)."""
+    seen = _rate_limits.get()
+    if seen is not None:
+        seen.append(error)
+
+
+@dataclass
+class IngestionReport:
+    """Outcome of one `ingest_into_knowledge` run."""
+
+    label: str
+    total: int
+    inserted: int = 0
+    retries: int = 0
+    rate_limited: list[str] = field(default_factory=list)
+
+
+def _log_progress(done: int, total: int, item: dict) -> None:
+    logger.info(f"[{done}/{total}] Embedded: {item.get('name')}")
+
+
+async def ingest_into_knowledge(
+    knowledge: Any,
+    items: list[dict],
+    label: str = "documents",
+    concurrency: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    retry_base_seconds: Optional[float] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> IngestionReport:
+    """
+    Insert `items` into `knowledge` concurrently, retrying items that hit embedder rate limits.
+
+    Args:
+        knowledge: The agno Knowledge to insert into
+        items: Dicts of `ainsert` arguments (name, metadata and text_content or path, optional reader)
+        label: What the items are, for log messages
+        concurrency: Inserts in flight at once (default: `INGEST_CONCURRENCY`)
+        max_retries: Re-inserts of a rate-limited item (default: `INGEST_MAX_RETRIES`)
+        retry_base_seconds: First backoff delay, doubled per retry (default: `INGEST_RETRY_BASE_SECONDS`)
+        on_progress: Called with (done, total, item) as each item finishes
+
+    Returns:
+        IngestionReport; items still rate limited after the last retry are listed, not raised
+
+    Raises:
+        The first non-rate-limit error an insert raises; the remaining inserts are cancelled
+    """
+    if concurrency is None:
+        concurrency = get_ingest_concurrency()
+    if max_retries is None:
+        max_retries = max(0, env_number("INGEST_MAX_RETRIES", DEFAULT_INGEST_MAX_RETRIES, int))
+    if retry_base_seconds is None:
+        retry_base_seconds = env_number("INGEST_RETRY_BASE_SECONDS", DEFAULT_INGEST_RETRY_BASE_SECONDS, float)
+    progress = on_progress or _log_progress
+
+    report = IngestionReport(label=label, total=len(items))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    done = 0
+
+    async def ingest_one(item: dict) -> None:
+        nonlocal done
+        kwargs = {key: item[key] for key in _INSERT_KEYS if key in item}
+        async with semaphore:
+            for attempt in range(max_retries + 1):
+                seen: list[BaseException] = []
+                token = _rate_limits.set(seen)
+                try:
+                    # A retry must replace the chunks the rate-limited attempt stored, not skip them.
+                    await knowledge.ainsert(**kwargs, skip_if_exists=attempt == 0, upsert=True)
+                except Exception as e:
+                    if not is_rate_limit_error(e):
+                        raise
+                    seen.append(e)
+                finally:
+                    _rate_limits.reset(token)
+
+                if not seen:
+                    report.inserted += 1
+                    break
+                if attempt == max_retries:
+                    report.rate_limited.append(item.get("name", "?"))
+                    logger.warning(f"{label}: still rate limited after {max_retries} retries: {item.get('name')}")
+                    break
+                delay = retry_base_seconds * (2**attempt) * (1 + random.random() * 0.25)
+                report.retries += 1
+                logger.warning(
+                    f"{label}: embedder rate limited ({item.get('name')}), "
+                    f"retry {attempt + 1}/{max_retries} in {delay:.1f}s"
+                )
+                # Back off while holding the slot, so a throttled embedder sees fewer concurrent requests.
+                await asyncio.sleep(delay)
+
+        done += 1
+        progress(done, report.total, item)
+
+    tasks = [asyncio.create_task(ingest_one(item)) for item in items]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    logger.info(
+        f"Ingested {report.inserted}/{report.total} {label} "
+        f"(concurrency {concurrency}, {report.retries} rate-limit retries)"
+    )
+    return report
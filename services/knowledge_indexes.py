@@ -0,0 +1,200 @@
+"""
+Metadata filter indexes for the knowledge vector tables, and the index setup entry point.
+
+HeX and SSC run with `enable_agentic_knowledge_filters=True`: the model passes
+filters such as ``{"source_type": "member_profile", "faculty_affiliation":
+"..."}``, which PgVector turns into ``meta_data @> '{...}'`` (dict filters) or
+``meta_data->>'key' = '...'`` (filter expressions). Without an index these
+either scan the table or post-filter the HNSW results — dropping recall when
+few rows match. Each project declares its filterable keys
+(`MetadataFilterIndexes`, on `IndexedHybridPgVector.filter_indexes`), and
+`ensure_metadata_indexes` creates, CONCURRENTLY and only when missing or
+invalid:
+
+- one GIN ``jsonb_path_ops`` index on ``meta_data`` (serves ``@>`` for any key);
+- a btree expression index on ``(meta_data->>'key')`` per declared key;
+- a partial HNSW index per declared selective filter
+  (``WHERE meta_data @> '{"source_type": "member_profile"}'``), so a
+  filtered ANN search walks a graph of only the matching rows.
+
+The planner only uses a partial index when the query repeats its predicate,
+so `IndexedHybridPgVector` splits dict filters into one ``@>`` per key.
+
+`ensure_knowledge_indexes` runs every index check for a table (HNSW, text
+search, metadata); it is what startup and scripts/manage_vector_indexes.py call.
+"""
+
+import json
+import re
+import time
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Any, Optional
+
+from sqlalchemy import text
+
+from services.hybrid_search import ensure_text_search_index
+from services.vector_index import (
+    HnswSettings,
+    VectorIndexReport,
+    distance_opclass,
+    ensure_vector_index,
+    get_hnsw_settings,
+    hnsw_index_ddl,
+    set_maintenance_work_mem,
+)
+
+logger = getLogger(__name__)
+
+_IDENTIFIER_RE = re.compile(r"[^a-z0-9_]+")
+_MAX_IDENTIFIER_LENGTH = 63  # Postgres NAMEDATALEN - 1
+
+
+@dataclass(frozen=True)
+class MetadataFilterIndexes:
+    """Metadata keys a project's agent filters on, and the filters selective enough for a partial HNSW index."""
+
+    keys: tuple[str, ...] = ()
+    selective_filters: tuple[tuple[str, str], ...] = ()
+
+
+def _identifier(*parts: str) -> str:
+    name = _IDENTIFIER_RE.sub("_", "_".join(parts).lower()).strip("_")
+    return name[:_MAX_IDENTIFIER_LENGTH]
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def containment_predicate(key: str, value: str) -> str:
+    """``meta_data @> '{"key": "value"}'::jsonb`` — the form PgVector renders for a one-key dict filter."""
+    return f"meta_data @> {_sql_literal(json.dumps({key: value}))}::jsonb"
+
+
+def metadata_index_definitions(vector_db: Any, spec: MetadataFilterIndexes, settings: HnswSettings) -> dict[str, str]:
+    """{index name: CREATE INDEX CONCURRENTLY statement} for a table's declared filters."""
+    schema, table = vector_db.schema, vector_db.table_name
+    qualified = f'"{schema}"."{table}"'
+    definitions = {}
+    if spec.keys or spec.selective_filters:
+        name = _identifier(table, "meta_data_gin_index")
+        definitions[name] = f'CREATE INDEX CONCURRENTLY "{name}" ON {qualified} USING gin (meta_data jsonb_path_ops)'
+    for key in spec.keys:
+        name = _identifier(table, "meta", key, "index")
+        definitions[name] = f'CREATE INDEX CONCURRENTLY "{name}" ON {qualified} ((meta_data->>{_sql_literal(key)}))'
+    for key, value in spec.selective_filters:
+        name = _identifier(table, "hnsw", key, value, "index")
+        definitions[name] = hnsw_index_ddl(
+            schema, table, name, distance_opclass(vector_db), settings, where=containment_predicate(key, value)
+        )
+    return definitions
+
+
+def _index_validity(conn, schema: str) -> dict[str, bool]:
+    rows = conn.execute(
+        text(
+            "SELECT c.relname, i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = :schema"
+        ),
+        {"schema": schema},
+    ).all()
+    return {name: valid for name, valid in rows}
+
+
+def ensure_metadata_indexes(
+    vector_db: Any,
+    spec: MetadataFilterIndexes,
+    settings: Optional[HnswSettings] = None,
+    dry_run: bool = False,
+) -> list[VectorIndexReport]:
+    """
+    Create the declared metadata filter indexes of a PgVector table that are missing or invalid.
+
+    Returns:
+        One VectorIndexReport per declared index
+    """
+    settings = settings or get_hnsw_settings()
+    schema, table = vector_db.schema, vector_db.table_name
+    definitions = metadata_index_definitions(vector_db, spec, settings)
+    if not definitions:
+        return []
+
+    reports = []
+    with vector_db.db_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        rows = conn.execute(text(f'SELECT count(*) FROM "{schema}"."{table}"')).scalar_one()
+        existing = _index_validity(conn, schema)
+        pending = {}
+        for name, ddl in definitions.items():
+            if existing.get(name):
+                reports.append(VectorIndexReport(f"{schema}.{table}", name, "ok", "", rows))
+            else:
+                pending[name] = ("invalid" if name in existing else "missing", ddl)
+        if not pending:
+            return reports
+        if dry_run:
+            return reports + [
+                VectorIndexReport(f"{schema}.{table}", name, "planned", reason, rows)
+                for name, (reason, _) in pending.items()
+            ]
+
+        lock_key = f"vector_index:{schema}.{table}"
+        if not conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": lock_key}).scalar_one():
+            return reports + [
+                VectorIndexReport(
+                    f"{schema}.{table}", name, "skipped", f"{reason}; another process holds the build lock", rows
+                )
+                for name, (reason, _) in pending.items()
+            ]
+        try:
+            set_maintenance_work_mem(conn, settings)
+            for name, (reason, ddl) in pending.items():
+                logger.info(f"Building metadata index {name} on {schema}.{table} ({reason})")
+                started = time.monotonic()
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{schema}"."{name}"'))
+                conn.execute(text(ddl))
+                size = conn.execute(text("SELECT pg_relation_size(to_regclass(:name))"), {"name": f"{schema}.{name}"})
+                report = VectorIndexReport(
+                    f"{schema}.{table}", name, "created", reason, rows, size.scalar() or 0, time.monotonic() - started
+                )
+                logger.info(report.summary())
+                reports.append(report)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": lock_key})
+    return reports
+
+
+def ensure_knowledge_indexes(
+    vector_db: Any,
+    settings: Optional[HnswSettings] = None,
+    force_rebuild: bool = False,
+    dry_run: bool = False,
+) -> list[VectorIndexReport]:
+    """
+    Every index check for a knowledge table: HNSW, text search, and its declared metadata filters.
+
+    A failing check is reported (action "failed") instead of skipping the rest.
+    """
+    settings = settings or get_hnsw_settings()
+    checks = [
+        (
+            f"{vector_db.table_name}_hnsw_index",
+            lambda: [ensure_vector_index(vector_db, settings=settings, force_rebuild=force_rebuild, dry_run=dry_run)],
+        ),
+        ("text search index", lambda: [ensure_text_search_index(vector_db, dry_run=dry_run)]),
+    ]
+    spec = getattr(vector_db, "filter_indexes", None)
+    if spec is not None:
+        checks.append(
+            ("metadata indexes", lambda: ensure_metadata_indexes(vector_db, spec, settings=settings, dry_run=dry_run))
+        )
+
+    table = f"{vector_db.schema}.{vector_db.table_name}"
+    reports = []
+    for label, check in checks:
+        try:
+            reports.extend(check())
+        except Exception as e:
+            logger.warning(f"Index check ({label}) on {table} failed: {e}")
+            reports.append(VectorIndexReport(table, label, "failed", str(e), 0))
+    return reports
@@ -0,0 +1,298 @@
+"""
+Incremental knowledge loads: replace changed documents, purge removed ones.
+
+Every loader inserted with `skip_if_exists`, and agno's content hash covers a
+document's name and path, not its text. An edited member profile, RSS item
+or SSC page therefore kept its stale vectors, and documents that disappeared
+upstream (departed members, deleted RSS items) stayed in the tables forever.
+
+`reconcile_knowledge` runs before ingestion. It compares the desired
+documents with the rows of the knowledge base's contents DB:
+
+- each item gets a `document_hash` in its metadata (SHA-256 of its metadata
+  and text or file bytes), which the contents DB stores with the row;
+- items are matched to rows by name and hash (HeX papers share one name per
+  member, so names alone are not unique). Unmatched rows are stale: the rows
+  and their vectors are deleted. Matched items need no ingestion;
+- vectors whose content id has no contents row (left behind by earlier
+  deletions) are deleted as well;
+- only new and changed items are returned for `ingest_into_knowledge`,
+  with a `ReconcileReport` of what was added, changed and removed.
+
+Items still rate limited after ingestion are passed to `forget_documents`,
+so the next reconcile replaces them instead of matching their hash;
+`incomplete_documents` finds the items whose insert failed.
+
+An empty desired set (the items plus the rows `retain` keeps), or one that
+would remove more than RECONCILE_MAX_REMOVED_FRACTION of the rows in scope
+(default 0.5), is treated as a broken upstream (an empty share listing, an
+unparsable feed): changed documents are still replaced, but nothing is removed.
+
+Loaders hold `aknowledge_load_lock` (a Postgres advisory lock per vector
+table) from reconcile to the end of ingestion, so a concurrent load (a second
+worker, the RSS refresh job) cannot insert between the contents snapshot and
+the orphan sweep, which would delete its fresh vectors.
+
+`scope` limits the comparison to rows and vectors whose metadata contains
+it (e.g. {"source_type": "news_article"}), for loaders that share a
+knowledge base. `retain` keeps rows that are still current but not in the
+desired set (SSC pages that answered 304 Not Modified are not re-fetched).
+
+The calls are synchronous (agno's PostgresDb and PgVector); run them with
+asyncio.to_thread from async loaders.
+"""
+
+import asyncio
+import hashlib
+import json
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+from sqlalchemy import select, text
+
+from services.atomic_download import DOWNLOAD_CHUNK_BYTES
+from services.env import env_number
+
+logger = getLogger(__name__)
+
+DOCUMENT_HASH_KEY = "document_hash"
+DEFAULT_RECONCILE_MAX_REMOVED_FRACTION = 0.5
+
+
+@dataclass
+class ReconcileReport:
+    """Diff between the desired documents and the knowledge base."""
+
+    label: str
+    added: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: int = 0
+    orphaned_vectors: int = 0  # content ids whose vectors had no contents row
+    held_back: list[str] = field(default_factory=list)  # removals refused by the safety limit
+
+    def summary(self) -> str:
+        summary = (
+            f"{self.label}: {len(self.added)} added, {len(self.changed)} changed, "
+            f"{len(self.removed)} removed, {self.unchanged} unchanged"
+        )
+        if self.orphaned_vectors:
+            summary += f", {self.orphaned_vectors} orphaned vector groups deleted"
+        if self.held_back:
+            summary += f", {len(self.held_back)} removals held back"
+        return summary
+
+
+def document_hash(item: dict) -> str:
+    """SHA-256 of an ingestion item's metadata and text (or file bytes)."""
+    digest = hashlib.sha256()
+    metadata = {key: value for key, value in (item.get("metadata") or {}).items() if key != DOCUMENT_HASH_KEY}
+    digest.update(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+    if "text_content" in item:
+        digest.update(item["text_content"].encode("utf-8"))
+    elif "path" in item:
+        with Path(item["path"]).open("rb") as fh:
+            for chunk in iter(lambda: fh.read(DOWNLOAD_CHUNK_BYTES), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _in_scope(metadata: Optional[dict], scope: Optional[dict]) -> bool:
+    metadata = metadata or {}
+    return all(metadata.get(key) == value for key, value in (scope or {}).items())
+
+
+def _orphaned_content_ids(vector_db: Any, known_ids: set[str], scope: Optional[dict]) -> dict[str, dict]:
+    """{content_id: meta_data} of vectors (in scope) whose content id has no contents row."""
+    table = vector_db.table
+    stmt = select(table.c.content_id, table.c.meta_data).where(table.c.content_id.isnot(None))
+    if known_ids:
+        stmt = stmt.where(table.c.content_id.notin_(sorted(known_ids)))
+    if scope:
+        stmt = stmt.where(table.c.meta_data.contains(scope))
+    with vector_db.Session() as sess:
+        rows = sess.execute(stmt).all()
+    return {row.content_id: row.meta_data or {} for row in rows}
+
+
+def reconcile_knowledge(
+    knowledge: Any,
+    items: list[dict],
+    label: str = "documents",
+    scope: Optional[dict] = None,
+    retain: Optional[Callable[[dict], bool]] = None,
+    max_removed_fraction: Optional[float] = None,
+) -> tuple[list[dict], ReconcileReport]:
+    """
+    Delete stale documents from `knowledge` and return the items that still need ingesting.
+
+    Args:
+        knowledge: The agno Knowledge (with a contents DB and a PgVector vector DB)
+        items: Desired documents (ingestion items: name, metadata and text_content or path)
+        label: Name of the items in the report
+        scope: Metadata the compared rows and vectors must contain (default: the whole knowledge base)
+        retain: Keeps a row missing from `items` when it returns True for the row's metadata
+        max_removed_fraction: Largest share of the rows in scope removed at once
+            (default: `RECONCILE_MAX_REMOVED_FRACTION`); nothing is removed when neither
+            `items` nor `retain` keeps any row
+
+    Returns:
+        (new and changed items, each with `document_hash` in its metadata; the diff report)
+    """
+    desired = []
+    for item in items:
+        metadata = {**(item.get("metadata") or {})}
+        metadata[DOCUMENT_HASH_KEY] = document_hash(item)
+        desired.append({**item, "metadata": metadata})
+
+    if max_removed_fraction is None:
+        max_removed_fraction = env_number(
+            "RECONCILE_MAX_REMOVED_FRACTION", DEFAULT_RECONCILE_MAX_REMOVED_FRACTION, float
+        )
+
+    report = ReconcileReport(label=label)
+    contents_db = getattr(knowledge, "contents_db", None)
+    if contents_db is None:
+        report.added = [item.get("name", "?") for item in desired]
+        return desired, report
+
+    rows, _ = contents_db.get_knowledge_contents()
+    known_ids = {row.id for row in rows}
+    # Rows still to be matched, by (name, document hash); a failed insert never matches.
+    unmatched: dict[tuple[str, Optional[str]], list[Any]] = {}
+    rows_in_scope = 0
+    for row in rows:
+        if _in_scope(row.metadata, scope):
+            rows_in_scope += 1
+            row_hash = None if row.status == "failed" else (row.metadata or {}).get(DOCUMENT_HASH_KEY)
+            unmatched.setdefault((row.name, row_hash), []).append(row)
+
+    to_ingest = []
+    for item in desired:
+        matches = unmatched.get((item.get("name"), item["metadata"][DOCUMENT_HASH_KEY]))
+        if matches:
+            matches.pop()
+            report.unchanged += 1
+        else:
+            to_ingest.append(item)
+
+    stale = [row for group in unmatched.values() for row in group]
+    stale_names = {row.name for row in stale}
+    for item in to_ingest:
+        (report.changed if item.get("name") in stale_names else report.added).append(item.get("name", "?"))
+    ingested_names = {item.get("name") for item in to_ingest}
+
+    replaced = [row for row in stale if row.name in ingested_names]
+    removals = [
+        row
+        for row in stale
+        if row.name not in ingested_names and not (retain is not None and retain(row.metadata or {}))
+    ]
+    retained = len(stale) - len(replaced) - len(removals)
+    report.unchanged += retained
+    # Incremental loaders pass only new and changed items; the rows they retain are desired too.
+    desired_count = len(items) + retained
+    if removals and (not desired_count or len(removals) > max_removed_fraction * rows_in_scope):
+        # An empty or mostly empty desired set is more likely a broken upstream than deletions.
+        report.held_back = [row.name for row in removals]
+        logger.warning(
+            f"{label}: not removing {len(removals)} of {rows_in_scope} documents "
+            f"({desired_count} desired, limit {max_removed_fraction:.0%})"
+        )
+        removals = []
+
+    vector_db = knowledge.vector_db
+    for row in replaced + removals:
+        vector_db.delete_by_content_id(row.id)
+        contents_db.delete_knowledge_content(row.id)
+        known_ids.discard(row.id)
+    report.removed = [row.name for row in removals]
+
+    if not report.held_back:
+        for content_id, meta_data in _orphaned_content_ids(vector_db, known_ids, scope).items():
+            if retain is not None and retain(meta_data):
+                continue
+            vector_db.delete_by_content_id(content_id)
+            report.orphaned_vectors += 1
+
+    logger.info(f"Reconciled {report.summary()}")
+    return to_ingest, report
+
+
+@asynccontextmanager
+async def aknowledge_load_lock(knowledge: Any) -> AsyncIterator[None]:
+    """
+    Hold a Postgres advisory lock on the knowledge base's vector table, from reconcile to the end of ingestion.
+
+    Waits while another process (API worker, RSS refresh job) loads into the same table.
+    """
+    vector_db = knowledge.vector_db
+    lock_key = f"knowledge_load:{vector_db.schema}.{vector_db.table_name}"
+
+    def acquire() -> Any:
+        conn = vector_db.db_engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            conn.execute(text("SELECT pg_advisory_lock(hashtext(:key))"), {"key": lock_key})
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def release(conn: Any) -> None:
+        try:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": lock_key})
+        finally:
+            conn.close()
+
+    conn = await asyncio.to_thread(acquire)
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(release, conn)
+
+
+def forget_documents(knowledge: Any, names: Iterable[str]) -> int:
+    """
+    Drop the document hash of the rows named `names`, so the next reconcile replaces them.
+
+    For items still rate limited after ingestion: their rows already carry the
+    new hash, but some chunks were stored without a vector.
+
+    Returns:
+        Number of rows updated
+    """
+    names = set(names)
+    contents_db = getattr(knowledge, "contents_db", None)
+    if not names or contents_db is None:
+        return 0
+    rows, _ = contents_db.get_knowledge_contents()
+    forgotten = 0
+    for row in rows:
+        if row.name in names and DOCUMENT_HASH_KEY in (row.metadata or {}):
+            row.metadata = {key: value for key, value in row.metadata.items() if key != DOCUMENT_HASH_KEY}
+            contents_db.upsert_knowledge_content(row)
+            forgotten += 1
+    return forgotten
+
+
+def incomplete_documents(knowledge: Any, items: list[dict]) -> list[str]:
+    """
+    Names of ingested `items` without a completed contents row.
+
+    agno's ainsert logs a failed insert instead of raising: the row is left
+    ``failed`` (or missing), and `ingest_into_knowledge` reports nothing.
+    `items` are the ones `reconcile_knowledge` returned (with their document hash).
+    """
+    contents_db = getattr(knowledge, "contents_db", None)
+    if not items or contents_db is None:
+        return []
+    rows, _ = contents_db.get_knowledge_contents()
+    completed = {(row.name, (row.metadata or {}).get(DOCUMENT_HASH_KEY)) for row in rows if row.status == "completed"}
+    return [
+        item.get("name", "?")
+        for item in items
+        if (item.get("name"), (item.get("metadata") or {}).get(DOCUMENT_HASH_KEY)) not in completed
+    ]
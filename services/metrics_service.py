@@ -3,14 +3,18 @@ Metrics service for recording anonymous agent usage metrics.
 
 Records per-request operational data (tokens, latency, cost, status) without
 any message content or user identity. Designed for aggregate reporting.
+While the app is running, rows go through the background usage writer so the
+commit never runs on the event loop.
 """
 
+from datetime import datetime, timezone
 from logging import getLogger
 from typing import Optional
 
 from db.models.usage_metrics import AgentUsageMetrics
 from db.session import SessionLocal
 from services.budget_service import calculate_cost_eur, get_today_vienna
+from services.usage_writer import usage_writer
 
 logger = getLogger(__name__)
 
@@ -42,7 +46,7 @@ def record_agent_metrics(
         duration_seconds: Total run duration in seconds
         time_to_first_token: Latency until first token generated
         cost_eur: Pre-calculated cost in EUR (if None, calculated from tokens)
-        response_status: One of: "success", "error", "budget_exceeded"
+        response_status: One of: "success", "error", "budget_exceeded", "cache_hit"
     """
     try:
         today = get_today_vienna()
@@ -53,18 +57,28 @@ def record_agent_metrics(
         if total_tokens == 0 and (input_tokens > 0 or output_tokens > 0):
             total_tokens = input_tokens + output_tokens
 
-        metrics = AgentUsageMetrics(
-            date=today,
-            anonymous_session_id=session_id,
-            anonymous_user_id=user_id,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
-            total_tokens=total_tokens,
-            duration_seconds=duration_seconds,
-            time_to_first_token=time_to_first_token,
-            cost_eur=cost_eur,
-            response_status=response_status,
-        )
+        values = {
+            "date": today,
+            "anonymous_session_id": session_id,
+            "anonymous_user_id": user_id,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": total_tokens,
+            "duration_seconds": duration_seconds,
+            "time_to_first_token": time_to_first_token,
+            "cost_eur": cost_eur,
+            "response_status": response_status,
+            "created_at": datetime.now(timezone.utc),
+        }
+        if usage_writer.submit_metrics(values):
+            logger.info(
+                f"Queued metrics: tokens={total_tokens}, "
+                f"duration={duration_seconds}s, cost={cost_eur:.6f}€, "
+                f"status={response_status}"
+            )
+            return
+
+        metrics = AgentUsageMetrics(**values)
 
         db = SessionLocal()
         try:
@@ -1,14 +1,47 @@
 """Async WebDAV client for Nextcloud public folder shares."""
 
+import asyncio
+import importlib.util
+import logging
 import xml.etree.ElementTree as ET
+from dataclasses import dataclass
 from pathlib import Path
-from urllib.parse import quote, unquote
+from typing import Optional
+from urllib.parse import quote, unquote, urlparse
 
 import httpx
 
+from services.atomic_download import DOWNLOAD_CHUNK_BYTES, awrite_chunks, expected_length
+
+logger = logging.getLogger(__name__)
+
 DAV_NS = "DAV:"
 _NS = {"d": DAV_NS}
 
+DEFAULT_MAX_CONNECTIONS = 8
+_PROPFIND_TIMEOUT_S = 30.0
+_DOWNLOAD_TIMEOUT_S = 120.0
+
+# Properties `list_tree` asks for (change detection needs etag, mtime and size).
+_TREE_PROPFIND_BODY = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:propfind xmlns:d="DAV:"><d:prop>'
+    "<d:resourcetype/><d:getetag/><d:getlastmodified/><d:getcontentlength/>"
+    "</d:prop></d:propfind>"
+)
+# Status codes of servers that refuse `Depth: infinity` outright.
+_DEPTH_INFINITY_REFUSED = {400, 403, 501}
+
+
+@dataclass(frozen=True)
+class RemoteFile:
+    """A file in the share, with the properties used to detect changes."""
+
+    path: str  # relative to the share root, e.g. "Member Name/paper.pdf"
+    etag: str = ""
+    last_modified: str = ""
+    size: Optional[int] = None
+
 
 class NextcloudClient:
     """WebDAV client for accessing files in a Nextcloud public folder share.
@@ -16,92 +49,163 @@ class NextcloudClient:
     Uses the public WebDAV endpoint (no personal credentials needed):
         https://<host>/public.php/webdav/
     Auth: Basic Auth with share_token as username, share_password as password.
+
+    All requests go through one pooled `httpx.AsyncClient` (HTTP/2 when the
+    `h2` package is installed), created on first use, so connections and TLS
+    sessions are reused across PROPFINDs and downloads. Close it with
+    `aclose()` or use the client as an async context manager.
     """
 
-    def __init__(self, webdav_public_url: str, share_token: str, share_password: str = ""):
+    def __init__(
+        self,
+        webdav_public_url: str,
+        share_token: str,
+        share_password: str = "",
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    ):
         self._base_url = webdav_public_url.rstrip("/")
         self._auth = httpx.BasicAuth(share_token, share_password)
+        self._max_connections = max(1, max_connections)
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "NextcloudClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the pooled connections (a later request opens a new pool)."""
+        if self._http is not None:
+            http, self._http = self._http, None
+            await http.aclose()
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                auth=self._auth,
+                timeout=_DOWNLOAD_TIMEOUT_S,
+                follow_redirects=True,
+                # HTTP/2 multiplexes the concurrent requests over few connections;
+                # without h2 httpx falls back to a pool of HTTP/1.1 connections.
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=self._max_connections, max_keepalive_connections=self._max_connections
+                ),
+            )
+        return self._http
+
+    async def list_tree(self, path: str = "/") -> list[RemoteFile]:
+        """List every file below `path` with its etag, last-modified date and size.
+
+        Sends one ``Depth: infinity`` PROPFIND. Servers that refuse it, or that
+        silently answer with depth 1 (SabreDAV's default when infinite depth is
+        disabled), are walked folder by folder with depth-1 PROPFINDs instead.
+        """
+        root = path.strip("/")
+        try:
+            entries = self._parse_tree(await self._propfind(path, "infinity", _TREE_PROPFIND_BODY))
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code not in _DEPTH_INFINITY_REFUSED:
+                raise
+            logger.info("PROPFIND Depth: infinity refused (%d), listing folder by folder", exc.response.status_code)
+            return await self._walk_tree([root])
+
+        folders = [entry for entry, is_folder in entries if is_folder and entry.path != root]
+        deepest = max((_depth(entry.path, root) for entry, _ in entries), default=0)
+        if folders and deepest < 2:
+            # Only direct children came back: no way to tell an empty folder
+            # from a server that ignored the depth, so list the folders.
+            files = [entry for entry, is_folder in entries if not is_folder]
+            return files + await self._walk_tree([folder.path for folder in folders])
+        return [entry for entry, is_folder in entries if not is_folder]
+
+    async def _walk_tree(self, folders: list[str]) -> list[RemoteFile]:
+        """Depth-1 PROPFIND per folder, one tree level at a time (concurrently within a level)."""
+        files: list[RemoteFile] = []
+        while folders:
+            listings = await asyncio.gather(
+                *(self._propfind(f"/{folder}", "1", _TREE_PROPFIND_BODY) for folder in folders)
+            )
+            next_level = []
+            for folder, xml_body in zip(folders, listings):
+                for entry, is_folder in self._parse_tree(xml_body):
+                    if entry.path == folder:
+                        continue
+                    if is_folder:
+                        next_level.append(entry.path)
+                    else:
+                        files.append(entry)
+            folders = next_level
+        return files
 
-    async def list_folders(self, path: str = "/") -> list[str]:
-        """List sub-folder names at the given path via PROPFIND depth=1."""
-        xml_body = await self._propfind(path)
-        root = ET.fromstring(xml_body)
-
-        folders: list[str] = []
-        for response in root.findall("d:response", _NS):
-            href = response.find("d:href", _NS)
-            if href is None or href.text is None:
-                continue
-
-            propstat = response.find("d:propstat", _NS)
-            if propstat is None:
-                continue
-            prop = propstat.find("d:prop", _NS)
-            if prop is None:
-                continue
-            resource_type = prop.find("d:resourcetype", _NS)
-            if resource_type is None:
-                continue
-            if resource_type.find("d:collection", _NS) is None:
-                continue
-
-            name = unquote(href.text.rstrip("/").split("/")[-1])
-            if name and name != "webdav":
-                folders.append(name)
-
-        return folders
-
-    async def list_files(self, path: str, extension: str = ".pdf") -> list[str]:
-        """List filenames at the given path, filtered by extension."""
-        xml_body = await self._propfind(path)
-        root = ET.fromstring(xml_body)
-
-        files: list[str] = []
-        ext_lower = extension.lower()
-        for response in root.findall("d:response", _NS):
+    def _parse_tree(self, xml_body: str) -> list[tuple[RemoteFile, bool]]:
+        """(RemoteFile, is_folder) per response; paths relative to the share root."""
+        base_path = unquote(urlparse(self._base_url).path).rstrip("/")
+        entries = []
+        for response in ET.fromstring(xml_body).findall("d:response", _NS):
             href = response.find("d:href", _NS)
-            if href is None or href.text is None:
-                continue
-
-            propstat = response.find("d:propstat", _NS)
-            if propstat is None:
-                continue
-            prop = propstat.find("d:prop", _NS)
-            if prop is None:
+            prop = response.find("d:propstat/d:prop", _NS)
+            if href is None or href.text is None or prop is None:
                 continue
+            href_path = unquote(urlparse(href.text).path)
+            if href_path.startswith(base_path):
+                href_path = href_path[len(base_path) :]
+            size = prop.findtext("d:getcontentlength", default="", namespaces=_NS).strip()
             resource_type = prop.find("d:resourcetype", _NS)
-            # Skip collections (folders)
-            if resource_type is not None and resource_type.find("d:collection", _NS) is not None:
-                continue
-
-            name = unquote(href.text.rstrip("/").split("/")[-1])
-            if name and name.lower().endswith(ext_lower):
-                files.append(name)
-
-        return files
-
-    async def download_file(self, remote_path: str, local_path: Path) -> Path:
-        """Download a file from the share to a local path."""
+            entries.append(
+                (
+                    RemoteFile(
+                        path=href_path.strip("/"),
+                        etag=prop.findtext("d:getetag", default="", namespaces=_NS).strip().strip('"'),
+                        last_modified=prop.findtext("d:getlastmodified", default="", namespaces=_NS).strip(),
+                        size=int(size) if size.isdigit() else None,
+                    ),
+                    resource_type is not None and resource_type.find("d:collection", _NS) is not None,
+                )
+            )
+        return entries
+
+    async def download_file(self, remote_path: str, local_path: Path, expected_size: Optional[int] = None) -> Path:
+        """Stream a file from the share to a local path (see services/atomic_download.py).
+
+        Args:
+            remote_path: Path in the share
+            local_path: Target file, replaced only by a complete download
+            expected_size: Size from the PROPFIND listing; defaults to the Content-Length
+
+        Raises:
+            IncompleteDownloadError: The byte count does not match the expected size
+        """
         encoded_path = "/".join(quote(segment, safe="") for segment in remote_path.strip("/").split("/"))
         url = f"{self._base_url}/{encoded_path}"
 
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-
-        async with httpx.AsyncClient(auth=self._auth, timeout=120.0, follow_redirects=True) as client:
-            response = await client.get(url)
+        async with self._client().stream("GET", url, timeout=_DOWNLOAD_TIMEOUT_S) as response:
             response.raise_for_status()
-            local_path.write_bytes(response.content)
+            if expected_size is None:
+                expected_size = expected_length(response.headers)
+            await awrite_chunks(response.aiter_bytes(DOWNLOAD_CHUNK_BYTES), local_path, expected_size)
 
         return local_path
 
-    async def _propfind(self, path: str) -> str:
+    async def _propfind(self, path: str, depth: str = "1", body: Optional[str] = None) -> str:
         """Send a PROPFIND request and return the XML response body."""
         encoded_path = (
             "/".join(quote(segment, safe="") for segment in path.strip("/").split("/")) if path.strip("/") else ""
         )
         url = f"{self._base_url}/{encoded_path}" if encoded_path else f"{self._base_url}/"
 
-        async with httpx.AsyncClient(auth=self._auth, timeout=30.0, follow_redirects=True) as client:
-            response = await client.request("PROPFIND", url, headers={"Depth": "1"})
-            response.raise_for_status()
-            return response.text
+        headers = {"Depth": depth}
+        if body is not None:
+            headers["Content-Type"] = "application/xml; charset=utf-8"
+        response = await self._client().request(
+            "PROPFIND", url, headers=headers, content=body, timeout=_PROPFIND_TIMEOUT_S
+        )
+        response.raise_for_status()
+        return response.text
+
+
+def _depth(path: str, root: str) -> int:
+    """Folder levels of `path` below `root` ("" is the share root)."""
+    relative = path[len(root) :].strip("/") if root else path
+    return len(relative.split("/")) if relative else 0
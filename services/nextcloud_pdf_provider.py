@@ -1,13 +1,18 @@
 """Discovers and downloads research PDFs from a Nextcloud public share."""
 
 import asyncio
+import json
 import logging
-from dataclasses import dataclass
+import os
+from dataclasses import asdict, dataclass
 from pathlib import Path
+from typing import Optional
 
 import httpx
 
-from services.nextcloud_client import NextcloudClient
+from services.atomic_download import IncompleteDownloadError
+from services.env import env_number
+from services.nextcloud_client import NextcloudClient, RemoteFile
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +20,8 @@ _MAX_DOWNLOAD_RETRIES = 3
 _RETRY_BASE_DELAY_S = 2.0  # doubles each attempt: 2s, 4s, 8s
 
 DEFAULT_DOWNLOAD_DIR = Path("/app/hex_gig_pdfs_cache")
+DEFAULT_UCLOUD_CONCURRENCY = 8
+MANIFEST_FILENAME = ".ucloud_manifest.json"
 
 
 @dataclass
@@ -29,52 +36,144 @@ class NextcloudPDFProvider:
 
     Uses a deterministic download path so that files persist across restarts
     and agno's skip_if_exists content hash remains stable.
+
+    The share is listed with one recursive PROPFIND (`NextcloudClient.list_tree`)
+    and each PDF's etag, last-modified date and size are kept in a manifest
+    next to the downloads. Only files that are new, changed upstream, or whose
+    local copy is missing or has the wrong size are downloaded, so a sync
+    with no upstream changes costs a single request.
+
+    Downloads run concurrently over the client's pooled connections, at most
+    `concurrency` at a time (`UCLOUD_CONCURRENCY`). Use the provider as an
+    async context manager to close the client's pool.
     """
 
-    def __init__(self, client: NextcloudClient, download_dir: Path = DEFAULT_DOWNLOAD_DIR):
+    def __init__(
+        self,
+        client: NextcloudClient,
+        download_dir: Path = DEFAULT_DOWNLOAD_DIR,
+        concurrency: Optional[int] = None,
+    ):
         self._client = client
         self._download_dir = download_dir
+        self._manifest_path = download_dir / MANIFEST_FILENAME
+        if concurrency is None:
+            concurrency = env_number("UCLOUD_CONCURRENCY", DEFAULT_UCLOUD_CONCURRENCY, int)
+        self._concurrency = max(1, concurrency)
+
+    async def __aenter__(self) -> "NextcloudPDFProvider":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
 
     async def discover_and_download(self) -> list[DiscoveredPDF]:
-        """Discover all member PDFs. Only downloads files not already present locally.
+        """Discover all member PDFs. Only downloads files that are new or changed upstream.
 
         Returns:
-            List of DiscoveredPDF objects (both newly downloaded and already-cached).
+            List of DiscoveredPDF objects (both newly downloaded and already-cached),
+            in share listing order.
         """
         self._download_dir.mkdir(parents=True, exist_ok=True)
-        discovered: list[DiscoveredPDF] = []
-
-        folders = await self._client.list_folders("/")
-        for folder in folders:
-            pdf_files = await self._client.list_files(f"/{folder}")
-            for filename in pdf_files:
-                local_path = self._download_dir / folder / filename
-                if not local_path.exists():
-                    for attempt in range(1, _MAX_DOWNLOAD_RETRIES + 1):
-                        try:
-                            await self._client.download_file(f"/{folder}/{filename}", local_path)
-                            logger.info("Downloaded: %s/%s", folder, filename)
-                            break
-                        except (httpx.RemoteProtocolError, httpx.ConnectError, httpx.ReadError) as exc:
-                            if attempt == _MAX_DOWNLOAD_RETRIES:
-                                raise
-                            delay = _RETRY_BASE_DELAY_S * (2 ** (attempt - 1))
-                            logger.warning(
-                                "Download failed (%s/%s), attempt %d/%d — retrying in %.0fs: %s",
-                                folder,
-                                filename,
-                                attempt,
-                                _MAX_DOWNLOAD_RETRIES,
-                                delay,
-                                exc,
-                            )
-                            await asyncio.sleep(delay)
-                discovered.append(
-                    DiscoveredPDF(
-                        local_path=local_path,
-                        member_folder_name=folder,
-                        filename=filename,
-                    )
+        manifest = self._load_manifest()
+
+        remote_pdfs: list[tuple[DiscoveredPDF, RemoteFile]] = []
+        for remote in await self._client.list_tree("/"):
+            parts = remote.path.split("/")
+            # PDFs directly inside a member folder
+            if len(parts) == 2 and parts[1].lower().endswith(".pdf"):
+                folder, filename = parts
+                pdf = DiscoveredPDF(
+                    local_path=self._download_dir / folder / filename, member_folder_name=folder, filename=filename
                 )
-
-        return discovered
+                remote_pdfs.append((pdf, remote))
+
+        synced = {remote.path: manifest[remote.path] for _, remote in remote_pdfs if remote.path in manifest}
+        stale = []
+        for pdf, remote in remote_pdfs:
+            if _is_current(pdf.local_path, remote, manifest.get(remote.path)):
+                synced[remote.path] = _manifest_entry(remote)
+            else:
+                stale.append((pdf, remote))
+
+        try:
+            if stale:
+                logger.info("Downloading %d of %d PDFs (%d at a time)", len(stale), len(remote_pdfs), self._concurrency)
+                semaphore = asyncio.Semaphore(self._concurrency)
+                # A download that fails after its retries cancels the others and is raised.
+                async with asyncio.TaskGroup() as group:
+                    for pdf, remote in stale:
+                        group.create_task(self._sync(pdf, remote, semaphore, synced))
+            else:
+                logger.info("u:Cloud PDFs up to date (%d files)", len(remote_pdfs))
+        finally:
+            # Files removed upstream drop out of the manifest.
+            self._save_manifest(synced)
+
+        return [pdf for pdf, _ in remote_pdfs]
+
+    async def _sync(
+        self, pdf: DiscoveredPDF, remote: RemoteFile, semaphore: asyncio.Semaphore, synced: dict[str, dict]
+    ) -> None:
+        await self._download(pdf, remote.size, semaphore)
+        synced[remote.path] = _manifest_entry(remote)
+
+    def _load_manifest(self) -> dict[str, dict]:
+        try:
+            return json.loads(self._manifest_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable manifest %s: %s", self._manifest_path, exc)
+            return {}
+
+    def _save_manifest(self, manifest: dict[str, dict]) -> None:
+        tmp_path = self._manifest_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=1, sort_keys=True, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self._manifest_path)
+
+    async def _download(self, pdf: DiscoveredPDF, size: Optional[int], semaphore: asyncio.Semaphore) -> None:
+        """Download one PDF, retrying transient connection errors and short reads with exponential backoff."""
+        folder, filename = pdf.member_folder_name, pdf.filename
+        for attempt in range(1, _MAX_DOWNLOAD_RETRIES + 1):
+            try:
+                async with semaphore:
+                    await self._client.download_file(f"/{folder}/{filename}", pdf.local_path, expected_size=size)
+                logger.info("Downloaded: %s/%s", folder, filename)
+                return
+            except (httpx.RemoteProtocolError, httpx.ConnectError, httpx.ReadError, IncompleteDownloadError) as exc:
+                if attempt == _MAX_DOWNLOAD_RETRIES:
+                    raise
+                delay = _RETRY_BASE_DELAY_S * (2 ** (attempt - 1))
+                logger.warning(
+                    "Download failed (%s/%s), attempt %d/%d — retrying in %.0fs: %s",
+                    folder,
+                    filename,
+                    attempt,
+                    _MAX_DOWNLOAD_RETRIES,
+                    delay,
+                    exc,
+                )
+                # Backoff outside the semaphore, so waiting retries do not hold a slot.
+                await asyncio.sleep(delay)
+
+
+def _manifest_entry(remote: RemoteFile) -> dict:
+    entry = asdict(remote)
+    del entry["path"]
+    return entry
+
+
+def _is_current(local_path: Path, remote: RemoteFile, entry: Optional[dict]) -> bool:
+    """Whether the local copy matches the remote file, so it need not be downloaded."""
+    try:
+        local_size = local_path.stat().st_size
+    except FileNotFoundError:
+        return False
+    if remote.size is not None and local_size != remote.size:
+        return False  # partial or outdated download
+    if entry is None:
+        return True  # downloaded before the manifest existed; the size matches
+    if remote.etag and entry.get("etag"):
+        return remote.etag == entry["etag"]
+    return (remote.last_modified, remote.size) == (entry.get("last_modified"), entry.get("size"))
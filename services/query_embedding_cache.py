@@ -0,0 +1,151 @@
+"""
+LRU + TTL cache of query embeddings.
+
+Every `search_knowledge_base` call embeds the model-generated query again
+(PgVector's search calls the embedder's sync `get_embedding`), and across users
+most SSC and HeX queries are near-identical ("Aufnahmetest Termin", "who
+researches mental health"). `BatchingEmbedder.get_embedding` goes through
+`query_embedding_cache`, keyed by embedder id, dimensions and the normalized
+query text (Unicode NFC, whitespace collapsed, case-folded). Normalization
+only builds the key: a miss embeds the caller's query as written, so the
+vector is the one the embedder would have returned without the cache.
+
+With `QUERY_EMBEDDING_CACHE_SHARED=true`, misses fall through to the
+Postgres ``embedding_cache`` table (see services/embedding_cache.py) before
+calling Azure, so all workers and replicas share query embeddings. Query
+entries are stored under their own embedder id (`<embedder id>:query`): the
+table maps hash(text) to embedding(text), and a query entry maps the hash of
+the normalized query to the embedding of the query as written, so chunks must
+never match it.
+
+`stats()` (hit rate per tier) is reported by the /health endpoint.
+"""
+
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from logging import getLogger
+from typing import Callable, Optional
+
+from services.embedding_cache import embedding_cache
+from services.env import env_number
+from services.excerpt_index import content_hash
+
+logger = getLogger(__name__)
+
+DEFAULT_QUERY_EMBEDDING_CACHE_MAX_ENTRIES = 1024
+DEFAULT_QUERY_EMBEDDING_CACHE_TTL_SECONDS = 3600.0
+# Suffix of the embedder id under which query embeddings are shared.
+SHARED_QUERY_NAMESPACE = ":query"
+
+
+def normalize_query(text: str) -> str:
+    """Cache key text: NFC, whitespace collapsed, case-folded."""
+    return " ".join(unicodedata.normalize("NFC", text).split()).casefold()
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU + TTL cache of query embeddings, with an optional shared Postgres tier."""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        shared: Optional[bool] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_entries is None:
+            max_entries = env_number(
+                "QUERY_EMBEDDING_CACHE_MAX_ENTRIES", DEFAULT_QUERY_EMBEDDING_CACHE_MAX_ENTRIES, int
+            )
+        if ttl_seconds is None:
+            ttl_seconds = env_number(
+                "QUERY_EMBEDDING_CACHE_TTL_SECONDS", DEFAULT_QUERY_EMBEDDING_CACHE_TTL_SECONDS, float
+            )
+        if shared is None:
+            shared = os.getenv("QUERY_EMBEDDING_CACHE_SHARED", "false").lower() == "true"
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[float, list[float]]] = OrderedDict()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _get(self, key: tuple) -> Optional[list[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, embedding = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return embedding
+
+    def _put(self, key: tuple, embedding: list[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_embed(
+        self,
+        embedder_id: str,
+        dimensions: Optional[int],
+        query: str,
+        embed: Callable[[str], list[float]],
+    ) -> list[float]:
+        """
+        The embedding of `query`, from memory, the shared tier, or `embed` (called with `query` unmodified).
+
+        Empty embeddings (failed embedder calls) are returned but never cached.
+        """
+        text = normalize_query(query)
+        key = (embedder_id, dimensions, text)
+        embedding = self._get(key)
+        if embedding is not None:
+            return embedding
+
+        shared_id = f"{embedder_id}{SHARED_QUERY_NAMESPACE}"
+        if self.shared:
+            embedding = embedding_cache.lookup(shared_id, dimensions, [text]).get(content_hash(text))
+            if embedding:
+                with self._lock:
+                    self.shared_hits += 1
+                self._put(key, embedding)
+                return embedding
+
+        with self._lock:
+            self.misses += 1
+        embedding = embed(query)
+        if embedding:
+            self._put(key, embedding)
+            if self.shared:
+                embedding_cache.store(shared_id, dimensions, [text], [embedding])
+        return embedding
+
+    def stats(self) -> dict:
+        """Entry count and hit rates since startup."""
+        with self._lock:
+            lookups = self.memory_hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.shared_hits) / lookups, 3) if lookups else None,
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache()
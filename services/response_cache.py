@@ -0,0 +1,177 @@
+"""
+Semantic response cache for repeated questions (opt-in, `RESPONSE_CACHE_ENABLED`).
+
+Many SSC-Psych and vax-study questions arrive in nearly the same words, and each
+one costs a full model run against the daily budget. The run route embeds the
+incoming message (through the query embedding cache) and looks for the most
+similar recent answer of the same agent; at or above
+`RESPONSE_CACHE_SIMILARITY_THRESHOLD` (cosine) the stored answer and its
+citations are replayed and the model is skipped.
+
+Entries are tagged with the knowledge version current when their run started.
+`invalidate()` — called whenever knowledge is (re)loaded — clears the cache and
+bumps the version, so answers still being generated from the old knowledge are
+dropped when they finish instead of being stored. Entries also expire after
+`RESPONSE_CACHE_TTL_SECONDS`, which bounds staleness for knowledge refreshed
+by other processes (the RSS refresh job).
+
+Only opening messages of a session are looked up or stored: a follow-up
+("and when is the deadline?") depends on the conversation before it.
+
+The cache is per process; each agent keeps at most
+`RESPONSE_CACHE_MAX_ENTRIES` answers (least recently used evicted first).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Callable, Optional
+
+import numpy as np
+
+from api.settings import api_settings
+
+logger = getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A stored answer and the citations emitted with it."""
+
+    content: str
+    citations: list[dict]
+    similarity: float = 1.0
+
+
+@dataclass(frozen=True)
+class ResponseCacheTicket:
+    """Lookup context of a run that missed the cache, needed to store its answer."""
+
+    agent_id: str
+    knowledge_version: int
+    embedding: tuple[float, ...]
+
+
+@dataclass
+class _Entry:
+    vector: np.ndarray  # unit length
+    response: CachedResponse
+    expires_at: float
+
+
+class SemanticResponseCache:
+    """Per-agent nearest-neighbour answer cache, invalidated on knowledge reload."""
+
+    def __init__(
+        self,
+        similarity_threshold: float,
+        ttl_seconds: float,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._entries: dict[str, OrderedDict[int, _Entry]] = {}
+        self._next_id = 0
+        self.knowledge_version = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if vector.ndim != 1 or norm == 0.0:
+            return None
+        return vector / norm
+
+    def lookup(self, agent_id: str, embedding: list[float]) -> tuple[Optional[CachedResponse], ResponseCacheTicket]:
+        """
+        Most similar live answer of `agent_id` at or above the threshold.
+
+        Returns:
+            (cached response or None, ticket to `store` this run's answer under on a miss)
+        """
+        with self._lock:
+            ticket = ResponseCacheTicket(agent_id, self.knowledge_version, tuple(embedding))
+            query = self._unit(embedding)
+            entries = self._entries.get(agent_id)
+            if query is None or not entries:
+                self.misses += 1
+                return None, ticket
+
+            now = self._clock()
+            for entry_id in [entry_id for entry_id, entry in entries.items() if entry.expires_at <= now]:
+                del entries[entry_id]
+            if not entries:
+                self.misses += 1
+                return None, ticket
+
+            ids = list(entries)
+            vectors = [entries[entry_id].vector for entry_id in ids]
+            if any(vector.shape != query.shape for vector in vectors):
+                self.misses += 1
+                return None, ticket
+            similarities = np.stack(vectors) @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.similarity_threshold:
+                self.misses += 1
+                return None, ticket
+
+            entries.move_to_end(ids[best])
+            self.hits += 1
+            cached = entries[ids[best]].response
+            return CachedResponse(cached.content, cached.citations, similarity), ticket
+
+    def store(self, ticket: ResponseCacheTicket, content: str, citations: list[dict]) -> bool:
+        """Cache a finished answer. Returns False when knowledge was reloaded since the run started."""
+        vector = self._unit(ticket.embedding)
+        if vector is None or not content or self.max_entries <= 0:
+            return False
+        with self._lock:
+            if ticket.knowledge_version != self.knowledge_version:
+                return False
+            entries = self._entries.setdefault(ticket.agent_id, OrderedDict())
+            self._next_id += 1
+            entries[self._next_id] = _Entry(
+                vector=vector,
+                response=CachedResponse(content, citations),
+                expires_at=self._clock() + self.ttl_seconds,
+            )
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        return True
+
+    def invalidate(self) -> None:
+        """Drop every cached answer; runs started before this call will not be stored."""
+        with self._lock:
+            dropped = sum(len(entries) for entries in self._entries.values())
+            self._entries.clear()
+            self.knowledge_version += 1
+        if dropped:
+            logger.info(f"Response cache invalidated ({dropped} answers dropped)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(len(entries) for entries in self._entries.values()),
+                "knowledge_version": self.knowledge_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+response_cache = SemanticResponseCache(
+    similarity_threshold=api_settings.response_cache_similarity_threshold,
+    ttl_seconds=api_settings.response_cache_ttl_seconds,
+    max_entries=api_settings.response_cache_max_entries,
+)
@@ -0,0 +1,78 @@
+"""
+Atomic read/update helpers for the pre-aggregated ``daily_spend_rollup`` table.
+
+Shared by ``budget_service`` (synchronous writes, budget reads and
+reservations) and ``usage_writer`` (batched writes), so both paths bump the
+rollup the same way.
+Callers own the session and the transaction: the rollup update commits
+together with the per-run ``daily_agent_usage`` rows it summarises.
+"""
+
+from datetime import date, datetime, timezone
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from api.settings import api_settings
+from db.models.budget import DailySpendRollup
+
+
+def _project() -> str:
+    return api_settings.project_config.project_name
+
+
+def add_daily_spend(db: Session, day: date, cost_eur: float, released_eur: float = 0.0) -> None:
+    """Add `cost_eur` to the rollup row for (`day`, project), creating it if needed.
+
+    `released_eur` is subtracted from the row's reservations in the same
+    statement, so a settling run moves from reserved to recorded spend atomically.
+    """
+    stmt = pg_insert(DailySpendRollup).values(
+        date=day,
+        project=_project(),
+        cost_eur=cost_eur,
+        reserved_eur=0.0,
+        updated_at=datetime.now(timezone.utc),
+    )
+    set_ = {
+        "cost_eur": DailySpendRollup.cost_eur + stmt.excluded.cost_eur,
+        "updated_at": stmt.excluded.updated_at,
+    }
+    if released_eur:
+        set_["reserved_eur"] = func.greatest(DailySpendRollup.reserved_eur - released_eur, 0.0)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailySpendRollup.date, DailySpendRollup.project],
+        set_=set_,
+    )
+    db.execute(stmt)
+
+
+def lock_daily_spend(db: Session, day: date) -> DailySpendRollup:
+    """Return the rollup row for (`day`, project) locked FOR UPDATE, creating it if needed.
+
+    The lock is held until the caller commits or rolls back, serialising
+    budget reservations across all workers that share the database.
+    """
+    stmt = (
+        pg_insert(DailySpendRollup)
+        .values(date=day, project=_project(), cost_eur=0.0, reserved_eur=0.0, updated_at=datetime.now(timezone.utc))
+        .on_conflict_do_nothing(index_elements=[DailySpendRollup.date, DailySpendRollup.project])
+    )
+    db.execute(stmt)
+    return (
+        db.query(DailySpendRollup)
+        .filter(DailySpendRollup.date == day, DailySpendRollup.project == _project())
+        .with_for_update()
+        .one()
+    )
+
+
+def get_daily_spend(db: Session, day: date) -> float:
+    """Recorded spend for (`day`, project); 0.0 when nothing was recorded yet."""
+    result = (
+        db.query(DailySpendRollup.cost_eur)
+        .filter(DailySpendRollup.date == day, DailySpendRollup.project == _project())
+        .scalar()
+    )
+    return float(result or 0.0)
@@ -4,47 +4,97 @@ Web scraper for the SSC Psychologie website.
 Crawls pages under https://ssc-psychologie.univie.ac.at/studium/ and
 downloads PDF documents from https://ssc-psychologie.univie.ac.at/downloads/.
 Preserves source URLs as metadata so the agent can cite them in responses.
+
+Crawls run on asyncio (services/async_crawler.py): pages are fetched
+concurrently within a per-host rate limit and a bound on in-flight requests
+(`SSC_CRAWL_RATE_PER_SECOND`, `SSC_CRAWL_BURST`, `SSC_CRAWL_MAX_IN_FLIGHT`),
+and HTML parsing runs in worker threads, so startup no longer blocks the
+event loop for the length of the crawl.
+
+Re-crawls are conditional (services/crawl_state.py): with the previous
+crawl's state, requests carry If-None-Match / If-Modified-Since, unchanged
+pages and documents are neither parsed nor returned, and the URLs whose
+vectors are outdated (changed or removed) are left in the state.
 """
 
+import asyncio
 import hashlib
+import importlib.util
 import logging
 import tempfile
-import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
 from urllib.parse import urljoin, urlparse
 
-import requests
+import httpx
 from bs4 import BeautifulSoup
 from pypdf import PdfReader, PdfWriter
 
+from services.async_crawler import AsyncCrawler, CrawlSettings, get_crawl_settings
+from services.atomic_download import (
+    DOWNLOAD_CHUNK_BYTES,
+    IncompleteDownloadError,
+    awrite_chunks,
+    expected_length,
+)
+from services.crawl_state import DOCUMENT, LISTING, WEB_PAGE, CrawlRecord, CrawlState
+
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://ssc-psychologie.univie.ac.at"
 STUDIUM_PATHS = ["/studium/", "/en/studium/"]
 DOWNLOADS_PATHS = ["/downloads/", "/en/downloads/"]
-REQUEST_DELAY_SECONDS = 0.5
 REQUEST_TIMEOUT_SECONDS = 30
 DOWNLOAD_RETRY_ATTEMPTS = 3
+# Crawl state rows of this site (services/crawl_state.py)
+CRAWL_STATE_SOURCE = "ssc-psych"
+# Removed pages and documents; anything else failing keeps its previous state.
+GONE_STATUS_CODES = {404, 410}
 USER_AGENT = "UniVie-SSC-Psych-Agent/1.0 (research chatbot; +https://ssc-psychologie.univie.ac.at/)"
+# lxml parses several times faster than the stdlib parser; it is an optional dependency.
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+
+
+def _get_client(settings: CrawlSettings) -> httpx.AsyncClient:
+    """Create the crawl's HTTP client, with a connection per in-flight request."""
+    return httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        timeout=REQUEST_TIMEOUT_SECONDS,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=settings.max_in_flight, max_keepalive_connections=settings.max_in_flight),
+    )
 
 
-def _get_session() -> requests.Session:
-    """Create a requests session with appropriate headers."""
-    session = requests.Session()
-    session.headers.update({"User-Agent": USER_AGENT})
-    return session
+@asynccontextmanager
+async def open_ssc_crawler() -> AsyncIterator[AsyncCrawler]:
+    """Crawler for the SSC site; share it between both scrapes so they share one politeness budget."""
+    settings = get_crawl_settings()
+    async with _get_client(settings) as client:
+        yield AsyncCrawler(client, settings)
 
 
-def _download_with_retry(session: requests.Session, url: str) -> Optional[requests.Response]:
-    """GET with retries — the SSC file server occasionally aborts connections."""
+async def _download_with_retry(
+    crawler: AsyncCrawler, url: str, local_path: Path, headers: Optional[dict[str, str]] = None
+) -> Optional[httpx.Response]:
+    """Stream `url` to `local_path` with retries — the SSC file server occasionally aborts connections.
+
+    The file is replaced only by a complete download (services/atomic_download.py).
+
+    Returns:
+        The (closed) response — 304 Not Modified and 404/410 write nothing — or None when every attempt failed
+    """
     for attempt in range(1, DOWNLOAD_RETRY_ATTEMPTS + 1):
         try:
-            time.sleep(REQUEST_DELAY_SECONDS)
-            response = session.get(url, timeout=REQUEST_TIMEOUT_SECONDS)
-            response.raise_for_status()
+            async with crawler.stream(url, headers=headers) as response:
+                if response.status_code == 304 or response.status_code in GONE_STATUS_CODES:
+                    return response
+                response.raise_for_status()
+                await awrite_chunks(
+                    response.aiter_bytes(DOWNLOAD_CHUNK_BYTES), local_path, expected_length(response.headers)
+                )
             return response
-        except requests.RequestException as e:
+        except (httpx.HTTPError, IncompleteDownloadError) as e:
             if attempt < DOWNLOAD_RETRY_ATTEMPTS:
                 logger.info(f"Download attempt {attempt}/{DOWNLOAD_RETRY_ATTEMPTS} failed for {url}: {e} — retrying")
             else:
@@ -52,6 +102,49 @@ def _download_with_retry(session: requests.Session, url: str) -> Optional[reques
     return None
 
 
+async def _fetch_page(crawler: AsyncCrawler, state: CrawlState, key: str, url: str) -> Optional[httpx.Response]:
+    """
+    Conditional GET of a page.
+
+    Returns:
+        The response when the page has to be parsed; None when it answered 304
+        (its previous record is kept), is gone (404/410, no record), or could not
+        be fetched (its previous record is kept, so it does not count as removed)
+    """
+    try:
+        response = await crawler.fetch(url, headers=state.conditional_headers(key))
+        if response.status_code == 304:
+            state.keep(key)
+            return None
+        response.raise_for_status()
+        return response
+    except httpx.HTTPError as e:
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code in GONE_STATUS_CODES:
+            logger.info(f"Gone ({e.response.status_code}): {url}")
+        else:
+            logger.warning(f"Failed to fetch {url}: {e}")
+            state.keep(key, seen=False)
+        return None
+
+
+def _validators(response: httpx.Response) -> dict[str, str]:
+    return {"etag": response.headers.get("etag", ""), "last_modified": response.headers.get("last-modified", "")}
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(DOWNLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _local_document_path(tmp_dir: Path, doc_url: str, filename: str) -> Path:
+    """Download target of a document, unique per URL: folders can hold files of the same name."""
+    url_hash = hashlib.sha256(doc_url.encode("utf-8")).hexdigest()[:12]
+    return tmp_dir / f"{url_hash}_{filename}"
+
+
 def _unlock_pdf_in_place(path: Path) -> bool:
     """True when the PDF at `path` is readable, decrypting it in place if needed.
 
@@ -145,51 +238,92 @@ def _content_hash(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
-def scrape_ssc_web_pages() -> list[dict]:
+def _page_key(url: str) -> str:
+    """Visited key of a /studium/ page: scheme, host and path (no query or fragment)."""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+
+
+def _listing_key(url: str) -> str:
+    """Visited key of a /downloads/ page — keeps the query, TYPO3 folder nav uses tx_filelist_filelist[path]."""
+    parsed = urlparse(url)
+    qs = f"?{parsed.query}" if parsed.query else ""
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path}{qs}"
+
+
+def _page_links(soup: BeautifulSoup, url: str) -> list[str]:
+    return [urljoin(url, link["href"]) for link in soup.find_all("a", href=True)]
+
+
+def _parse_page(html: str, url: str) -> tuple[str, str, list[str]]:
+    """Title, main content and links of a page (CPU-bound, run off the event loop)."""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    title = _extract_page_title(soup)
+    # Links after content extraction, which drops navigation inside the content area.
+    content = _extract_main_content(soup)
+    return title, content, _page_links(soup, url)
+
+
+async def ascrape_ssc_web_pages(
+    crawler: Optional[AsyncCrawler] = None, state: Optional[CrawlState] = None
+) -> list[dict]:
     """
     Crawl all pages under the SSC Psychologie /studium/ section (German + English).
 
-    Returns a list of dicts, each with:
+    With the previous crawl's `state`, requests are conditional: pages that
+    answer 304 Not Modified are not parsed (their stored links are followed),
+    and only new or changed pages are returned. The changed and removed URLs
+    are left in `state` for the caller to replace or purge.
+
+    Args:
+        crawler: Shared crawler (default: a new one from `open_ssc_crawler`)
+        state: Crawl state (default: empty — every page is fetched and returned)
+
+    Returns a list of dicts, sorted by source URL, each with:
         - name: Document name for the knowledge base
         - text_content: Extracted page text
         - metadata: Dict with source_type, source_url, page_title, language, content_hash
     """
-    session = _get_session()
-    visited: set[str] = set()
-    results: list[dict] = []
-
-    # Build initial queue from both German and English entry points
-    queue: list[str] = [f"{BASE_URL}{path}" for path in STUDIUM_PATHS]
-    allowed_prefixes = STUDIUM_PATHS.copy()
-
-    while queue:
-        url = queue.pop(0)
-
-        # Normalize URL (strip fragment, ensure trailing consistency)
-        parsed = urlparse(url)
-        normalized = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-        if normalized in visited:
-            continue
-        visited.add(normalized)
+    if crawler is None:
+        async with open_ssc_crawler() as own_crawler:
+            return await ascrape_ssc_web_pages(own_crawler, state)
+    if state is None:
+        state = CrawlState()
 
-        try:
-            time.sleep(REQUEST_DELAY_SECONDS)
-            response = session.get(url, timeout=REQUEST_TIMEOUT_SECONDS)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            logger.warning(f"Failed to fetch {url}: {e}")
-            continue
+    results: list[dict] = []
 
+    async def visit(url: str) -> list[str]:
+        normalized = _page_key(url)
+        response = await _fetch_page(crawler, state, normalized, url)
+        if response is None:
+            record = state.records.get(normalized)
+            links = list(record.links) if record else []
+            return [link for link in links if _is_internal_link(link, STUDIUM_PATHS)]
         if "text/html" not in response.headers.get("content-type", ""):
-            continue
-
-        soup = BeautifulSoup(response.text, "html.parser")
-        title = _extract_page_title(soup)
-        content = _extract_main_content(soup)
+            return []
+
+        title, content, links = await asyncio.to_thread(_parse_page, response.text, url)
+        # Thin pages are recorded without a hash: nothing of them is embedded.
+        thin = not content or len(content) < 50
+        page_hash = "" if thin else _content_hash(content)
+        changed = state.update(
+            CrawlRecord(
+                url=normalized,
+                kind=WEB_PAGE,
+                content_hash=page_hash,
+                links=tuple(links),
+                **_validators(response),
+            )
+        )
+        # Discover internal links within /studium/
+        links = [link for link in links if _is_internal_link(link, STUDIUM_PATHS)]
 
-        if not content or len(content) < 50:
+        if thin:
             logger.debug(f"Skipping {url} — insufficient content ({len(content)} chars)")
-            continue
+            return links
+        if not changed:
+            logger.debug(f"Unchanged: {normalized}")
+            return links
 
         language = _detect_language(url)
         results.append(
@@ -201,27 +335,91 @@ def scrape_ssc_web_pages() -> list[dict]:
                     "source_url": normalized,
                     "page_title": title,
                     "language": language,
-                    "content_hash": _content_hash(content),
+                    "content_hash": page_hash,
                 },
             }
         )
         logger.info(f"Scraped: {title} ({language}) — {normalized}")
+        return links
 
-        # Discover internal links within /studium/
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
-            full_url = urljoin(url, href)
-            full_parsed = urlparse(full_url)
-            full_normalized = f"{full_parsed.scheme}://{full_parsed.netloc}{full_parsed.path}"
-
-            if full_normalized not in visited and _is_internal_link(full_url, allowed_prefixes):
-                queue.append(full_url)
+    # Both the German and English entry points
+    await crawler.crawl([f"{BASE_URL}{path}" for path in STUDIUM_PATHS], key=_page_key, visit=visit)
 
-    logger.info(f"Scraped {len(results)} web pages from SSC Psychologie website")
+    # Pages complete in network order; sort so runs over an unchanged site produce the same list.
+    results.sort(key=lambda item: item["metadata"]["source_url"])
+    logger.info(f"Scraped {len(results)} new or changed web pages from SSC Psychologie website")
     return results
 
 
-def scrape_ssc_downloads() -> list[dict]:
+def _document_item(doc_url: str, filename: str) -> dict:
+    filename_lower = filename.lower()
+    source_type = "pdf_document" if filename_lower.endswith(".pdf") else "word_document"
+    # Derive a human-readable title from the filename (strip extension)
+    document_title = filename.rsplit(".", 1)[0].replace("_", " ").replace("-", " ")
+    # Simple language heuristic: filenames containing _E_ or ending with E.pdf/E.docx are English
+    language = (
+        "en" if ("_E_" in filename or filename_lower.endswith(("e.pdf", "e.docx", "_en.pdf", "_en.docx"))) else "de"
+    )
+    file_label = "PDF" if source_type == "pdf_document" else "DOCX"
+    return {
+        "name": f"SSC {file_label} - {document_title}",
+        "metadata": {
+            "source_type": source_type,
+            "source_url": doc_url,
+            "document_title": document_title,
+            "language": language,
+        },
+    }
+
+
+async def _fetch_document(crawler: AsyncCrawler, state: CrawlState, doc_url: str, tmp_dir: Path) -> Optional[dict]:
+    """Download one document and build its knowledge item; None when it is unchanged, gone or not downloadable."""
+    filename = Path(urlparse(doc_url).path).name
+    if not filename:
+        return None
+
+    local_path = _local_document_path(tmp_dir, doc_url, filename)
+    # The conditional request needs the local copy: unchanged documents are not downloaded again.
+    headers = state.conditional_headers(doc_url) if local_path.exists() else {}
+    response = await _download_with_retry(crawler, doc_url, local_path, headers)
+    if response is None:
+        state.keep(doc_url, seen=False)
+        return None
+    if response.status_code == 304:
+        state.keep(doc_url)
+        return None
+    if response.status_code in GONE_STATUS_CODES:
+        logger.info(f"Gone ({response.status_code}): {doc_url}")
+        return None
+
+    file_hash = await asyncio.to_thread(_file_hash, local_path)
+    if not state.update(CrawlRecord(url=doc_url, kind=DOCUMENT, content_hash=file_hash, **_validators(response))):
+        logger.debug(f"Unchanged: {doc_url}")
+        return None
+
+    item = _document_item(doc_url, filename)
+    document_title = item["metadata"]["document_title"]
+    if item["metadata"]["source_type"] == "pdf_document" and not await asyncio.to_thread(
+        _unlock_pdf_in_place, local_path
+    ):
+        # Content is unreachable, but the agent must still be able to cite
+        # the download link when a page tells students to fetch this form.
+        item["text_content"] = (
+            f"{document_title}: Dieses Formular ist als geschütztes PDF verfügbar; "
+            f"Download unter {doc_url}. / This form is available as a protected PDF; "
+            f"download it at {doc_url}."
+        )
+        logger.warning(f"Password-protected PDF (no empty-password unlock): {filename} — embedding download stub")
+    else:
+        item["path"] = local_path
+
+    logger.info(f"Downloaded: {filename} → {doc_url}")
+    return item
+
+
+async def ascrape_ssc_downloads(
+    crawler: Optional[AsyncCrawler] = None, state: Optional[CrawlState] = None
+) -> list[dict]:
     """
     Scrape the SSC Psychologie /downloads/ section and download all linked PDFs and Word docs.
 
@@ -230,117 +428,61 @@ def scrape_ssc_downloads() -> list[dict]:
     key must include the query string, otherwise all subfolder pages collapse to the same
     normalized path and are skipped after the first visit.
 
-    Returns a list of dicts, each with:
+    With the previous crawl's `state`, listing pages and documents are
+    requested conditionally and only new or changed documents are returned
+    (see `ascrape_ssc_web_pages`).
+
+    Args:
+        crawler: Shared crawler (default: a new one from `open_ssc_crawler`)
+        state: Crawl state (default: empty — every document is downloaded and returned)
+
+    Returns a list of dicts, sorted by source URL, each with:
         - name: Document name for the knowledge base
         - path: Path to the downloaded file
         - metadata: Dict with source_type, source_url, document_title, language
     """
-    session = _get_session()
-    visited_pages: set[str] = set()
-    doc_urls: set[str] = set()
-    results: list[dict] = []
-
-    # Crawl /downloads/ pages to find document links
-    queue: list[str] = [f"{BASE_URL}{path}" for path in DOWNLOADS_PATHS]
-    allowed_prefixes = DOWNLOADS_PATHS.copy()
-
-    while queue:
-        url = queue.pop(0)
-        parsed = urlparse(url)
-        # Include query string — TYPO3 folder nav uses tx_filelist_filelist[path] params
-        qs = f"?{parsed.query}" if parsed.query else ""
-        normalized = f"{parsed.scheme}://{parsed.netloc}{parsed.path}{qs}"
-
-        if normalized in visited_pages:
-            continue
-        visited_pages.add(normalized)
-
-        try:
-            time.sleep(REQUEST_DELAY_SECONDS)
-            response = session.get(url, timeout=REQUEST_TIMEOUT_SECONDS)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            logger.warning(f"Failed to fetch {url}: {e}")
-            continue
+    if crawler is None:
+        async with open_ssc_crawler() as own_crawler:
+            return await ascrape_ssc_downloads(own_crawler, state)
+    if state is None:
+        state = CrawlState()
 
-        if "text/html" not in response.headers.get("content-type", ""):
-            continue
+    doc_urls: set[str] = set()
 
-        soup = BeautifulSoup(response.text, "html.parser")
+    async def visit(url: str) -> list[str]:
+        normalized = _listing_key(url)
+        response = await _fetch_page(crawler, state, normalized, url)
+        if response is None:
+            record = state.records.get(normalized)
+            links = list(record.links) if record else []
+        elif "text/html" not in response.headers.get("content-type", ""):
+            return []
+        else:
+            soup = await asyncio.to_thread(BeautifulSoup, response.text, HTML_PARSER)
+            links = _page_links(soup, url)
+            state.update(CrawlRecord(url=normalized, kind=LISTING, links=tuple(links), **_validators(response)))
 
         # Collect PDF and Word document links
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
-            full_url = urljoin(url, href)
+        doc_urls.update(link for link in links if link.lower().endswith((".pdf", ".docx")))
+        # Follow internal links within /downloads/ (includes query-param subfolder pages)
+        return [link for link in links if _is_internal_link(link, DOWNLOADS_PATHS)]
 
-            if full_url.lower().endswith((".pdf", ".docx")):
-                doc_urls.add(full_url)
-
-            # Follow internal links within /downloads/ (includes query-param subfolder pages)
-            full_parsed = urlparse(full_url)
-            full_qs = f"?{full_parsed.query}" if full_parsed.query else ""
-            full_normalized = f"{full_parsed.scheme}://{full_parsed.netloc}{full_parsed.path}{full_qs}"
-            if full_normalized not in visited_pages and _is_internal_link(full_url, allowed_prefixes):
-                queue.append(full_url)
+    # Crawl /downloads/ pages to find document links
+    await crawler.crawl([f"{BASE_URL}{path}" for path in DOWNLOADS_PATHS], key=_listing_key, visit=visit)
 
-    # Download documents to temp directory
     if not doc_urls:
         logger.warning("No documents found on SSC downloads pages")
-        return results
+        return []
 
     # Fixed path (not mkdtemp): agno's skip_if_exists hashes the file *path*, so a
     # random temp dir per run defeats dedup and re-embeds every document on restart.
     tmp_dir = Path(tempfile.gettempdir()) / "ssc_psych_pdfs"
     tmp_dir.mkdir(exist_ok=True)
-    logger.info(f"Downloading {len(doc_urls)} documents to {tmp_dir}")
-
-    for doc_url in sorted(doc_urls):
-        parsed = urlparse(doc_url)
-        filename = Path(parsed.path).name
-
-        if not filename:
-            continue
-
-        response = _download_with_retry(session, doc_url)
-        if response is None:
-            continue
-
-        local_path = tmp_dir / filename
-        local_path.write_bytes(response.content)
-
-        filename_lower = filename.lower()
-        source_type = "pdf_document" if filename_lower.endswith(".pdf") else "word_document"
-        # Derive a human-readable title from the filename (strip extension)
-        document_title = filename.rsplit(".", 1)[0].replace("_", " ").replace("-", " ")
-        # Simple language heuristic: filenames containing _E_ or ending with E.pdf/E.docx are English
-        language = (
-            "en" if ("_E_" in filename or filename_lower.endswith(("e.pdf", "e.docx", "_en.pdf", "_en.docx"))) else "de"
-        )
-        file_label = "PDF" if source_type == "pdf_document" else "DOCX"
-
-        item: dict = {
-            "name": f"SSC {file_label} - {document_title}",
-            "metadata": {
-                "source_type": source_type,
-                "source_url": doc_url,
-                "document_title": document_title,
-                "language": language,
-            },
-        }
-        if source_type == "pdf_document" and not _unlock_pdf_in_place(local_path):
-            # Content is unreachable, but the agent must still be able to cite
-            # the download link when a page tells students to fetch this form.
-            item["text_content"] = (
-                f"{document_title}: Dieses Formular ist als geschütztes PDF verfügbar; "
-                f"Download unter {doc_url}. / This form is available as a protected PDF; "
-                f"download it at {doc_url}."
-            )
-            logger.warning(f"Password-protected PDF (no empty-password unlock): {filename} — embedding download stub")
-        else:
-            item["path"] = local_path
+    logger.info(f"Checking {len(doc_urls)} documents in {tmp_dir}")
 
-        results.append(item)
-        logger.info(f"Downloaded: {filename} → {doc_url}")
+    # Downloads run concurrently within the crawler's budget; gather keeps them in URL order.
+    items = await asyncio.gather(*(_fetch_document(crawler, state, doc_url, tmp_dir) for doc_url in sorted(doc_urls)))
+    results = [item for item in items if item is not None]
 
-    logger.info(f"Downloaded {len(results)} documents from SSC Psychologie website")
+    logger.info(f"Downloaded {len(results)} new or changed documents from SSC Psychologie website")
     return results
@@ -0,0 +1,159 @@
+"""
+Coalesce consecutive content deltas of an agno event stream (opt-in).
+
+`chat_response_streamer` emits one SSE frame per agno event, and most of those
+events are token-sized `RunContent` deltas — each one its own JSON
+serialization, write and TCP push. With `SSE_COALESCE_ENABLED=true` the stream
+is passed through `coalesce_content_events`, which merges runs of plain-text
+`RunContent` deltas into a single `RunContent` event once the merge window
+(`SSE_COALESCE_WINDOW_MS`) elapses or the buffered text reaches
+`SSE_COALESCE_MAX_BYTES`. Every other event (tool calls, references,
+reasoning, RunCompleted, ...) flushes the buffer first and passes through
+untouched, so frame order and the bare-JSON framing that the agent-ui parser
+relies on are unchanged — a merged frame is just a `RunContent` event with
+more text.
+
+Backpressure: the upstream run is read by a pump task into a queue bounded by
+`SSE_COALESCE_QUEUE_SIZE`. When the client reads slower than the model
+writes, the queue fills and the pump stops pulling from the run instead of
+buffering without limit.
+"""
+
+import asyncio
+import dataclasses
+from logging import getLogger
+from typing import Any, AsyncIterator, Optional
+
+logger = getLogger(__name__)
+
+_END = object()
+
+# RunContent fields that make a delta more than plain text; such deltas are never merged.
+_NON_TEXT_FIELDS = (
+    "reasoning_content",
+    "citations",
+    "references",
+    "response_audio",
+    "image",
+    "additional_input",
+    "reasoning_steps",
+    "reasoning_messages",
+    "model_provider_data",
+    "tools",
+)
+
+
+def _is_text_delta(event: Any) -> bool:
+    """True for a `RunContent` event that carries only a string delta."""
+    if getattr(event, "event", None) != "RunContent" or not dataclasses.is_dataclass(event):
+        return False
+    if not isinstance(getattr(event, "content", None), str):
+        return False
+    return not any(getattr(event, name, None) for name in _NON_TEXT_FIELDS)
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def _pump(events: AsyncIterator[Any], queue: asyncio.Queue) -> None:
+    """Read the run into the bounded queue; blocks (pausing the run) while the queue is full."""
+    try:
+        async for event in events:
+            await queue.put(event)
+    except Exception as e:
+        await queue.put(_Failure(e))
+        return
+    finally:
+        # Cancelled mid-run (client disconnected): close the run's generator now, not at GC.
+        aclose = getattr(events, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception as e:
+                logger.debug(f"Closing the run stream failed: {e}")
+    await queue.put(_END)
+
+
+async def coalesce_content_events(
+    events: AsyncIterator[Any],
+    window_seconds: float,
+    max_bytes: int,
+    queue_size: int,
+) -> AsyncIterator[Any]:
+    """
+    Re-yield `events`, merging consecutive plain-text `RunContent` deltas.
+
+    Args:
+        events: The agno run event stream (``agent.arun(..., stream=True)``)
+        window_seconds: Longest a delta waits for more text before it is sent
+        max_bytes: Buffered text size (UTF-8 bytes) that forces a flush
+        queue_size: Events read ahead of the client before the run is paused
+
+    Yields:
+        The same events, with runs of text deltas merged into one `RunContent`
+
+    Raises:
+        Whatever the upstream stream raised, after the buffered text is yielded
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+    pump = asyncio.create_task(_pump(events, queue), name="sse-coalescer-pump")
+
+    pending: Optional[Any] = None
+    parts: list[str] = []
+    size = 0
+    deadline = 0.0
+
+    def merged() -> Any:
+        return dataclasses.replace(pending, content="".join(parts))
+
+    try:
+        while True:
+            if pending is None:
+                item = await queue.get()
+            else:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    yield merged()
+                    pending, parts, size = None, [], 0
+                    continue
+
+            if item is _END or isinstance(item, _Failure):
+                if pending is not None:
+                    yield merged()
+                    pending = None
+                if isinstance(item, _Failure):
+                    raise item.error
+                return
+
+            if _is_text_delta(item):
+                if pending is not None and item.run_id != pending.run_id:
+                    yield merged()
+                    pending, parts, size = None, [], 0
+                if pending is None:
+                    pending = item
+                    deadline = loop.time() + window_seconds
+                parts.append(item.content)
+                size += len(item.content.encode("utf-8"))
+                if size >= max_bytes:
+                    yield merged()
+                    pending, parts, size = None, [], 0
+                continue
+
+            # Boundary (tool call, references, completion, ...): flush, then pass through.
+            if pending is not None:
+                yield merged()
+                pending, parts, size = None, [], 0
+            yield item
+    finally:
+        if not pump.done():
+            pump.cancel()
+            try:
+                await pump
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.debug(f"SSE coalescer pump ended with error after cancel: {e}")
@@ -0,0 +1,285 @@
+"""
+Background write pipeline for budget usage and anonymous metrics rows.
+
+`record_usage` and `record_agent_metrics` used to commit synchronously on the
+event loop, so a single slow Postgres commit stalled every other SSE stream in
+the worker. While the app is running they instead hand their row to
+`usage_writer`, whose task drains an asyncio queue and persists rows in
+multi-row INSERTs (one statement per table per batch) on a worker thread.
+Each batch of usage rows also adds its summed cost to the matching
+``daily_spend_rollup`` row, and releases the budget reservations the rows
+settle, in the same transaction.
+
+A batch is flushed when it reaches `USAGE_WRITER_BATCH_SIZE` rows or
+`USAGE_WRITER_FLUSH_SECONDS` after its first row, whichever comes first, and
+the queue is drained on shutdown (`app_lifecycle`). Rows whose transaction
+fails are retried `USAGE_WRITER_MAX_RETRIES` times with exponential backoff,
+then written one by one; rows that still fail are logged and dropped, and
+their cost stays pending so this worker's budget ledger keeps counting it. When the writer is not
+running (scripts, tests, after shutdown) `submit_*` returns False and callers
+fall back to their synchronous write.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+from datetime import date
+from logging import getLogger
+from typing import Any, Optional
+
+from sqlalchemy import insert
+
+from api.settings import api_settings
+from db.models.budget import DailyAgentUsage, DailySpendRollup
+from db.models.usage_metrics import AgentUsageMetrics
+from db.session import SessionLocal
+from services.spend_rollup import add_daily_spend
+
+logger = getLogger(__name__)
+
+_STOP = object()
+
+# Queue item: (model, row values or None, (reservation date, amount to release) or None).
+_Item = tuple[Any, Optional[dict], Optional[tuple[date, float]]]
+
+
+def _write_batch(batch: list[_Item]) -> list[_Item]:
+    """Persist a batch with one multi-row INSERT per table (runs on a worker thread).
+
+    Returns the items whose transaction failed.
+    """
+    rows_by_model: dict[Any, list[dict]] = defaultdict(list)
+    items_by_model: dict[Any, list[_Item]] = defaultdict(list)
+    cost_by_day: dict[date, float] = defaultdict(float)
+    released_by_day: dict[date, float] = defaultdict(float)
+    for item in batch:
+        model, values, release = item
+        # Reservation releases commit with the usage rows.
+        items_by_model[DailyAgentUsage if release is not None else model].append(item)
+        if values is not None:
+            rows_by_model[model].append(values)
+            if model is DailyAgentUsage:
+                cost_by_day[values["date"]] += values["cost_eur"]
+        if release is not None:
+            released_by_day[release[0]] += release[1]
+
+    failed: list[_Item] = []
+
+    db = SessionLocal()
+    try:
+        # Usage rows, their rollup costs and the reservations they settle commit together.
+        spend_rows = rows_by_model.pop(DailyAgentUsage, [])
+        if spend_rows or released_by_day:
+            try:
+                if spend_rows:
+                    db.execute(insert(DailyAgentUsage), spend_rows)
+                for day in cost_by_day.keys() | released_by_day.keys():
+                    add_daily_spend(db, day, cost_by_day.get(day, 0.0), released_eur=released_by_day.get(day, 0.0))
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                failed += items_by_model[DailyAgentUsage]
+                logger.error(f"Failed to persist {len(spend_rows)} {DailyAgentUsage.__tablename__} rows: {e}")
+
+        for model, rows in rows_by_model.items():
+            try:
+                db.execute(insert(model), rows)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                failed += items_by_model[model]
+                logger.error(f"Failed to persist {len(rows)} {model.__tablename__} rows: {e}")
+    finally:
+        db.close()
+    return failed
+
+
+class UsageWriter:
+    """Queue + single writer task that batch-inserts usage and metrics rows."""
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_seconds: float,
+        max_queue_size: int,
+        max_retries: int = 3,
+        retry_base_seconds: float = 0.5,
+    ):
+        self._batch_size = max(1, batch_size)
+        self._flush_seconds = flush_seconds
+        self._max_queue_size = max_queue_size
+        self._max_retries = max(0, max_retries)
+        self._retry_base_seconds = retry_base_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._accepting = False
+        # Spend that is queued but not yet committed, per Vienna date — lets the
+        # budget ledger count it when it resyncs from Postgres.
+        self._pending_lock = threading.Lock()
+        self._pending_cost_eur: dict[date, float] = defaultdict(float)
+        self.retried_rows = 0
+        self.dropped_rows = 0
+
+    @property
+    def running(self) -> bool:
+        return self._accepting
+
+    @property
+    def queue_depth(self) -> int:
+        """Rows waiting to be written (gauge)."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> dict:
+        """Queue depth gauge and retry counters since startup."""
+        return {
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_queue_size": self._max_queue_size,
+            "retried_rows": self.retried_rows,
+            "dropped_rows": self.dropped_rows,
+        }
+
+    def pending_cost_eur(self, day: date) -> float:
+        """Cost of usage rows for `day` that are queued but not yet committed."""
+        with self._pending_lock:
+            return self._pending_cost_eur.get(day, 0.0)
+
+    def start(self) -> None:
+        """Start the writer task on the running event loop."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self._max_queue_size)
+        self._task = self._loop.create_task(self._run(), name="usage-writer")
+        self._accepting = True
+        logger.info(
+            f"Usage writer started (batch_size={self._batch_size}, flush_seconds={self._flush_seconds}, "
+            f"max_queue={self._max_queue_size})"
+        )
+
+    async def stop(self) -> None:
+        """Stop accepting rows, flush everything queued, and wait for the task to exit."""
+        if self._task is None or self._queue is None:
+            return
+        self._accepting = False
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+        self._loop = None
+        logger.info("Usage writer stopped")
+
+    def submit_usage(self, values: dict, release: Optional[tuple[date, float]] = None) -> bool:
+        """Queue a `daily_agent_usage` row, optionally settling a reservation (date, amount).
+
+        Returns False when the caller must write it itself.
+        """
+        if not self._submit(DailyAgentUsage, values, release):
+            return False
+        with self._pending_lock:
+            self._pending_cost_eur[values["date"]] += values["cost_eur"]
+        return True
+
+    def submit_release(self, day: date, amount_eur: float) -> bool:
+        """Queue the release of an unused budget reservation. Returns False when the caller must write it itself."""
+        return self._submit(DailySpendRollup, None, (day, amount_eur))
+
+    def submit_metrics(self, values: dict) -> bool:
+        """Queue an `agent_usage_metrics` row. Returns False when the caller must write it itself."""
+        return self._submit(AgentUsageMetrics, values)
+
+    def _submit(self, model: Any, values: Optional[dict], release: Optional[tuple[date, float]] = None) -> bool:
+        if not self._accepting or self._queue is None or self._loop is None:
+            return False
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is not self._loop:
+            # Off the event loop (worker thread): a synchronous write blocks no stream.
+            return False
+        try:
+            self._queue.put_nowait((model, values, release))
+        except asyncio.QueueFull:
+            logger.warning(f"Usage writer queue full ({self._max_queue_size}); writing synchronously")
+            return False
+        return True
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self._flush_seconds
+            while len(batch) < self._batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Drain anything that was queued behind the stop marker.
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        if remaining:
+            await self._flush(remaining)
+
+    async def _write(self, batch: list[_Item]) -> list[_Item]:
+        """Write `batch` and settle the pending cost of its committed rows; returns the failed items."""
+        try:
+            failed = await asyncio.to_thread(_write_batch, batch)
+        except Exception as e:
+            logger.error(f"Usage writer flush failed ({len(batch)} rows): {e}")
+            failed = batch
+        failed_ids = {id(item) for item in failed}
+        with self._pending_lock:
+            for item in batch:
+                model, values, _release = item
+                if id(item) not in failed_ids and model is DailyAgentUsage and values is not None:
+                    self._pending_cost_eur[values["date"]] -= values["cost_eur"]
+            for day in [day for day, cost in self._pending_cost_eur.items() if cost <= 1e-12]:
+                del self._pending_cost_eur[day]
+        return failed
+
+    async def _flush(self, batch: list[_Item]) -> None:
+        failed = await self._write(batch)
+        for attempt in range(self._max_retries):
+            if not failed:
+                break
+            delay = self._retry_base_seconds * 2**attempt
+            logger.warning(f"Usage writer retrying {len(failed)} rows in {delay:.1f}s")
+            self.retried_rows += len(failed)
+            await asyncio.sleep(delay)
+            failed = await self._write(failed)
+        if len(failed) > 1:
+            # One bad row must not take the rest of the batch with it.
+            failed = [item for row in failed for item in await self._write([row])]
+        if failed:
+            # Their cost stays pending: the spend happened even though it was not recorded.
+            self.dropped_rows += len(failed)
+            logger.error(f"Usage writer dropped {len(failed)} rows after {self._max_retries} retries")
+        logger.info(f"Usage writer flushed {len(batch)} rows (queue_depth={self.queue_depth})")
+
+
+usage_writer = UsageWriter(
+    batch_size=api_settings.usage_writer_batch_size,
+    flush_seconds=api_settings.usage_writer_flush_seconds,
+    max_queue_size=api_settings.usage_writer_max_queue_size,
+    max_retries=api_settings.usage_writer_max_retries,
+    retry_base_seconds=api_settings.usage_writer_retry_base_seconds,
+)
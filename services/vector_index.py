@@ -0,0 +1,293 @@
+"""
+HNSW index lifecycle for the knowledge vector tables.
+
+`hex_gig_embeddings` and `ssc_psych_embeddings` are searched with
+`IndexedHybridPgVector`, whose semantic half is an ANN search that only stays
+fast while an HNSW index with the opclass matching the search distance
+exists — `vector_cosine_ops` for agno's default cosine distance. An
+index with another opclass (or an invalid one left behind by a failed
+concurrent build) is silently ignored by the planner, and every query
+full-scans the table again.
+
+`ensure_vector_index` checks a PgVector table's ``{table}_hnsw_index`` (agno's
+own index name, so `PgVector.optimize` sees it as existing) and:
+
+- creates it with ``CREATE INDEX CONCURRENTLY`` when it is missing;
+- rebuilds it concurrently (build a replacement, then swap names) when it is
+  invalid, uses the wrong access method or opclass, was built with other
+  `m`/`ef_construction` values, or the table has grown by
+  `VECTOR_INDEX_REBUILD_GROWTH` times since the last build (the row count at
+  build time is kept in the index comment);
+- reports the index size and build time.
+
+A Postgres advisory lock per table keeps concurrent workers from building the
+same index twice. `hnsw_index()` is the PgVector `vector_index` config the
+knowledge bases use, so queries run with ``SET LOCAL hnsw.ef_search`` from
+`VECTOR_INDEX_HNSW_EF_SEARCH` (agno's default of 5 returns fewer rows than
+the knowledge search asks for).
+
+Runs after knowledge loading at startup (unless
+`MANAGE_VECTOR_INDEX_ON_STARTUP=false`) and from
+scripts/manage_vector_indexes.py.
+"""
+
+import os
+import re
+import time
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Any, Optional
+
+from sqlalchemy import text
+
+from services.env import env_number
+
+logger = getLogger(__name__)
+
+DEFAULT_HNSW_M = 16
+DEFAULT_HNSW_EF_CONSTRUCTION = 64
+DEFAULT_HNSW_EF_SEARCH = 40
+DEFAULT_REBUILD_GROWTH = 2.0
+
+# Keyed by agno's Distance values (a str enum).
+_OPCLASS_BY_DISTANCE = {
+    "cosine": "vector_cosine_ops",
+    "l2": "vector_l2_ops",
+    "max_inner_product": "vector_ip_ops",
+}
+_BUILT_ROWS_RE = re.compile(r"rows=(\d+)")
+
+_INDEX_STATE_SQL = text(
+    """
+    SELECT am.amname AS method,
+           opc.opcname AS opclass,
+           c.reloptions AS options,
+           i.indisvalid AS valid,
+           pg_relation_size(c.oid) AS size_bytes,
+           obj_description(c.oid, 'pg_class') AS comment
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_am am ON am.oid = c.relam
+    JOIN pg_opclass opc ON opc.oid = i.indclass[0]
+    WHERE n.nspname = :schema AND c.relname = :name
+    """
+)
+
+
+@dataclass(frozen=True)
+class HnswSettings:
+    """Build and query parameters of the knowledge HNSW indexes."""
+
+    m: int = DEFAULT_HNSW_M
+    ef_construction: int = DEFAULT_HNSW_EF_CONSTRUCTION
+    ef_search: int = DEFAULT_HNSW_EF_SEARCH
+    rebuild_growth: float = DEFAULT_REBUILD_GROWTH
+    maintenance_work_mem: Optional[str] = None
+
+
+def get_hnsw_settings() -> HnswSettings:
+    """HNSW settings from the environment (read directly, like the other knowledge settings)."""
+    return HnswSettings(
+        m=env_number("VECTOR_INDEX_HNSW_M", DEFAULT_HNSW_M, int),
+        ef_construction=env_number("VECTOR_INDEX_HNSW_EF_CONSTRUCTION", DEFAULT_HNSW_EF_CONSTRUCTION, int),
+        ef_search=env_number("VECTOR_INDEX_HNSW_EF_SEARCH", DEFAULT_HNSW_EF_SEARCH, int),
+        rebuild_growth=env_number("VECTOR_INDEX_REBUILD_GROWTH", DEFAULT_REBUILD_GROWTH, float),
+        maintenance_work_mem=os.getenv("VECTOR_INDEX_MAINTENANCE_WORK_MEM") or None,
+    )
+
+
+def hnsw_index(settings: Optional[HnswSettings] = None):
+    """PgVector `vector_index` config (agno HNSW); its `ef_search` is set on every vector search."""
+    from agno.vectordb.pgvector.index import HNSW
+
+    settings = settings or get_hnsw_settings()
+    # No `configuration`: agno's default SETs maintenance_work_mem = 2GB when
+    # PgVector.optimize builds the index, more than the B1ms database has.
+    return HNSW(m=settings.m, ef_construction=settings.ef_construction, ef_search=settings.ef_search, configuration={})
+
+
+@dataclass
+class IndexState:
+    """What the catalog says about an existing index."""
+
+    method: str
+    opclass: str
+    options: dict[str, str]
+    valid: bool
+    size_bytes: int
+    built_rows: Optional[int] = None
+
+
+@dataclass
+class VectorIndexReport:
+    """Outcome of one `ensure_vector_index` run."""
+
+    table: str
+    index_name: str
+    action: str  # ok | created | rebuilt | planned | skipped | failed
+    reason: str
+    rows: int
+    size_bytes: int = 0
+    build_seconds: Optional[float] = None
+
+    def summary(self) -> str:
+        line = f"{self.table} {self.index_name}: {self.action}"
+        if self.reason:
+            line += f" ({self.reason})"
+        line += f" — {self.rows} rows, {self.size_bytes / 1_048_576:.1f} MB"
+        if self.build_seconds is not None:
+            line += f", built in {self.build_seconds:.1f}s"
+        return line
+
+
+def parse_reloptions(options: Optional[list[str]]) -> dict[str, str]:
+    """``['m=16', 'ef_construction=64']`` -> ``{'m': '16', 'ef_construction': '64'}``."""
+    return dict(option.split("=", 1) for option in options or [] if "=" in option)
+
+
+def rebuild_reason(state: Optional[IndexState], rows: int, opclass: str, settings: HnswSettings) -> Optional[str]:
+    """Why the index must be (re)built, or None when it is fine as it is."""
+    if state is None:
+        return "missing"
+    if not state.valid:
+        return "invalid (failed concurrent build)"
+    if state.method != "hnsw":
+        return f"{state.method} index, expected hnsw"
+    if state.opclass != opclass:
+        return f"opclass {state.opclass}, expected {opclass}"
+    built = {"m": str(settings.m), "ef_construction": str(settings.ef_construction)}
+    if {key: state.options.get(key) for key in built} != built:
+        return f"built with {state.options}, settings are {built}"
+    if state.built_rows and settings.rebuild_growth > 0 and rows >= state.built_rows * settings.rebuild_growth:
+        return f"grew from {state.built_rows} to {rows} rows"
+    return None
+
+
+def _index_state(conn, schema: str, name: str) -> Optional[IndexState]:
+    row = conn.execute(_INDEX_STATE_SQL, {"schema": schema, "name": name}).mappings().first()
+    if row is None:
+        return None
+    match = _BUILT_ROWS_RE.search(row["comment"] or "")
+    return IndexState(
+        method=row["method"],
+        opclass=row["opclass"],
+        options=parse_reloptions(row["options"]),
+        valid=row["valid"],
+        size_bytes=row["size_bytes"],
+        built_rows=int(match.group(1)) if match else None,
+    )
+
+
+def _record_built_rows(conn, schema: str, name: str, rows: int) -> None:
+    conn.execute(text(f'COMMENT ON INDEX "{schema}"."{name}" IS \'rows={rows}\''))
+
+
+def distance_opclass(vector_db: Any) -> str:
+    """pgvector operator class matching the PgVector's search distance."""
+    return _OPCLASS_BY_DISTANCE.get(vector_db.distance, "vector_cosine_ops")
+
+
+def hnsw_index_ddl(
+    schema: str, table: str, name: str, opclass: str, settings: HnswSettings, where: Optional[str] = None
+) -> str:
+    """CREATE INDEX CONCURRENTLY statement of an HNSW index, partial when `where` is given."""
+    ddl = (
+        f'CREATE INDEX CONCURRENTLY "{name}" ON "{schema}"."{table}" '
+        f"USING hnsw (embedding {opclass}) "
+        f"WITH (m = {int(settings.m)}, ef_construction = {int(settings.ef_construction)})"
+    )
+    return f"{ddl} WHERE {where}" if where else ddl
+
+
+def set_maintenance_work_mem(conn, settings: HnswSettings) -> None:
+    if settings.maintenance_work_mem:
+        conn.execute(
+            text("SELECT set_config('maintenance_work_mem', :value, false)"), {"value": settings.maintenance_work_mem}
+        )
+
+
+def _build(conn, schema: str, table: str, name: str, opclass: str, settings: HnswSettings) -> None:
+    set_maintenance_work_mem(conn, settings)
+    conn.execute(text(hnsw_index_ddl(schema, table, name, opclass, settings)))
+
+
+def ensure_vector_index(
+    vector_db: Any,
+    settings: Optional[HnswSettings] = None,
+    force_rebuild: bool = False,
+    dry_run: bool = False,
+) -> VectorIndexReport:
+    """
+    Create or rebuild a PgVector table's HNSW index when needed, without blocking writes.
+
+    Args:
+        vector_db: The knowledge base's PgVector
+        settings: HNSW parameters (default: from the environment)
+        force_rebuild: Rebuild even when the index looks fine
+        dry_run: Only report what would be done ("planned")
+
+    Returns:
+        VectorIndexReport with the action taken, index size and build time
+    """
+    settings = settings or get_hnsw_settings()
+    schema, table = vector_db.schema, vector_db.table_name
+    name = f"{table}_hnsw_index"
+    opclass = distance_opclass(vector_db)
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    with vector_db.db_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        rows = conn.execute(text(f'SELECT count(*) FROM "{schema}"."{table}"')).scalar_one()
+        state = _index_state(conn, schema, name)
+        reason = rebuild_reason(state, rows, opclass, settings)
+        if reason is None and force_rebuild:
+            reason = "forced"
+        size_bytes = state.size_bytes if state else 0
+
+        if reason is None:
+            if state.built_rows is None:
+                _record_built_rows(conn, schema, name, rows)  # baseline for the growth threshold
+            return VectorIndexReport(f"{schema}.{table}", name, "ok", "", rows, size_bytes)
+        if dry_run:
+            return VectorIndexReport(f"{schema}.{table}", name, "planned", reason, rows, size_bytes)
+
+        lock_key = f"vector_index:{schema}.{table}"
+        if not conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": lock_key}).scalar_one():
+            return VectorIndexReport(
+                f"{schema}.{table}",
+                name,
+                "skipped",
+                f"{reason}; another process holds the build lock",
+                rows,
+                size_bytes,
+            )
+        try:
+            logger.info(f"Building HNSW index {name} on {schema}.{table} ({reason}, {rows} rows)")
+            started = time.monotonic()
+            if state is None:
+                _build(conn, schema, table, name, opclass, settings)
+            else:
+                # Build the replacement next to the old index, which keeps serving
+                # queries until the swap.
+                replacement = f"{name}_new"
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{schema}"."{replacement}"'))
+                _build(conn, schema, table, replacement, opclass, settings)
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{schema}"."{name}"'))
+                conn.execute(text(f'ALTER INDEX "{schema}"."{replacement}" RENAME TO "{name}"'))
+            build_seconds = time.monotonic() - started
+            _record_built_rows(conn, schema, name, rows)
+            built = _index_state(conn, schema, name)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": lock_key})
+
+    report = VectorIndexReport(
+        f"{schema}.{table}",
+        name,
+        "created" if state is None else "rebuilt",
+        reason,
+        rows,
+        built.size_bytes if built else 0,
+        build_seconds,
+    )
+    logger.info(report.summary())
+    return report
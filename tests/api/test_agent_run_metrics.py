@@ -14,6 +14,7 @@ import pytest
 
 from api.routes.agents import RunRequest, chat_response_streamer, create_agent_run
 from api.settings import api_settings
+from services.budget_service import BudgetReservation
 
 
 def make_chunk(content="hello", metrics=None):
@@ -76,6 +77,39 @@ class TestStreamingMetrics:
         assert kwargs["user_id"] == "user-1"
         assert kwargs["duration_seconds"] is not None
 
+    async def test_success_settles_reservation_with_usage(self):
+        metrics = SimpleNamespace(input_tokens=10, output_tokens=5, total_tokens=15, duration=1.2)
+        agent = make_streaming_agent([make_chunk(metrics=metrics)])
+        reservation = BudgetReservation(day=datetime.now(timezone.utc).date(), amount_eur=0.05)
+
+        with (
+            patch("api.routes.agents.record_agent_metrics"),
+            patch("api.routes.agents.record_usage") as mock_usage,
+            patch("api.routes.agents.release_reservation") as mock_release,
+        ):
+            async for _ in chat_response_streamer(agent, "msg", has_budget=True, reservation=reservation):
+                pass
+
+        assert mock_usage.call_args.kwargs["reservation"] is reservation
+        mock_release.assert_called_once_with(reservation)
+
+    async def test_client_disconnect_releases_reservation(self):
+        """Closing the stream mid-run (client went away) returns the reserved budget."""
+        agent = make_streaming_agent([make_chunk(), make_chunk()])
+        reservation = BudgetReservation(day=datetime.now(timezone.utc).date(), amount_eur=0.05)
+
+        with (
+            patch("api.routes.agents.record_agent_metrics"),
+            patch("api.routes.agents.record_usage") as mock_usage,
+            patch("api.routes.agents.release_reservation") as mock_release,
+        ):
+            stream = chat_response_streamer(agent, "msg", has_budget=True, reservation=reservation)
+            await stream.__anext__()
+            await stream.aclose()
+
+        mock_usage.assert_not_called()
+        mock_release.assert_called_once_with(reservation)
+
     async def test_stream_failure_without_budget_records_nothing(self):
         """Metrics recording stays gated on has_budget, also on the error path."""
         agent = make_streaming_agent([make_chunk()], error=RuntimeError("boom"))
@@ -97,22 +131,44 @@ class TestNonStreamingMetrics:
 
         agent = MagicMock()
         agent.arun = AsyncMock(side_effect=RuntimeError("azure timeout"))
+        reservation = BudgetReservation(day=reset_time.date(), amount_eur=0.05)
 
         with (
             patch("api.routes.agents.check_budget_available", return_value=(True, 1.5, reset_time)),
             patch("api.routes.agents.get_agent", return_value=agent),
+            patch("api.routes.agents.reserve_budget", return_value=reservation),
+            patch("api.routes.agents.release_reservation") as mock_release,
             patch("api.routes.agents.record_agent_metrics") as mock_record,
         ):
             request = RunRequest(message="hi", stream=False, session_id="sess-2", user_id="user-2")
             with pytest.raises(RuntimeError, match="azure timeout"):
                 await create_agent_run(agent_id="hex", body=request)
 
+        mock_release.assert_called_once_with(reservation)
         mock_record.assert_called_once()
         kwargs = mock_record.call_args.kwargs
         assert kwargs["response_status"] == "error"
         assert kwargs["session_id"] == "sess-2"
         assert kwargs["user_id"] == "user-2"
 
+    async def test_unstarted_stream_releases_reservation(self, monkeypatch):
+        """A stream whose body never runs (early disconnect) still returns its reservation."""
+        monkeypatch.setattr(api_settings, "daily_budget_eur", 2.0)
+        reset_time = datetime.now(timezone.utc) + timedelta(hours=5)
+        reservation = BudgetReservation(day=reset_time.date(), amount_eur=0.05)
+
+        with (
+            patch("api.routes.agents.check_budget_available", return_value=(True, 1.5, reset_time)),
+            patch("api.routes.agents.get_agent", return_value=make_streaming_agent([make_chunk()])),
+            patch("api.routes.agents.reserve_budget", return_value=reservation),
+            patch("api.routes.agents.release_reservation") as mock_release,
+        ):
+            request = RunRequest(message="hi", stream=True, session_id="sess-5", user_id="user-5")
+            response = await create_agent_run(agent_id="hex", body=request)
+            await response.background()
+
+        mock_release.assert_called_once_with(reservation)
+
     async def test_budget_exceeded_records_user_id(self, monkeypatch):
         monkeypatch.setattr(api_settings, "daily_budget_eur", 2.0)
         reset_time = datetime.now(timezone.utc) + timedelta(hours=5)
@@ -128,3 +184,22 @@ class TestNonStreamingMetrics:
         kwargs = mock_record.call_args.kwargs
         assert kwargs["response_status"] == "budget_exceeded"
         assert kwargs["user_id"] == "user-3"
+
+    async def test_refused_reservation_returns_budget_exceeded(self, monkeypatch):
+        """Concurrent runs can all pass the pre-check; the locked reservation is the real gate."""
+        monkeypatch.setattr(api_settings, "daily_budget_eur", 2.0)
+        reset_time = datetime.now(timezone.utc) + timedelta(hours=5)
+        agent = MagicMock()
+
+        with (
+            patch("api.routes.agents.check_budget_available", return_value=(True, 0.01, reset_time)),
+            patch("api.routes.agents.get_agent", return_value=agent),
+            patch("api.routes.agents.reserve_budget", return_value=None),
+            patch("api.routes.agents.record_agent_metrics") as mock_record,
+        ):
+            request = RunRequest(message="hi", stream=False, session_id="sess-4", user_id="user-4")
+            response = await create_agent_run(agent_id="hex", body=request)
+
+        assert response.status_code == 429
+        agent.arun.assert_not_called()
+        assert mock_record.call_args.kwargs["response_status"] == "budget_exceeded"
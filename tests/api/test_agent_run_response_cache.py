@@ -0,0 +1,117 @@
+"""
+Unit tests for the semantic response cache in the agent run route.
+
+Calls create_agent_run / chat_response_streamer directly with a stub agent and a
+fresh cache, so no app startup, embedder or database is required.
+Run with: pytest tests/api/test_agent_run_response_cache.py -v
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from api.routes.agents import RunRequest, chat_response_streamer, create_agent_run
+from api.settings import api_settings
+from services.response_cache import SemanticResponseCache
+
+CITATIONS = [{"title": "Aufnahmeverfahren", "url": "https://ssc-psychologie.univie.ac.at/aufnahme"}]
+
+
+def make_agent(previous_runs=None):
+    agent = MagicMock()
+    agent.id = "ssc_psych"
+    agent.name = "SSC Psych"
+    agent.knowledge.vector_db.embedder.get_embedding.return_value = [1.0, 0.0]
+    agent.aget_session = AsyncMock(return_value=SimpleNamespace(runs=previous_runs) if previous_runs else None)
+    agent.asave_session = AsyncMock()
+    agent.arun = MagicMock(side_effect=AssertionError("cache hit must not run the model"))
+    return agent
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(api_settings, "response_cache_enabled", True)
+    cache = SemanticResponseCache(similarity_threshold=0.95, ttl_seconds=60.0, max_entries=8)
+    _, ticket = cache.lookup("ssc_psych", [1.0, 0.0])
+    cache.store(ticket, "Der Aufnahmetest ist im August.", CITATIONS)
+    with patch("api.routes.agents.response_cache", cache):
+        yield cache
+
+
+def _sse_events(frames: list[str]) -> list[dict]:
+    return [json.loads(frame.split("data: ", 1)[1]) for frame in frames]
+
+
+class TestCacheHit:
+    async def test_stream_replays_run_events_and_citations(self, cache, monkeypatch):
+        monkeypatch.setattr(api_settings, "daily_budget_eur", 2.0)
+        reset_time = datetime.now(timezone.utc) + timedelta(hours=5)
+        agent = make_agent()
+
+        with (
+            patch("api.routes.agents.check_budget_available", return_value=(True, 1.5, reset_time)),
+            patch("api.routes.agents.get_agent", return_value=agent),
+            patch("api.routes.agents.reserve_budget") as mock_reserve,
+            patch("api.routes.agents.record_agent_metrics") as mock_record,
+        ):
+            request = RunRequest(message="Wann ist der Aufnahmetest?", stream=True, session_id="s1", user_id="u1")
+            response = await create_agent_run(agent_id="ssc_psych", body=request)
+            frames = [frame async for frame in response.body_iterator]
+
+        events = _sse_events(frames)
+        assert [event["event"] for event in events] == ["RunStarted", "RunContent", "RunCompleted", "Citations"]
+        assert events[1]["content"] == "Der Aufnahmetest ist im August."
+        assert events[3]["citations"] == CITATIONS
+        mock_reserve.assert_not_called()
+        assert mock_record.call_args.kwargs["response_status"] == "cache_hit"
+        assert mock_record.call_args.kwargs["user_id"] == "u1"
+        agent.asave_session.assert_awaited_once()  # follow-ups see the replayed turn
+
+    async def test_non_stream_returns_cached_payload(self, cache, monkeypatch):
+        monkeypatch.setattr(api_settings, "daily_budget_eur", None)
+        agent = make_agent()
+
+        with patch("api.routes.agents.get_agent", return_value=agent):
+            request = RunRequest(message="Wann ist der Aufnahmetest?", stream=False, session_id="s1")
+            response = await create_agent_run(agent_id="ssc_psych", body=request)
+
+        payload = json.loads(response.body)
+        assert payload["content"] == "Der Aufnahmetest ist im August."
+        assert payload["citations"] == CITATIONS
+        assert payload["cached"] is True
+
+    async def test_follow_up_messages_are_not_served_from_cache(self, cache, monkeypatch):
+        monkeypatch.setattr(api_settings, "daily_budget_eur", None)
+        agent = make_agent(previous_runs=[object()])
+        agent.arun = AsyncMock(return_value=SimpleNamespace(content="live", references=None, metrics=None))
+
+        with patch("api.routes.agents.get_agent", return_value=agent):
+            request = RunRequest(message="Und wann ist die Anmeldung?", stream=False, session_id="s1")
+            response = await create_agent_run(agent_id="ssc_psych", body=request)
+
+        agent.arun.assert_awaited_once()
+        assert response["content"] == "live"
+        agent.knowledge.vector_db.embedder.get_embedding.assert_not_called()
+
+
+class TestCacheMiss:
+    async def test_completed_stream_is_stored(self, cache):
+        cache.invalidate()
+        _, ticket = cache.lookup("ssc_psych", [0.0, 1.0])
+
+        async def arun(message, stream=True, stream_events=True, session_id=None):
+            yield SimpleNamespace(
+                event="RunCompleted", content="Die Anmeldung endet im Juli.", metrics=None, references=None
+            )
+
+        agent = MagicMock()
+        agent.arun = arun
+
+        async for _ in chat_response_streamer(agent, "Anmeldung?", cache_ticket=ticket):
+            pass
+
+        cached, _ = cache.lookup("ssc_psych", [0.0, 1.0])
+        assert cached.content == "Die Anmeldung endet im Juli."
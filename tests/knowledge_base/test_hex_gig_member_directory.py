@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from knowledge_base import hex_gig_knowledge_base
+from knowledge_base.hex_gig_member_directory import (
+    MemberDirectory,
+    count_network_members,
+    count_network_members_by,
+    get_member_directory,
+    list_network_members,
+)
+
+MEMBERS_CSV = (
+    "first_name,last_name,email_address,academic_position,"
+    "faculty_affiliation,department_affiliation,discipline,uni_wien_url,gender\n"
+    "Ada,Lovelace,Ada@univie.ac.at,Full Professor,Faculty of Psychology,Dept A,Psychology,https://u/ada,f\n"
+    "Grace,Hopper,grace@univie.ac.at,Assistant Professor,Faculty of Psychology,Dept B,Sport Psychology,https://u/grace,f\n"
+    "Alan,Turing,alan@univie.ac.at,Full Professor,Faculty of Social sciences,Dept C,Sociology,https://u/alan,m\n"
+    "Emmy,Noether,emmy@univie.ac.at,,Faculty of Life sciences,Dept D,,https://u/emmy,f\n"
+)
+
+
+@pytest.fixture
+def members_csv(tmp_path, monkeypatch):
+    path = tmp_path / "members.csv"
+    path.write_text(MEMBERS_CSV, encoding="utf-8")
+    monkeypatch.setattr(hex_gig_knowledge_base, "HEX_GIG_MEMBERS_CSV", path)
+    get_member_directory.cache_clear()
+    yield path
+    get_member_directory.cache_clear()
+
+
+def test_counts_are_exact_per_facet(members_csv):
+    assert json.loads(count_network_members(faculty="faculty of psychology")) == {
+        "count": 2,
+        "total_members": 4,
+        "matched": {"faculty": ["Faculty of Psychology"]},
+    }
+    assert json.loads(count_network_members(faculty="Psychology", position="Full Professor"))["count"] == 1
+    assert json.loads(count_network_members())["count"] == 4
+
+
+def test_partial_values_match_every_containing_value(members_csv):
+    result = json.loads(count_network_members(discipline="psychology"))
+
+    # Exact value wins over the values containing it
+    assert result["matched"] == {"discipline": ["Psychology"]}
+    assert json.loads(count_network_members(discipline="Psych"))["matched"] == {
+        "discipline": ["Psychology", "Sport Psychology"]
+    }
+
+
+def test_unknown_values_match_nobody(members_csv):
+    assert json.loads(count_network_members(faculty="Faculty of Law")) == {
+        "count": 0,
+        "total_members": 4,
+        "matched": {"faculty": []},
+    }
+
+
+def test_list_returns_every_match_without_excluded_fields(members_csv):
+    result = json.loads(list_network_members(faculty="Psychology"))
+
+    assert [member["name"] for member in result["members"]] == ["Ada Lovelace", "Grace Hopper"]
+    assert result["members"][0]["email_address"] == "ada@univie.ac.at"
+    assert result["members"][0]["uni_wien_url"] == "https://u/ada"
+    assert "gender" not in result["members"][0]
+
+
+def test_group_counts_include_members_without_a_value(members_csv):
+    assert json.loads(count_network_members_by("position"))["counts"] == {
+        "Full Professor": 2,
+        "": 1,
+        "Assistant Professor": 1,
+    }
+    assert "error" in json.loads(count_network_members_by("gender"))
+
+
+def test_directory_is_built_once(members_csv):
+    assert get_member_directory() is get_member_directory()
+    assert len(get_member_directory()) == 4
+
+
+def test_directory_collapses_whitespace_in_values():
+    directory = MemberDirectory({"A B": {"faculty_affiliation": " Faculty  of Law "}})
+
+    assert directory.find(faculty="faculty of law")[0] == ["A B"]
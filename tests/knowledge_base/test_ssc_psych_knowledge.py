@@ -5,10 +5,12 @@ Tests URL parsing, content extraction, metadata schema, and language detection.
 Run with: pytest tests/knowledge_base/test_ssc_psych_knowledge.py -v
 """
 
+import hashlib
 from io import BytesIO
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 
-import requests
+import httpx
+import pytest
 from pypdf import PdfWriter
 
 from services.ssc_web_scraper import (
@@ -134,35 +136,43 @@ class TestContentHash:
         assert all(c in "0123456789abcdef" for c in h)
 
 
+def _mock_client(handler):
+    """Patch target for `_get_client`: an httpx client answering from `handler(request)`."""
+    return lambda settings: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture(autouse=True)
+def _no_crawl_delay(monkeypatch):
+    # Rate 0 disables the politeness limit (no waits in tests)
+    monkeypatch.setenv("SSC_CRAWL_RATE_PER_SECOND", "0")
+
+
 class TestScrapeWebPages:
     """Tests for the full web scraping pipeline (mocked HTTP)."""
 
-    @patch("services.ssc_web_scraper._get_session")
-    @patch("services.ssc_web_scraper.time.sleep")  # Skip delays in tests
-    def test_scrape_returns_correct_metadata_schema(self, mock_sleep, mock_session):
+    PAGE_HTML = """
+    <html><head><title>Bachelorstudium</title></head>
+    <body>
+        <h1>Bachelorstudium Psychologie</h1>
+        <div class="content-main">
+            <p>Das Bachelorstudium Psychologie vermittelt grundlegende Kenntnisse
+            und Kompetenzen in den zentralen Bereichen der Psychologie als Wissenschaft.</p>
+            <a href="/studium/bachelor/#anchor">Bachelor</a>
+            <a href="/studium/bachelor/?print=1">Print</a>
+            <a href="https://www.univie.ac.at/">Uni Wien</a>
+        </div>
+    </body></html>
+    """
+
+    async def test_scrape_returns_correct_metadata_schema(self):
         """Scraped pages should have the expected metadata keys."""
-        from services.ssc_web_scraper import scrape_ssc_web_pages
-
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.headers = {"content-type": "text/html; charset=utf-8"}
-        mock_response.text = """
-        <html><head><title>Bachelorstudium</title></head>
-        <body>
-            <h1>Bachelorstudium Psychologie</h1>
-            <div class="content-main">
-                <p>Das Bachelorstudium Psychologie vermittelt grundlegende Kenntnisse
-                und Kompetenzen in den zentralen Bereichen der Psychologie als Wissenschaft.</p>
-            </div>
-        </body></html>
-        """
-        mock_response.raise_for_status = MagicMock()
+        from services.ssc_web_scraper import ascrape_ssc_web_pages
 
-        session = MagicMock()
-        session.get.return_value = mock_response
-        mock_session.return_value = session
+        def handler(request):
+            return httpx.Response(200, headers={"content-type": "text/html; charset=utf-8"}, text=self.PAGE_HTML)
 
-        results = scrape_ssc_web_pages()
+        with patch("services.ssc_web_scraper._get_client", _mock_client(handler)):
+            results = await ascrape_ssc_web_pages()
 
         assert len(results) > 0
         first = results[0]
@@ -177,10 +187,45 @@ class TestScrapeWebPages:
         assert meta["language"] in ("de", "en")
         assert "content_hash" in meta
 
+    async def test_each_page_is_fetched_once(self):
+        """Links differing only in fragment or query are the same page; external links are not followed."""
+        from services.ssc_web_scraper import ascrape_ssc_web_pages
+
+        requested: list[str] = []
+
+        def handler(request):
+            requested.append(str(request.url))
+            return httpx.Response(200, headers={"content-type": "text/html; charset=utf-8"}, text=self.PAGE_HTML)
+
+        with patch("services.ssc_web_scraper._get_client", _mock_client(handler)):
+            results = await ascrape_ssc_web_pages()
+
+        assert sorted(r["metadata"]["source_url"] for r in results) == [
+            "https://ssc-psychologie.univie.ac.at/en/studium/",
+            "https://ssc-psychologie.univie.ac.at/studium/",
+            "https://ssc-psychologie.univie.ac.at/studium/bachelor/",
+        ]
+        assert len(requested) == 3
+        assert [r["metadata"]["source_url"] for r in results] == sorted(r["metadata"]["source_url"] for r in results)
+
+    async def test_failed_page_is_skipped(self):
+        from services.ssc_web_scraper import ascrape_ssc_web_pages
+
+        def handler(request):
+            if request.url.path.startswith("/en/"):
+                return httpx.Response(503)
+            return httpx.Response(200, headers={"content-type": "text/html; charset=utf-8"}, text=self.PAGE_HTML)
+
+        with patch("services.ssc_web_scraper._get_client", _mock_client(handler)):
+            results = await ascrape_ssc_web_pages()
+
+        assert all(r["metadata"]["language"] == "de" for r in results)
+        assert len(results) == 2
+
 
 class TestScrapeDownloads:
     """Regression tests for issue #38 — subfolder traversal and Word-doc support
-    in scrape_ssc_downloads (mocked HTTP)."""
+    in ascrape_ssc_downloads (mocked HTTP)."""
 
     ROOT_HTML = """
     <html><body><div class="content-main">
@@ -196,134 +241,248 @@ class TestScrapeDownloads:
     """
     EMPTY_HTML = "<html><body><div class='content-main'></div></body></html>"
 
-    def _fake_session(self, pdf_overrides: dict[str, bytes] | None = None):
+    def _handler(self, pdf_overrides: dict[str, bytes] | None = None):
         overrides = pdf_overrides or {}
         default_pdf = _pdf_bytes()
 
-        def fake_get(url, timeout=None):
-            response = MagicMock()
-            response.raise_for_status = MagicMock()
+        def handler(request):
+            url = str(request.url)
             if url.lower().endswith((".pdf", ".docx")):
-                response.headers = {"content-type": "application/octet-stream"}
                 filename = url.rsplit("/", 1)[-1]
                 if filename in overrides:
-                    response.content = overrides[filename]
+                    content = overrides[filename]
                 elif url.lower().endswith(".pdf"):
-                    response.content = default_pdf
+                    content = default_pdf
                 else:
-                    response.content = b"fake file bytes"
+                    content = b"fake file bytes"
+                return httpx.Response(200, headers={"content-type": "application/octet-stream"}, content=content)
+            if "tx_filelist_filelist" in url:
+                text = self.SUBFOLDER_HTML
+            elif "/en/downloads/" in url:
+                text = self.EMPTY_HTML
             else:
-                response.headers = {"content-type": "text/html; charset=utf-8"}
-                if "tx_filelist_filelist" in url:
-                    response.text = self.SUBFOLDER_HTML
-                elif "/en/downloads/" in url:
-                    response.text = self.EMPTY_HTML
-                else:
-                    response.text = self.ROOT_HTML
-            return response
+                text = self.ROOT_HTML
+            return httpx.Response(200, headers={"content-type": "text/html; charset=utf-8"}, text=text)
 
-        session = MagicMock()
-        session.get.side_effect = fake_get
-        return session
+        return handler
 
-    @patch("services.ssc_web_scraper._get_session")
-    @patch("services.ssc_web_scraper.time.sleep")
-    def test_subfolder_pages_are_traversed(self, mock_sleep, mock_session):
-        """Bug 1: query-param subfolder pages must not collapse into the root visited key."""
-        from services.ssc_web_scraper import scrape_ssc_downloads
+    async def _scrape(self, handler) -> list[dict]:
+        from services.ssc_web_scraper import ascrape_ssc_downloads
 
-        mock_session.return_value = self._fake_session()
-        results = scrape_ssc_downloads()
+        with patch("services.ssc_web_scraper._get_client", _mock_client(handler)):
+            return await ascrape_ssc_downloads()
+
+    async def test_subfolder_pages_are_traversed(self):
+        """Bug 1: query-param subfolder pages must not collapse into the root visited key."""
+        results = await self._scrape(self._handler())
 
         urls = {r["metadata"]["source_url"] for r in results}
         assert any(u.endswith("diss_registration.pdf") for u in urls), (
             "PDF linked only from the tx_filelist subfolder page was not collected"
         )
 
-    @patch("services.ssc_web_scraper._get_session")
-    @patch("services.ssc_web_scraper.time.sleep")
-    def test_docx_files_are_collected(self, mock_sleep, mock_session):
+    async def test_docx_files_are_collected(self):
         """Bug 2: .docx links must be downloaded and tagged as word_document."""
-        from services.ssc_web_scraper import scrape_ssc_downloads
-
-        mock_session.return_value = self._fake_session()
-        results = scrape_ssc_downloads()
+        results = await self._scrape(self._handler())
 
         docx = [r for r in results if str(r["path"]).endswith(".docx")]
         assert len(docx) == 1
         assert docx[0]["metadata"]["source_type"] == "word_document"
         assert "DOCX" in docx[0]["name"]
 
-    @patch("services.ssc_web_scraper._get_session")
-    @patch("services.ssc_web_scraper.time.sleep")
-    def test_pdfs_keep_pdf_metadata(self, mock_sleep, mock_session):
-        from services.ssc_web_scraper import scrape_ssc_downloads
-
-        mock_session.return_value = self._fake_session()
-        results = scrape_ssc_downloads()
+    async def test_pdfs_keep_pdf_metadata(self):
+        results = await self._scrape(self._handler())
 
         pdfs = [r for r in results if str(r.get("path", "")).endswith(".pdf")]
         assert len(pdfs) == 2
         assert all(r["metadata"]["source_type"] == "pdf_document" for r in pdfs)
 
-    @patch("services.ssc_web_scraper._get_session")
-    @patch("services.ssc_web_scraper.time.sleep")
-    def test_transient_download_failure_is_retried(self, mock_sleep, mock_session):
+    async def test_results_are_in_url_order(self):
+        results = await self._scrape(self._handler())
+
+        urls = [r["metadata"]["source_url"] for r in results]
+        assert urls == sorted(urls)
+
+    async def test_same_filename_in_two_folders_gets_two_local_files(self):
+        self.ROOT_HTML = self.ROOT_HTML.replace("/fileadmin/root_form.pdf", "/fileadmin/a/form.pdf")
+        self.SUBFOLDER_HTML = self.SUBFOLDER_HTML.replace("/fileadmin/diss_registration.pdf", "/fileadmin/b/form.pdf")
+
+        results = await self._scrape(self._handler())
+
+        pdfs = {r["metadata"]["source_url"]: r["path"] for r in results if str(r.get("path", "")).endswith(".pdf")}
+        assert len(pdfs) == 2
+        assert len(set(pdfs.values())) == 2
+        assert all(path.name.endswith("_form.pdf") for path in pdfs.values())
+
+    async def test_transient_download_failure_is_retried(self):
         """A single connection abort must not lose the document (observed live:
         SL.P4_E_Registration_for_defense_2016.pdf, RemoteDisconnected)."""
-        from services.ssc_web_scraper import scrape_ssc_downloads
-
-        session = self._fake_session()
-        real_get = session.get.side_effect
+        real_handler = self._handler()
         failed: list[str] = []
 
-        def flaky_get(url, timeout=None):
-            if url.endswith("root_form.pdf") and not failed:
-                failed.append(url)
-                raise requests.ConnectionError("Remote end closed connection without response")
-            return real_get(url, timeout=timeout)
+        def flaky_handler(request):
+            if str(request.url).endswith("root_form.pdf") and not failed:
+                failed.append(str(request.url))
+                raise httpx.RemoteProtocolError("Server disconnected without sending a response.", request=request)
+            return real_handler(request)
 
-        session.get.side_effect = flaky_get
-        mock_session.return_value = session
-        results = scrape_ssc_downloads()
+        results = await self._scrape(flaky_handler)
 
         urls = {r["metadata"]["source_url"] for r in results}
+        assert failed
         assert any(u.endswith("root_form.pdf") for u in urls)
 
-    @patch("services.ssc_web_scraper._get_session")
-    @patch("services.ssc_web_scraper.time.sleep")
-    def test_user_password_pdf_becomes_download_stub(self, mock_sleep, mock_session):
+    async def test_truncated_download_is_retried(self):
+        """A body shorter than its Content-Length is a failed attempt, not a cached file."""
+        real_handler = self._handler()
+        truncated: list[str] = []
+
+        def truncating_handler(request):
+            response = real_handler(request)
+            if str(request.url).endswith("root_form.pdf") and not truncated:
+                truncated.append(str(request.url))
+                return httpx.Response(
+                    200, headers={"content-length": str(len(response.content))}, content=response.content[:10]
+                )
+            return response
+
+        results = await self._scrape(truncating_handler)
+
+        item = next(r for r in results if r["metadata"]["source_url"].endswith("root_form.pdf"))
+        assert truncated
+        assert item["path"].read_bytes() == _pdf_bytes()
+
+    async def test_user_password_pdf_becomes_download_stub(self):
         """A PDF locked with a real user password cannot be parsed — the agent
         must still be able to cite the download link via a stub document."""
-        from services.ssc_web_scraper import scrape_ssc_downloads
-
-        mock_session.return_value = self._fake_session(
-            pdf_overrides={"root_form.pdf": _pdf_bytes(user_password="secret")}
-        )
-        results = scrape_ssc_downloads()
+        results = await self._scrape(self._handler(pdf_overrides={"root_form.pdf": _pdf_bytes(user_password="secret")}))
 
         item = next(r for r in results if r["metadata"]["source_url"].endswith("root_form.pdf"))
         assert "path" not in item
         assert item["metadata"]["source_url"] in item["text_content"]
         assert item["metadata"]["source_type"] == "pdf_document"
 
-    @patch("services.ssc_web_scraper._get_session")
-    @patch("services.ssc_web_scraper.time.sleep")
-    def test_owner_locked_pdf_is_decrypted_in_place(self, mock_sleep, mock_session):
+    async def test_owner_locked_pdf_is_decrypted_in_place(self):
         """Owner-locked PDFs (empty user password — all 5 real SSC cases) must be
         decrypted so the reader can embed their text."""
         from pypdf import PdfReader
 
-        from services.ssc_web_scraper import scrape_ssc_downloads
-
-        mock_session.return_value = self._fake_session(pdf_overrides={"root_form.pdf": _pdf_bytes(user_password="")})
-        results = scrape_ssc_downloads()
+        results = await self._scrape(self._handler(pdf_overrides={"root_form.pdf": _pdf_bytes(user_password="")}))
 
         item = next(r for r in results if r["metadata"]["source_url"].endswith("root_form.pdf"))
         assert "path" in item
         assert PdfReader(str(item["path"])).is_encrypted is False
 
 
+class TestConditionalRecrawl:
+    """A re-crawl with the previous crawl state only parses and returns what changed (mocked HTTP)."""
+
+    FILLER = "Informationen zum Studium der Psychologie an der Universität Wien für Studierende."
+
+    def _page(self, title: str, links: tuple[str, ...] = ()) -> str:
+        anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+        return (
+            f"<html><body><div class='content-main'><h1>{title}</h1><p>{self.FILLER}</p>{anchors}</div></body></html>"
+        )
+
+    def _site(self, pages: dict[str, str], requests: list[tuple[str, int]]):
+        """Serve `pages` (path → body; missing = 404) with ETags, answering If-None-Match with 304."""
+
+        def handler(request):
+            body = pages.get(request.url.path)
+            if body is None:
+                requests.append((request.url.path, 404))
+                return httpx.Response(404)
+            etag = f'"{hashlib.sha256(body.encode()).hexdigest()[:12]}"'
+            if request.headers.get("if-none-match") == etag:
+                requests.append((request.url.path, 304))
+                return httpx.Response(304, headers={"etag": etag})
+            requests.append((request.url.path, 200))
+            content_type = "application/pdf" if request.url.path.endswith(".pdf") else "text/html; charset=utf-8"
+            return httpx.Response(200, headers={"content-type": content_type, "etag": etag}, text=body)
+
+        return _mock_client(handler)
+
+    async def test_unchanged_pages_are_not_returned_but_retained(self):
+        from services.crawl_state import CrawlState
+        from services.ssc_web_scraper import ascrape_ssc_web_pages
+
+        pages = {
+            "/studium/": self._page("Studium", ("/studium/a/", "/studium/b/")),
+            "/studium/a/": self._page("Bachelor"),
+            "/studium/b/": self._page("Master"),
+            "/en/studium/": self._page("Studies"),
+        }
+        requests: list[tuple[str, int]] = []
+        first = CrawlState()
+        with patch("services.ssc_web_scraper._get_client", self._site(pages, requests)):
+            assert len(await ascrape_ssc_web_pages(state=first)) == 4
+
+        pages["/studium/a/"] = self._page("Bachelor (neu)")
+        del pages["/studium/b/"]
+        requests.clear()
+        second = CrawlState(first.records)
+        with patch("services.ssc_web_scraper._get_client", self._site(pages, requests)):
+            results = await ascrape_ssc_web_pages(state=second)
+
+        assert [r["metadata"]["source_url"] for r in results] == ["https://ssc-psychologie.univie.ac.at/studium/a/"]
+        assert results[0]["metadata"]["page_title"] == "Bachelor (neu)"
+        # The root answered 304 and its stored links were still followed.
+        assert sorted(requests) == [
+            ("/en/studium/", 304),
+            ("/studium/", 304),
+            ("/studium/a/", 200),
+            ("/studium/b/", 404),
+        ]
+        # /studium/a/ is replaced and /studium/b/ purged by the reconcile; the rest is kept.
+        assert second.unchanged_urls() == {
+            "https://ssc-psychologie.univie.ac.at/studium/",
+            "https://ssc-psychologie.univie.ac.at/en/studium/",
+        }
+        assert second.unchanged == 2
+
+    async def test_failed_page_keeps_its_previous_state(self):
+        from services.crawl_state import CrawlState
+        from services.ssc_web_scraper import ascrape_ssc_web_pages
+
+        pages = {"/studium/": self._page("Studium", ("/studium/a/",)), "/studium/a/": self._page("Bachelor")}
+        first = CrawlState()
+        with patch("services.ssc_web_scraper._get_client", self._site(pages, [])):
+            await ascrape_ssc_web_pages(state=first)
+
+        def unavailable(request):
+            raise httpx.ConnectError("connection refused", request=request)
+
+        second = CrawlState(first.records)
+        with patch("services.ssc_web_scraper._get_client", _mock_client(unavailable)):
+            assert await ascrape_ssc_web_pages(state=second) == []
+
+        assert set(first.records) <= second.unchanged_urls()
+        # /en/studium/ was a 404 last time: unreachable now, its links (if any) are unknown.
+        assert not second.removals_known()
+
+    async def test_unchanged_documents_are_not_downloaded_again(self):
+        from services.crawl_state import CrawlState
+        from services.ssc_web_scraper import ascrape_ssc_downloads
+
+        pages = {
+            "/downloads/": self._page("Downloads", ("/fileadmin/crawl_state_form.pdf",)),
+            "/fileadmin/crawl_state_form.pdf": "not really a pdf",
+        }
+        requests: list[tuple[str, int]] = []
+        first = CrawlState()
+        with patch("services.ssc_web_scraper._get_client", self._site(pages, requests)):
+            assert len(await ascrape_ssc_downloads(state=first)) == 1
+
+        requests.clear()
+        second = CrawlState(first.records)
+        with patch("services.ssc_web_scraper._get_client", self._site(pages, requests)):
+            assert await ascrape_ssc_downloads(state=second) == []
+
+        assert ("/fileadmin/crawl_state_form.pdf", 304) in requests
+        assert "https://ssc-psychologie.univie.ac.at/fileadmin/crawl_state_form.pdf" in second.unchanged_urls()
+
+
 class TestNonEmptyReaders:
     """Blank documents (image-only pages, empty chunks) 400 against the Azure
     embedder and land in the vector table without embeddings — the readers
@@ -0,0 +1,55 @@
+"""Reference implementation of citation excerpt extraction, shared by the tests and the benchmark."""
+
+from services.citations_service import _WHITESPACE_RE, _query_keywords, _snap_to_whitespace
+
+
+def legacy_extract_excerpt(chunk_content, query, max_chars=200, claim_text=None, exclude_tokens=None):
+    """The original O(k²) extract_excerpt: the reference for the equivalence tests
+    in test_citations_service.py, and the baseline of scripts/benchmark_extract_excerpt.py."""
+    if not chunk_content:
+        return ""
+    content = chunk_content.strip()
+    if len(content) <= max_chars:
+        return _WHITESPACE_RE.sub(" ", content).strip()
+
+    excluded = {tok.lower() for tok in (exclude_tokens or ())}
+    weights = {}
+    for kw in _query_keywords(query):
+        if kw not in excluded:
+            weights[kw] = 1
+    for kw in _query_keywords(claim_text or ""):
+        if kw not in excluded:
+            weights[kw] = 2
+
+    lowered = content.lower()
+    occurrences = []
+    for kw in weights:
+        pos = lowered.find(kw)
+        while pos != -1:
+            occurrences.append((pos, kw))
+            pos = lowered.find(kw, pos + 1)
+
+    if not occurrences:
+        if excluded:
+            return legacy_extract_excerpt(content, query, max_chars, claim_text=claim_text)
+        window = content[:max_chars]
+        return _WHITESPACE_RE.sub(" ", window).strip() + "…"
+
+    occurrences.sort()
+    lead = max_chars // 4
+    best_start = 0
+    best_score = -1
+    for anchor, _kw in occurrences:
+        w_start = anchor - lead
+        w_end = w_start + max_chars
+        in_window = {kw for pos, kw in occurrences if w_start <= pos < w_end}
+        score = sum(weights[kw] for kw in in_window)
+        if score > best_score:
+            best_score = score
+            best_start = w_start
+
+    start, end = _snap_to_whitespace(content, best_start, best_start + max_chars)
+    excerpt = _WHITESPACE_RE.sub(" ", content[start:end]).strip()
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(content) else ""
+    return f"{prefix}{excerpt}{suffix}"
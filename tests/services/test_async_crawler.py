@@ -0,0 +1,117 @@
+"""Tests for the rate-limited asyncio crawler."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services.async_crawler import AsyncCrawler, CrawlSettings, TokenBucket, get_crawl_settings
+
+
+async def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=20, burst=2)
+    started = time.monotonic()
+
+    for _ in range(2):
+        await bucket.acquire()
+    burst_elapsed = time.monotonic() - started
+    for _ in range(2):
+        await bucket.acquire()
+    paced_elapsed = time.monotonic() - started
+
+    assert burst_elapsed < 0.04
+    assert paced_elapsed >= 0.09  # two more tokens at 20/s
+
+
+async def test_zero_rate_disables_the_limit():
+    bucket = TokenBucket(rate=0, burst=1)
+    started = time.monotonic()
+
+    for _ in range(50):
+        await bucket.acquire()
+
+    assert time.monotonic() - started < 0.05
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("SSC_CRAWL_RATE_PER_SECOND", "0.5")
+    monkeypatch.setenv("SSC_CRAWL_BURST", "0")
+    monkeypatch.setenv("SSC_CRAWL_MAX_IN_FLIGHT", "3")
+
+    assert get_crawl_settings() == CrawlSettings(rate_per_second=0.5, burst=1, max_in_flight=3)
+
+
+async def test_in_flight_requests_are_bounded():
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, text="ok")
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        crawler = AsyncCrawler(client, CrawlSettings(rate_per_second=0, max_in_flight=3))
+        await asyncio.gather(*(crawler.fetch(f"https://example.org/{i}") for i in range(12)))
+
+    assert peak == 3
+
+
+async def test_crawl_visits_each_key_once_breadth_first():
+    links = {
+        "/": ["/a", "/b", "/a#top"],
+        "/a": ["/", "/c"],
+        "/b": ["/c", "/d"],
+        "/c": [],
+        "/d": ["/b"],
+    }
+    visited: list[str] = []
+
+    async def visit(url):
+        visited.append(url)
+        return links[url]
+
+    async with httpx.AsyncClient() as client:
+        crawler = AsyncCrawler(client, CrawlSettings(rate_per_second=0, max_in_flight=1))
+        count = await crawler.crawl(["/"], key=lambda url: url.split("#")[0], visit=visit)
+
+    assert visited == ["/", "/a", "/b", "/c", "/d"]
+    assert count == 5
+
+
+async def test_failed_visit_is_skipped():
+    async def visit(url):
+        if url == "/broken":
+            raise httpx.ConnectError("refused")
+        return ["/broken", "/ok"] if url == "/" else []
+
+    async with httpx.AsyncClient() as client:
+        crawler = AsyncCrawler(client, CrawlSettings(rate_per_second=0))
+        assert await crawler.crawl(["/"], key=str, visit=visit) == 3
+
+
+async def test_unexpected_error_cancels_the_visits_in_flight():
+    cancelled: list[str] = []
+
+    async def visit(url):
+        if url == "/":
+            return ["/slow", "/bad"]
+        if url == "/bad":
+            raise ValueError("unparsable page")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+        return []
+
+    async with httpx.AsyncClient() as client:
+        crawler = AsyncCrawler(client, CrawlSettings(rate_per_second=0))
+        with pytest.raises(ValueError, match="unparsable"):
+            await asyncio.wait_for(crawler.crawl(["/"], key=str, visit=visit), 1)
+
+    assert cancelled == ["/slow"]
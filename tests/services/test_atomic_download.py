@@ -0,0 +1,78 @@
+"""Tests for the shared streaming download writer."""
+
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from services.atomic_download import IncompleteDownloadError, awrite_chunks, expected_length, write_chunks
+
+
+def test_complete_download_replaces_the_target(tmp_path):
+    target = tmp_path / "docs" / "form.pdf"
+
+    assert write_chunks(iter([b"%PDF", b"-1.4"]), target, expected_size=8) == 8
+
+    assert target.read_bytes() == b"%PDF-1.4"
+    assert [p.name for p in target.parent.iterdir()] == ["form.pdf"]
+
+
+def test_short_download_leaves_no_partial_file(tmp_path):
+    target = tmp_path / "form.pdf"
+
+    with pytest.raises(IncompleteDownloadError, match="received 4 of 8 bytes"):
+        write_chunks(iter([b"%PDF"]), target, expected_size=8)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_interrupted_download_keeps_the_previous_file(tmp_path):
+    target = tmp_path / "form.pdf"
+    target.write_bytes(b"previous")
+
+    def chunks():
+        yield b"%PDF"
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        write_chunks(chunks(), target)
+
+    assert target.read_bytes() == b"previous"
+    assert [p.name for p in tmp_path.iterdir()] == ["form.pdf"]
+
+
+def test_content_length_is_ignored_for_encoded_bodies():
+    assert expected_length({"content-length": "120"}) == 120
+    assert expected_length({"content-length": "120", "content-encoding": "gzip"}) is None
+    assert expected_length({}) is None
+
+
+async def test_async_write_syncs_and_renames_off_the_event_loop(tmp_path):
+    target = tmp_path / "paper.pdf"
+    fsync_threads = []
+
+    async def chunks():
+        yield b"%PDF"
+        yield b"-1.4"
+
+    with patch(
+        "services.atomic_download.os.fsync", side_effect=lambda fd: fsync_threads.append(threading.current_thread())
+    ):
+        assert await awrite_chunks(chunks(), target, expected_size=8) == 8
+
+    assert target.read_bytes() == b"%PDF-1.4"
+    assert fsync_threads and threading.main_thread() not in fsync_threads
+
+
+async def test_async_short_read_keeps_previous_file(tmp_path):
+    target = tmp_path / "paper.pdf"
+    target.write_bytes(b"old")
+
+    async def chunks():
+        yield b"%PDF"
+
+    with pytest.raises(IncompleteDownloadError):
+        await awrite_chunks(chunks(), target, expected_size=8)
+
+    assert target.read_bytes() == b"old"
+    assert list(tmp_path.iterdir()) == [target]
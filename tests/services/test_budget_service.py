@@ -5,7 +5,8 @@ Tests follow TDD approach - written before implementation.
 Run with: pytest tests/services/test_budget_service.py -v
 """
 
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
 from unittest.mock import patch
 from zoneinfo import ZoneInfo
 
@@ -16,10 +17,16 @@ from api.settings import api_settings
 # These imports will fail until implementation is complete
 from services.budget_service import (
     BUDGET_TIMEZONE,
+    BudgetLedger,
+    BudgetReservation,
     calculate_cost_eur,
     check_budget_available,
+    estimate_run_cost_eur,
     get_next_reset_time_utc,
     get_today_vienna,
+    record_usage,
+    release_reservation,
+    reserve_budget,
 )
 
 
@@ -96,6 +103,178 @@ class TestBudgetAvailability:
         assert remaining == 0
 
 
+class TestBudgetLedger:
+    """Unit tests for the in-process budget ledger."""
+
+    @patch("services.budget_service._query_daily_spend_eur", return_value=1.25)
+    def test_loads_once_then_serves_from_memory(self, mock_query):
+        """Repeated reads within the resync interval should hit the DB once."""
+        ledger = BudgetLedger(resync_seconds=3600)
+
+        assert ledger.spend_eur() == 1.25
+        assert ledger.spend_eur() == 1.25
+        mock_query.assert_called_once()
+
+    @patch("services.budget_service._query_daily_spend_eur", return_value=1.0)
+    def test_add_accumulates_without_db(self, mock_query):
+        """Recorded spend for today is added in memory."""
+        ledger = BudgetLedger(resync_seconds=3600)
+        today = get_today_vienna()
+        ledger.spend_eur()
+
+        ledger.add(today, 0.5)
+        ledger.add(today, 0.25)
+
+        assert ledger.spend_eur() == pytest.approx(1.75)
+        mock_query.assert_called_once()
+
+    @patch("services.budget_service._query_daily_spend_eur", return_value=1.0)
+    def test_add_for_other_day_is_ignored(self, mock_query):
+        """Spend stamped with another date must not leak into today's total."""
+        ledger = BudgetLedger(resync_seconds=3600)
+        ledger.spend_eur()
+
+        ledger.add(get_today_vienna() - timedelta(days=1), 5.0)
+
+        assert ledger.spend_eur() == 1.0
+
+    @patch("services.budget_service._query_daily_spend_eur", side_effect=[1.0, 2.0])
+    def test_resyncs_after_interval(self, mock_query):
+        """A zero interval forces every read back to Postgres."""
+        ledger = BudgetLedger(resync_seconds=0)
+
+        assert ledger.spend_eur() == 1.0
+        assert ledger.spend_eur() == 2.0
+        assert mock_query.call_count == 2
+
+    @patch("services.budget_service._query_daily_spend_eur", side_effect=[1.5, 0.0])
+    @patch("services.budget_service.get_today_vienna")
+    def test_resyncs_at_vienna_midnight(self, mock_today, mock_query):
+        """A new Vienna date resets the ledger from the DB even inside the interval."""
+        ledger = BudgetLedger(resync_seconds=3600)
+
+        mock_today.return_value = date(2026, 3, 28)
+        assert ledger.spend_eur() == 1.5
+
+        mock_today.return_value = date(2026, 3, 29)
+        assert ledger.spend_eur() == 0.0
+        assert mock_query.call_args.args == (date(2026, 3, 29),)
+
+
+class TestRecordUsage:
+    """record_usage should prefer the background writer and keep the ledger current."""
+
+    @patch("services.budget_service.SessionLocal")
+    @patch("services.budget_service.budget_ledger")
+    @patch("services.budget_service.usage_writer")
+    def test_queues_row_when_writer_running(self, mock_writer, mock_ledger, mock_session_local):
+        mock_writer.submit_usage.return_value = True
+
+        record_usage(input_tokens=1000, output_tokens=500)
+
+        values = mock_writer.submit_usage.call_args.args[0]
+        assert values["input_tokens"] == 1000
+        assert values["output_tokens"] == 500
+        mock_ledger.add.assert_called_once_with(values["date"], values["cost_eur"])
+        mock_session_local.assert_not_called()
+
+    @patch("services.budget_service.SessionLocal")
+    @patch("services.budget_service.budget_ledger")
+    @patch("services.budget_service.usage_writer")
+    def test_writes_synchronously_when_writer_stopped(self, mock_writer, mock_ledger, mock_session_local):
+        mock_writer.submit_usage.return_value = False
+
+        record_usage(input_tokens=1000, output_tokens=500)
+
+        mock_session_local.return_value.commit.assert_called_once()
+        mock_ledger.add.assert_called_once()
+
+    @patch("services.budget_service.SessionLocal")
+    @patch("services.budget_service.budget_ledger")
+    @patch("services.budget_service.usage_writer")
+    def test_settles_reservation_with_the_usage_row(self, mock_writer, mock_ledger, mock_session_local):
+        mock_writer.submit_usage.return_value = True
+        reservation = BudgetReservation(day=date(2026, 3, 28), amount_eur=0.05)
+
+        record_usage(input_tokens=1000, output_tokens=500, reservation=reservation)
+
+        assert mock_writer.submit_usage.call_args.kwargs["release"] == (date(2026, 3, 28), 0.05)
+        assert reservation.closed is True
+
+
+class TestBudgetReservation:
+    """reserve_budget should gate runs on spend + outstanding reservations under a row lock."""
+
+    @pytest.fixture(autouse=True)
+    def pinned_budget(self, monkeypatch):
+        monkeypatch.setattr(api_settings, "daily_budget_eur", 2.0)
+        monkeypatch.setattr(api_settings, "model_pricing_input_eur", 1.87)
+        monkeypatch.setattr(api_settings, "model_pricing_output_eur", 7.48)
+
+    def _locked_row(self, mock_lock, cost_eur: float, reserved_eur: float):
+        row = SimpleNamespace(cost_eur=cost_eur, reserved_eur=reserved_eur, updated_at=None)
+        mock_lock.return_value = row
+        return row
+
+    @patch("services.budget_service.usage_writer")
+    @patch("services.budget_service.lock_daily_spend")
+    @patch("services.budget_service.SessionLocal")
+    def test_reserves_when_budget_allows(self, mock_session_local, mock_lock, mock_writer):
+        mock_writer.pending_cost_eur.return_value = 0.0
+        row = self._locked_row(mock_lock, cost_eur=1.0, reserved_eur=0.5)
+
+        reservation = reserve_budget(0.25)
+
+        assert reservation is not None
+        assert reservation.amount_eur == 0.25
+        assert row.reserved_eur == pytest.approx(0.75)
+        mock_session_local.return_value.commit.assert_called_once()
+
+    @patch("services.budget_service.usage_writer")
+    @patch("services.budget_service.lock_daily_spend")
+    @patch("services.budget_service.SessionLocal")
+    def test_refuses_when_reservations_would_overshoot(self, mock_session_local, mock_lock, mock_writer):
+        """Outstanding reservations count against the budget, not only recorded spend."""
+        mock_writer.pending_cost_eur.return_value = 0.0
+        row = self._locked_row(mock_lock, cost_eur=1.0, reserved_eur=0.9)
+
+        assert reserve_budget(0.25) is None
+        assert row.reserved_eur == 0.9
+        mock_session_local.return_value.rollback.assert_called_once()
+        mock_session_local.return_value.commit.assert_not_called()
+
+    @patch("services.budget_service.SessionLocal")
+    @patch("services.budget_service.usage_writer")
+    def test_release_is_idempotent(self, mock_writer, mock_session_local):
+        mock_writer.submit_release.return_value = True
+        reservation = BudgetReservation(day=date(2026, 3, 28), amount_eur=0.05)
+
+        release_reservation(reservation)
+        release_reservation(reservation)
+        release_reservation(None)
+
+        mock_writer.submit_release.assert_called_once_with(date(2026, 3, 28), 0.05)
+        mock_session_local.assert_not_called()
+
+    @patch("services.budget_service.SessionLocal")
+    @patch("services.budget_service.usage_writer")
+    def test_release_failure_is_logged_not_raised(self, mock_writer, mock_session_local):
+        mock_writer.submit_release.return_value = False
+        mock_session_local.return_value.commit.side_effect = Exception("DB connection lost")
+
+        release_reservation(BudgetReservation(day=date(2026, 3, 28), amount_eur=0.05))
+
+        mock_session_local.return_value.rollback.assert_called_once()
+
+    def test_estimate_uses_model_cap_and_per_agent_input(self, monkeypatch):
+        monkeypatch.setattr(api_settings, "budget_input_token_estimates", {"hex": 2000})
+
+        assert estimate_run_cost_eur("hex", 1000) == pytest.approx(calculate_cost_eur(2000, 1000))
+        assert estimate_run_cost_eur("other", None) == pytest.approx(
+            calculate_cost_eur(api_settings.budget_input_token_estimate, api_settings.budget_output_token_estimate)
+        )
+
+
 class TestTimezoneHandling:
     """Tests for Vienna timezone handling."""
 
@@ -1,8 +1,21 @@
 """Unit tests for services.citations_service."""
 
 import json
+import random
+from unittest.mock import patch
 
-from services.citations_service import build_citations, extract_excerpt, format_citations_sse
+from api.project_configs.hex_gig_config import HEX_GIG_CITATION_RESOLVERS
+from api.project_configs.vax_study_config import VAX_STUDY_CITATION_RESOLVERS
+from knowledge_base.marhinovirus_knowledge_base import get_normal_catalog_url
+from services.citations_service import (
+    CitationBuilder,
+    CitationResolvers,
+    CitationSource,
+    build_citations,
+    extract_excerpt,
+    format_citations_sse,
+)
+from tests.services.excerpt_reference import legacy_extract_excerpt
 
 # Abridged verbatim from the live "Informationen für Studienbeginner*innen" page —
 # the chunk behind the Peer-Mentoring chip regression. The page header (which the
@@ -26,6 +39,35 @@ _STUDIENBEGINNER_CHUNK = (
 )
 
 
+class TestExtractExcerptEquivalence:
+    """The linear window search must match the original algorithm byte for byte."""
+
+    # Overlapping and prefix-sharing stems, so occurrences overlap and nest.
+    _VOCAB = ["stud", "studium", "dium", "psych", "psychologie", "logie", "antrag", "anträge", "frist", "ÜBER"]
+
+    def _text(self, rng: random.Random, words: int) -> str:
+        filler = ["der", "und", "xx", "Semester", "\n", "Info", "-", "u:find"]
+        return " ".join(rng.choice(self._VOCAB + filler) + rng.choice(["", "", "en", "s", "."]) for _ in range(words))
+
+    def test_randomized_equivalence(self):
+        rng = random.Random(7)
+        for _ in range(2000):
+            content = self._text(rng, rng.randint(0, 120))
+            query = " ".join(rng.sample(self._VOCAB, rng.randint(0, 4)))
+            claim = self._text(rng, rng.randint(0, 8)) if rng.random() < 0.6 else None
+            exclude = rng.sample(self._VOCAB, rng.randint(0, 2)) if rng.random() < 0.4 else None
+            max_chars = rng.choice([1, 7, 40, 80, 200])
+            kwargs = {"max_chars": max_chars, "claim_text": claim, "exclude_tokens": exclude}
+            assert extract_excerpt(content, query, **kwargs) == legacy_extract_excerpt(content, query, **kwargs)
+
+    def test_regression_chunk_equivalence(self):
+        query = "Wie bewerbe ich mich für den Bachelor Psychologie?"
+        for max_chars in (60, 120, 200, 400):
+            assert extract_excerpt(_STUDIENBEGINNER_CHUNK, query, max_chars=max_chars) == legacy_extract_excerpt(
+                _STUDIENBEGINNER_CHUNK, query, max_chars=max_chars
+            )
+
+
 class TestExtractExcerpt:
     def test_short_content_returned_as_is(self):
         content = "Bachelor Psychologie deadline is March 15."
@@ -214,6 +256,151 @@ class TestBuildCitations:
         assert {c["source_url"] for c in out} == {url_a, url_b}
 
 
+class TestCitationBuilder:
+    """The streaming builder must produce exactly what build_citations does on the full answer."""
+
+    _URL_A = "https://ssc.example/studienbeginn/"
+    _URL_B = "https://ssc.example/kontakt/"
+
+    def _refs(self) -> list:
+        kontakt = "Kontakt Kontaktseite des SSC. " + "filler " * 40 + "Montag bis Freitag von 9 bis 12 Uhr geöffnet."
+        return [
+            {
+                "query": "q",
+                "references": [
+                    {"name": "a", "meta_data": {"source_url": self._URL_A}, "content": _STUDIENBEGINNER_CHUNK},
+                    {
+                        "name": "b",
+                        "meta_data": {"source_url": self._URL_B, "page_title": "Kontakt"},
+                        "content": kontakt,
+                    },
+                ],
+            }
+        ]
+
+    def _answer(self) -> str:
+        return (
+            f"Im ersten Semester sind die STEOP-Vorlesungen vorgesehen ([Studienbeginn]({self._URL_A})).\r\n"
+            f"Das SSC ist Montag bis Freitag geöffnet ([Kontakt]({self._URL_B}))."
+        )
+
+    def _stream(self, builder: CitationBuilder, text: str, rng: random.Random) -> None:
+        pos = 0
+        while pos < len(text):
+            step = rng.randint(1, 12)
+            builder.add_answer_delta(text[pos : pos + step])
+            pos += step
+
+    def test_matches_build_citations_for_any_delta_split(self):
+        query = "Welche Vorlesungen im ersten Semester?"
+        expected = build_citations(self._refs(), query=query, answer_text=self._answer())
+        rng = random.Random(37)
+        for _ in range(50):
+            builder = CitationBuilder(query)
+            builder.set_references(self._refs())
+            self._stream(builder, self._answer(), rng)
+            assert builder.build(answer_text=self._answer()) == expected
+
+    def test_references_after_the_citing_line(self):
+        """Agentic search can deliver references after the answer already cited them."""
+        query = "Öffnungszeiten"
+        builder = CitationBuilder(query)
+        builder.add_answer_delta(self._answer())
+        builder.set_references(self._refs())
+
+        assert builder.build(answer_text=self._answer()) == build_citations(
+            self._refs(), query=query, answer_text=self._answer()
+        )
+
+    def test_cited_source_is_resolved_before_build(self):
+        builder = CitationBuilder("Öffnungszeiten")
+        builder.set_references(self._refs())
+        first_line = self._answer().splitlines(keepends=True)[0]
+
+        with patch("services.citations_service.extract_excerpt", wraps=extract_excerpt) as mock_extract:
+            builder.add_answer_delta(first_line)
+            assert mock_extract.call_count == 1
+            builder.build(answer_text=first_line)
+        # Only the source never cited on a completed line is left for build().
+        contents = [call.args[0] for call in mock_extract.call_args_list]
+        assert contents.count(_STUDIENBEGINNER_CHUNK) == 1
+
+    def test_final_answer_overrides_streamed_text(self):
+        query = "x"
+        builder = CitationBuilder(query)
+        builder.set_references(self._refs())
+        builder.add_answer_delta("unrelated text\n")
+
+        assert builder.build(answer_text=self._answer()) == build_citations(
+            self._refs(), query=query, answer_text=self._answer()
+        )
+
+
+class TestCitationResolvers:
+    """Per-project resolvers decide which chunks are cited and under which URL."""
+
+    def _refs(self, *chunks) -> list:
+        return [{"query": "test", "references": list(chunks), "time": 0.01}]
+
+    def test_dispatches_on_source_type_with_default(self):
+        resolvers = CitationResolvers(
+            {"news": lambda name, meta: CitationSource(meta["link"], "News", "news", "en")},
+            default=lambda name, meta: None,
+        )
+        refs = self._refs(
+            {"name": "n", "meta_data": {"source_type": "news", "link": "https://n.example/"}, "content": "x"},
+            {"name": "o", "meta_data": {"source_type": "other", "source_url": "https://o.example/"}, "content": "y"},
+        )
+
+        out = build_citations(refs, query="x", resolvers=resolvers)
+
+        assert [c["source_url"] for c in out] == ["https://n.example/"]
+
+    def test_hex_gig_sources(self):
+        refs = self._refs(
+            {
+                "name": "HeX Research - Ada Lovelace",
+                "meta_data": {
+                    "source_type": "research_paper",
+                    "doi": "https://doi.org/10.1/x",
+                    "uni_wien_url": "https://ufind.example/ada",
+                },
+                "content": "paper",
+            },
+            {
+                "name": "HeX News - Launch",
+                "meta_data": {"source_type": "news_article", "link": "https://gig.example/news/1", "title": "Launch"},
+                "content": "news",
+            },
+            {
+                "name": "HeX Member - grace hopper",
+                "meta_data": {"source_type": "member_profile", "uni_wien_url": "https://ufind.example/grace"},
+                "content": "profile",
+            },
+            {"name": "HeX Research - No Links", "meta_data": {"source_type": "research_paper"}, "content": "orphan"},
+        )
+
+        out = build_citations(refs, query="x", resolvers=HEX_GIG_CITATION_RESOLVERS)
+
+        assert [(c["source_url"], c["title"], c["source_type"]) for c in out] == [
+            ("https://doi.org/10.1/x", "HeX Research - Ada Lovelace", "research_paper"),
+            ("https://gig.example/news/1", "Launch", "news_article"),
+            ("https://ufind.example/grace", "HeX Member - grace hopper", "member_profile"),
+        ]
+
+    def test_vax_catalog_pages(self):
+        refs = self._refs(
+            {"name": "Marhinovirus Normal Catalog", "meta_data": {"page": 3}, "content": "side effects"},
+            {"name": "Marhinovirus Normal Catalog", "meta_data": {"page": 3}, "content": "same page"},
+        )
+
+        out = build_citations(refs, query="side effects", resolvers=VAX_STUDY_CITATION_RESOLVERS)
+
+        assert len(out) == 1
+        assert out[0]["source_url"] == f"{get_normal_catalog_url()}#page=3"
+        assert out[0]["language"] == "en"
+
+
 class TestFormatCitationsSse:
     """The agent-ui stream parser drops SSE framing lines and routes on the
     `event` key inside the data JSON — these tests pin that contract."""
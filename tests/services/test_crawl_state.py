@@ -0,0 +1,139 @@
+"""
+Unit tests for the crawl state behind conditional SSC re-crawls.
+
+SessionLocal is mocked, so no database is required.
+Run with: pytest tests/services/test_crawl_state.py -v
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from services.crawl_state import DOCUMENT, LISTING, WEB_PAGE, CrawlRecord, CrawlState, CrawlStateStore
+
+
+def _previous() -> dict[str, CrawlRecord]:
+    records = [
+        CrawlRecord(url="https://x/studium/", kind=WEB_PAGE, etag='"a1"', content_hash="h1", links=("https://x/b/",)),
+        CrawlRecord(url="https://x/studium/b/", kind=WEB_PAGE, last_modified="Mon, 05 Oct 2026", content_hash="h2"),
+        CrawlRecord(url="https://x/downloads/", kind=LISTING),
+        CrawlRecord(url="https://x/form.pdf", kind=DOCUMENT, etag='"f"', content_hash="h3"),
+    ]
+    return {record.url: record for record in records}
+
+
+class TestCrawlState:
+    def test_conditional_headers_from_previous_validators(self):
+        state = CrawlState(_previous())
+
+        assert state.conditional_headers("https://x/studium/") == {"If-None-Match": '"a1"'}
+        assert state.conditional_headers("https://x/studium/b/") == {"If-Modified-Since": "Mon, 05 Oct 2026"}
+        assert state.conditional_headers("https://x/new/") == {}
+
+    def test_not_modified_keeps_record_and_links(self):
+        state = CrawlState(_previous())
+
+        record = state.keep("https://x/studium/")
+
+        assert record.links == ("https://x/b/",)
+        assert state.records["https://x/studium/"] == record
+        assert state.unchanged == 1
+        assert state.changed == []
+
+    def test_update_detects_changed_content(self):
+        state = CrawlState(_previous())
+
+        assert not state.update(CrawlRecord(url="https://x/studium/", kind=WEB_PAGE, content_hash="h1"))
+        assert state.update(CrawlRecord(url="https://x/studium/b/", kind=WEB_PAGE, content_hash="h2-new"))
+        assert state.update(CrawlRecord(url="https://x/studium/c/", kind=WEB_PAGE, content_hash="h4"))
+
+        assert state.changed == ["https://x/studium/b/", "https://x/studium/c/"]
+
+    def test_unchanged_urls_exclude_changed_and_removed_urls(self):
+        state = CrawlState(_previous())
+        state.update(CrawlRecord(url="https://x/studium/", kind=WEB_PAGE, content_hash="h1"))
+        state.update(CrawlRecord(url="https://x/studium/b/", kind=WEB_PAGE, content_hash="h2-new"))
+        state.update(CrawlRecord(url="https://x/studium/c/", kind=WEB_PAGE, content_hash="h4"))
+        # https://x/downloads/ (listing) and https://x/form.pdf were not found again
+
+        assert {record.url for record in state.removed()} == {"https://x/downloads/", "https://x/form.pdf"}
+        assert state.unchanged_urls() == {"https://x/studium/"}
+
+    def test_failed_fetch_is_not_a_removal(self):
+        previous = _previous()
+        state = CrawlState(previous)
+
+        state.keep("https://x/form.pdf", seen=False)
+
+        assert "https://x/form.pdf" not in {record.url for record in state.removed()}
+        assert state.unchanged_urls() == {"https://x/form.pdf"}
+        assert state.removals_known()
+        assert state.records["https://x/form.pdf"] == previous["https://x/form.pdf"]
+        assert state.unchanged == 0
+
+    def test_failed_fetch_without_previous_record_makes_removals_unknown(self):
+        state = CrawlState({})
+
+        assert state.keep("https://x/studium/", seen=False) is None
+
+        assert state.unchanged_urls() == {"https://x/studium/"}
+        assert not state.removals_known()
+
+    def test_invalidate_forces_the_next_fetch(self):
+        state = CrawlState(_previous())
+        state.keep("https://x/studium/")
+
+        state.invalidate("https://x/studium/")
+
+        record = state.records["https://x/studium/"]
+        assert (record.etag, record.last_modified, record.content_hash) == ("", "", "")
+        assert record.links == ("https://x/b/",)
+
+
+class TestCrawlStateStore:
+    @patch("services.crawl_state.SessionLocal")
+    def test_load_returns_records_by_url(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        row = SimpleNamespace(
+            url="https://x/studium/",
+            kind=WEB_PAGE,
+            etag='"a1"',
+            last_modified=None,
+            content_hash="h1",
+            links=["https://x/b/"],
+            last_seen=None,
+        )
+        mock_db.execute.return_value.scalars.return_value.all.return_value = [row]
+
+        records = CrawlStateStore("ssc-psych").load()
+
+        assert records["https://x/studium/"].links == ("https://x/b/",)
+        assert records["https://x/studium/"].last_modified == ""
+        mock_db.close.assert_called_once()
+
+    @patch("services.crawl_state.SessionLocal")
+    def test_save_replaces_the_source_rows(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+
+        CrawlStateStore("ssc-psych").save(_previous().values())
+
+        (delete_stmt,), (insert_stmt, rows) = [call.args for call in mock_db.execute.call_args_list]
+        assert "DELETE FROM crawl_state" in str(delete_stmt)
+        assert "INSERT INTO crawl_state" in str(insert_stmt)
+        assert {row["source"] for row in rows} == {"ssc-psych"}
+        assert len(rows) == 4
+        mock_db.commit.assert_called_once()
+
+    @patch("services.crawl_state.SessionLocal")
+    def test_missing_table_disables_the_store(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        mock_db.execute.side_effect = Exception('relation "crawl_state" does not exist')
+        store = CrawlStateStore("ssc-psych")
+
+        assert store.load() == {}
+        store.save(_previous().values())
+
+        assert not store.enabled
+        assert mock_db.execute.call_count == 1
@@ -0,0 +1,93 @@
+"""Tests for the cached, process-pool DOI extraction."""
+
+import json
+import os
+
+from pypdf import PdfWriter
+
+from services import doi_extraction
+from services.doi_extraction import DOI_CACHE_FILENAME, EXTRACTION_FAILED, extract_doi_from_pdf, extract_dois
+
+
+def _pdf(path, text=None):
+    """Blank one-page PDF; `text` is appended after the EOF marker, where no reader sees it."""
+    writer = PdfWriter()
+    writer.add_blank_page(width=72, height=72)
+    with path.open("wb") as fh:
+        writer.write(fh)
+    if text:
+        with path.open("ab") as fh:
+            fh.write(text.encode())
+    return path
+
+
+def _counting_extractor(monkeypatch, dois):
+    calls = []
+
+    def extract(path):
+        calls.append(path.name)
+        return dois.get(path.name)
+
+    monkeypatch.setattr(doi_extraction, "extract_doi_from_pdf", extract)
+    return calls
+
+
+def test_warm_cache_parses_no_pdf(tmp_path, monkeypatch):
+    cache_path = tmp_path / DOI_CACHE_FILENAME
+    paths = [_pdf(tmp_path / "a.pdf"), _pdf(tmp_path / "b.pdf")]
+    calls = _counting_extractor(monkeypatch, {"a.pdf": "https://doi.org/10.1000/abcdef"})
+
+    first = extract_dois(paths, cache_path=cache_path, workers=1)
+    second = extract_dois(paths, cache_path=cache_path, workers=1)
+
+    assert first == second == {paths[0]: "https://doi.org/10.1000/abcdef", paths[1]: None}
+    assert sorted(calls) == ["a.pdf", "b.pdf"]  # "no DOI" is cached too
+
+
+def test_changed_file_is_extracted_again(tmp_path, monkeypatch):
+    cache_path = tmp_path / DOI_CACHE_FILENAME
+    path = _pdf(tmp_path / "a.pdf")
+    calls = _counting_extractor(monkeypatch, {})
+    extract_dois([path], cache_path=cache_path, workers=1)
+
+    _pdf(path, text="%% replaced upstream")
+    extract_dois([path], cache_path=cache_path, workers=1)
+
+    assert calls == ["a.pdf", "a.pdf"]
+
+
+def test_failed_extraction_is_not_cached(tmp_path, monkeypatch):
+    cache_path = tmp_path / DOI_CACHE_FILENAME
+    path = _pdf(tmp_path / "a.pdf")
+    calls = _counting_extractor(monkeypatch, {"a.pdf": EXTRACTION_FAILED})
+
+    assert extract_dois([path], cache_path=cache_path, workers=1) == {path: None}
+    extract_dois([path], cache_path=cache_path, workers=1)
+
+    assert calls == ["a.pdf", "a.pdf"]
+    assert json.loads(cache_path.read_text()) == {}
+
+
+def test_unreadable_pdf_is_a_failed_extraction(tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"not a pdf")
+
+    assert extract_doi_from_pdf(path) == EXTRACTION_FAILED
+
+
+def test_removed_files_leave_the_cache(tmp_path, monkeypatch):
+    cache_path = tmp_path / DOI_CACHE_FILENAME
+    a, b = _pdf(tmp_path / "a.pdf"), _pdf(tmp_path / "b.pdf")
+    _counting_extractor(monkeypatch, {})
+    extract_dois([a, b], cache_path=cache_path, workers=1)
+    os.remove(b)
+
+    extract_dois([a, b], cache_path=cache_path, workers=1)
+
+    assert list(json.loads(cache_path.read_text())) == [str(a)]
+
+
+def test_worker_processes_extract_real_pdfs(tmp_path):
+    paths = [_pdf(tmp_path / f"{i}.pdf") for i in range(3)]
+
+    assert extract_dois(paths, workers=2) == {path: None for path in paths}
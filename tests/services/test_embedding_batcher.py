@@ -0,0 +1,111 @@
+"""
+Unit tests for ingestion embedding micro-batching.
+
+Uses a fake batch embedding call; no embedder is required.
+Run with: pytest tests/services/test_embedding_batcher.py -v
+"""
+
+import asyncio
+
+import pytest
+
+from services.embedding_batcher import EmbeddingBatcher, estimate_tokens
+
+
+class FakeEmbedMany:
+    def __init__(self, error: Exception = None):
+        self.requests: list[list[str]] = []
+        self._error = error
+
+    async def __call__(self, texts: list[str]):
+        self.requests.append(list(texts))
+        await asyncio.sleep(0)
+        if self._error is not None:
+            raise self._error
+        tokens = sum(estimate_tokens(text) for text in texts)
+        return [[float(len(text))] for text in texts], {"prompt_tokens": tokens, "total_tokens": tokens}
+
+
+def _batcher(embed_many, **kwargs) -> EmbeddingBatcher:
+    kwargs.setdefault("max_inputs", 64)
+    kwargs.setdefault("max_tokens", 60_000)
+    kwargs.setdefault("linger_seconds", 0.01)
+    return EmbeddingBatcher(embed_many, **kwargs)
+
+
+class TestEmbeddingBatcher:
+    async def test_concurrent_texts_share_one_request(self):
+        embed_many = FakeEmbedMany()
+        batcher = _batcher(embed_many)
+
+        results = await asyncio.gather(*(batcher.embed("x" * n) for n in range(1, 6)))
+
+        assert embed_many.requests == [["x", "xx", "xxx", "xxxx", "xxxxx"]]
+        assert [embedding for embedding, _ in results] == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        assert batcher.requests_sent == 1
+        assert batcher.texts_embedded == 5
+
+    async def test_batches_are_capped_by_input_count(self):
+        embed_many = FakeEmbedMany()
+        batcher = _batcher(embed_many, max_inputs=2)
+
+        await asyncio.gather(*(batcher.embed(f"text {i}") for i in range(5)))
+
+        assert [len(request) for request in embed_many.requests] == [2, 2, 1]
+
+    async def test_batches_are_capped_by_estimated_tokens(self):
+        embed_many = FakeEmbedMany()
+        text = "a" * 299  # 100 estimated tokens
+        batcher = _batcher(embed_many, max_tokens=250)
+
+        await asyncio.gather(*(batcher.embed(text) for _ in range(5)))
+
+        assert [len(request) for request in embed_many.requests] == [2, 2, 1]
+
+    async def test_a_single_text_is_sent_after_the_linger_window(self):
+        embed_many = FakeEmbedMany()
+
+        embedding, _ = await asyncio.wait_for(_batcher(embed_many).embed("alone"), timeout=1)
+
+        assert embedding == [5.0]
+        assert embed_many.requests == [["alone"]]
+
+    async def test_usage_is_split_between_callers(self):
+        batcher = _batcher(FakeEmbedMany())
+
+        results = await asyncio.gather(batcher.embed("a" * 29), batcher.embed("a" * 89))
+
+        assert [usage["prompt_tokens"] for _, usage in results] == [10, 30]
+
+    async def test_a_failed_request_fails_every_caller_in_it(self):
+        batcher = _batcher(FakeEmbedMany(error=RuntimeError("429 Too Many Requests")))
+
+        results = await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def test_vector_count_mismatch_is_an_error(self):
+        async def short(texts):
+            return [[0.0]], None
+
+        batcher = _batcher(short)
+
+        with pytest.raises(ValueError, match="1 vectors for 2 inputs"):
+            await asyncio.gather(batcher.embed("a"), batcher.embed("b"))
+
+    async def test_a_cancelled_request_cancels_its_callers(self):
+        started = asyncio.Event()
+
+        async def hanging(texts):
+            started.set()
+            await asyncio.Event().wait()
+
+        batcher = _batcher(hanging)
+        callers = [asyncio.ensure_future(batcher.embed(text)) for text in ("a", "b")]
+        await started.wait()
+
+        for request in list(batcher._requests):
+            request.cancel()
+        results = await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 1)
+
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
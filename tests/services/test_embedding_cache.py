@@ -0,0 +1,107 @@
+"""
+Unit tests for the persistent content-addressed embedding cache.
+
+SessionLocal is mocked, so no database is required.
+Run with: pytest tests/services/test_embedding_cache.py -v
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.dialects import postgresql
+
+from services.embedding_cache import EmbeddingCache
+from services.excerpt_index import content_hash
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+class TestLookup:
+    @patch("services.embedding_cache.SessionLocal")
+    def test_returns_hits_and_counts_misses(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        mock_db.execute.return_value.all.return_value = [
+            SimpleNamespace(content_hash=content_hash("known"), embedding=[0.5, 0.25])
+        ]
+        cache = EmbeddingCache(enabled=True, max_rows=10)
+
+        found = cache.lookup("text-embedding-3-large", 1536, ["known", "new", "new"])
+
+        assert found == {content_hash("known"): [0.5, 0.25]}
+        assert (cache.hits, cache.misses) == (1, 1)
+        stmt = mock_db.execute.call_args.args[0]
+        assert "UPDATE embedding_cache SET last_used_at" in _sql(stmt)
+        assert "RETURNING embedding_cache.content_hash, embedding_cache.embedding" in _sql(stmt)
+        mock_db.commit.assert_called_once()
+
+    @patch("services.embedding_cache.SessionLocal")
+    def test_missing_table_disables_the_cache(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        mock_db.execute.side_effect = Exception('relation "embedding_cache" does not exist')
+        cache = EmbeddingCache(enabled=True, max_rows=10)
+
+        assert cache.lookup("m", 1536, ["a"]) == {}
+        assert cache.lookup("m", 1536, ["b"]) == {}
+
+        assert not cache.enabled
+        assert mock_db.execute.call_count == 1
+        assert "(disabled)" in cache.summary()
+
+    @patch("services.embedding_cache.SessionLocal")
+    def test_disabled_cache_never_queries(self, mock_session_local):
+        cache = EmbeddingCache(enabled=False, max_rows=10)
+
+        assert cache.lookup("m", 1536, ["a"]) == {}
+        cache.store("m", 1536, ["a"], [[1.0]])
+
+        mock_session_local.assert_not_called()
+
+
+class TestStore:
+    @patch("services.embedding_cache.SessionLocal")
+    def test_stores_non_empty_embeddings_once_per_text(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        cache = EmbeddingCache(enabled=True, max_rows=10)
+
+        with patch.object(cache, "evict") as mock_evict:
+            cache.store("m", 1536, ["a", "a", "failed"], [[1.0], [1.0], []])
+
+        params = mock_db.execute.call_args.args[0].compile().params
+        assert content_hash("a") in params.values()
+        assert content_hash("failed") not in params.values()
+        assert cache.stored == 1
+        mock_evict.assert_called_once()  # first store after startup checks the size limit
+
+
+class TestEvict:
+    @patch("services.embedding_cache.SessionLocal")
+    def test_deletes_least_recently_used_rows_beyond_the_limit(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        count = MagicMock()
+        count.scalar_one.return_value = 13
+        deleted = MagicMock(rowcount=3)
+        mock_db.execute.side_effect = [count, deleted]
+        cache = EmbeddingCache(enabled=True, max_rows=10)
+
+        assert cache.evict() == 3
+
+        delete_sql = _sql(mock_db.execute.call_args_list[1].args[0])
+        assert "DELETE FROM embedding_cache" in delete_sql
+        assert "ORDER BY embedding_cache.last_used_at ASC" in delete_sql
+        assert mock_db.execute.call_args_list[1].args[0].compile().params["param_1"] == 3
+        assert cache.evicted == 3
+
+    @patch("services.embedding_cache.SessionLocal")
+    def test_nothing_is_deleted_under_the_limit(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        mock_db.execute.return_value.scalar_one.return_value = 4
+
+        assert EmbeddingCache(enabled=True, max_rows=10).evict() == 0
+        assert mock_db.execute.call_count == 1
@@ -0,0 +1,144 @@
+"""
+Unit tests for precomputed citation excerpt token indexes.
+
+SessionLocal is mocked, so no database is required.
+Run with: pytest tests/services/test_excerpt_index.py -v
+"""
+
+import random
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import Column, MetaData, String, Table
+
+from services.citations_service import build_citations, extract_excerpt
+from services.excerpt_index import (
+    ExcerptIndexStore,
+    TokenLookup,
+    build_token_index,
+    content_hash,
+    find_indexed_occurrences,
+    index_knowledge_chunks,
+)
+
+_VOCAB = ["because", "cause", "Studium", "Bachelorstudium", "Psychologie", "Frist", "über", "ab", "der", "\n"]
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_VOCAB) + rng.choice(["", ".", "-", "s"]) for _ in range(words))
+
+
+class TestBuildTokenIndex:
+    def test_offsets_refer_to_stripped_lowercased_content(self):
+        index = build_token_index("  Because the Cause, because.")
+
+        assert index == {"because": [0, 19], "the": [8], "cause": [12]}
+
+    def test_indexed_occurrences_include_substrings_of_tokens(self):
+        """Keywords match inside longer tokens, as the text scan always did."""
+        index = build_token_index("Bachelorstudium und Studium")
+
+        assert find_indexed_occurrences(TokenLookup(index), ["studium"]) == [(8, "studium"), (20, "studium")]
+
+    def test_lookup_matches_at_token_starts_ends_and_inside(self):
+        lookup = TokenLookup(build_token_index("Because the Cause, because."))
+
+        assert lookup.occurrences(["cause", "aus", "the", "missing"]) == [
+            (2, "cause"),
+            (3, "aus"),
+            (8, "the"),
+            (12, "cause"),
+            (13, "aus"),
+            (21, "cause"),
+            (22, "aus"),
+        ]
+
+
+class TestIndexedExtractExcerpt:
+    def test_randomized_equivalence_with_text_scan(self):
+        rng = random.Random(8)
+        for _ in range(1000):
+            content = _text(rng, rng.randint(0, 80))
+            query = " ".join(rng.sample(_VOCAB, 3))
+            claim = _text(rng, 5) if rng.random() < 0.5 else None
+            exclude = ["psychologie"] if rng.random() < 0.3 else None
+            kwargs = {"max_chars": rng.choice([10, 60, 200]), "claim_text": claim, "exclude_tokens": exclude}
+
+            scanned = extract_excerpt(content, query, **kwargs)
+            indexed = extract_excerpt(content, query, token_index=TokenLookup(build_token_index(content)), **kwargs)
+            assert indexed == scanned
+
+
+class TestExcerptIndexStore:
+    def test_citations_use_preloaded_index(self):
+        content = "Zulassung " + "filler " * 40 + "Antrag Frist"
+        refs = [{"references": [{"name": "a", "meta_data": {"source_url": "https://a.example/"}, "content": content}]}]
+        store = ExcerptIndexStore()
+        store.update({content_hash(content): build_token_index(content)})
+
+        with (
+            patch("services.citations_service.excerpt_index_store", store),
+            patch("services.citations_service.find_indexed_occurrences", wraps=find_indexed_occurrences) as mock_find,
+        ):
+            indexed = build_citations(refs, query="Antrag Frist", max_excerpt_chars=60)
+
+        mock_find.assert_called_once()
+        assert indexed == build_citations(refs, query="Antrag Frist", max_excerpt_chars=60)
+
+    def test_unknown_content_has_no_index(self):
+        store = ExcerptIndexStore()
+        store.update({content_hash("known"): {}})
+
+        assert store.get("other") is None
+
+
+class TestIndexKnowledgeChunks:
+    @patch("services.excerpt_index.excerpt_index_store")
+    @patch("services.excerpt_index.SessionLocal")
+    def test_indexes_only_new_chunks(self, mock_session_local, mock_store):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        table = Table("ssc_psych_embeddings", MetaData(), Column("content", String))
+        contents = MagicMock()
+        contents.scalars.return_value.all.return_value = ["old chunk", "new chunk", "new chunk", ""]
+        known = MagicMock()
+        known.scalars.return_value.all.return_value = [content_hash("old chunk")]
+        mock_db.execute.side_effect = [contents, known, MagicMock()]
+
+        assert index_knowledge_chunks(SimpleNamespace(table=table)) == 1
+
+        insert_stmt = mock_db.execute.call_args_list[2].args[0]
+        params = insert_stmt.compile().params
+        assert content_hash("new chunk") in params.values()
+        mock_db.commit.assert_called_once()
+        mock_store.preload.assert_called_once()
+
+    @patch("services.excerpt_index.excerpt_index_store")
+    @patch("services.excerpt_index.SessionLocal")
+    def test_indexes_of_removed_chunks_are_deleted(self, mock_session_local, mock_store):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        table = Table("ssc_psych_embeddings", MetaData(), Column("content", String))
+        contents = MagicMock()
+        contents.scalars.return_value.all.return_value = ["kept chunk"]
+        known = MagicMock()
+        known.scalars.return_value.all.return_value = [content_hash("kept chunk"), content_hash("purged chunk")]
+        mock_db.execute.side_effect = [contents, known, MagicMock()]
+
+        assert index_knowledge_chunks(SimpleNamespace(table=table)) == 0
+
+        delete_stmt = mock_db.execute.call_args_list[2].args[0]
+        assert delete_stmt.compile().params["content_hash_1"] == [content_hash("purged chunk")]
+        mock_db.commit.assert_called_once()
+
+    @patch("services.excerpt_index.SessionLocal")
+    def test_preload_replaces_the_loaded_indexes(self, mock_session_local):
+        store = ExcerptIndexStore()
+        store.update({content_hash("purged chunk"): {}})
+        row = SimpleNamespace(content_hash=content_hash("kept chunk"), token_index={"kept": [0]})
+        mock_session_local.return_value.execute.return_value.all.return_value = [row]
+
+        assert store.preload() == 1
+
+        assert store.get("purged chunk") is None
+        assert store.get("kept chunk") is not None
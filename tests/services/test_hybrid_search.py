@@ -0,0 +1,184 @@
+"""
+Unit tests for the index-backed hybrid search query and its text search index.
+
+The query is compiled with the Postgres dialect and the index lifecycle runs
+against a fake connection, so no database is required.
+Run with: pytest tests/services/test_hybrid_search.py -v
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, MetaData, String, Table
+from sqlalchemy.dialects import postgresql
+
+from services.hybrid_search import build_hybrid_search_query, ensure_text_search_index
+
+TABLE = Table(
+    "ssc_psych_embeddings",
+    MetaData(schema="ai"),
+    Column("id", String, primary_key=True),
+    Column("name", String),
+    Column("meta_data", postgresql.JSONB),
+    Column("content", postgresql.TEXT),
+    Column("embedding", Vector(3)),
+    Column("usage", postgresql.JSONB),
+)
+
+
+def _compile(**kwargs):
+    kwargs.setdefault("limit", 5)
+    kwargs.setdefault("candidates", 40)
+    kwargs.setdefault("rrf_k", 60)
+    stmt = build_hybrid_search_query(TABLE, [0.1, 0.2, 0.3], "PSY-101 Aufnahmetest", **kwargs)
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    return " ".join(str(compiled).split()), compiled.params
+
+
+class TestBuildHybridSearchQuery:
+    def test_lexical_candidates_come_from_the_stored_tsvector(self):
+        sql, params = _compile()
+
+        assert "content_tsv @@ (websearch_to_tsquery(" in sql
+        assert "to_tsvector(" not in sql  # never computed per row
+        assert params["query"] == "PSY-101 Aufnahmetest"
+        assert [value for value in params.values() if value in ("german", "english")] == ["german", "english"]
+
+    def test_semantic_candidates_are_an_ordered_ann_scan(self):
+        sql, params = _compile(candidates=30)
+
+        assert "ORDER BY ai.ssc_psych_embeddings.embedding <=> %(embedding_1)s LIMIT" in sql
+        assert list(params.values()).count(30) == 2  # both candidate sets
+
+    def test_candidates_fused_by_reciprocal_rank(self):
+        sql, params = _compile(limit=8, rrf_k=50)
+
+        assert "UNION ALL" in sql
+        assert "sum(%(param_2)s / CAST((%(rank_1)s::INTEGER + ranked.rank) AS NUMERIC)) AS rrf_score" in sql
+        assert params["rank_1"] == 50
+        assert sql.endswith("ORDER BY fused.rrf_score DESC, ai.ssc_psych_embeddings.id LIMIT %(param_5)s::INTEGER")
+        assert params["param_5"] == 8
+
+    def test_filters_apply_to_both_candidate_sets(self):
+        sql, _ = _compile(conditions=[TABLE.c.meta_data.contains({"source_type": "web_page"})])
+
+        assert sql.count("meta_data @> %(meta_data_1)s::JSONB") == 2
+
+    def test_candidate_sets_are_never_smaller_than_the_limit(self):
+        _, params = _compile(limit=50, candidates=10)
+
+        assert list(params.values()).count(50) == 3
+
+
+class FakeConnection:
+    def __init__(self, has_column: bool, index_valid, lock_free: bool = True):
+        self.has_column = has_column
+        self.index_valid = index_valid
+        self.lock_free = lock_free
+        self.statements: list[str] = []
+
+    def execute(self, stmt, params=None):
+        sql = " ".join(str(stmt).split())
+        self.statements.append(sql)
+        result = MagicMock()
+        if sql.startswith("SELECT count(*)"):
+            result.scalar_one.return_value = 50_000
+        elif "information_schema.columns" in sql:
+            result.first.return_value = (1,) if self.has_column else None
+        elif "indisvalid" in sql:
+            result.scalar.return_value = self.index_valid
+        elif "pg_relation_size" in sql:
+            result.scalar.return_value = 2_097_152
+        elif "pg_try_advisory_lock" in sql:
+            result.scalar_one.return_value = self.lock_free
+        return result
+
+
+def _vector_db(conn: FakeConnection):
+    engine = MagicMock()
+    engine.connect.return_value.execution_options.return_value.__enter__.return_value = conn
+    return SimpleNamespace(db_engine=engine, schema="ai", table_name="hex_gig_embeddings")
+
+
+class TestEnsureTextSearchIndex:
+    def test_adds_generated_column_and_gin_index(self):
+        conn = FakeConnection(has_column=False, index_valid=None)
+
+        report = ensure_text_search_index(_vector_db(conn))
+
+        assert (report.action, report.reason, report.rows) == ("created", "missing column", 50_000)
+        alter = next(sql for sql in conn.statements if sql.startswith("ALTER TABLE"))
+        assert "ADD COLUMN IF NOT EXISTS content_tsv tsvector GENERATED ALWAYS AS" in alter
+        assert "WHEN meta_data->>'language' = 'de' THEN 'german'::regconfig ELSE 'english'::regconfig" in alter
+        assert (
+            'CREATE INDEX CONCURRENTLY "hex_gig_embeddings_content_tsv_index" ON "ai"."hex_gig_embeddings" '
+            "USING gin (content_tsv)" in conn.statements
+        )
+
+    def test_invalid_index_is_rebuilt_without_touching_the_column(self):
+        conn = FakeConnection(has_column=True, index_valid=False)
+
+        report = ensure_text_search_index(_vector_db(conn))
+
+        assert report.reason == "invalid"
+        assert not any(sql.startswith("ALTER TABLE") for sql in conn.statements)
+        assert any(sql.startswith("CREATE INDEX CONCURRENTLY") for sql in conn.statements)
+
+    def test_existing_index_is_reported(self):
+        conn = FakeConnection(has_column=True, index_valid=True)
+
+        report = ensure_text_search_index(_vector_db(conn))
+
+        assert (report.action, report.size_bytes) == ("ok", 2_097_152)
+        assert not any(sql.startswith(("ALTER", "CREATE")) for sql in conn.statements)
+
+    def test_dry_run_and_held_lock_build_nothing(self):
+        for conn, kwargs, action in (
+            (FakeConnection(has_column=False, index_valid=None), {"dry_run": True}, "planned"),
+            (FakeConnection(has_column=False, index_valid=None, lock_free=False), {}, "skipped"),
+        ):
+            assert ensure_text_search_index(_vector_db(conn), **kwargs).action == action
+            assert not any(sql.startswith(("ALTER", "CREATE")) for sql in conn.statements)
+
+
+class TestIndexedHybridPgVectorFallback:
+    @staticmethod
+    def _vector_db(column_exists: bool):
+        from knowledge_base import IndexedHybridPgVector
+
+        vector_db = IndexedHybridPgVector.__new__(IndexedHybridPgVector)
+        vector_db.schema, vector_db.table_name = "ai", "ssc_psych_embeddings"
+        sess = MagicMock()
+        sess.execute.return_value.first.return_value = (1,) if column_exists else None
+        vector_db.Session = MagicMock()
+        vector_db.Session.return_value.__enter__.return_value = sess
+        vector_db.embedder = MagicMock()
+        vector_db.vector_search = MagicMock(return_value=["doc"])
+        return vector_db, sess
+
+    def test_missing_column_is_checked_once_and_falls_back_to_vector_search(self):
+        vector_db, sess = self._vector_db(column_exists=False)
+
+        assert vector_db.hybrid_search("Aufnahmetest") == ["doc"]
+        assert vector_db.hybrid_search("Frist") == ["doc"]
+
+        assert sess.execute.call_count == 1
+        assert vector_db.vector_search.call_count == 2
+        vector_db.embedder.get_embedding.assert_not_called()
+
+    def test_missing_column_is_checked_again_after_the_recheck_interval(self):
+        vector_db, sess = self._vector_db(column_exists=False)
+        vector_db.hybrid_search("Aufnahmetest")
+
+        vector_db._text_search_checked_at -= vector_db.TEXT_SEARCH_RECHECK_SECONDS
+        vector_db.hybrid_search("Frist")
+
+        assert sess.execute.call_count == 2
+
+    def test_existing_column_is_cached(self):
+        vector_db, sess = self._vector_db(column_exists=True)
+
+        assert vector_db._text_search_ready()
+        assert vector_db._text_search_ready()
+        assert sess.execute.call_count == 1
@@ -0,0 +1,126 @@
+"""
+Unit tests for bounded-concurrency knowledge ingestion.
+
+Uses a fake Knowledge; no embedder or database is required.
+Run with: pytest tests/services/test_ingestion_executor.py -v
+"""
+
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from services.ingestion_executor import ingest_into_knowledge, is_rate_limit_error, note_rate_limit
+
+
+def _rate_limit_error() -> openai.RateLimitError:
+    response = httpx.Response(429, request=httpx.Request("POST", "https://embedder.example/embeddings"))
+    return openai.RateLimitError("Too Many Requests", response=response, body=None)
+
+
+class FakeKnowledge:
+    def __init__(self, behaviour=None):
+        self.calls: list[dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._behaviour = behaviour or {}
+
+    async def ainsert(self, **kwargs):
+        self.calls.append(kwargs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            outcomes = self._behaviour.get(kwargs["name"])
+            if outcomes:
+                outcome = outcomes.pop(0)
+                if outcome == "noted":
+                    # What the embedder does when PgVector swallows the 429.
+                    note_rate_limit(_rate_limit_error())
+                elif isinstance(outcome, Exception):
+                    raise outcome
+        finally:
+            self.in_flight -= 1
+
+
+def _items(n: int) -> list[dict]:
+    return [{"name": f"doc-{i}", "text_content": f"text {i}", "metadata": {"i": i}} for i in range(n)]
+
+
+async def _ingest(knowledge, items, **kwargs):
+    kwargs.setdefault("retry_base_seconds", 0.001)
+    return await ingest_into_knowledge(knowledge, items, label="test docs", **kwargs)
+
+
+class TestIngestIntoKnowledge:
+    async def test_inserts_run_concurrently_up_to_the_limit(self):
+        knowledge = FakeKnowledge()
+
+        report = await _ingest(knowledge, _items(10), concurrency=3)
+
+        assert knowledge.max_in_flight == 3
+        assert report.inserted == 10
+        assert {call["name"] for call in knowledge.calls} == {f"doc-{i}" for i in range(10)}
+        assert all(call["skip_if_exists"] for call in knowledge.calls)
+
+    async def test_only_insert_arguments_are_forwarded(self):
+        knowledge = FakeKnowledge()
+
+        await _ingest(knowledge, [{"name": "a", "path": "/tmp/a.pdf", "reader": "r", "metadata": {}, "extra": 1}])
+
+        assert knowledge.calls == [
+            {"name": "a", "path": "/tmp/a.pdf", "reader": "r", "metadata": {}, "skip_if_exists": True, "upsert": True}
+        ]
+
+    async def test_swallowed_rate_limit_is_retried_and_replaces_the_attempt(self):
+        knowledge = FakeKnowledge({"doc-1": ["noted"]})
+
+        report = await _ingest(knowledge, _items(3), concurrency=2)
+
+        retried = [call for call in knowledge.calls if call["name"] == "doc-1"]
+        assert [call["skip_if_exists"] for call in retried] == [True, False]
+        assert report.retries == 1
+        assert report.inserted == 3
+        assert report.rate_limited == []
+
+    async def test_rate_limit_on_another_item_does_not_leak(self):
+        knowledge = FakeKnowledge({"doc-0": ["noted"]})
+
+        await _ingest(knowledge, _items(4), concurrency=4)
+
+        assert [call["name"] for call in knowledge.calls].count("doc-0") == 2
+        assert all([call["name"] for call in knowledge.calls].count(f"doc-{i}") == 1 for i in (1, 2, 3))
+
+    async def test_raised_rate_limit_gives_up_after_max_retries(self):
+        knowledge = FakeKnowledge({"doc-0": [_rate_limit_error() for _ in range(5)]})
+
+        report = await _ingest(knowledge, _items(2), max_retries=2)
+
+        assert [call["name"] for call in knowledge.calls].count("doc-0") == 3
+        assert report.rate_limited == ["doc-0"]
+        assert report.inserted == 1
+
+    async def test_other_errors_abort_the_run(self):
+        knowledge = FakeKnowledge({"doc-0": [ValueError("broken pdf")]})
+
+        with pytest.raises(ValueError, match="broken pdf"):
+            await _ingest(knowledge, _items(20), concurrency=2)
+
+        assert len(knowledge.calls) < 20
+
+    async def test_progress_is_reported_per_item(self):
+        progress = []
+
+        await _ingest(FakeKnowledge(), _items(3), on_progress=lambda done, total, item: progress.append((done, total)))
+
+        assert progress == [(1, 3), (2, 3), (3, 3)]
+
+
+class TestIsRateLimitError:
+    def test_detects_openai_and_httpx_429s(self):
+        response = httpx.Response(429, request=httpx.Request("GET", "https://example.org"))
+
+        assert is_rate_limit_error(_rate_limit_error())
+        assert is_rate_limit_error(httpx.HTTPStatusError("429", request=response.request, response=response))
+        assert not is_rate_limit_error(ValueError("429 in the message is not enough"))
@@ -0,0 +1,142 @@
+"""
+Unit tests for the metadata filter indexes of the knowledge vector tables.
+
+The index lifecycle runs against a fake connection, so no database is required.
+Run with: pytest tests/services/test_knowledge_indexes.py -v
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from services.knowledge_indexes import (
+    MetadataFilterIndexes,
+    containment_predicate,
+    ensure_knowledge_indexes,
+    ensure_metadata_indexes,
+)
+from services.vector_index import HnswSettings, VectorIndexReport
+
+SPEC = MetadataFilterIndexes(
+    keys=("source_type", "faculty_affiliation"),
+    selective_filters=(("source_type", "member_profile"),),
+)
+
+
+class FakeConnection:
+    def __init__(self, indexes: dict[str, bool], lock_free: bool = True):
+        self.indexes = indexes
+        self.lock_free = lock_free
+        self.statements: list[str] = []
+
+    def execute(self, stmt, params=None):
+        sql = " ".join(str(stmt).split())
+        self.statements.append(sql)
+        result = MagicMock()
+        if sql.startswith("SELECT count(*)"):
+            result.scalar_one.return_value = 20_000
+        elif "indisvalid" in sql:
+            result.all.return_value = list(self.indexes.items())
+        elif "pg_relation_size" in sql:
+            result.scalar.return_value = 1_048_576
+        elif "pg_try_advisory_lock" in sql:
+            result.scalar_one.return_value = self.lock_free
+        return result
+
+
+def _vector_db(conn: FakeConnection, **attributes):
+    engine = MagicMock()
+    engine.connect.return_value.execution_options.return_value.__enter__.return_value = conn
+    return SimpleNamespace(
+        db_engine=engine, schema="ai", table_name="hex_gig_embeddings", distance="cosine", **attributes
+    )
+
+
+def _created(conn: FakeConnection) -> list[str]:
+    return [sql for sql in conn.statements if sql.startswith("CREATE INDEX")]
+
+
+class TestEnsureMetadataIndexes:
+    def test_creates_gin_expression_and_partial_hnsw_indexes(self):
+        conn = FakeConnection({})
+
+        reports = ensure_metadata_indexes(_vector_db(conn), SPEC, settings=HnswSettings())
+
+        assert [(r.index_name, r.action, r.reason) for r in reports] == [
+            ("hex_gig_embeddings_meta_data_gin_index", "created", "missing"),
+            ("hex_gig_embeddings_meta_source_type_index", "created", "missing"),
+            ("hex_gig_embeddings_meta_faculty_affiliation_index", "created", "missing"),
+            ("hex_gig_embeddings_hnsw_source_type_member_profile_index", "created", "missing"),
+        ]
+        gin, source_type, _, partial = _created(conn)
+        assert gin.endswith('ON "ai"."hex_gig_embeddings" USING gin (meta_data jsonb_path_ops)')
+        assert source_type.endswith("((meta_data->>'source_type'))")
+        assert "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)" in partial
+        assert partial.endswith("""WHERE meta_data @> '{"source_type": "member_profile"}'::jsonb""")
+
+    def test_only_missing_or_invalid_indexes_are_built(self):
+        conn = FakeConnection(
+            {
+                "hex_gig_embeddings_meta_data_gin_index": True,
+                "hex_gig_embeddings_meta_source_type_index": False,
+                "hex_gig_embeddings_meta_faculty_affiliation_index": True,
+                "hex_gig_embeddings_hnsw_source_type_member_profile_index": True,
+            }
+        )
+
+        reports = ensure_metadata_indexes(_vector_db(conn), SPEC, settings=HnswSettings())
+
+        assert [r.action for r in reports] == ["ok", "ok", "ok", "created"]
+        assert reports[-1].reason == "invalid"
+        assert 'DROP INDEX CONCURRENTLY IF EXISTS "ai"."hex_gig_embeddings_meta_source_type_index"' in conn.statements
+        assert len(_created(conn)) == 1
+
+    def test_dry_run_and_held_lock_build_nothing(self):
+        for conn, kwargs, action in (
+            (FakeConnection({}), {"dry_run": True}, "planned"),
+            (FakeConnection({}, lock_free=False), {}, "skipped"),
+        ):
+            reports = ensure_metadata_indexes(_vector_db(conn), SPEC, settings=HnswSettings(), **kwargs)
+
+            assert {r.action for r in reports} == {action}
+            assert not _created(conn)
+
+    def test_no_declared_keys_touches_nothing(self):
+        conn = FakeConnection({})
+
+        assert ensure_metadata_indexes(_vector_db(conn), MetadataFilterIndexes(), settings=HnswSettings()) == []
+        assert conn.statements == []
+
+    def test_predicate_quotes_are_escaped(self):
+        assert containment_predicate("faculty", "Children's Health") == (
+            """meta_data @> '{"faculty": "Children''s Health"}'::jsonb"""
+        )
+
+
+class TestEnsureKnowledgeIndexes:
+    def test_runs_every_check_and_reports_failures(self):
+        vector_db = _vector_db(FakeConnection({}), filter_indexes=SPEC)
+        hnsw = VectorIndexReport("ai.hex_gig_embeddings", "hex_gig_embeddings_hnsw_index", "ok", "", 20_000)
+
+        with (
+            patch("services.knowledge_indexes.ensure_vector_index", return_value=hnsw),
+            patch("services.knowledge_indexes.ensure_text_search_index", side_effect=RuntimeError("no permission")),
+        ):
+            reports = ensure_knowledge_indexes(vector_db, settings=HnswSettings())
+
+        assert reports[0] is hnsw
+        assert (reports[1].index_name, reports[1].action, reports[1].reason) == (
+            "text search index",
+            "failed",
+            "no permission",
+        )
+        assert [r.action for r in reports[2:]] == ["created"] * 4
+
+    def test_tables_without_declared_filters_skip_the_metadata_step(self):
+        vector_db = _vector_db(FakeConnection({}))
+        report = VectorIndexReport("ai.hex_gig_embeddings", "index", "ok", "", 0)
+
+        with (
+            patch("services.knowledge_indexes.ensure_vector_index", return_value=report),
+            patch("services.knowledge_indexes.ensure_text_search_index", return_value=report),
+        ):
+            assert len(ensure_knowledge_indexes(vector_db, settings=HnswSettings())) == 2
@@ -0,0 +1,264 @@
+"""
+Unit tests for reconciling a knowledge base with the desired documents.
+
+The contents DB and vector DB are mocked, so no database is required.
+Run with: pytest tests/services/test_knowledge_reconcile.py -v
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import Column, MetaData, String, Table
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
+
+from services.knowledge_reconcile import (
+    DOCUMENT_HASH_KEY,
+    _orphaned_content_ids,
+    aknowledge_load_lock,
+    document_hash,
+    forget_documents,
+    incomplete_documents,
+    reconcile_knowledge,
+)
+
+
+def _item(name: str, text: str, **metadata) -> dict:
+    return {"name": name, "text_content": text, "metadata": {"source_type": "member_profile", **metadata}}
+
+
+def _row(row_id: str, item: dict, status: str = "completed", with_hash: bool = True) -> SimpleNamespace:
+    metadata = dict(item["metadata"])
+    if with_hash:
+        metadata[DOCUMENT_HASH_KEY] = document_hash(item)
+    return SimpleNamespace(id=row_id, name=item["name"], metadata=metadata, status=status)
+
+
+def _knowledge(rows: list) -> MagicMock:
+    knowledge = MagicMock()
+    knowledge.contents_db.get_knowledge_contents.return_value = (rows, len(rows))
+    return knowledge
+
+
+def _deleted_ids(knowledge: MagicMock) -> set[str]:
+    return {call.args[0] for call in knowledge.contents_db.delete_knowledge_content.call_args_list}
+
+
+@patch("services.knowledge_reconcile._orphaned_content_ids", return_value={})
+class TestReconcileKnowledge:
+    def test_unchanged_documents_are_not_ingested(self, _orphans):
+        alice = _item("Alice", "Profile of Alice")
+        knowledge = _knowledge([_row("c1", alice)])
+
+        to_ingest, report = reconcile_knowledge(knowledge, [alice], "member profiles")
+
+        assert to_ingest == []
+        assert report.unchanged == 1
+        assert report.summary() == "member profiles: 0 added, 0 changed, 0 removed, 1 unchanged"
+        knowledge.contents_db.delete_knowledge_content.assert_not_called()
+
+    def test_changed_document_is_purged_and_ingested_again(self, _orphans):
+        knowledge = _knowledge([_row("c1", _item("Alice", "Old profile"))])
+        edited = _item("Alice", "New profile")
+
+        to_ingest, report = reconcile_knowledge(knowledge, [edited])
+
+        assert [item["name"] for item in to_ingest] == ["Alice"]
+        assert to_ingest[0]["metadata"][DOCUMENT_HASH_KEY] == document_hash(edited)
+        assert report.changed == ["Alice"]
+        assert report.removed == []
+        knowledge.vector_db.delete_by_content_id.assert_called_once_with("c1")
+        assert _deleted_ids(knowledge) == {"c1"}
+
+    def test_documents_gone_upstream_are_removed(self, _orphans):
+        alice, bob = _item("Alice", "Profile of Alice"), _item("Bob", "Profile of Bob")
+        knowledge = _knowledge([_row("c1", alice), _row("c2", bob)])
+
+        to_ingest, report = reconcile_knowledge(knowledge, [alice, _item("Carol", "Profile of Carol")])
+
+        assert [item["name"] for item in to_ingest] == ["Carol"]
+        assert (report.added, report.removed, report.unchanged) == (["Carol"], ["Bob"], 1)
+        assert _deleted_ids(knowledge) == {"c2"}
+
+    def test_rows_outside_the_scope_are_left_alone(self, orphans):
+        paper = {"name": "Alice", "path": "/tmp/x.pdf", "metadata": {"source_type": "research_paper"}}
+        knowledge = _knowledge([SimpleNamespace(id="p1", name="Alice", metadata=paper["metadata"], status="completed")])
+
+        _, report = reconcile_knowledge(knowledge, [], scope={"source_type": "member_profile"})
+
+        assert report.removed == []
+        knowledge.contents_db.delete_knowledge_content.assert_not_called()
+        assert orphans.call_args.args[2] == {"source_type": "member_profile"}
+
+    def test_duplicate_names_are_matched_by_hash(self, _orphans):
+        first, second = _item("Alice", "Paper one"), _item("Alice", "Paper two")
+        knowledge = _knowledge([_row("p1", first), _row("p2", second)])
+
+        to_ingest, report = reconcile_knowledge(knowledge, [second, first])
+
+        assert to_ingest == []
+        assert report.unchanged == 2
+
+    def test_rows_without_hash_or_failed_are_replaced(self, _orphans):
+        alice, bob = _item("Alice", "Profile of Alice"), _item("Bob", "Profile of Bob")
+        knowledge = _knowledge([_row("c1", alice, with_hash=False), _row("c2", bob, status="failed")])
+
+        to_ingest, report = reconcile_knowledge(knowledge, [alice, bob])
+
+        assert [item["name"] for item in to_ingest] == ["Alice", "Bob"]
+        assert report.changed == ["Alice", "Bob"]
+        assert _deleted_ids(knowledge) == {"c1", "c2"}
+
+    def test_retained_rows_are_kept(self, _orphans):
+        home = _item("Home", "Home text", source_url="https://x/")
+        page = _item("Studium", "Old text", source_url="https://x/studium/")
+        gone = _item("Gone", "Text", source_url="https://x/gone/")
+        knowledge = _knowledge([_row("w0", home), _row("w1", page), _row("w2", gone)])
+
+        _, report = reconcile_knowledge(
+            knowledge, [home], retain=lambda meta: meta.get("source_url") == "https://x/studium/"
+        )
+
+        assert report.removed == ["Gone"]
+        assert report.unchanged == 2
+        assert _deleted_ids(knowledge) == {"w2"}
+
+    def test_empty_desired_set_removes_nothing(self, orphans):
+        alice = _item("Alice", "Profile of Alice")
+        knowledge = _knowledge([_row("c1", alice)])
+
+        to_ingest, report = reconcile_knowledge(knowledge, [], "member profiles")
+
+        assert to_ingest == []
+        assert (report.removed, report.held_back) == ([], ["Alice"])
+        assert report.summary().endswith(", 1 removals held back")
+        knowledge.contents_db.delete_knowledge_content.assert_not_called()
+        knowledge.vector_db.delete_by_content_id.assert_not_called()
+        orphans.assert_not_called()
+
+    def test_retained_rows_count_as_desired(self, _orphans):
+        pages = [_item(f"Page {i}", "Text", source_url=f"https://x/{i}/") for i in range(20)]
+        knowledge = _knowledge([_row(f"w{i}", page) for i, page in enumerate(pages)])
+
+        # Nothing changed (every page answered 304), one page was deleted upstream.
+        _, report = reconcile_knowledge(knowledge, [], retain=lambda meta: meta["source_url"] != "https://x/7/")
+
+        assert (report.removed, report.held_back, report.unchanged) == (["Page 7"], [], 19)
+        assert _deleted_ids(knowledge) == {"w7"}
+
+    def test_removing_most_of_the_scope_is_held_back_but_changes_apply(self, _orphans):
+        alice, bob, carol = (_item(name, f"Profile of {name}") for name in ("Alice", "Bob", "Carol"))
+        knowledge = _knowledge([_row("c1", alice), _row("c2", bob), _row("c3", carol)])
+        edited = _item("Alice", "New profile")
+
+        to_ingest, report = reconcile_knowledge(knowledge, [edited])
+
+        assert [item["name"] for item in to_ingest] == ["Alice"]
+        assert report.held_back == ["Bob", "Carol"]
+        assert _deleted_ids(knowledge) == {"c1"}
+
+    def test_removal_limit_is_configurable(self, _orphans, monkeypatch):
+        alice, bob, carol = (_item(name, f"Profile of {name}") for name in ("Alice", "Bob", "Carol"))
+        rows = [_row("c1", alice), _row("c2", bob), _row("c3", carol)]
+
+        _, report = reconcile_knowledge(_knowledge(rows), [alice], max_removed_fraction=1.0)
+        assert report.removed == ["Bob", "Carol"]
+
+        monkeypatch.setenv("RECONCILE_MAX_REMOVED_FRACTION", "0.2")
+        _, report = reconcile_knowledge(_knowledge(rows), [alice, bob])
+        assert (report.removed, report.held_back) == ([], ["Carol"])
+
+    def test_orphaned_vectors_are_deleted_unless_retained(self, orphans):
+        orphans.return_value = {"o1": {"source_url": "https://x/old/"}, "o2": {"source_url": "https://x/keep/"}}
+        alice = _item("Alice", "Profile of Alice")
+        knowledge = _knowledge([_row("c1", alice)])
+
+        _, report = reconcile_knowledge(knowledge, [alice], retain=lambda meta: meta["source_url"] == "https://x/keep/")
+
+        assert orphans.call_args.args[1] == {"c1"}
+        knowledge.vector_db.delete_by_content_id.assert_called_once_with("o1")
+        assert report.orphaned_vectors == 1
+        assert report.summary().endswith(", 1 orphaned vector groups deleted")
+
+    def test_without_contents_db_everything_is_added(self, orphans):
+        knowledge = SimpleNamespace(contents_db=None, vector_db=MagicMock())
+
+        to_ingest, report = reconcile_knowledge(knowledge, [_item("Alice", "Profile of Alice")])
+
+        assert len(to_ingest) == 1
+        assert report.added == ["Alice"]
+        orphans.assert_not_called()
+
+
+class TestDocumentHash:
+    def test_covers_text_and_metadata_but_not_its_own_key(self):
+        item = _item("Alice", "Profile of Alice")
+
+        assert document_hash(item) == document_hash({**item, "metadata": {**item["metadata"], DOCUMENT_HASH_KEY: "x"}})
+        assert document_hash(item) != document_hash(_item("Alice", "Profile of Alice", title="Dr."))
+        assert document_hash(item) != document_hash(_item("Alice", "Profile of Alice, edited"))
+
+    def test_hashes_file_bytes(self, tmp_path):
+        path = tmp_path / "paper.pdf"
+        path.write_bytes(b"%PDF-1.4 one")
+        before = document_hash({"name": "Alice", "path": str(path), "metadata": {}})
+
+        path.write_bytes(b"%PDF-1.4 two")
+
+        assert document_hash({"name": "Alice", "path": str(path), "metadata": {}}) != before
+
+
+def test_orphaned_content_ids_query():
+    table = Table(
+        "member_embeddings", MetaData(), Column("content_id", String), Column("meta_data", JSONB), schema="ai"
+    )
+    sess = MagicMock()
+    sess.execute.return_value.all.return_value = [SimpleNamespace(content_id="o1", meta_data=None)]
+    vector_db = SimpleNamespace(table=table, Session=MagicMock())
+    vector_db.Session.return_value.__enter__.return_value = sess
+
+    orphans = _orphaned_content_ids(vector_db, {"c1", "c2"}, {"source_type": "news_article"})
+
+    assert orphans == {"o1": {}}
+    sql = str(sess.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "content_id IS NOT NULL" in sql
+    assert "NOT IN" in sql
+    assert "meta_data @>" in sql
+
+
+def test_forget_documents_drops_the_hash():
+    alice, bob = _item("Alice", "Profile of Alice"), _item("Bob", "Profile of Bob")
+    rows = [_row("c1", alice), _row("c2", bob)]
+    knowledge = _knowledge(rows)
+
+    assert forget_documents(knowledge, ["Alice"]) == 1
+
+    (updated,) = [call.args[0] for call in knowledge.contents_db.upsert_knowledge_content.call_args_list]
+    assert updated.id == "c1"
+    assert DOCUMENT_HASH_KEY not in updated.metadata
+    assert DOCUMENT_HASH_KEY in rows[1].metadata
+
+
+def test_incomplete_documents_are_failed_or_missing_rows():
+    alice, bob, carol = (_item(name, f"Profile of {name}") for name in ("Alice", "Bob", "Carol"))
+    with patch("services.knowledge_reconcile._orphaned_content_ids", return_value={}):
+        to_ingest, _ = reconcile_knowledge(_knowledge([]), [alice, bob, carol])
+    knowledge = _knowledge([_row("c1", alice), _row("c2", bob, status="failed")])
+
+    assert incomplete_documents(knowledge, to_ingest) == ["Bob", "Carol"]
+
+
+async def test_load_lock_is_held_on_one_connection():
+    conn = MagicMock()
+    vector_db = SimpleNamespace(schema="ai", table_name="hex_gig_embeddings", db_engine=MagicMock())
+    vector_db.db_engine.connect.return_value.execution_options.return_value = conn
+
+    async with aknowledge_load_lock(SimpleNamespace(vector_db=vector_db)):
+        (lock,) = conn.execute.call_args_list
+
+    vector_db.db_engine.connect.return_value.execution_options.assert_called_once_with(isolation_level="AUTOCOMMIT")
+    unlock = conn.execute.call_args_list[1]
+    assert "pg_advisory_lock" in str(lock.args[0])
+    assert "pg_advisory_unlock" in str(unlock.args[0])
+    assert lock.args[1] == unlock.args[1] == {"key": "knowledge_load:ai.hex_gig_embeddings"}
+    conn.close.assert_called_once()
@@ -4,74 +4,6 @@ import pytest
 
 from services.nextcloud_client import NextcloudClient
 
-PROPFIND_FOLDERS_XML = """\
-<?xml version="1.0"?>
-<d:multistatus xmlns:d="DAV:">
-  <d:response>
-    <d:href>/public.php/webdav/</d:href>
-    <d:propstat>
-      <d:prop>
-        <d:resourcetype><d:collection/></d:resourcetype>
-      </d:prop>
-      <d:status>HTTP/1.1 200 OK</d:status>
-    </d:propstat>
-  </d:response>
-  <d:response>
-    <d:href>/public.php/webdav/Laura%20Maria%20K%C3%B6nig/</d:href>
-    <d:propstat>
-      <d:prop>
-        <d:resourcetype><d:collection/></d:resourcetype>
-      </d:prop>
-      <d:status>HTTP/1.1 200 OK</d:status>
-    </d:propstat>
-  </d:response>
-  <d:response>
-    <d:href>/public.php/webdav/Barbara%20Wessner/</d:href>
-    <d:propstat>
-      <d:prop>
-        <d:resourcetype><d:collection/></d:resourcetype>
-      </d:prop>
-      <d:status>HTTP/1.1 200 OK</d:status>
-    </d:propstat>
-  </d:response>
-</d:multistatus>
-"""
-
-PROPFIND_FILES_XML = """\
-<?xml version="1.0"?>
-<d:multistatus xmlns:d="DAV:">
-  <d:response>
-    <d:href>/public.php/webdav/Laura%20Maria%20K%C3%B6nig/</d:href>
-    <d:propstat>
-      <d:prop>
-        <d:resourcetype><d:collection/></d:resourcetype>
-      </d:prop>
-      <d:status>HTTP/1.1 200 OK</d:status>
-    </d:propstat>
-  </d:response>
-  <d:response>
-    <d:href>/public.php/webdav/Laura%20Maria%20K%C3%B6nig/paper1.pdf</d:href>
-    <d:propstat>
-      <d:prop>
-        <d:resourcetype/>
-        <d:getcontentlength>12345</d:getcontentlength>
-      </d:prop>
-      <d:status>HTTP/1.1 200 OK</d:status>
-    </d:propstat>
-  </d:response>
-  <d:response>
-    <d:href>/public.php/webdav/Laura%20Maria%20K%C3%B6nig/notes.txt</d:href>
-    <d:propstat>
-      <d:prop>
-        <d:resourcetype/>
-        <d:getcontentlength>100</d:getcontentlength>
-      </d:prop>
-      <d:status>HTTP/1.1 200 OK</d:status>
-    </d:propstat>
-  </d:response>
-</d:multistatus>
-"""
-
 
 class FakeResponse:
     def __init__(self, text, status_code=207):
@@ -105,31 +37,36 @@ class FakeClient:
     async def __aexit__(self, *args):
         pass
 
+    async def aclose(self):
+        pass
 
-@pytest.mark.asyncio
-async def test_list_folders(monkeypatch):
-    client = NextcloudClient("https://example.com/public.php/webdav", "token123")
 
-    async def mock_propfind(self, path):
-        return PROPFIND_FOLDERS_XML
+class FakeStreamClient(FakeClient):
+    def __init__(self, body, headers=None):
+        super().__init__([])
+        self.body = body
+        self.headers = headers or {}
 
-    monkeypatch.setattr(NextcloudClient, "_propfind", mock_propfind)
+    def stream(self, method, url, **kwargs):
+        client = self
 
-    folders = await client.list_folders("/")
-    assert sorted(folders) == ["Barbara Wessner", "Laura Maria König"]
+        class Response:
+            headers = client.headers
 
+            def raise_for_status(self):
+                pass
 
-@pytest.mark.asyncio
-async def test_list_files_filters_by_extension(monkeypatch):
-    client = NextcloudClient("https://example.com/public.php/webdav", "token123")
+            async def aiter_bytes(self, chunk_size):
+                for i in range(0, len(client.body), 4):
+                    yield client.body[i : i + 4]
 
-    async def mock_propfind(self, path):
-        return PROPFIND_FILES_XML
+            async def __aenter__(self):
+                return self
 
-    monkeypatch.setattr(NextcloudClient, "_propfind", mock_propfind)
+            async def __aexit__(self, *args):
+                pass
 
-    files = await client.list_files("/Laura Maria König")
-    assert files == ["paper1.pdf"]
+        return Response()
 
 
 @pytest.mark.asyncio
@@ -139,14 +76,131 @@ async def test_download_file(tmp_path, monkeypatch):
 
     import httpx
 
-    monkeypatch.setattr(
-        httpx,
-        "AsyncClient",
-        lambda **kwargs: FakeClient([FakeResponse(pdf_content.decode("latin-1"), status_code=200)]),
-    )
+    monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: FakeStreamClient(pdf_content))
 
     local_path = tmp_path / "test.pdf"
     result = await client.download_file("/Member/test.pdf", local_path)
 
     assert result == local_path
-    assert local_path.read_bytes() == pdf_content.decode("latin-1").encode()
+    assert local_path.read_bytes() == pdf_content
+    assert [p.name for p in tmp_path.iterdir()] == ["test.pdf"]  # no temp file left
+
+
+@pytest.mark.asyncio
+async def test_short_download_keeps_the_previous_file(tmp_path, monkeypatch):
+    from services.atomic_download import IncompleteDownloadError
+
+    client = NextcloudClient("https://example.com/public.php/webdav", "token123")
+
+    import httpx
+
+    monkeypatch.setattr(
+        httpx, "AsyncClient", lambda **kwargs: FakeStreamClient(b"%PDF-1.4", headers={"content-length": "100"})
+    )
+
+    local_path = tmp_path / "test.pdf"
+    local_path.write_bytes(b"previous")
+    with pytest.raises(IncompleteDownloadError):
+        await client.download_file("/Member/test.pdf", local_path)
+
+    assert local_path.read_bytes() == b"previous"
+    assert [p.name for p in tmp_path.iterdir()] == ["test.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_requests_share_one_pooled_client(monkeypatch):
+    import httpx
+
+    created = []
+
+    def make_client(**kwargs):
+        created.append(kwargs)
+        return FakeClient([FakeResponse(_tree_xml(ROOT, MEMBER, PAPER)), FakeResponse(_tree_xml(MEMBER, PAPER))])
+
+    monkeypatch.setattr(httpx, "AsyncClient", make_client)
+
+    async with NextcloudClient("https://example.com/public.php/webdav", "token123", max_connections=4) as client:
+        assert [f.path for f in await client.list_tree("/")] == ["Laura Maria König/paper1.pdf"]
+        assert [f.path for f in await client.list_tree("/Laura Maria König")] == ["Laura Maria König/paper1.pdf"]
+
+    assert len(created) == 1
+    assert created[0]["limits"].max_connections == 4
+    assert client._http is None  # closed on exit
+
+
+def _tree_xml(*entries):
+    """Multistatus body; entries are (href, is_folder, etag, size)."""
+    responses = "".join(
+        f"<d:response><d:href>{href}</d:href><d:propstat><d:prop>"
+        + ("<d:resourcetype><d:collection/></d:resourcetype>" if is_folder else "<d:resourcetype/>")
+        + (f'<d:getetag>"{etag}"</d:getetag>' if etag else "")
+        + "<d:getlastmodified>Mon, 05 May 2025 10:00:00 GMT</d:getlastmodified>"
+        + (f"<d:getcontentlength>{size}</d:getcontentlength>" if size is not None else "")
+        + "</d:prop><d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>"
+        for href, is_folder, etag, size in entries
+    )
+    return f'<?xml version="1.0"?><d:multistatus xmlns:d="DAV:">{responses}</d:multistatus>'
+
+
+ROOT = ("/public.php/webdav/", True, None, None)
+MEMBER = ("/public.php/webdav/Laura%20Maria%20K%C3%B6nig/", True, None, None)
+PAPER = ("/public.php/webdav/Laura%20Maria%20K%C3%B6nig/paper1.pdf", False, "abc", 12345)
+
+
+@pytest.mark.asyncio
+async def test_list_tree_uses_one_infinite_depth_propfind(monkeypatch):
+    calls = []
+
+    async def mock_propfind(self, path, depth="1", body=None):
+        calls.append((path, depth))
+        return _tree_xml(ROOT, MEMBER, PAPER)
+
+    monkeypatch.setattr(NextcloudClient, "_propfind", mock_propfind)
+    client = NextcloudClient("https://example.com/public.php/webdav", "token123")
+
+    files = await client.list_tree("/")
+
+    assert calls == [("/", "infinity")]
+    assert [(f.path, f.etag, f.size) for f in files] == [("Laura Maria König/paper1.pdf", "abc", 12345)]
+    assert files[0].last_modified == "Mon, 05 May 2025 10:00:00 GMT"
+
+
+@pytest.mark.asyncio
+async def test_list_tree_walks_folders_when_the_server_answers_depth_one(monkeypatch):
+    calls = []
+
+    async def mock_propfind(self, path, depth="1", body=None):
+        calls.append((path, depth))
+        if path == "/":
+            return _tree_xml(ROOT, MEMBER)  # infinite depth silently ignored
+        return _tree_xml(MEMBER, PAPER)
+
+    monkeypatch.setattr(NextcloudClient, "_propfind", mock_propfind)
+    client = NextcloudClient("https://example.com/public.php/webdav", "token123")
+
+    files = await client.list_tree("/")
+
+    assert calls == [("/", "infinity"), ("/Laura Maria König", "1")]
+    assert [f.path for f in files] == ["Laura Maria König/paper1.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_list_tree_falls_back_when_infinite_depth_is_refused(monkeypatch):
+    import httpx
+
+    calls = []
+
+    async def mock_propfind(self, path, depth="1", body=None):
+        calls.append((path, depth))
+        if depth == "infinity":
+            request = httpx.Request("PROPFIND", "https://example.com/public.php/webdav/")
+            raise httpx.HTTPStatusError("refused", request=request, response=httpx.Response(403, request=request))
+        return _tree_xml(ROOT, MEMBER) if path == "/" else _tree_xml(MEMBER, PAPER)
+
+    monkeypatch.setattr(NextcloudClient, "_propfind", mock_propfind)
+    client = NextcloudClient("https://example.com/public.php/webdav", "token123")
+
+    files = await client.list_tree("/")
+
+    assert calls == [("/", "infinity"), ("/", "1"), ("/Laura Maria König", "1")]
+    assert [f.path for f in files] == ["Laura Maria König/paper1.pdf"]
@@ -0,0 +1,146 @@
+"""Tests for NextcloudPDFProvider concurrent discovery and downloads."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from services import nextcloud_pdf_provider
+from services.nextcloud_client import RemoteFile
+from services.nextcloud_pdf_provider import MANIFEST_FILENAME, NextcloudPDFProvider
+
+
+class FakeNextcloudClient:
+    def __init__(self, files_by_folder, failures=None, etags=None):
+        self.files_by_folder = files_by_folder
+        self.failures = dict(failures or {})
+        self.etags = etags or {}
+        self.listings = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.downloads = []
+        self.closed = False
+
+    async def _request(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+
+    async def list_tree(self, path):
+        self.listings += 1
+        return [
+            RemoteFile(path=f"{folder}/{name}", etag=self.etags.get(f"{folder}/{name}", "e1"), size=4)
+            for folder, names in self.files_by_folder.items()
+            for name in names
+        ] + [RemoteFile(path=f"{folder}/notes.txt", size=1) for folder in self.files_by_folder]
+
+    async def download_file(self, remote_path, local_path, expected_size=None):
+        assert expected_size == 4
+        await self._request()
+        self.downloads.append(remote_path)
+        if self.failures.get(remote_path):
+            self.failures[remote_path] -= 1
+            raise httpx.ReadError("connection reset")
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        local_path.write_bytes(b"%PDF")
+        return local_path
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(nextcloud_pdf_provider, "_RETRY_BASE_DELAY_S", 0.0)
+
+
+@pytest.mark.asyncio
+async def test_downloads_run_concurrently_within_the_bound(tmp_path):
+    client = FakeNextcloudClient({f"Member {i}": [f"paper{j}.pdf" for j in range(3)] for i in range(5)})
+
+    async with NextcloudPDFProvider(client, download_dir=tmp_path, concurrency=4) as provider:
+        discovered = await provider.discover_and_download()
+
+    assert len(discovered) == 15
+    assert [(pdf.member_folder_name, pdf.filename) for pdf in discovered[:3]] == [
+        ("Member 0", "paper0.pdf"),
+        ("Member 0", "paper1.pdf"),
+        ("Member 0", "paper2.pdf"),
+    ]
+    assert all(pdf.local_path.exists() for pdf in discovered)
+    assert 1 < client.max_in_flight <= 4
+    assert client.closed
+
+
+@pytest.mark.asyncio
+async def test_existing_files_are_not_downloaded_again(tmp_path):
+    (tmp_path / "Member").mkdir()
+    (tmp_path / "Member" / "cached.pdf").write_bytes(b"%PDF")
+    client = FakeNextcloudClient({"Member": ["cached.pdf", "new.pdf"]})
+
+    discovered = await NextcloudPDFProvider(client, download_dir=tmp_path).discover_and_download()
+
+    assert [pdf.filename for pdf in discovered] == ["cached.pdf", "new.pdf"]
+    assert client.downloads == ["/Member/new.pdf"]
+    assert set(json.loads((tmp_path / MANIFEST_FILENAME).read_text())) == {"Member/cached.pdf", "Member/new.pdf"}
+
+
+@pytest.mark.asyncio
+async def test_unchanged_share_costs_one_listing(tmp_path):
+    client = FakeNextcloudClient({"Member": ["a.pdf", "b.pdf"]})
+    await NextcloudPDFProvider(client, download_dir=tmp_path).discover_and_download()
+    client.downloads.clear()
+
+    discovered = await NextcloudPDFProvider(client, download_dir=tmp_path).discover_and_download()
+
+    assert client.downloads == []
+    assert client.listings == 2
+    assert len(discovered) == 2
+
+
+@pytest.mark.asyncio
+async def test_changed_and_truncated_files_are_downloaded_again(tmp_path):
+    client = FakeNextcloudClient({"Member": ["a.pdf", "b.pdf", "c.pdf"]})
+    await NextcloudPDFProvider(client, download_dir=tmp_path).discover_and_download()
+    client.downloads.clear()
+    client.etags["Member/a.pdf"] = "e2"  # replaced upstream
+    (tmp_path / "Member" / "b.pdf").write_bytes(b"%P")  # partial download
+
+    discovered = await NextcloudPDFProvider(client, download_dir=tmp_path).discover_and_download()
+
+    assert sorted(client.downloads) == ["/Member/a.pdf", "/Member/b.pdf"]
+    assert [pdf.filename for pdf in discovered] == ["a.pdf", "b.pdf", "c.pdf"]
+    assert json.loads((tmp_path / MANIFEST_FILENAME).read_text())["Member/a.pdf"]["etag"] == "e2"
+
+
+@pytest.mark.asyncio
+async def test_files_removed_upstream_leave_the_manifest(tmp_path):
+    client = FakeNextcloudClient({"Member": ["a.pdf", "b.pdf"]})
+    await NextcloudPDFProvider(client, download_dir=tmp_path).discover_and_download()
+    client.files_by_folder = {"Member": ["a.pdf"]}
+
+    await NextcloudPDFProvider(client, download_dir=tmp_path).discover_and_download()
+
+    assert list(json.loads((tmp_path / MANIFEST_FILENAME).read_text())) == ["Member/a.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried_per_file(tmp_path):
+    client = FakeNextcloudClient({"Member": ["a.pdf", "b.pdf"]}, failures={"/Member/a.pdf": 2})
+
+    await NextcloudPDFProvider(client, download_dir=tmp_path).discover_and_download()
+
+    assert client.downloads.count("/Member/a.pdf") == 3
+    assert client.downloads.count("/Member/b.pdf") == 1
+
+
+@pytest.mark.asyncio
+async def test_download_failing_after_retries_is_raised(tmp_path):
+    client = FakeNextcloudClient({"Member": ["a.pdf"]}, failures={"/Member/a.pdf": 5})
+
+    with pytest.raises(ExceptionGroup) as excinfo:
+        await NextcloudPDFProvider(client, download_dir=tmp_path).discover_and_download()
+
+    assert excinfo.group_contains(httpx.ReadError)
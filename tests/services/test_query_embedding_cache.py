@@ -0,0 +1,121 @@
+"""
+Unit tests for the query-embedding LRU + TTL cache.
+
+The embedder is a stub and the shared Postgres tier is mocked.
+Run with: pytest tests/services/test_query_embedding_cache.py -v
+"""
+
+from unittest.mock import MagicMock, patch
+
+from services.excerpt_index import content_hash
+from services.query_embedding_cache import QueryEmbeddingCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StubEmbed:
+    def __init__(self):
+        self.calls: list[str] = []
+
+    def __call__(self, text: str) -> list[float]:
+        self.calls.append(text)
+        return [float(len(text))]
+
+
+def _cache(**kwargs) -> QueryEmbeddingCache:
+    kwargs.setdefault("max_entries", 8)
+    kwargs.setdefault("ttl_seconds", 60.0)
+    kwargs.setdefault("shared", False)
+    return QueryEmbeddingCache(**kwargs)
+
+
+class TestNormalizeQuery:
+    def test_case_whitespace_and_unicode_form_are_ignored(self):
+        assert normalize_query("  Wann ist der\tAufnahmetest?  ") == "wann ist der aufnahmetest?"
+        assert normalize_query("Psychologie Ü") == normalize_query("psychologie Ü")
+
+
+class TestQueryEmbeddingCache:
+    def test_near_identical_queries_embed_once(self):
+        cache, embed = _cache(), StubEmbed()
+
+        first = cache.get_or_embed("m", 1536, "Who researches mental health?", embed)
+        second = cache.get_or_embed("m", 1536, "who researches  mental health?", embed)
+
+        assert first == second
+        assert embed.calls == ["Who researches mental health?"]
+        assert cache.stats() == {"entries": 1, "memory_hits": 1, "shared_hits": 0, "misses": 1, "hit_rate": 0.5}
+
+    def test_embedder_receives_the_unmodified_query(self):
+        cache, embed = _cache(), StubEmbed()
+        query = "  Straße zum ZID\tAufnahmetest "
+
+        cache.get_or_embed("m", 1536, query, embed)
+
+        assert embed.calls == [query]
+
+    def test_entries_expire_after_ttl(self):
+        clock, embed = FakeClock(), StubEmbed()
+        cache = _cache(ttl_seconds=10.0, clock=clock)
+
+        cache.get_or_embed("m", 1536, "frist", embed)
+        clock.now = 10.0
+        cache.get_or_embed("m", 1536, "frist", embed)
+
+        assert embed.calls == ["frist", "frist"]
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache, embed = _cache(max_entries=2), StubEmbed()
+
+        for query in ("a", "b", "a", "c", "a", "b"):
+            cache.get_or_embed("m", 1536, query, embed)
+
+        assert embed.calls == ["a", "b", "c", "b"]
+
+    def test_embedder_and_dimensions_are_part_of_the_key(self):
+        cache, embed = _cache(), StubEmbed()
+
+        cache.get_or_embed("m", 1536, "q", embed)
+        cache.get_or_embed("m", 256, "q", embed)
+        cache.get_or_embed("other", 1536, "q", embed)
+
+        assert len(embed.calls) == 3
+
+    def test_failed_embeddings_are_not_cached(self):
+        cache = _cache()
+        failing = MagicMock(return_value=[])
+
+        assert cache.get_or_embed("m", 1536, "q", failing) == []
+        cache.get_or_embed("m", 1536, "q", failing)
+
+        assert failing.call_count == 2
+
+
+class TestSharedTier:
+    @patch("services.query_embedding_cache.embedding_cache")
+    def test_shared_hit_skips_the_embedder(self, mock_shared):
+        mock_shared.lookup.return_value = {content_hash("frist"): [0.5]}
+        cache, embed = _cache(shared=True), StubEmbed()
+
+        assert cache.get_or_embed("m", 1536, "Frist", embed) == [0.5]
+        assert cache.get_or_embed("m", 1536, "frist", embed) == [0.5]
+
+        assert embed.calls == []
+        mock_shared.lookup.assert_called_once_with("m:query", 1536, ["frist"])
+        assert cache.stats()["shared_hits"] == 1
+        assert cache.stats()["memory_hits"] == 1
+
+    @patch("services.query_embedding_cache.embedding_cache")
+    def test_shared_miss_is_stored_for_other_workers(self, mock_shared):
+        mock_shared.lookup.return_value = {}
+        cache, embed = _cache(shared=True), StubEmbed()
+
+        cache.get_or_embed("m", 1536, "Frist", embed)
+
+        mock_shared.store.assert_called_once_with("m:query", 1536, ["frist"], [[5.0]])
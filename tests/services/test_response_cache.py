@@ -0,0 +1,107 @@
+"""
+Unit tests for the semantic response cache.
+
+Embeddings are small hand-written vectors; no embedder or database is required.
+Run with: pytest tests/services/test_response_cache.py -v
+"""
+
+from services.response_cache import SemanticResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+CITATIONS = [{"title": "Aufnahmeverfahren", "url": "https://ssc-psychologie.univie.ac.at/aufnahme"}]
+
+
+def _cache(**kwargs) -> SemanticResponseCache:
+    kwargs.setdefault("similarity_threshold", 0.95)
+    kwargs.setdefault("ttl_seconds", 60.0)
+    kwargs.setdefault("max_entries", 8)
+    return SemanticResponseCache(**kwargs)
+
+
+def _store(cache: SemanticResponseCache, agent_id: str, embedding: list[float], content: str) -> None:
+    _, ticket = cache.lookup(agent_id, embedding)
+    assert cache.store(ticket, content, CITATIONS)
+
+
+class TestLookup:
+    def test_similar_question_replays_answer_and_citations(self):
+        cache = _cache()
+        _store(cache, "ssc_psych", [1.0, 0.0, 0.0], "Der Aufnahmetest ist im August.")
+
+        cached, _ = cache.lookup("ssc_psych", [0.99, 0.05, 0.0])
+
+        assert cached.content == "Der Aufnahmetest ist im August."
+        assert cached.citations == CITATIONS
+        assert cached.similarity >= 0.95
+        assert cache.stats()["hits"] == 1
+
+    def test_dissimilar_question_misses(self):
+        cache = _cache()
+        _store(cache, "ssc_psych", [1.0, 0.0, 0.0], "answer")
+
+        cached, ticket = cache.lookup("ssc_psych", [0.7, 0.7, 0.0])
+
+        assert cached is None
+        assert ticket.agent_id == "ssc_psych"
+
+    def test_agents_do_not_share_answers(self):
+        cache = _cache()
+        _store(cache, "ssc_psych", [1.0, 0.0], "answer")
+
+        assert cache.lookup("hex", [1.0, 0.0])[0] is None
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = _cache(ttl_seconds=10.0, clock=clock)
+        _store(cache, "ssc_psych", [1.0, 0.0], "answer")
+
+        clock.now = 10.0
+
+        assert cache.lookup("ssc_psych", [1.0, 0.0])[0] is None
+        assert cache.stats()["entries"] == 0
+
+    def test_least_recently_used_answer_is_evicted(self):
+        cache = _cache(max_entries=2)
+        _store(cache, "a", [1.0, 0.0, 0.0], "x")
+        _store(cache, "a", [0.0, 1.0, 0.0], "y")
+        cache.lookup("a", [1.0, 0.0, 0.0])  # x is now the most recently used
+        _store(cache, "a", [0.0, 0.0, 1.0], "z")
+
+        assert cache.lookup("a", [1.0, 0.0, 0.0])[0].content == "x"
+        assert cache.lookup("a", [0.0, 1.0, 0.0])[0] is None
+
+    def test_zero_vector_is_a_miss(self):
+        cache = _cache()
+        _store(cache, "a", [1.0, 0.0], "x")
+
+        cached, ticket = cache.lookup("a", [0.0, 0.0])
+
+        assert cached is None
+        assert not cache.store(ticket, "y", [])
+
+
+class TestInvalidate:
+    def test_invalidate_drops_answers(self):
+        cache = _cache()
+        _store(cache, "a", [1.0, 0.0], "x")
+
+        cache.invalidate()
+
+        assert cache.lookup("a", [1.0, 0.0])[0] is None
+
+    def test_runs_started_before_a_reload_are_not_stored(self):
+        cache = _cache()
+        _, ticket = cache.lookup("a", [1.0, 0.0])
+
+        cache.invalidate()
+
+        assert not cache.store(ticket, "answer from old knowledge", CITATIONS)
+        assert cache.stats()["entries"] == 0
@@ -0,0 +1,81 @@
+"""
+Unit tests for the daily spend rollup helpers.
+
+Statements are compiled against the PostgreSQL dialect; no database is required.
+Run with: pytest tests/services/test_spend_rollup.py -v
+"""
+
+from datetime import date
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from api.settings import api_settings
+from services.spend_rollup import add_daily_spend, get_daily_spend, lock_daily_spend
+
+
+class TestAddDailySpend:
+    def test_upsert_adds_to_existing_total_atomically(self):
+        db = MagicMock()
+
+        add_daily_spend(db, date(2026, 3, 28), 0.42)
+
+        stmt = db.execute.call_args.args[0]
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (date, project) DO UPDATE" in sql
+        assert "cost_eur = (daily_spend_rollup.cost_eur + excluded.cost_eur)" in sql
+
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        assert params["date"] == date(2026, 3, 28)
+        assert params["project"] == api_settings.project_config.project_name
+        assert params["cost_eur"] == 0.42
+
+    def test_release_decrements_reservations_without_going_negative(self):
+        db = MagicMock()
+
+        add_daily_spend(db, date(2026, 3, 28), 0.1, released_eur=0.3)
+
+        sql = str(db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "reserved_eur = greatest(daily_spend_rollup.reserved_eur - " in sql
+
+    def test_no_release_leaves_reservations_alone(self):
+        db = MagicMock()
+
+        add_daily_spend(db, date(2026, 3, 28), 0.1)
+
+        sql = str(db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "reserved_eur = greatest" not in sql
+
+    def test_does_not_commit(self):
+        """The caller commits, so the rollup moves together with the detail rows."""
+        db = MagicMock()
+
+        add_daily_spend(db, date(2026, 3, 28), 0.42)
+
+        db.commit.assert_not_called()
+
+
+class TestLockDailySpend:
+    def test_creates_row_then_selects_it_for_update(self):
+        db = MagicMock()
+        row = db.query.return_value.filter.return_value.with_for_update.return_value.one.return_value
+
+        assert lock_daily_spend(db, date(2026, 3, 28)) is row
+
+        sql = str(db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (date, project) DO NOTHING" in sql
+        db.query.return_value.filter.return_value.with_for_update.assert_called_once()
+
+
+class TestGetDailySpend:
+    def test_returns_rollup_value(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.scalar.return_value = 1.5
+
+        assert get_daily_spend(db, date(2026, 3, 28)) == 1.5
+
+    def test_missing_row_is_zero(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.scalar.return_value = None
+
+        assert get_daily_spend(db, date(2026, 3, 28)) == 0.0
@@ -0,0 +1,122 @@
+"""
+Unit tests for SSE content-delta coalescing.
+
+Uses real agno event dataclasses; no model or network is required.
+Run with: pytest tests/services/test_sse_coalescer.py -v
+"""
+
+import asyncio
+import json
+
+import pytest
+from agno.os.utils import format_sse_event
+from agno.run.agent import RunCompletedEvent, RunContentEvent, ToolCallStartedEvent
+
+from services.sse_coalescer import coalesce_content_events
+
+
+def _delta(text: str, run_id: str = "run-1") -> RunContentEvent:
+    return RunContentEvent(content=text, run_id=run_id)
+
+
+async def _stream(events, delay: float = 0.0, error: Exception = None):
+    for event in events:
+        if delay:
+            await asyncio.sleep(delay)
+        yield event
+    if error is not None:
+        raise error
+
+
+async def _collect(events, window_seconds=1.0, max_bytes=4096, queue_size=64):
+    return [
+        event
+        async for event in coalesce_content_events(
+            events, window_seconds=window_seconds, max_bytes=max_bytes, queue_size=queue_size
+        )
+    ]
+
+
+class TestCoalesceContentEvents:
+    async def test_merges_deltas_and_flushes_at_completion(self):
+        completed = RunCompletedEvent(content="Hello world", run_id="run-1")
+
+        out = await _collect(_stream([_delta("Hel"), _delta("lo "), _delta("world"), completed]))
+
+        assert [event.event for event in out] == ["RunContent", "RunCompleted"]
+        assert out[0].content == "Hello world"
+        assert out[1] is completed
+
+    async def test_tool_call_is_a_flush_boundary(self):
+        tool_started = ToolCallStartedEvent(run_id="run-1")
+
+        out = await _collect(_stream([_delta("a"), _delta("b"), tool_started, _delta("c")]))
+
+        assert [(event.event, getattr(event, "content", None)) for event in out] == [
+            ("RunContent", "ab"),
+            ("ToolCallStarted", None),
+            ("RunContent", "c"),
+        ]
+
+    async def test_max_bytes_forces_a_flush(self):
+        out = await _collect(_stream([_delta("aaaa"), _delta("bbbb"), _delta("cc")]), max_bytes=8)
+
+        assert [event.content for event in out] == ["aaaabbbb", "cc"]
+
+    async def test_window_elapses_while_upstream_is_quiet(self):
+        """A stalled model must not hold back text already received."""
+        out = await _collect(_stream([_delta("a"), _delta("b")], delay=0.05), window_seconds=0.01)
+
+        assert [event.content for event in out] == ["a", "b"]
+
+    async def test_deltas_with_references_are_not_merged(self):
+        with_refs = RunContentEvent(content="x", run_id="run-1", references=[{"references": []}])
+
+        out = await _collect(_stream([_delta("a"), with_refs, _delta("b")]))
+
+        assert [event.content for event in out] == ["a", "x", "b"]
+        assert out[1] is with_refs
+
+    async def test_upstream_error_is_raised_after_buffered_text(self):
+        received = []
+        with pytest.raises(RuntimeError, match="model exploded"):
+            async for event in coalesce_content_events(
+                _stream([_delta("partial")], error=RuntimeError("model exploded")),
+                window_seconds=1.0,
+                max_bytes=4096,
+                queue_size=64,
+            ):
+                received.append(event)
+
+        assert [event.content for event in received] == ["partial"]
+
+    async def test_merged_frame_keeps_bare_json_event_key(self):
+        """agent-ui routes on the `event` key inside the JSON payload, not the SSE header."""
+        out = await _collect(_stream([_delta("Hel"), _delta("lo")]))
+
+        frame = format_sse_event(out[0])
+        payload = json.loads(frame.split("data: ", 1)[1])
+        assert frame.startswith("event: RunContent\n")
+        assert payload["event"] == "RunContent"
+        assert payload["content"] == "Hello"
+
+    async def test_closing_early_stops_reading_the_run(self):
+        """Backpressure: a bounded queue caps read-ahead, and closing cancels the pump."""
+        produced = []
+
+        async def endless():
+            i = 0
+            while True:
+                produced.append(i)
+                yield ToolCallStartedEvent(run_id="run-1")
+                i += 1
+
+        stream = coalesce_content_events(endless(), window_seconds=1.0, max_bytes=4096, queue_size=4)
+        await stream.__anext__()
+        await asyncio.sleep(0.01)
+        assert len(produced) <= 4 + 2
+        await stream.aclose()
+
+        produced_at_close = len(produced)
+        await asyncio.sleep(0.01)
+        assert len(produced) == produced_at_close
@@ -0,0 +1,228 @@
+"""
+Unit tests for the background usage/metrics writer.
+
+SessionLocal is mocked, so no database is required.
+Run with: pytest tests/services/test_usage_writer.py -v
+"""
+
+import asyncio
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.dialects import postgresql
+
+from db.models.budget import DailyAgentUsage, DailySpendRollup
+from db.models.usage_metrics import AgentUsageMetrics
+from services.usage_writer import UsageWriter
+
+
+def _usage(cost: float = 0.1, day: date = date(2026, 3, 28)) -> dict:
+    return {"date": day, "input_tokens": 10, "output_tokens": 5, "cost_eur": cost}
+
+
+def _metrics(status: str = "success") -> dict:
+    return {"date": date(2026, 3, 28), "input_tokens": 10, "output_tokens": 5, "response_status": status}
+
+
+def _inserted_rows(mock_db) -> dict:
+    """Map table name -> rows passed to each multi-row INSERT."""
+    return {call.args[0].table.name: call.args[1] for call in mock_db.execute.call_args_list if len(call.args) > 1}
+
+
+def _rollup_upserts(mock_db) -> list:
+    """Compiled parameters of every daily_spend_rollup upsert."""
+    return [
+        call.args[0].compile().params
+        for call in mock_db.execute.call_args_list
+        if call.args[0].table.name == DailySpendRollup.__tablename__
+    ]
+
+
+class TestUsageWriter:
+    @patch("services.usage_writer.SessionLocal")
+    async def test_not_running_rejects_rows(self, mock_session_local):
+        """Before start() callers must fall back to their synchronous write."""
+        writer = UsageWriter(batch_size=10, flush_seconds=1.0, max_queue_size=100)
+
+        assert writer.submit_usage(_usage()) is False
+        assert writer.submit_metrics(_metrics()) is False
+        mock_session_local.assert_not_called()
+
+    @patch("services.usage_writer.SessionLocal")
+    async def test_stop_flushes_queued_rows_in_one_insert_per_table(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        writer = UsageWriter(batch_size=100, flush_seconds=60.0, max_queue_size=100)
+        writer.start()
+
+        assert writer.submit_usage(_usage())
+        assert writer.submit_usage(_usage())
+        assert writer.submit_metrics(_metrics())
+        assert writer.queue_depth == 3
+
+        await writer.stop()
+
+        rows = _inserted_rows(mock_db)
+        assert len(rows[DailyAgentUsage.__tablename__]) == 2
+        assert len(rows[AgentUsageMetrics.__tablename__]) == 1
+        assert len(_rollup_upserts(mock_db)) == 1
+        assert mock_db.execute.call_count == 3
+        assert writer.running is False
+        assert writer.queue_depth == 0
+
+    @patch("services.usage_writer.SessionLocal")
+    async def test_flushes_when_batch_size_reached(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        writer = UsageWriter(batch_size=2, flush_seconds=60.0, max_queue_size=100)
+        writer.start()
+
+        writer.submit_metrics(_metrics())
+        writer.submit_metrics(_metrics())
+        for _ in range(20):
+            if mock_db.execute.called:
+                break
+            await asyncio.sleep(0.01)
+
+        assert mock_db.execute.call_count == 1
+        await writer.stop()
+
+    @patch("services.usage_writer.SessionLocal")
+    async def test_flushes_after_interval(self, mock_session_local):
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        writer = UsageWriter(batch_size=100, flush_seconds=0.01, max_queue_size=100)
+        writer.start()
+
+        writer.submit_metrics(_metrics())
+        for _ in range(50):
+            if mock_db.execute.called:
+                break
+            await asyncio.sleep(0.01)
+
+        assert mock_db.execute.call_count == 1
+        await writer.stop()
+
+    @patch("services.usage_writer.SessionLocal")
+    async def test_usage_batch_bumps_rollup_once_per_day(self, mock_session_local):
+        """A batch adds its summed cost to the rollup with one upsert per date."""
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        writer = UsageWriter(batch_size=100, flush_seconds=60.0, max_queue_size=100)
+        writer.start()
+
+        writer.submit_usage(_usage(cost=0.25, day=date(2026, 3, 28)))
+        writer.submit_usage(_usage(cost=0.5, day=date(2026, 3, 28)))
+        writer.submit_usage(_usage(cost=1.0, day=date(2026, 3, 29)))
+        await writer.stop()
+
+        upserts = {params["date"]: params["cost_eur"] for params in _rollup_upserts(mock_db)}
+        assert upserts == {date(2026, 3, 28): 0.75, date(2026, 3, 29): 1.0}
+        mock_db.commit.assert_called_once()
+
+    @patch("services.usage_writer.SessionLocal")
+    async def test_releases_commit_with_the_batch(self, mock_session_local):
+        """Settled and released reservations are netted per date in the rollup upsert."""
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        writer = UsageWriter(batch_size=100, flush_seconds=60.0, max_queue_size=100)
+        writer.start()
+
+        writer.submit_usage(_usage(cost=0.25), release=(date(2026, 3, 28), 0.5))
+        assert writer.submit_release(date(2026, 3, 28), 0.5)
+        await writer.stop()
+
+        statements = [call.args[0] for call in mock_db.execute.call_args_list]
+        rollups = [stmt for stmt in statements if stmt.table.name == DailySpendRollup.__tablename__]
+        assert len(rollups) == 1
+        assert "reserved_eur" in str(rollups[0].compile(dialect=postgresql.dialect()))
+        assert 1.0 in rollups[0].compile().params.values()
+        mock_db.commit.assert_called_once()
+
+    @patch("services.usage_writer.SessionLocal")
+    async def test_pending_cost_tracks_uncommitted_usage(self, mock_session_local):
+        """Queued spend is visible to the budget ledger until it is committed."""
+        mock_session_local.return_value = MagicMock()
+        writer = UsageWriter(batch_size=100, flush_seconds=60.0, max_queue_size=100)
+        writer.start()
+
+        writer.submit_usage(_usage(cost=0.25))
+        writer.submit_usage(_usage(cost=0.5))
+        assert writer.pending_cost_eur(date(2026, 3, 28)) == 0.75
+        assert writer.pending_cost_eur(date(2026, 3, 29)) == 0.0
+
+        await writer.stop()
+        assert writer.pending_cost_eur(date(2026, 3, 28)) == 0.0
+
+    @patch("services.usage_writer.SessionLocal")
+    async def test_stats_report_the_queue_depth(self, mock_session_local):
+        mock_session_local.return_value = MagicMock()
+        writer = UsageWriter(batch_size=100, flush_seconds=60.0, max_queue_size=100)
+        writer.start()
+
+        writer.submit_metrics(_metrics())
+        writer.submit_metrics(_metrics())
+        stats = writer.stats()
+        await writer.stop()
+
+        assert stats == {
+            "running": True,
+            "queue_depth": 2,
+            "max_queue_size": 100,
+            "retried_rows": 0,
+            "dropped_rows": 0,
+        }
+        assert writer.stats()["queue_depth"] == 0
+
+    @patch("services.usage_writer.SessionLocal")
+    async def test_full_queue_rejects_rows(self, mock_session_local):
+        mock_session_local.return_value = MagicMock()
+        writer = UsageWriter(batch_size=100, flush_seconds=60.0, max_queue_size=1)
+        writer.start()
+
+        assert writer.submit_metrics(_metrics()) is True
+        assert writer.submit_metrics(_metrics()) is False
+        await writer.stop()
+
+    @patch("services.usage_writer.SessionLocal")
+    async def test_failed_commit_is_retried(self, mock_session_local):
+        """A transient DB error delays the batch instead of losing its spend and releases."""
+        mock_db = MagicMock()
+        mock_db.commit.side_effect = [Exception("DB connection lost"), None]
+        mock_session_local.return_value = mock_db
+        writer = UsageWriter(batch_size=100, flush_seconds=60.0, max_queue_size=100, retry_base_seconds=0.0)
+        writer.start()
+
+        writer.submit_usage(_usage(cost=0.25), release=(date(2026, 3, 28), 0.5))
+        await writer.stop()
+
+        mock_db.rollback.assert_called_once()
+        assert mock_db.commit.call_count == 2
+        assert len(_rollup_upserts(mock_db)) == 2
+        assert (writer.retried_rows, writer.dropped_rows) == (1, 0)
+        assert writer.pending_cost_eur(date(2026, 3, 28)) == 0.0
+
+    @patch("services.usage_writer.SessionLocal")
+    async def test_rows_failing_every_retry_are_written_one_by_one(self, mock_session_local):
+        """A bad row is dropped on its own; its cost stays pending for the budget ledger."""
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+
+        def commit():
+            rows = mock_db.execute.call_args_list[-2].args[1]
+            if any(row["cost_eur"] == 0.5 for row in rows):
+                raise Exception("value out of range")
+
+        mock_db.commit.side_effect = commit
+        writer = UsageWriter(
+            batch_size=100, flush_seconds=60.0, max_queue_size=100, max_retries=2, retry_base_seconds=0.0
+        )
+        writer.start()
+
+        writer.submit_usage(_usage(cost=0.25))
+        writer.submit_usage(_usage(cost=0.5))
+        await writer.stop()
+
+        assert (writer.retried_rows, writer.dropped_rows) == (4, 1)
+        assert writer.pending_cost_eur(date(2026, 3, 28)) == 0.5
+        mock_db.close.assert_called()
@@ -0,0 +1,173 @@
+"""
+Unit tests for the HNSW index lifecycle of the knowledge vector tables.
+
+The database connection is a fake that answers the catalog queries and records
+every statement, so no Postgres is required.
+Run with: pytest tests/services/test_vector_index.py -v
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from services.vector_index import (
+    HnswSettings,
+    IndexState,
+    ensure_vector_index,
+    hnsw_index,
+    parse_reloptions,
+    rebuild_reason,
+)
+
+SETTINGS = HnswSettings(m=16, ef_construction=64, ef_search=40, rebuild_growth=2.0)
+
+
+def _state(**overrides) -> IndexState:
+    values = dict(
+        method="hnsw",
+        opclass="vector_cosine_ops",
+        options={"m": "16", "ef_construction": "64"},
+        valid=True,
+        size_bytes=8_388_608,
+        built_rows=1000,
+    )
+    values.update(overrides)
+    return IndexState(**values)
+
+
+class TestRebuildReason:
+    def test_healthy_index_needs_nothing(self):
+        assert rebuild_reason(_state(), 1500, "vector_cosine_ops", SETTINGS) is None
+
+    def test_missing_index_is_created(self):
+        assert rebuild_reason(None, 10, "vector_cosine_ops", SETTINGS) == "missing"
+
+    def test_wrong_opclass_is_rebuilt(self):
+        reason = rebuild_reason(_state(opclass="vector_l2_ops"), 1000, "vector_cosine_ops", SETTINGS)
+        assert reason == "opclass vector_l2_ops, expected vector_cosine_ops"
+
+    def test_ivfflat_and_invalid_indexes_are_rebuilt(self):
+        assert "ivfflat" in rebuild_reason(_state(method="ivfflat"), 1000, "vector_cosine_ops", SETTINGS)
+        assert "invalid" in rebuild_reason(_state(valid=False), 1000, "vector_cosine_ops", SETTINGS)
+
+    def test_changed_build_parameters_are_rebuilt(self):
+        state = _state(options={"m": "16", "ef_construction": "200"})
+        assert rebuild_reason(state, 1000, "vector_cosine_ops", SETTINGS).startswith("built with")
+
+    def test_growth_threshold_triggers_rebuild(self):
+        assert rebuild_reason(_state(), 1999, "vector_cosine_ops", SETTINGS) is None
+        assert rebuild_reason(_state(), 2000, "vector_cosine_ops", SETTINGS) == "grew from 1000 to 2000 rows"
+
+    def test_unknown_build_size_never_triggers_growth_rebuild(self):
+        assert rebuild_reason(_state(built_rows=None), 10**6, "vector_cosine_ops", SETTINGS) is None
+
+
+def test_parse_reloptions():
+    assert parse_reloptions(["m=16", "ef_construction=64"]) == {"m": "16", "ef_construction": "64"}
+    assert parse_reloptions(None) == {}
+
+
+def test_hnsw_index_carries_query_ef_search():
+    index = hnsw_index(SETTINGS)
+    assert (index.m, index.ef_construction, index.ef_search) == (16, 64, 40)
+    assert index.configuration == {}
+
+
+class FakeConnection:
+    """Answers count/catalog/lock queries; records every statement."""
+
+    def __init__(self, rows: int, catalog_rows: list, lock_free: bool = True):
+        self.rows = rows
+        self.catalog_rows = list(catalog_rows)
+        self.lock_free = lock_free
+        self.statements: list[str] = []
+
+    def execute(self, stmt, params=None):
+        sql = " ".join(str(stmt).split())
+        self.statements.append(sql)
+        result = MagicMock()
+        if sql.startswith("SELECT count(*)"):
+            result.scalar_one.return_value = self.rows
+        elif "FROM pg_index" in sql:
+            result.mappings.return_value.first.return_value = self.catalog_rows.pop(0) if self.catalog_rows else None
+        elif "pg_try_advisory_lock" in sql:
+            result.scalar_one.return_value = self.lock_free
+        return result
+
+
+def _vector_db(conn: FakeConnection):
+    engine = MagicMock()
+    engine.connect.return_value.execution_options.return_value.__enter__.return_value = conn
+    return SimpleNamespace(db_engine=engine, schema="ai", table_name="ssc_psych_embeddings", distance="cosine")
+
+
+def _catalog(**overrides) -> dict:
+    row = dict(
+        method="hnsw",
+        opclass="vector_cosine_ops",
+        options=["m=16", "ef_construction=64"],
+        valid=True,
+        size_bytes=4_194_304,
+        comment="rows=900",
+    )
+    row.update(overrides)
+    return row
+
+
+class TestEnsureVectorIndex:
+    def test_missing_index_is_built_concurrently_and_reported(self):
+        conn = FakeConnection(rows=1200, catalog_rows=[None, _catalog(comment="rows=1200")])
+
+        report = ensure_vector_index(_vector_db(conn), settings=SETTINGS)
+
+        assert (report.action, report.reason, report.rows) == ("created", "missing", 1200)
+        assert report.size_bytes == 4_194_304
+        assert report.build_seconds is not None
+        create = next(sql for sql in conn.statements if sql.startswith("CREATE INDEX"))
+        assert create == (
+            'CREATE INDEX CONCURRENTLY "ssc_psych_embeddings_hnsw_index" ON "ai"."ssc_psych_embeddings" '
+            "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+        )
+        assert 'COMMENT ON INDEX "ai"."ssc_psych_embeddings_hnsw_index" IS \'rows=1200\'' in conn.statements
+        assert any("pg_advisory_unlock" in sql for sql in conn.statements)
+
+    def test_wrong_opclass_is_replaced_by_swapping_a_new_index_in(self):
+        conn = FakeConnection(rows=1000, catalog_rows=[_catalog(opclass="vector_l2_ops"), _catalog()])
+
+        report = ensure_vector_index(_vector_db(conn), settings=SETTINGS)
+
+        assert report.action == "rebuilt"
+        ddl = [sql for sql in conn.statements if sql.split()[0] in ("CREATE", "DROP", "ALTER")]
+        assert ddl == [
+            'DROP INDEX CONCURRENTLY IF EXISTS "ai"."ssc_psych_embeddings_hnsw_index_new"',
+            (
+                'CREATE INDEX CONCURRENTLY "ssc_psych_embeddings_hnsw_index_new" ON "ai"."ssc_psych_embeddings" '
+                "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+            ),
+            'DROP INDEX CONCURRENTLY IF EXISTS "ai"."ssc_psych_embeddings_hnsw_index"',
+            'ALTER INDEX "ai"."ssc_psych_embeddings_hnsw_index_new" RENAME TO "ssc_psych_embeddings_hnsw_index"',
+        ]
+
+    def test_healthy_index_without_comment_gets_a_growth_baseline(self):
+        conn = FakeConnection(rows=1000, catalog_rows=[_catalog(comment=None)])
+
+        report = ensure_vector_index(_vector_db(conn), settings=SETTINGS)
+
+        assert report.action == "ok"
+        assert 'COMMENT ON INDEX "ai"."ssc_psych_embeddings_hnsw_index" IS \'rows=1000\'' in conn.statements
+        assert not any(sql.startswith("CREATE INDEX") for sql in conn.statements)
+
+    def test_dry_run_only_reports(self):
+        conn = FakeConnection(rows=1000, catalog_rows=[None])
+
+        report = ensure_vector_index(_vector_db(conn), settings=SETTINGS, dry_run=True)
+
+        assert (report.action, report.reason) == ("planned", "missing")
+        assert not any(sql.startswith(("CREATE", "DROP")) for sql in conn.statements)
+
+    def test_build_held_by_another_process_is_skipped(self):
+        conn = FakeConnection(rows=1000, catalog_rows=[None], lock_free=False)
+
+        report = ensure_vector_index(_vector_db(conn), settings=SETTINGS)
+
+        assert report.action == "skipped"
+        assert not any(sql.startswith("CREATE INDEX") for sql in conn.statements)